@@ -11,7 +11,7 @@ except:
 import os
 import sys
 sys.path.append('./')
-from src.cost_time import calculate_time    
+from src.cost_time import instrument    
 
 class FunASR:
     def __init__(self) -> None:
@@ -36,7 +36,7 @@ class FunASR:
         #         punc_model="FunASR/punc_ct-transformer_zh-cn-common-vocab272727-pytorch", # punc_model_revision="v2.0.4",
         #         # spk_model="cam++", spk_model_revision="v2.0.2",
         #         )
-    @calculate_time
+    @instrument
     def transcribe(self, audio_file):
         res = self.model.generate(input=audio_file, 
             batch_size_s=300)
@@ -5,7 +5,7 @@ pip install -U openai-whisper
 import whisper
 import sys
 sys.path.append('./')
-from src.cost_time import calculate_time 
+from src.cost_time import instrument 
 
 class WhisperASR:
     def __init__(self, model_path):
@@ -112,7 +112,7 @@ class WhisperASR:
         }
         self.model = whisper.load_model(model_path)
 
-    @calculate_time
+    @instrument
     def transcribe(self, audio_file):
         result = self.model.transcribe(audio_file)
         return result["text"]
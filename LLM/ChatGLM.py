@@ -4,6 +4,7 @@
 支持：Qwen，ChatLLM等
 '''
 from transformers import AutoModelForCausalLM, AutoTokenizer
+from src.cost_time import instrument
 
 class ChatGLM:
     def __init__(self, mode='offline', model_path = 'THUDM/chatglm3-6b', prefix_prompt = '''请用少于25个字回答以下问题\n\n'''):
@@ -20,6 +21,7 @@ class ChatGLM:
         tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
         return model, tokenizer   
     
+    @instrument
     def generate(self, prompt, system_prompt=""):
         if self.mode != 'api':
             try:
@@ -37,6 +39,7 @@ class ChatGLM:
         '''暂时不写api版本,与Linly-api相类似,感兴趣可以实现一下'''
         pass 
     
+    @instrument
     def chat(self, system_prompt, message):
         response = self.generate(message, system_prompt)
         self.history.append((message, response))
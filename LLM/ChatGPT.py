@@ -3,6 +3,7 @@ pip install openai
 '''
 import os
 from openai import OpenAI
+from src.cost_time import instrument
 
 class ChatGPT():
     def __init__(self, model_path = 'gpt-3.5-turbo', api_key = None, proxy_url = None, prefix_prompt = '''请用少于25个字回答以下问题\n\n'''):
@@ -14,6 +15,7 @@ class ChatGPT():
         self.model_path = model_path
         self.prefix_prompt = prefix_prompt
 
+    @instrument
     def generate(self, message):
         try:
             response = self.client.chat.completions.create(
@@ -3,6 +3,7 @@ pip install -U g4f[all]
 https://github.com/xtekky/gpt4free
 '''
 from g4f.client import Client
+from src.cost_time import instrument
 
 class GPT4FREE:
     def __init__(self, prefix_prompt = '''请用少于25个字回答以下问题\n\n'''):
@@ -17,6 +18,7 @@ class GPT4FREE:
         )
         print(response.choices[0].message.content)
         '''
+    @instrument
     def generate(self, question, system_prompt="You are a helpful assistant."):
         self.history += [{
                 "role": "user", 
@@ -34,6 +36,7 @@ class GPT4FREE:
             return '对不起，你的请求出错了，请再次尝试。\nSorry, your request has encountered an error. Please try again.\n'
         
         return response.choices[0].message.content
+    @instrument
     def chat(self, system_prompt = "You are a helpful assistant.", message = "", history=[]):
         response = self.generate(message, system_prompt)
         self.history += [{
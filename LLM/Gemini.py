@@ -1,5 +1,6 @@
 import os
 import google.generativeai as genai
+from src.cost_time import instrument
 
 
 def configure_api(api_key, proxy_url=None):
@@ -14,6 +15,7 @@ class Gemini:
         configure_api(api_key, proxy_url)
         self.model = genai.GenerativeModel(model_path)
         
+    @instrument
     def generate(self, question):
         response = self.model.generate_content(question)
         return response
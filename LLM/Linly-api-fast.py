@@ -5,6 +5,7 @@ import json
 import datetime
 import torch
 from configs import model_path, api_port
+from src.cost_time import instrument_app
 # 设置设备参数
 DEVICE = "11"  # 使用CUDA
 DEVICE_ID = "0"  # CUDA设备ID，如果未设置则为空
@@ -17,8 +18,8 @@ def torch_gc():
             torch.cuda.empty_cache()  # 清空CUDA缓存
             torch.cuda.ipc_collect()  # 收集CUDA内存碎片
 
-# 创建FastAPI应用
-app = FastAPI()
+# 创建FastAPI应用（附带请求追踪与 /metrics 接口）
+app = instrument_app(FastAPI())
 
 # 处理POST请求的端点
 @app.post("/")
@@ -4,6 +4,7 @@ import requests
 import json
 from transformers import AutoModelForCausalLM, AutoTokenizer
 from configs import ip, api_port, model_path
+from src.cost_time import instrument
 os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
 
 class Linly:
@@ -30,6 +31,7 @@ class Linly:
         tokenizer = AutoTokenizer.from_pretrained(path, use_fast=False, trust_remote_code=True)
         return model, tokenizer   
     
+    @instrument
     def generate(self, question, system_prompt=""):
         if self.mode != 'api':
             self.data["question"] = self.message_to_prompt(question, system_prompt)
@@ -69,6 +71,7 @@ class Linly:
         response = requests.post(url=self.url, headers=headers, data=json.dumps(data))
         return response.json()['response']
             
+    @instrument
     def chat(self, system_prompt, message, history):
         self.history = history
         prompt = self.message_to_prompt(message, system_prompt)
@@ -5,6 +5,7 @@ from transformers import (
     StoppingCriteria,
 )
 import os
+from src.cost_time import instrument
 os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
 # os.environ["CUDA_VISIBLE_DEVICES"] = '0'
 
@@ -54,6 +55,7 @@ class Llama2Chinese:
             base_model.resize_token_embeddings(tokenzier_vocab_size)
         return base_model, tokenizer
     
+    @instrument
     def generate(self, prompt, system_prompt="Below is an instruction that describes a task. Write a response that appropriately completes the request."):
         """
         生成对话响应
@@ -126,6 +128,7 @@ class Llama2Chinese:
         '''暂时不写api版本,与Linly-api相类似,感兴趣可以实现一下'''
         pass 
     
+    @instrument
     def chat(self, system_prompt, message):
         response = self.generate(message, system_prompt)
         self.history.append((message, response))
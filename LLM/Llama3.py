@@ -4,6 +4,7 @@ pip install openai
 import os
 import json
 from openai import OpenAI
+from src.cost_time import instrument
 
 class Llama3():
     # 可能的API配置
@@ -112,6 +113,7 @@ class Llama3():
             
         self.prefix_prompt = prefix_prompt
 
+    @instrument
     def generate(self, message, system_prompt="你是一个很有帮助的中文助手。"):
         try:
             # 添加用户消息到历史记录
@@ -161,6 +163,7 @@ class Llama3():
             print(f"\nLlama3 API错误: {str(e)}")
             return f"对不起，调用Llama3 API时出错: {str(e)}\n请检查API密钥和网络连接，然后重试。"
 
+    @instrument
     def chat(self, system_prompt = "你是一个很有帮助的中文助手。", message = "", history=[]):
         response = self.generate(message, system_prompt)
         history.append((message, response))
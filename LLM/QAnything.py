@@ -1,6 +1,7 @@
 import time
 import requests
 import json
+from src.cost_time import instrument
 
 def _extract_plain_response(data_string):
     '''
@@ -103,6 +104,7 @@ class QAnything:
         except Exception as e:
             print(f"QAnything chat: 请求发送失败: {e}")
     
+    @instrument
     def generate(self, prompt):
         """
         生成对话响应
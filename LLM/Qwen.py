@@ -2,6 +2,7 @@ import os
 import torch
 import requests
 from transformers import AutoModelForCausalLM, AutoTokenizer
+from src.cost_time import instrument
 os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
 
 class Qwen:
@@ -27,6 +28,7 @@ class Qwen:
 
         return model, tokenizer   
     
+    @instrument
     def generate(self, question, system_prompt=""):
         if self.mode != 'api':
             self.data["question"] = self.prefix_prompt + question
@@ -43,6 +45,7 @@ class Qwen:
         '''暂时不写api版本,与Linly-api相类似,感兴趣可以实现一下'''
         pass 
     
+    @instrument
     def chat(self, system_prompt, message, history):
         response = self.generate(message, system_prompt)
         history.append((message, response))
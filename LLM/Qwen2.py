@@ -2,6 +2,7 @@ import os
 import torch
 import requests
 from transformers import AutoModelForCausalLM, AutoTokenizer
+from src.cost_time import instrument
 os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
 
 class Qwen2:
@@ -28,6 +29,7 @@ class Qwen2:
 
         return model, tokenizer   
     
+    @instrument
     def generate(self, question, system_prompt="You are a helpful assistant."):
         device = 'cuda' if torch.cuda.is_available() else 'cpu'
         if self.mode != 'api':
@@ -63,6 +65,7 @@ class Qwen2:
         '''暂时不写api版本,与Linly-api相类似,感兴趣可以实现一下'''
         pass 
     
+    @instrument
     def chat(self, system_prompt, message, history):
         response = self.generate(message, system_prompt)
         history.append((message, response))
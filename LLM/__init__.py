@@ -11,6 +11,7 @@ from .Llama3 import Llama3
 from .Llama2Chinese import Llama2Chinese
 from .GPT4Free import GPT4FREE
 from .QAnything import QAnything
+from src.cost_time import instrument
 
 def test_Linly(question = "如何应对压力？", mode='offline', model_path="Linly-AI/Chinese-LLaMA-2-7B-hf"):
     llm = Linly(mode, model_path)
@@ -64,11 +65,13 @@ class LLM:
         llm.prefix_prompt = prefix_prompt
         return llm
     
+    @instrument
     def chat(self, system_prompt, message, history):
         response = self.generate(message, system_prompt)
         history.append((message, response))
         return response, history
 
+    @instrument
     def generate(self, question, system_prompt = 'system无效'):
         return question
     
@@ -1,4 +1,5 @@
 from llama_cpp import Llama
+from src.cost_time import instrument
 
 class LlamacppChat:
     def __init__(self, model_path):
@@ -10,6 +11,7 @@ class LlamacppChat:
             n_ctx=1024  # 设置上下文长度
         )
 
+    @instrument
     def chat(self, messages):
         output = self.llm.create_chat_completion(
             messages=messages
@@ -1,7 +0,0 @@
-# -*- coding: utf-8 -*-
-
-__author__ = """Adrian Bulat"""
-__email__ = 'adrian.bulat@nottingham.ac.uk'
-__version__ = '1.0.1'
-
-from .api import FaceAlignment, LandmarksType, NetworkSize, YOLOv8_face
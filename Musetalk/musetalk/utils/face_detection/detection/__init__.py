@@ -1 +0,0 @@
-from .core import FaceDetector
\ No newline at end of file
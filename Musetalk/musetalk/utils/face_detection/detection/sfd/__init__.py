@@ -1 +0,0 @@
-from .sfd_detector import SFDDetector as FaceDetector
\ No newline at end of file
@@ -1,5 +1,4 @@
 import sys
-from face_detection import FaceAlignment,LandmarksType
 from os import listdir, path
 import subprocess
 import numpy as np
@@ -7,20 +6,11 @@ import cv2
 import pickle
 import os
 import json
-from mmpose.apis import inference_topdown, init_model
-from mmpose.structures import merge_data_samples
-import torch
 from tqdm import tqdm
+from src.utils.face_analysis import get_face_analysis
 
-# initialize the mmpose model
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-config_file = './Musetalk/musetalk/utils/dwpose/rtmpose-l_8xb32-270e_coco-ubody-wholebody-384x288.py'
-checkpoint_file = './Musetalk/models/dwpose/dw-ll_ucoco_384.pth'
-model = init_model(config_file, checkpoint_file, device=device)
-
-# initialize the face detection model
-device = "cuda" if torch.cuda.is_available() else "cpu"
-fa = FaceAlignment(LandmarksType._2D, flip_input=False,device=device)
+# DWPose 与 S3FD 由共享的人脸分析服务在首次使用时加载（进程内只加载一次），结果按帧哈希缓存
+fa = get_face_analysis()
 
 # maker if the bbox is not sufficient 
 coord_placeholder = (0.0,0.0,0.0,0.0)
@@ -42,8 +32,7 @@ def read_imgs(img_list):
 
 def get_bbox_range(img_list,upperbondrange =0):
     frames = read_imgs(img_list)
-    batch_size_fa = 1
-    batches = [frames[i:i + batch_size_fa] for i in range(0, len(frames), batch_size_fa)]
+    batch_size_fa = 8
     coords_list = []
     landmarks = []
     if upperbondrange != 0:
@@ -52,30 +41,26 @@ def get_bbox_range(img_list,upperbondrange =0):
         print('get key_landmark and face bounding boxes with the default value')
     average_range_minus = []
     average_range_plus = []
-    for fb in tqdm(batches):
-        results = inference_topdown(model, np.asarray(fb)[0])
-        results = merge_data_samples(results)
-        keypoints = results.pred_instances.keypoints
-        face_land_mark= keypoints[0][23:91]
+    # DWPose 关键点与 S3FD 人脸框整段批量计算（已缓存的帧直接复用）
+    face_land_marks = fa.landmarks(frames)
+    # get bounding boxes by face detetion
+    bboxes = fa.detect(frames, batch_size=batch_size_fa)
+    for face_land_mark, f in zip(tqdm(face_land_marks), bboxes):
         face_land_mark = face_land_mark.astype(np.int32)
         
-        # get bounding boxes by face detetion
-        bbox = fa.get_detections_for_batch(np.asarray(fb))
-        
         # adjust the bounding box refer to landmark
         # Add the bounding box to a tuple and append it to the coordinates list
-        for j, f in enumerate(bbox):
-            if f is None: # no face in the image
-                coords_list += [coord_placeholder]
-                continue
-            
-            half_face_coord =  face_land_mark[29]#np.mean([face_land_mark[28], face_land_mark[29]], axis=0)
-            range_minus = (face_land_mark[30]- face_land_mark[29])[1]
-            range_plus = (face_land_mark[29]- face_land_mark[28])[1]
-            average_range_minus.append(range_minus)
-            average_range_plus.append(range_plus)
-            if upperbondrange != 0:
-                half_face_coord[1] = upperbondrange+half_face_coord[1] #手动调整  + 向下（偏29）  - 向上（偏28）
+        if f is None: # no face in the image
+            coords_list += [coord_placeholder]
+            continue
+        
+        half_face_coord =  face_land_mark[29]#np.mean([face_land_mark[28], face_land_mark[29]], axis=0)
+        range_minus = (face_land_mark[30]- face_land_mark[29])[1]
+        range_plus = (face_land_mark[29]- face_land_mark[28])[1]
+        average_range_minus.append(range_minus)
+        average_range_plus.append(range_plus)
+        if upperbondrange != 0:
+            half_face_coord[1] = upperbondrange+half_face_coord[1] #手动调整  + 向下（偏29）  - 向上（偏28）
 
     text_range=f"Total frame:「{len(frames)}」 Manually adjust range : [ -{int(sum(average_range_minus) / len(average_range_minus))}~{int(sum(average_range_plus) / len(average_range_plus))} ] , the current value: {upperbondrange}"
     return text_range
@@ -83,8 +68,7 @@ def get_bbox_range(img_list,upperbondrange =0):
 
 def get_landmark_and_bbox(img_list,upperbondrange =0):
     frames = read_imgs(img_list)
-    batch_size_fa = 1
-    batches = [frames[i:i + batch_size_fa] for i in range(0, len(frames), batch_size_fa)]
+    batch_size_fa = 8
     coords_list = []
     landmarks = []
     if upperbondrange != 0:
@@ -93,42 +77,38 @@ def get_landmark_and_bbox(img_list,upperbondrange =0):
         print('get key_landmark and face bounding boxes with the default value')
     average_range_minus = []
     average_range_plus = []
-    for fb in tqdm(batches):
-        results = inference_topdown(model, np.asarray(fb)[0])
-        results = merge_data_samples(results)
-        keypoints = results.pred_instances.keypoints
-        face_land_mark= keypoints[0][23:91]
+    # DWPose 关键点与 S3FD 人脸框整段批量计算（已缓存的帧直接复用）
+    face_land_marks = fa.landmarks(frames)
+    # get bounding boxes by face detetion
+    bboxes = fa.detect(frames, batch_size=batch_size_fa)
+    for face_land_mark, f in zip(tqdm(face_land_marks), bboxes):
         face_land_mark = face_land_mark.astype(np.int32)
         
-        # get bounding boxes by face detetion
-        bbox = fa.get_detections_for_batch(np.asarray(fb))
-        
         # adjust the bounding box refer to landmark
         # Add the bounding box to a tuple and append it to the coordinates list
-        for j, f in enumerate(bbox):
-            if f is None: # no face in the image
-                coords_list += [coord_placeholder]
-                continue
-            
-            half_face_coord =  face_land_mark[29]#np.mean([face_land_mark[28], face_land_mark[29]], axis=0)
-            range_minus = (face_land_mark[30]- face_land_mark[29])[1]
-            range_plus = (face_land_mark[29]- face_land_mark[28])[1]
-            average_range_minus.append(range_minus)
-            average_range_plus.append(range_plus)
-            if upperbondrange != 0:
-                half_face_coord[1] = upperbondrange+half_face_coord[1] #手动调整  + 向下（偏29）  - 向上（偏28）
-            half_face_dist = np.max(face_land_mark[:,1]) - half_face_coord[1]
-            upper_bond = half_face_coord[1]-half_face_dist
-            
-            f_landmark = (np.min(face_land_mark[:, 0]),int(upper_bond),np.max(face_land_mark[:, 0]),np.max(face_land_mark[:,1]))
-            x1, y1, x2, y2 = f_landmark
-            
-            if y2-y1<=0 or x2-x1<=0 or x1<0: # if the landmark bbox is not suitable, reuse the bbox
-                coords_list += [f]
-                w,h = f[2]-f[0], f[3]-f[1]
-                print("error bbox:",f)
-            else:
-                coords_list += [f_landmark]
+        if f is None: # no face in the image
+            coords_list += [coord_placeholder]
+            continue
+        
+        half_face_coord =  face_land_mark[29]#np.mean([face_land_mark[28], face_land_mark[29]], axis=0)
+        range_minus = (face_land_mark[30]- face_land_mark[29])[1]
+        range_plus = (face_land_mark[29]- face_land_mark[28])[1]
+        average_range_minus.append(range_minus)
+        average_range_plus.append(range_plus)
+        if upperbondrange != 0:
+            half_face_coord[1] = upperbondrange+half_face_coord[1] #手动调整  + 向下（偏29）  - 向上（偏28）
+        half_face_dist = np.max(face_land_mark[:,1]) - half_face_coord[1]
+        upper_bond = half_face_coord[1]-half_face_dist
+        
+        f_landmark = (np.min(face_land_mark[:, 0]),int(upper_bond),np.max(face_land_mark[:, 0]),np.max(face_land_mark[:,1]))
+        x1, y1, x2, y2 = f_landmark
+        
+        if y2-y1<=0 or x2-x1<=0 or x1<0: # if the landmark bbox is not suitable, reuse the bbox
+            coords_list += [f]
+            w,h = f[2]-f[0], f[3]-f[1]
+            print("error bbox:",f)
+        else:
+            coords_list += [f_landmark]
     
     print("********************************************bbox_shift parameter adjustment**********************************************************")
     print(f"Total frame:「{len(frames)}」 Manually adjust range : [ -{int(sum(average_range_minus) / len(average_range_minus))}~{int(sum(average_range_plus) / len(average_range_plus))} ] , the current value: {upperbondrange}")
@@ -0,0 +1,80 @@
+"""
+Backend selection for the NeRF CUDA extensions (raymarching / gridencoder / freqencoder / shencoder).
+
+Each extension has a pure-PyTorch implementation (torch_impl.py in the package) that is used
+for inference when the CUDA extension cannot be used, e.g. on CPU preview nodes or in CI.
+The backend is chosen by the NERF_BACKEND environment variable or set_backend():
+
+    auto   use the CUDA extension when a GPU is available and it loads, otherwise fall back (default)
+    cuda   always use the CUDA extension, fail if it cannot be loaded
+    torch  always use the PyTorch implementation
+
+Training kernels (march_rays_train, composite_rays_train*, ...) are CUDA only.
+"""
+import functools
+import os
+
+import torch
+
+BACKENDS = ('auto', 'cuda', 'torch')
+
+_backend = os.environ.get('NERF_BACKEND', 'auto').lower()
+if _backend not in BACKENDS:
+    raise ValueError(f'NERF_BACKEND must be one of {BACKENDS}, got {_backend!r}')
+
+
+def set_backend(name):
+    global _backend
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f'backend must be one of {BACKENDS}, got {name!r}')
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+class Extension:
+    ''' Lazily loaded CUDA extension.
+    Attribute access is forwarded to the compiled module, so existing `_backend.xxx(...)` calls are unchanged.
+    The extension is only built / imported the first time it is needed, so CPU nodes never invoke nvcc.
+    '''
+    def __init__(self, name, load_fn):
+        self.name = name
+        self.load_fn = load_fn
+        self._module = None
+        self._error = None
+
+    @property
+    def module(self):
+        if self._module is None and self._error is None:
+            if _backend == 'auto' and not torch.cuda.is_available():
+                return None
+            try:
+                self._module = self.load_fn()
+            except Exception as e:
+                self._error = e
+                if _backend == 'auto':
+                    print(f'[WARN] {self.name} CUDA extension is not available ({e}), using the PyTorch implementation.')
+        if self._module is None and _backend == 'cuda':
+            raise RuntimeError(f'{self.name} CUDA extension is not available: {self._error}')
+        return self._module
+
+    def use_torch(self):
+        return _backend == 'torch' or self.module is None
+
+    def dispatch(self, cuda_fn, torch_fn):
+        ''' Return a function calling torch_fn or cuda_fn depending on the backend selected at call time. '''
+        @functools.wraps(torch_fn)
+        def fn(*args, **kwargs):
+            if self.use_torch():
+                return torch_fn(*args, **kwargs)
+            return cuda_fn(*args, **kwargs)
+        return fn
+
+    def __getattr__(self, name):
+        module = self.module
+        if module is None:
+            raise RuntimeError(f'{self.name} CUDA extension is not available (backend: {_backend})')
+        return getattr(module, name)
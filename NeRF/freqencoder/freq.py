@@ -6,10 +6,18 @@ from torch.autograd import Function
 from torch.autograd.function import once_differentiable
 from torch.cuda.amp import custom_bwd, custom_fwd 
 
-try:
-    import _freqencoder as _backend
-except ImportError:
-    from .backend import _backend
+from extensions import Extension
+from . import torch_impl
+
+
+def _load_backend():
+    try:
+        import _freqencoder as _backend
+    except ImportError:
+        from .backend import _backend
+    return _backend
+
+_backend = Extension('freqencoder', _load_backend)
 
 
 class _freq_encoder(Function):
@@ -49,7 +57,7 @@ class _freq_encoder(Function):
         return grad_inputs, None, None
     
 
-freq_encode = _freq_encoder.apply
+freq_encode = _backend.dispatch(_freq_encoder.apply, torch_impl.freq_encode)
 
 
 class FreqEncoder(nn.Module):
@@ -0,0 +1,18 @@
+''' Pure PyTorch implementation of the frequency encoding (see src/freqencoder.cu). '''
+import numpy as np
+
+import torch
+
+
+def freq_encode(inputs, degree, output_dim):
+    # inputs: [B, input_dim], float
+    # RETURN: [B, F], float, [x, sin(x), cos(x), sin(2x), cos(2x), ...]
+
+    inputs = inputs.float()
+    outputs = [inputs]
+    for f in range(degree):
+        x = inputs * (2.0 ** f)
+        outputs.append(torch.sin(x))
+        outputs.append(torch.sin(x + np.float32(np.pi / 2)))
+
+    return torch.cat(outputs, dim=-1)
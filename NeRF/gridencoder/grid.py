@@ -6,10 +6,18 @@ from torch.autograd import Function
 from torch.autograd.function import once_differentiable
 from torch.cuda.amp import custom_bwd, custom_fwd 
 
-try:
-    import _gridencoder as _backend
-except ImportError:
-    from .backend import _backend
+from extensions import Extension
+from . import torch_impl
+
+
+def _load_backend():
+    try:
+        import _gridencoder as _backend
+    except ImportError:
+        from .backend import _backend
+    return _backend
+
+_backend = Extension('gridencoder', _load_backend)
 
 _gridtype_to_id = {
     'hash': 0,
@@ -85,7 +93,7 @@ class _grid_encode(Function):
         
 
 
-grid_encode = _grid_encode.apply
+grid_encode = _backend.dispatch(_grid_encode.apply, torch_impl.grid_encode)
 
 
 class GridEncoder(nn.Module):
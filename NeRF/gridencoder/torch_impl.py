@@ -0,0 +1,89 @@
+''' Pure PyTorch implementation of the multi-resolution grid encoding (see src/gridencoder.cu).
+
+Differentiable through the embedding lookup (and the inputs), so no custom backward is needed.
+'''
+import numpy as np
+
+import torch
+
+PRIMES = (1, 2654435761, 805459861, 3674653429, 2097192037, 1434869437, 2165219737)
+
+
+def _fast_hash(pos_grid):
+    # uint32 xor hash, emulated with int64
+    result = torch.zeros_like(pos_grid[..., 0])
+    for d in range(pos_grid.shape[-1]):
+        result = result ^ ((pos_grid[..., d] * PRIMES[d]) & 0xFFFFFFFF)
+    return result
+
+
+def _level_params(offsets, per_level_scale, base_resolution, D, gridtype, align_corners):
+    ''' per-level scale, hashmap size, strides ([L, D], 0 for dims after the stride exceeds the hashmap) and hash flag '''
+    L = len(offsets) - 1
+    S = np.float32(np.log2(per_level_scale))
+    scales, sizes, strides, use_hash = [], [], [], []
+    for level in range(L):
+        hashmap_size = offsets[level + 1] - offsets[level]
+        scale = np.float32(np.exp2(np.float32(level) * S) * np.float32(base_resolution) - np.float32(1))
+        resolution = int(np.ceil(scale)) + 1
+
+        stride = 1
+        level_strides = [0] * D
+        for d in range(D):
+            if stride > hashmap_size:
+                break
+            level_strides[d] = stride
+            stride *= resolution if align_corners else (resolution + 1)
+
+        scales.append(scale)
+        sizes.append(hashmap_size)
+        strides.append(level_strides)
+        # gridtype: 0 == hash, 1 == tiled
+        use_hash.append(gridtype == 0 and stride > hashmap_size)
+    return np.array(scales, dtype=np.float32), sizes, strides, use_hash
+
+
+def grid_encode(inputs, embeddings, offsets, per_level_scale, base_resolution, calc_grad_inputs=False, gridtype=0, align_corners=False):
+    # inputs: [B, D], float in [0, 1]
+    # embeddings: [sO, C], float
+    # offsets: [L + 1], int
+    # RETURN: [B, L * C], float
+
+    inputs = inputs.float()
+    device = inputs.device
+    B, D = inputs.shape
+    offsets = offsets.tolist()
+    scales, sizes, strides, use_hash = _level_params(offsets, per_level_scale, base_resolution, D, gridtype, align_corners)
+
+    scales = torch.from_numpy(scales).to(device)
+    sizes = torch.tensor(sizes, dtype=torch.long, device=device)
+    strides = torch.tensor(strides, dtype=torch.long, device=device)
+    use_hash = torch.tensor(use_hash, dtype=torch.bool, device=device)
+    starts = torch.tensor(offsets[:-1], dtype=torch.long, device=device)
+
+    # if input out of bound, the output is 0
+    oob = ((inputs < 0) | (inputs > 1)).any(-1)
+    inputs = inputs.clamp(0, 1)
+
+    # all levels at once: [B, L, D]
+    pos = inputs[:, None, :] * scales[None, :, None] + (0.0 if align_corners else 0.5)
+    pos_grid = torch.floor(pos)
+    pos = pos - pos_grid
+    pos_grid = pos_grid.long()
+
+    outputs = 0
+    for idx in range(1 << D):
+        w = 1
+        corner = pos_grid.clone()
+        for d in range(D):
+            if (idx & (1 << d)) == 0:
+                w = w * (1 - pos[..., d])
+            else:
+                w = w * pos[..., d]
+                corner[..., d] += 1
+        index = torch.where(use_hash, _fast_hash(corner), (corner * strides).sum(-1))
+        index = index % sizes + starts
+        outputs = outputs + w[..., None] * embeddings[index].float()
+
+    outputs = outputs.masked_fill(oob[:, None, None], 0)
+    return outputs.reshape(B, -1)
@@ -1,8 +1,11 @@
 import os
 import cv2
 import glob
+import hashlib
 import json
 import tqdm
+from collections import OrderedDict
+from types import SimpleNamespace
 import numpy as np
 from scipy.spatial.transform import Slerp, Rotation
 import matplotlib.pyplot as plt 
@@ -13,7 +16,7 @@ import torch
 import torch.nn.functional as F
 from torch.utils.data import DataLoader
 
-from .utils import get_audio_features, get_rays, get_bg_coords, convert_poses, AudDataset
+from .utils import get_audio_features, get_rays, get_ray_directions, get_bg_coords, convert_poses, AudDataset
 
 # ref: https://github.com/NVlabs/instant-ngp/blob/b76004c8cf478880227401ae763be4c02f80b62f/include/neural-graphics-primitives/nerf_loader.h#L50
 def nerf_matrix_to_ngp(pose, scale=0.33, offset=[0, 0, 0]):
@@ -81,8 +84,118 @@ def visualize_poses(poses, size=0.1):
     trimesh.Scene(objects).show()
 
 from .wav2vec import *
+
+
+class AudioFeatureExtractor:
+    """
+    音频特征提取器，跨请求常驻：
+    AVE 编码器 / wav2vec 模型只加载一次，相同音频内容的特征按哈希缓存（内存LRU）。
+    """
+    def __init__(self, opt, device, max_cached=8):
+        self.opt = opt
+        self.device = device
+        self.max_cached = max_cached
+        self.features = OrderedDict()
+        self._ave_model = None
+
+    def __call__(self, aud):
+        with open(aud, 'rb') as f:
+            digest = hashlib.sha1(f.read())
+        digest.update(repr((self.opt.asr_model, self.opt.emb)).encode('utf-8'))
+        key = digest.hexdigest()
+        if key in self.features:
+            self.features.move_to_end(key)
+            print(f'[INFO] use cached aud_features of {aud}')
+            return self.features[key]
+
+        aud_features = self.process(self.extract(aud))
+        print(f'[INFO] load {aud} aud_features: {aud_features.shape}')
+        aud_features = aud_features.to(self.device)
+        self.features[key] = aud_features
+        while len(self.features) > self.max_cached:
+            self.features.popitem(last=False)
+        return aud_features
+
+    @property
+    def ave_model(self):
+        if self._ave_model is None:
+            from .network import AudioEncoder
+            model = AudioEncoder().to(self.device).eval()
+            ckpt = torch.load('./checkpoints/audio_visual_encoder.pth', map_location='cpu')
+            model.load_state_dict({f'audio_encoder.{k}': v for k, v in ckpt.items()})
+            self._ave_model = model
+        return self._ave_model
+
+    def extract(self, aud):
+        if aud.endswith('npy'):
+            return np.load(aud)
+        elif aud.endswith('wav'):
+            if self.opt.asr_model == 'cpierse/wav2vec2-large-xlsr-53-esperanto':
+                # 利用预训练的Wav2vec来跑一下，模型在 wav2vec 模块中常驻
+                asr_opt = SimpleNamespace(asr_wav=aud, asr_play=False, asr_save_feats=True,
+                                          asr_model=self.opt.asr_model, fps=self.opt.fps,
+                                          l=self.opt.l, m=self.opt.m, r=self.opt.r)
+                with ASR(asr_opt) as asr:
+                    asr.run()
+                return np.load(aud.replace('.wav', '_eo.npy'))
+            elif self.opt.asr_model == 'deepspeech':
+                os.system(f"python NeRF/data_utils/deepspeech_features/extract_ds_features.py --input {aud}")
+                return np.load(aud.replace('.wav', '.npy'))
+            elif self.opt.asr_model == 'ave':
+                dataset = AudDataset(aud)
+                data_loader = DataLoader(dataset, batch_size=64, shuffle=False)
+                outputs = []
+                for mel in data_loader:
+                    mel = mel.to(self.device)
+                    with torch.no_grad():
+                        out = self.ave_model(mel)
+                    outputs.append(out)
+                outputs = torch.cat(outputs, dim=0).cpu()
+                first_frame, last_frame = outputs[:1], outputs[-1:]
+                return torch.cat([first_frame.repeat(2, 1), outputs, last_frame.repeat(2, 1)], dim=0).numpy()
+            else:
+                try:
+                    return np.load(aud)
+                except:
+                    print(f'[ERROR] If do not use Audio Visual Encoder, replace it with the npy file path')
+                    raise
+        else:
+            raise NotImplementedError
+
+    def process(self, aud_features):
+        if self.opt.asr_model == 'ave':
+            aud_features = torch.from_numpy(aud_features).unsqueeze(0)
+
+            # support both [N, 16] labels and [N, 16, K] logits
+            if len(aud_features.shape) == 3:
+                aud_features = aud_features.float().permute(1, 0, 2)  # [N, 16, 29] --> [N, 29, 16]
+
+                if self.opt.emb:
+                    print(f'[INFO] argmax to aud features {aud_features.shape} for --emb mode')
+                    aud_features = aud_features.argmax(1)  # [N, 16]
+
+            else:
+                assert self.opt.emb, "aud only provide labels, must use --emb"
+                aud_features = aud_features.long()
+        else:
+            aud_features = torch.from_numpy(aud_features)
+
+            # support both [N, 16] labels and [N, 16, K] logits
+            if len(aud_features.shape) == 3:
+                aud_features = aud_features.float().permute(0, 2, 1)  # [N, 16, 29] --> [N, 29, 16]
+
+                if self.opt.emb:
+                    print(f'[INFO] argmax to aud features {aud_features.shape} for --emb mode')
+                    aud_features = aud_features.argmax(1)  # [N, 16]
+
+            else:
+                assert self.opt.emb, "aud only provide labels, must use --emb"
+                aud_features = aud_features.long()
+        return aud_features
+
+
 class NeRFDataset_Test:
-    def __init__(self, opt, device, downscale=1):
+    def __init__(self, opt, device, downscale=1, audio_extractor=None):
         super().__init__()
         
         self.opt = opt
@@ -99,6 +212,10 @@ class NeRFDataset_Test:
         self.training = False
         self.num_rays = -1
 
+        # 位姿、内参、背景与光线只与位姿文件有关，构造一次后跨请求复用；
+        # 每次请求只需通过 set_audio 更新音频特征
+        self.audio_extractor = audio_extractor or AudioFeatureExtractor(opt, device)
+
         # load nerf-compatible format data.
         
         with open(opt.pose, 'r') as f:
@@ -119,104 +236,7 @@ class NeRFDataset_Test:
 
         print(f'[INFO] load {len(frames)} frames.')
 
-        # only load pre-calculated aud features when not live-streaming
-        if not self.opt.asr:
-            if self.opt.aud.endswith('npy'):
-                aud_features = np.load(self.opt.aud)
-            elif self.opt.aud.endswith('wav'):
-                if self.opt.asr_model == 'cpierse/wav2vec2-large-xlsr-53-esperanto':
-                    
-                    import argparse
-                    parser = argparse.ArgumentParser()
-                    parser.add_argument('--wav', type=str, default='')
-                    parser.add_argument('--play', action='store_true', help="play out the audio")
-                    
-                    parser.add_argument('--model', type=str, default='cpierse/wav2vec2-large-xlsr-53-esperanto')
-                    # parser.add_argument('--model', type=str, default='facebook/wav2vec2-large-960h-lv60-self')
-
-                    parser.add_argument('--save_feats', action='store_true')
-                    # audio FPS
-                    parser.add_argument('--fps', type=int, default=50)
-                    # sliding window left-middle-right length.
-                    parser.add_argument('-l', type=int, default=10)
-                    parser.add_argument('-m', type=int, default=50)
-                    parser.add_argument('-r', type=int, default=10)
-                    
-                    opt = parser.parse_args()
-                    # fix
-                    opt.asr_wav = self.opt.aud
-                    opt.asr_play = opt.play
-                    opt.asr_save_feats = True
-                    opt.asr_model = opt.model
-                    # 利用预训练的Wav2vec来跑一下
-                    with ASR(opt) as asr:
-                        asr.run()
-                    # os.system(f"ls")
-                    # os.system(f"python NeRF/nerf_triplane/wav2vec.py --wav {self.opt.aud} --save_feats")
-                    aud_features = np.load(opt.aud.replace('.wav', '_eo.npy'))
-                elif self.opt.asr_model == 'deepspeech':
-                    os.system(f"python NeRF/data_utils/deepspeech_features/extract_ds_features.py --input {self.opt.aud}")
-                    aud_features = np.load(opt.aud.replace('.wav', '.npy'))
-                elif self.opt.asr_model == 'ave':
-                    from .network import AudioEncoder
-                    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-                    model = AudioEncoder().to(device).eval()
-                    ckpt = torch.load('./checkpoints/audio_visual_encoder.pth')
-                    model.load_state_dict({f'audio_encoder.{k}': v for k, v in ckpt.items()})
-                    dataset = AudDataset(self.opt.aud)
-                    data_loader = DataLoader(dataset, batch_size=64, shuffle=False)
-                    outputs = []
-                    for mel in data_loader:
-                        mel = mel.to(device)
-                        with torch.no_grad():
-                            out = model(mel)
-                        outputs.append(out)
-                    outputs = torch.cat(outputs, dim=0).cpu()
-                    first_frame, last_frame = outputs[:1], outputs[-1:]
-                    aud_features = torch.cat([first_frame.repeat(2, 1), outputs, last_frame.repeat(2, 1)], dim=0).numpy()
-                else:
-                    try:
-                        aud_features = np.load(self.opt.aud)
-                    except:
-                        print(f'[ERROR] If do not use Audio Visual Encoder, replace it with the npy file path')
-            else:
-                raise NotImplementedError
-                
-            if self.opt.asr_model == 'ave':
-                aud_features = torch.from_numpy(aud_features).unsqueeze(0)
-
-                # support both [N, 16] labels and [N, 16, K] logits
-                if len(aud_features.shape) == 3:
-                    aud_features = aud_features.float().permute(1, 0, 2)  # [N, 16, 29] --> [N, 29, 16]
-
-                    if self.opt.emb:
-                        print(f'[INFO] argmax to aud features {aud_features.shape} for --emb mode')
-                        aud_features = aud_features.argmax(1)  # [N, 16]
-
-                else:
-                    assert self.opt.emb, "aud only provide labels, must use --emb"
-                    aud_features = aud_features.long()
-
-                print(f'[INFO] load {self.opt.aud} aud_features: {aud_features.shape}')
-            else:
-                aud_features = torch.from_numpy(aud_features)
-
-                # support both [N, 16] labels and [N, 16, K] logits
-                if len(aud_features.shape) == 3:
-                    aud_features = aud_features.float().permute(0, 2, 1)  # [N, 16, 29] --> [N, 29, 16]
-
-                    if self.opt.emb:
-                        print(f'[INFO] argmax to aud features {aud_features.shape} for --emb mode')
-                        aud_features = aud_features.argmax(1)  # [N, 16]
-
-                else:
-                    assert self.opt.emb, "aud only provide labels, must use --emb"
-                    aud_features = aud_features.long()
-
-                print(f'[INFO] load {self.opt.aud} aud_features: {aud_features.shape}')
-
         self.poses = []
-        self.auds = []
         self.eye_area = []
 
         for f in tqdm.tqdm(frames, desc=f'Loading data'):
@@ -225,11 +245,6 @@ class NeRFDataset_Test:
             pose = nerf_matrix_to_ngp(pose, scale=self.scale, offset=self.offset)
             self.poses.append(pose)
 
-            # find the corresponding audio to the image frame
-            if not self.opt.asr and self.opt.aud == '':
-                aud = aud_features[min(f['aud_id'], aud_features.shape[0] - 1)] # careful for the last frame...
-                self.auds.append(aud)
-
             if self.opt.exp_eye:
                 
                 if 'eye_ratio' in f:
@@ -262,16 +277,8 @@ class NeRFDataset_Test:
             
         self.poses = torch.from_numpy(self.poses) # [N, 4, 4]
         
-        if self.opt.asr:
-            # live streaming, no pre-calculated auds
-            self.auds = None
-        else:
-            # auds corresponding to images
-            if self.opt.aud == '':
-                self.auds = torch.stack(self.auds, dim=0) # [N, 32, 16]
-            # auds is novel, may have a different length with images
-            else:
-                self.auds = aud_features
+        # live streaming or no audio yet: no pre-calculated auds
+        self.auds = None
         
         self.bg_img = torch.from_numpy(self.bg_img)
 
@@ -293,10 +300,8 @@ class NeRFDataset_Test:
         # always preload
         self.poses = self.poses.to(self.device)
 
-        if self.auds is not None:
-            self.auds = self.auds.to(self.device)
-
         self.bg_img = self.bg_img.to(torch.half).to(self.device)
+        self.bg_color = self.bg_img.view(1, -1, 3)
         
         if self.opt.exp_eye:
             self.eye_area = self.eye_area.to(self.device)
@@ -312,6 +317,25 @@ class NeRFDataset_Test:
 
         # directly build the coordinate meshgrid in [-1, 1]^2
         self.bg_coords = get_bg_coords(self.H, self.W, self.device) # [1, H*W, 2] in [-1, 1]
+
+        # camera-space ray directions do not depend on the pose: compute them once and
+        # rotate them per frame in get_rays (a [H*W, 3] x [3, 3] matmul, cheaper than caching full-res rays per pose)
+        self.directions = get_ray_directions(self.intrinsics, self.H, self.W, self.device) # [1, H*W, 3]
+
+        if not self.opt.asr and self.opt.aud != '':
+            self.set_audio(self.opt.aud)
+
+    def set_audio(self, aud):
+        """切换驱动音频，只重新计算（或从缓存中取出）音频特征"""
+        self.opt.aud = aud
+        self.auds = self.audio_extractor(aud)
+
+    def get_rays(self, index):
+        """返回第 index 个位姿的整幅图像光线 (rays_o, rays_d)，均为 [1, H*W, 3]"""
+        pose = self.poses[index]
+        with torch.cuda.amp.autocast(enabled=False):
+            rays_d = self.directions @ pose[:3, :3].transpose(-1, -2)
+        return pose[:3, 3][None, None, :].expand_as(rays_d), rays_d
     
     def mirror_index(self, index):
         size = self.poses.shape[0]
@@ -335,24 +359,24 @@ class NeRFDataset_Test:
             results['auds'] = auds
 
         # head pose and bg image may mirror (replay --> <-- --> <--).
-        index[0] = self.mirror_index(index[0])
+        index = [self.mirror_index(i) for i in index]
 
         poses = self.poses[index].to(self.device) # [B, 4, 4]
         
-        rays = get_rays(poses, self.intrinsics, self.H, self.W, self.num_rays, self.opt.patch_size)
+        rays = [self.get_rays(i) for i in index]
 
         results['index'] = index # for ind. code
         results['H'] = self.H
         results['W'] = self.W
-        results['rays_o'] = rays['rays_o']
-        results['rays_d'] = rays['rays_d']
+        results['rays_o'] = torch.cat([r[0] for r in rays], dim=0) if B > 1 else rays[0][0]
+        results['rays_d'] = torch.cat([r[1] for r in rays], dim=0) if B > 1 else rays[0][1]
 
         if self.opt.exp_eye:
             results['eye'] = self.eye_area[index].to(self.device) # [1]
         else:
             results['eye'] = None
 
-        bg_img = self.bg_img.view(1, -1, 3).repeat(B, 1, 1).to(self.device)
+        bg_img = self.bg_color if B == 1 else self.bg_color.repeat(B, 1, 1)
 
         results['bg_color'] = bg_img
 
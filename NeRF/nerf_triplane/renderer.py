@@ -155,7 +155,7 @@ class NeRFRenderer(nn.Module):
         self.local_step = 0
 
 
-    def run_cuda(self, rays_o, rays_d, auds, bg_coords, poses, eye=None, index=0, dt_gamma=0, bg_color=None, perturb=False, force_all_rays=False, max_steps=1024, T_thresh=1e-4, **kwargs):
+    def run_cuda(self, rays_o, rays_d, auds, bg_coords, poses, eye=None, index=0, dt_gamma=0, bg_color=None, perturb=False, force_all_rays=False, max_steps=1024, T_thresh=1e-4, max_ray_batch=-1, **kwargs):
         # rays_o, rays_d: [B, N, 3], assumes B == 1
         # auds: [B, 16]
         # index: [B]
@@ -237,37 +237,42 @@ class NeRFRenderer(nn.Module):
             amb_eye_sum = torch.zeros(N, dtype=dtype, device=device)
             uncertainty_sum = torch.zeros(N, dtype=dtype, device=device)
 
-            n_alive = N
-            rays_alive = torch.arange(n_alive, dtype=torch.int32, device=device) # [N]
             rays_t = nears.clone() # [N]
 
-            step = 0
+            # the CUDA kernels march all rays at once; the PyTorch fallback marches max_ray_batch rays at a time to bound memory
+            batch = max_ray_batch if max_ray_batch > 0 and raymarching.use_torch_backend() else N
+
+            for head in range(0, N, batch):
+                n_rays = min(batch, N - head)
+                rays_alive = torch.arange(head, head + n_rays, dtype=torch.int32, device=device) # [n_rays]
+
+                step = 0
             
-            while step < max_steps:
+                while step < max_steps:
 
-                # count alive rays 
-                n_alive = rays_alive.shape[0]
+                    # count alive rays 
+                    n_alive = rays_alive.shape[0]
                 
-                # exit loop
-                if n_alive <= 0:
-                    break
+                    # exit loop
+                    if n_alive <= 0:
+                        break
 
-                # decide compact_steps
-                n_step = max(min(N // n_alive, 8), 1)
+                    # decide compact_steps
+                    n_step = max(min(n_rays // n_alive, 8), 1)
 
-                xyzs, dirs, deltas = raymarching.march_rays(n_alive, n_step, rays_alive, rays_t, rays_o, rays_d, self.bound, self.density_bitfield, self.cascade, self.grid_size, nears, fars, 128, perturb if step == 0 else False, dt_gamma, max_steps)
+                    xyzs, dirs, deltas = raymarching.march_rays(n_alive, n_step, rays_alive, rays_t, rays_o, rays_d, self.bound, self.density_bitfield, self.cascade, self.grid_size, nears, fars, 128, perturb if step == 0 else False, dt_gamma, max_steps)
 
-                sigmas, rgbs, ambients_aud, ambients_eye, uncertainties = self(xyzs, dirs, enc_a, ind_code, eye)
-                sigmas = self.density_scale * sigmas
+                    sigmas, rgbs, ambients_aud, ambients_eye, uncertainties = self(xyzs, dirs, enc_a, ind_code, eye)
+                    sigmas = self.density_scale * sigmas
 
-                # raymarching.composite_rays_uncertainty(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambients, uncertainties, weights_sum, depth, image, ambient_sum, uncertainty_sum, T_thresh)
-                raymarching.composite_rays_triplane(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambients_aud, ambients_eye, uncertainties, weights_sum, depth, image, amb_aud_sum, amb_eye_sum, uncertainty_sum, T_thresh)
+                    # raymarching.composite_rays_uncertainty(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambients, uncertainties, weights_sum, depth, image, ambient_sum, uncertainty_sum, T_thresh)
+                    raymarching.composite_rays_triplane(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambients_aud, ambients_eye, uncertainties, weights_sum, depth, image, amb_aud_sum, amb_eye_sum, uncertainty_sum, T_thresh)
 
-                rays_alive = rays_alive[rays_alive >= 0]
+                    rays_alive = rays_alive[rays_alive >= 0]
 
-                # print(f'step = {step}, n_step = {n_step}, n_alive = {n_alive}, xyzs: {xyzs.shape}')
+                    # print(f'step = {step}, n_step = {n_step}, n_alive = {n_alive}, xyzs: {xyzs.shape}')
 
-                step += n_step
+                    step += n_step
             
         torso_results = self.run_torso(rays_o, bg_coords, poses, index, bg_color)
         bg_color = torso_results['bg_color']
@@ -672,7 +677,7 @@ class NeRFRenderer(nn.Module):
             raise NotImplementedError
 
         else:
-            results = _run(rays_o, rays_d, auds, bg_coords, poses, **kwargs)
+            results = _run(rays_o, rays_d, auds, bg_coords, poses, max_ray_batch=max_ray_batch, **kwargs)
 
         return results
     
@@ -1,5 +1,7 @@
 import os
 import glob
+import contextlib
+import subprocess
 import tqdm
 import random
 import tensorboardX
@@ -329,6 +331,23 @@ def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None):
     return results
 
 
+@torch.cuda.amp.autocast(enabled=False)
+def get_ray_directions(intrinsics, H, W, device):
+    ''' camera-space unit ray directions of all pixels, shared by every pose
+    Returns:
+        directions: [1, H*W, 3], rays_d = directions @ R^T (same as get_rays with N=-1)
+    '''
+    fx, fy, cx, cy = intrinsics
+    i, j = custom_meshgrid(torch.linspace(0, W-1, W, device=device), torch.linspace(0, H-1, H, device=device)) # float
+    i = i.t().reshape([1, H*W]) + 0.5
+    j = j.t().reshape([1, H*W]) + 0.5
+    zs = torch.ones_like(i)
+    xs = (i - cx) / fx * zs
+    ys = (j - cy) / fy * zs
+    directions = torch.stack((xs, ys, zs), dim=-1)
+    return directions / torch.norm(directions, dim=-1, keepdim=True)
+
+
 def seed_everything(seed):
     random.seed(seed)
     os.environ['PYTHONHASHSEED'] = str(seed)
@@ -992,7 +1011,12 @@ class Trainer(object):
         self.evaluate_one_epoch(loader, name)
         self.use_tensorboardX = use_tensorboardX
 
-    def test(self, loader, save_path=None, name=None, write_image=False):
+    def test(self, loader, save_path=None, name=None, write_image=False, write_depth=False, stream=True):
+        ''' render the loader and encode the video (muxed with opt.aud if it is an audio file).
+        stream: encode frames through an ffmpeg pipe as they are rendered, instead of keeping all frames in memory.
+        write_depth: also write {name}_depth.mp4.
+        Returns the path of the finished video.
+        '''
 
         if save_path is None:
             save_path = os.path.join(self.workspace, 'results')
@@ -1007,10 +1031,18 @@ class Trainer(object):
         pbar = tqdm.tqdm(total=len(loader) * loader.batch_size, bar_format='{percentage:3.0f}% {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]')
         self.model.eval()
 
+        # audio features (.npy) cannot be muxed
+        audio = self.opt.aud if self.opt.aud != '' and not self.opt.aud.endswith('.npy') else None
+        video_path = os.path.join(save_path, f'{name}.mp4')
+        depth_path = os.path.join(save_path, f'{name}_depth.mp4')
+        output_path = os.path.join(save_path, f'{name}_audio.mp4') if audio is not None else video_path
+
         all_preds = []
         all_preds_depth = []
+        writer, depth_writer = None, None
 
-        with torch.no_grad():
+        # the writers are released (waiting for ffmpeg to finish the mux) when leaving the ExitStack, or killed on error
+        with torch.no_grad(), contextlib.ExitStack() as stack:
 
             for i, data in enumerate(loader):
                 
@@ -1028,31 +1060,43 @@ class Trainer(object):
                 pred = preds[0].detach().cpu().numpy()
                 pred = (pred * 255).astype(np.uint8)
 
-                pred_depth = preds_depth[0].detach().cpu().numpy()
-                pred_depth = (pred_depth * 255).astype(np.uint8)
+                if write_image or write_depth:
+                    pred_depth = preds_depth[0].detach().cpu().numpy()
+                    pred_depth = (pred_depth * 255).astype(np.uint8)
 
                 if write_image:
                     imageio.imwrite(path, pred)
                     imageio.imwrite(path_depth, pred_depth)
 
-                all_preds.append(pred)
-                all_preds_depth.append(pred_depth)
+                if stream:
+                    if writer is None:
+                        from src.utils.videoio import FFmpegWriter
+                        size = pred.shape[1::-1]
+                        writer = stack.enter_context(FFmpegWriter(output_path, 25, size, audio=audio, input_pix_fmt='rgb24'))
+                        if write_depth:
+                            depth_writer = stack.enter_context(FFmpegWriter(depth_path, 25, size, input_pix_fmt='gray'))
+                    writer.write(pred)
+                    if write_depth:
+                        depth_writer.write(pred_depth)
+                else:
+                    all_preds.append(pred)
+                    if write_depth:
+                        all_preds_depth.append(pred_depth)
 
                 pbar.update(loader.batch_size)
 
-        # write video
-        all_preds = np.stack(all_preds, axis=0)
-        all_preds_depth = np.stack(all_preds_depth, axis=0)
-        imageio.mimwrite(os.path.join(save_path, f'{name}.mp4'), all_preds, fps=25, quality=8, macro_block_size=1)
-        imageio.mimwrite(os.path.join(save_path, f'{name}_depth.mp4'), all_preds_depth, fps=25, quality=8, macro_block_size=1)
-        # imageio.mimwrite(os.path.join(save_path, f'{name}_depth.mp4'), all_preds_depth, fps=25, quality=8, macro_block_size=1)
-        # print('-'*100. self.opt.aud)
-        if self.opt.aud != '':
-            # print(f'ffmpeg -i {os.path.join(save_path, f"{name}.mp4")} -i {self.opt.aud} -strict -2 {os.path.join(save_path, f"{name}_audio.mp4")} -y')
-            os.system(f'ffmpeg -i {os.path.join(save_path, f"{name}.mp4")} -i {self.opt.aud} -strict -2 {os.path.join(save_path, f"{name}_audio.mp4")} -y')
+        if not stream:
+            # write video
+            imageio.mimwrite(video_path, np.stack(all_preds, axis=0), fps=25, quality=8, macro_block_size=1)
+            if write_depth:
+                imageio.mimwrite(depth_path, np.stack(all_preds_depth, axis=0), fps=25, quality=8, macro_block_size=1)
+            if audio is not None:
+                subprocess.run(['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', video_path, '-i', audio, '-strict', '-2', output_path], check=True)
 
         self.log(f"==> Finished Test.")
 
+        return output_path
+
     # [GUI] just train for 16 steps, without any other overhead that may slow down rendering.
     def train_gui(self, train_loader, step=16):
 
@@ -32,6 +32,17 @@ def _play_frame(stream, exit_event, queue, chunk):
         frame = (frame * 32767).astype(np.int16).tobytes()
         stream.write(frame, chunk)
 
+# 已加载的 wav2vec 模型，多次创建 ASR（如逐条音频提取特征）时复用
+_asr_models = {}
+
+def load_asr_model(name, device):
+    key = (name, str(device))
+    if key not in _asr_models:
+        processor = AutoProcessor.from_pretrained(name)
+        model = AutoModelForCTC.from_pretrained(name).to(device)
+        _asr_models[key] = (processor, model)
+    return _asr_models[key]
+
 class ASR:
     def __init__(self, opt):
 
@@ -89,8 +100,7 @@ class ASR:
 
         # create wav2vec model
         print(f'[INFO] loading ASR model {self.opt.asr_model}...')
-        self.processor = AutoProcessor.from_pretrained(opt.asr_model)
-        self.model = AutoModelForCTC.from_pretrained(opt.asr_model).to(self.device)
+        self.processor, self.model = load_asr_model(opt.asr_model, self.device)
 
         # prepare to save logits
         if self.opt.asr_save_feats:
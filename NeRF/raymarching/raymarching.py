@@ -6,10 +6,23 @@ import torch.nn as nn
 from torch.autograd import Function
 from torch.cuda.amp import custom_bwd, custom_fwd
 
-try:
-    import _raymarching_face as _backend
-except ImportError:
-    from .backend import _backend
+from extensions import Extension
+from . import torch_impl
+
+
+def _load_backend():
+    try:
+        import _raymarching_face as _backend
+    except ImportError:
+        from .backend import _backend
+    return _backend
+
+_backend = Extension('raymarching', _load_backend)
+
+
+def use_torch_backend():
+    ''' whether the PyTorch implementation is used (CUDA extension unavailable or NERF_BACKEND=torch) '''
+    return _backend.use_torch()
 
 # ----------------------------------------
 # utils
@@ -45,7 +58,7 @@ class _near_far_from_aabb(Function):
 
         return nears, fars
 
-near_far_from_aabb = _near_far_from_aabb.apply
+near_far_from_aabb = _backend.dispatch(_near_far_from_aabb.apply, torch_impl.near_far_from_aabb)
 
 
 class _sph_from_ray(Function):
@@ -76,7 +89,7 @@ class _sph_from_ray(Function):
 
         return coords
 
-sph_from_ray = _sph_from_ray.apply
+sph_from_ray = _backend.dispatch(_sph_from_ray.apply, torch_impl.sph_from_ray)
 
 
 class _morton3D(Function):
@@ -100,7 +113,7 @@ class _morton3D(Function):
 
         return indices
 
-morton3D = _morton3D.apply
+morton3D = _backend.dispatch(_morton3D.apply, torch_impl.morton3D)
 
 class _morton3D_invert(Function):
     @staticmethod
@@ -122,7 +135,7 @@ class _morton3D_invert(Function):
 
         return coords
 
-morton3D_invert = _morton3D_invert.apply
+morton3D_invert = _backend.dispatch(_morton3D_invert.apply, torch_impl.morton3D_invert)
 
 
 class _packbits(Function):
@@ -151,7 +164,7 @@ class _packbits(Function):
 
         return bitfield
 
-packbits = _packbits.apply
+packbits = _backend.dispatch(_packbits.apply, torch_impl.packbits)
 
 
 class _morton3D_dilation(Function):
@@ -177,7 +190,7 @@ class _morton3D_dilation(Function):
 
         return grid_dilation
 
-morton3D_dilation = _morton3D_dilation.apply
+morton3D_dilation = _backend.dispatch(_morton3D_dilation.apply, torch_impl.morton3D_dilation)
 
 # ----------------------------------------
 # train functions
@@ -277,7 +290,7 @@ class _march_rays_train(Function):
         
         return grad_rays_o, grad_rays_d, None, None, None, None, None, None, None, None, None, None, None, None, None
 
-march_rays_train = _march_rays_train.apply
+march_rays_train = _backend.dispatch(_march_rays_train.apply, torch_impl.march_rays_train)
 
 
 class _composite_rays_train(Function):
@@ -338,7 +351,7 @@ class _composite_rays_train(Function):
         return grad_sigmas, grad_rgbs, grad_ambient, None, None, None
 
 
-composite_rays_train = _composite_rays_train.apply
+composite_rays_train = _backend.dispatch(_composite_rays_train.apply, torch_impl.composite_rays_train)
 
 # ----------------------------------------
 # infer functions
@@ -395,7 +408,7 @@ class _march_rays(Function):
 
         return xyzs, dirs, deltas
 
-march_rays = _march_rays.apply
+march_rays = _backend.dispatch(_march_rays.apply, torch_impl.march_rays)
 
 
 class _composite_rays(Function):
@@ -420,7 +433,7 @@ class _composite_rays(Function):
         return tuple()
 
 
-composite_rays = _composite_rays.apply
+composite_rays = _backend.dispatch(_composite_rays.apply, torch_impl.composite_rays)
 
 
 class _composite_rays_ambient(Function):
@@ -431,7 +444,7 @@ class _composite_rays_ambient(Function):
         return tuple()
 
 
-composite_rays_ambient = _composite_rays_ambient.apply
+composite_rays_ambient = _backend.dispatch(_composite_rays_ambient.apply, torch_impl.composite_rays_ambient)
 
 
 
@@ -497,7 +510,7 @@ class _composite_rays_train_sigma(Function):
         return grad_sigmas, grad_rgbs, grad_ambient, None, None, None
 
 
-composite_rays_train_sigma = _composite_rays_train_sigma.apply
+composite_rays_train_sigma = _backend.dispatch(_composite_rays_train_sigma.apply, torch_impl.composite_rays_train_sigma)
 
 
 class _composite_rays_ambient_sigma(Function):
@@ -508,7 +521,7 @@ class _composite_rays_ambient_sigma(Function):
         return tuple()
 
 
-composite_rays_ambient_sigma = _composite_rays_ambient_sigma.apply
+composite_rays_ambient_sigma = _backend.dispatch(_composite_rays_ambient_sigma.apply, torch_impl.composite_rays_ambient_sigma)
 
 
 
@@ -575,7 +588,7 @@ class _composite_rays_train_uncertainty(Function):
         return grad_sigmas, grad_rgbs, grad_ambient, grad_uncertainty, None, None, None
 
 
-composite_rays_train_uncertainty = _composite_rays_train_uncertainty.apply
+composite_rays_train_uncertainty = _backend.dispatch(_composite_rays_train_uncertainty.apply, torch_impl.composite_rays_train_uncertainty)
 
 
 class _composite_rays_uncertainty(Function):
@@ -586,7 +599,7 @@ class _composite_rays_uncertainty(Function):
         return tuple()
 
 
-composite_rays_uncertainty = _composite_rays_uncertainty.apply
+composite_rays_uncertainty = _backend.dispatch(_composite_rays_uncertainty.apply, torch_impl.composite_rays_uncertainty)
 
 
 
@@ -657,7 +670,7 @@ class _composite_rays_train_triplane(Function):
         return grad_sigmas, grad_rgbs, grad_amb_aud, grad_amb_eye, grad_uncertainty, None, None, None
 
 
-composite_rays_train_triplane = _composite_rays_train_triplane.apply
+composite_rays_train_triplane = _backend.dispatch(_composite_rays_train_triplane.apply, torch_impl.composite_rays_train_triplane)
 
 
 class _composite_rays_triplane(Function):
@@ -668,4 +681,4 @@ class _composite_rays_triplane(Function):
         return tuple()
 
 
-composite_rays_triplane = _composite_rays_triplane.apply
\ No newline at end of file
+composite_rays_triplane = _backend.dispatch(_composite_rays_triplane.apply, torch_impl.composite_rays_triplane)
\ No newline at end of file
@@ -0,0 +1,372 @@
+''' Pure PyTorch implementation of the raymarching inference kernels (see src/raymarching.cu).
+
+Rays are processed as vectorized batches: every loop iteration advances all still-marching rays by one
+sample, rays that left the scene or filled their n_step samples are masked out (early termination).
+Float math follows the CUDA kernels step by step, so results match up to fused multiply-add rounding.
+'''
+import numpy as np
+
+import torch
+
+SQRT3 = np.float32(1.7320508075688772)
+RPI = np.float32(0.3183098861837907)
+FLT_MAX = torch.finfo(torch.float32).max
+
+
+def _not_implemented(name):
+    def fn(*args, **kwargs):
+        raise NotImplementedError(f'{name} is only implemented by the CUDA extension (training is not supported with the torch backend)')
+    fn.__name__ = name
+    return fn
+
+
+march_rays_train = _not_implemented('march_rays_train')
+composite_rays_train = _not_implemented('composite_rays_train')
+composite_rays_train_sigma = _not_implemented('composite_rays_train_sigma')
+composite_rays_train_uncertainty = _not_implemented('composite_rays_train_uncertainty')
+composite_rays_train_triplane = _not_implemented('composite_rays_train_triplane')
+composite_rays_ambient_sigma = _not_implemented('composite_rays_ambient_sigma')
+composite_rays_uncertainty = _not_implemented('composite_rays_uncertainty')
+
+
+# ----------------------------------------
+# bit tricks (uint32 emulated with int64)
+# ----------------------------------------
+
+def _expand_bits(v):
+    v = (v * 0x00010001) & 0xFF0000FF
+    v = (v * 0x00000101) & 0x0F00F00F
+    v = (v * 0x00000011) & 0xC30C30C3
+    v = (v * 0x00000005) & 0x49249249
+    return v
+
+
+def _morton3D(x, y, z):
+    return _expand_bits(x) | (_expand_bits(y) << 1) | (_expand_bits(z) << 2)
+
+
+def _morton3D_invert(x):
+    x = x & 0x49249249
+    x = (x | (x >> 2)) & 0xc30c30c3
+    x = (x | (x >> 4)) & 0x0f00f00f
+    x = (x | (x >> 8)) & 0xff0000ff
+    x = (x | (x >> 16)) & 0x0000ffff
+    return x
+
+
+def _clamp(x, min, max):
+    # fminf(max, fmaxf(min, x)), NaN-ignoring like the CUDA helpers
+    return torch.fmin(torch.fmax(x, torch.as_tensor(min, dtype=x.dtype, device=x.device)), torch.as_tensor(max, dtype=x.dtype, device=x.device))
+
+
+def _mip_level(x, C):
+    # frexpf exponent, clamped to [0, C - 1]
+    _, exponent = torch.frexp(x)
+    return exponent.clamp(0, C - 1)
+
+
+# ----------------------------------------
+# utils
+# ----------------------------------------
+
+def near_far_from_aabb(rays_o, rays_d, aabb, min_near=0.2):
+    ''' near_far_from_aabb, PyTorch implementation
+    Args:
+        rays_o: float, [N, 3]
+        rays_d: float, [N, 3]
+        aabb: float, [6], (xmin, ymin, zmin, xmax, ymax, zmax)
+        min_near: float, scalar
+    Returns:
+        nears: float, [N]
+        fars: float, [N]
+    '''
+    rays_o = rays_o.float().reshape(-1, 3)
+    rays_d = rays_d.float().reshape(-1, 3)
+    aabb = aabb.float().to(rays_o.device)
+
+    rd = 1 / rays_d
+    t0 = (aabb[:3] - rays_o) * rd
+    t1 = (aabb[3:] - rays_o) * rd
+    near_i = torch.where(t0 > t1, t1, t0)
+    far_i = torch.where(t0 > t1, t0, t1)
+
+    near, far = near_i[:, 0], far_i[:, 0]
+    miss = torch.zeros_like(near, dtype=torch.bool)
+    for d in (1, 2):
+        miss |= (near > far_i[:, d]) | (near_i[:, d] > far)
+        near = torch.where(near_i[:, d] > near, near_i[:, d], near)
+        far = torch.where(far_i[:, d] < far, far_i[:, d], far)
+
+    near = torch.where(near < min_near, torch.full_like(near, min_near), near)
+    near = near.masked_fill(miss, FLT_MAX)
+    far = far.masked_fill(miss, FLT_MAX)
+
+    return near, far
+
+
+def sph_from_ray(rays_o, rays_d, radius):
+    ''' sph_from_ray, PyTorch implementation
+    Returns:
+        coords: [N, 2], in [-1, 1], theta and phi on a sphere. (further-surface)
+    '''
+    rays_o = rays_o.float().reshape(-1, 3)
+    rays_d = rays_d.float().reshape(-1, 3)
+
+    A = (rays_d * rays_d).sum(-1)
+    B = (rays_o * rays_d).sum(-1)
+    C = (rays_o * rays_o).sum(-1) - radius * radius
+    t = (- B + torch.sqrt(B * B - A * C)) / A
+
+    p = rays_o + t[:, None] * rays_d
+    x, y, z = p.unbind(-1)
+    theta = torch.atan2(torch.sqrt(x * x + z * z), y)
+    phi = torch.atan2(z, x)
+
+    return torch.stack([2 * theta * RPI - 1, phi * RPI], dim=-1)
+
+
+def morton3D(coords):
+    ''' morton3D, PyTorch implementation
+    Args:
+        coords: [N, 3], int32, in [0, 128)
+    Returns:
+        indices: [N], int32, in [0, 128^3)
+    '''
+    coords = coords.long()
+    return _morton3D(coords[:, 0], coords[:, 1], coords[:, 2]).int()
+
+
+def morton3D_invert(indices):
+    ''' morton3D_invert, PyTorch implementation
+    Args:
+        indices: [N], int32, in [0, 128^3)
+    Returns:
+        coords: [N, 3], int32, in [0, 128)
+    '''
+    indices = indices.long()
+    return torch.stack([_morton3D_invert(indices >> i) for i in range(3)], dim=-1).int()
+
+
+def packbits(grid, thresh, bitfield=None):
+    ''' packbits, PyTorch implementation
+    Args:
+        grid: float, [C, H * H * H], assume H % 2 == 0
+        thresh: float, threshold
+    Returns:
+        bitfield: uint8, [C, H * H * H / 8]
+    '''
+    bits = (grid.float().reshape(-1, 8) > thresh).to(torch.uint8)
+    weights = torch.tensor([1 << i for i in range(8)], dtype=torch.uint8, device=grid.device)
+    packed = (bits * weights).sum(-1, dtype=torch.uint8)
+
+    if bitfield is None:
+        return packed
+    bitfield.copy_(packed)
+    return bitfield
+
+
+def morton3D_dilation(grid):
+    ''' max pooling over the 6-neighborhood with morton coord, PyTorch implementation
+    Args:
+        grid: float, [C, H * H * H], assume H % 2 == 0
+    Returns:
+        grid_dilate: float, [C, H * H * H]
+    '''
+    grid = grid.float()
+    C, H3 = grid.shape
+    H = int(round(np.cbrt(H3)))
+
+    coords = morton3D_invert(torch.arange(H3, device=grid.device)).long()
+    dense = torch.empty(C, H, H, H, dtype=grid.dtype, device=grid.device)
+    dense[:, coords[:, 0], coords[:, 1], coords[:, 2]] = grid
+
+    pad = torch.nn.functional.pad(dense, (1, 1, 1, 1, 1, 1), value=-float('inf'))
+    res = dense.clone()
+    for shift in (pad[:, 2:, 1:-1, 1:-1], pad[:, :-2, 1:-1, 1:-1],
+                  pad[:, 1:-1, 2:, 1:-1], pad[:, 1:-1, :-2, 1:-1],
+                  pad[:, 1:-1, 1:-1, 2:], pad[:, 1:-1, 1:-1, :-2]):
+        res = torch.fmax(res, shift)
+
+    return res[:, coords[:, 0], coords[:, 1], coords[:, 2]]
+
+
+# ----------------------------------------
+# infer functions
+# ----------------------------------------
+
+def march_rays(n_alive, n_step, rays_alive, rays_t, rays_o, rays_d, bound, density_bitfield, C, H, near, far, align=-1, perturb=False, dt_gamma=0, max_steps=1024):
+    ''' march rays to generate points (forward only, for inference), PyTorch implementation
+    Same arguments and outputs as the CUDA version.
+    Returns:
+        xyzs: float, [n_alive * n_step, 3], all generated points' coords
+        dirs: float, [n_alive * n_step, 3], all generated points' view dirs.
+        deltas: float, [n_alive * n_step, 2], all generated points' deltas (rgb, depth).
+    '''
+    device = rays_o.device
+    rays_o = rays_o.float().reshape(-1, 3)
+    rays_d = rays_d.float().reshape(-1, 3)
+
+    M = n_alive * n_step
+    if align > 0:
+        M += align - (M % align)
+
+    xyzs = torch.zeros(M, 3, dtype=torch.float32, device=device)
+    dirs = torch.zeros(M, 3, dtype=torch.float32, device=device)
+    deltas = torch.zeros(M, 2, dtype=torch.float32, device=device)
+
+    if perturb:
+        noises = torch.rand(n_alive, dtype=torch.float32, device=device)
+    else:
+        noises = torch.zeros(n_alive, dtype=torch.float32, device=device)
+
+    index = rays_alive[:n_alive].long()
+    o = rays_o[index]
+    d = rays_d[index]
+    rd = 1 / d
+    sign = 0.5 - torch.signbit(d).float()  # 0.5f * signf(d)
+    t = rays_t[index].float()
+    far = far[index].float()
+
+    dt_max = np.float32(2) * SQRT3 * np.float32(1 << (C - 1)) / np.float32(H)
+    dt_min = min(dt_max, np.float32(2) * SQRT3 / np.float32(max_steps))
+    rH = np.float32(1) / np.float32(H)
+    H3 = H * H * H
+    bound = float(bound)
+    bitfield = density_bitfield.reshape(-1)
+
+    def step_size(t):
+        return _clamp(t * dt_gamma, dt_min, dt_max)
+
+    t = t + step_size(t) * noises
+
+    step = torch.zeros(n_alive, dtype=torch.long, device=device)
+    rays = torch.arange(n_alive, device=device)
+
+    while True:
+        # only the rays still marching
+        active = (t[rays] < far[rays]) & (step[rays] < n_step)
+        rays = rays[active]
+        if rays.numel() == 0:
+            break
+
+        tr = t[rays]
+        x = _clamp(o[rays] + tr[:, None] * d[rays], -bound, bound)
+        dt = step_size(tr)
+
+        # get mip level
+        level = torch.maximum(_mip_level(x.abs().amax(-1), C), _mip_level(dt * H * 0.5, C))
+        mip_bound = torch.clamp(torch.ldexp(torch.ones_like(tr), level), max=bound)
+        mip_rbound = 1 / mip_bound
+
+        # convert to nearest grid position (double precision like the CUDA kernel)
+        ng = (0.5 * (x * mip_rbound[:, None] + 1).double() * H).float()
+        ng = _clamp(ng, 0.0, float(H - 1)).long()
+
+        idx = level.long() * H3 + _morton3D(ng[:, 0], ng[:, 1], ng[:, 2])
+        occ = ((bitfield[idx // 8].long() >> (idx % 8)) & 1).bool()
+
+        # occupied: write the sample and advance a small step
+        r = rays[occ]
+        if r.numel() > 0:
+            out = r * n_step + step[r]
+            xyzs[out] = x[occ]
+            dirs[out] = d[r]
+            t[r] = tr[occ] + dt[occ]
+            deltas[out, 0] = dt[occ]
+            deltas[out, 1] = t[r]
+            step[r] += 1
+
+        # empty: skip to the next voxel
+        e = ~occ
+        r = rays[e]
+        if r.numel() > 0:
+            tv = (((ng[e].float() + 0.5 + sign[r]) * rH * 2 - 1) * mip_bound[e, None] - x[e]) * rd[r]
+            tt = tr[e] + torch.clamp(torch.fmin(tv[:, 0], torch.fmin(tv[:, 1], tv[:, 2])), min=0.0)
+            te = tr[e]
+            # do { t += dt } while (t < tt)
+            pending = torch.ones_like(te, dtype=torch.bool)
+            while True:
+                te = torch.where(pending, te + step_size(te), te)
+                pending = pending & (te < tt)
+                if not pending.any():
+                    break
+            t[r] = te
+
+    return xyzs, dirs, deltas
+
+
+def _composite(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, weights_sum, depth, image, T_thresh, weighted=(), unweighted=()):
+    ''' shared composite loop, vectorized over rays and iterating over the (at most 8) steps.
+    weighted / unweighted: pairs of (per-sample values, per-ray in-place sum).
+    '''
+    rays = rays_alive[:n_alive]
+    index = rays.long()
+    M = n_alive * n_step
+
+    sigmas = sigmas.float().reshape(-1)[:M].view(n_alive, n_step)
+    rgbs = rgbs.float().reshape(-1, 3)[:M].view(n_alive, n_step, 3)
+    deltas = deltas.float().reshape(-1, 2)[:M].view(n_alive, n_step, 2)
+    weighted = [(v.float().reshape(-1)[:M].view(n_alive, n_step), s) for v, s in weighted]
+    unweighted = [(v.float().reshape(-1)[:M].view(n_alive, n_step), s) for v, s in unweighted]
+
+    t = rays_t[index]
+    weight_sum = weights_sum[index]
+    d = depth[index]
+    rgb = image[index]
+    w_sums = [s[index] for _, s in weighted]
+    u_sums = [s[index] for _, s in unweighted]
+
+    # alive: the ray has not hit a zero delta or a small transmittance yet
+    alive = torch.ones(n_alive, dtype=torch.bool, device=sigmas.device)
+    for i in range(n_step):
+        delta = deltas[:, i, 0]
+        alive = alive & (delta != 0)
+        if not alive.any():
+            break
+
+        alpha = 1.0 - torch.exp(- sigmas[:, i] * delta)
+        T = 1 - weight_sum
+        weight = torch.where(alive, alpha * T, torch.zeros_like(T))
+        weight_sum = weight_sum + weight
+
+        t = torch.where(alive, deltas[:, i, 1], t)
+        d = d + weight * t
+        rgb = rgb + weight[:, None] * rgbs[:, i]
+        w_sums = [s + weight * v[:, i] for (v, _), s in zip(weighted, w_sums)]
+        u_sums = [torch.where(alive, s + v[:, i], s) for (v, _), s in zip(unweighted, u_sums)]
+
+        alive = alive & ~(T < T_thresh)
+
+    # rays_alive = -1 means ray is terminated early.
+    rays_t[index[alive]] = t[alive]
+    rays.masked_fill_(~alive, -1)
+
+    weights_sum[index] = weight_sum
+    depth[index] = d
+    image[index] = rgb
+    for (_, s), v in zip(weighted + unweighted, w_sums + u_sums):
+        s[index] = v
+
+
+def composite_rays(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, weights_sum, depth, image, T_thresh=1e-2):
+    ''' composite rays' rgbs, according to the ray marching formula (for inference), PyTorch implementation
+    In-place Outputs:
+        weights_sum: float, [N,], the alpha channel
+        depth: float, [N,], the depth value
+        image: float, [N, 3], the RGB channel (after multiplying alpha!)
+    '''
+    _composite(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, weights_sum, depth, image, T_thresh)
+    return tuple()
+
+
+def composite_rays_ambient(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambients, weights_sum, depth, image, ambient_sum, T_thresh=1e-2):
+    _composite(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, weights_sum, depth, image, T_thresh,
+               unweighted=[(ambients, ambient_sum)])
+    return tuple()
+
+
+def composite_rays_triplane(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambs_aud, ambs_eye, uncertainties, weights_sum, depth, image, amb_aud_sum, amb_eye_sum, uncertainty_sum, T_thresh=1e-2):
+    _composite(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, weights_sum, depth, image, T_thresh,
+               weighted=[(uncertainties, uncertainty_sum)],
+               unweighted=[(ambs_aud, amb_aud_sum), (ambs_eye, amb_eye_sum)])
+    return tuple()
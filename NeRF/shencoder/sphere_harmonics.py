@@ -6,10 +6,18 @@ from torch.autograd import Function
 from torch.autograd.function import once_differentiable
 from torch.cuda.amp import custom_bwd, custom_fwd 
 
-try:
-    import _shencoder as _backend
-except ImportError:
-    from .backend import _backend
+from extensions import Extension
+from . import torch_impl
+
+
+def _load_backend():
+    try:
+        import _shencoder as _backend
+    except ImportError:
+        from .backend import _backend
+    return _backend
+
+_backend = Extension('shencoder', _load_backend)
 
 class _sh_encoder(Function):
     @staticmethod
@@ -55,7 +63,7 @@ class _sh_encoder(Function):
 
 
 
-sh_encode = _sh_encoder.apply
+sh_encode = _backend.dispatch(_sh_encoder.apply, torch_impl.sh_encode)
 
 
 class SHEncoder(nn.Module):
@@ -0,0 +1,42 @@
+''' Pure PyTorch implementation of the spherical harmonics encoding (see src/shencoder.cu), degree <= 4. '''
+import torch
+
+
+def sh_encode(inputs, degree, calc_grad_inputs=False):
+    # inputs: [B, input_dim], float in [-1, 1]
+    # RETURN: [B, degree ** 2], float
+
+    if degree > 4:
+        raise NotImplementedError(f'SH degree {degree} is only implemented by the CUDA extension (torch backend supports degree <= 4)')
+
+    inputs = inputs.float()
+    x, y, z = inputs.unbind(-1)
+    xy, xz, yz, x2, y2, z2 = x * y, x * z, y * z, x * x, y * y, z * z
+
+    outputs = [torch.full_like(x, 0.28209479177387814)]                        # 1/(2*sqrt(pi))
+    if degree > 1:
+        outputs += [
+            -0.48860251190291987 * y,                                          # -sqrt(3)*y/(2*sqrt(pi))
+            0.48860251190291987 * z,                                           # sqrt(3)*z/(2*sqrt(pi))
+            -0.48860251190291987 * x,                                          # -sqrt(3)*x/(2*sqrt(pi))
+        ]
+    if degree > 2:
+        outputs += [
+            1.0925484305920792 * xy,                                           # sqrt(15)*xy/(2*sqrt(pi))
+            -1.0925484305920792 * yz,                                          # -sqrt(15)*yz/(2*sqrt(pi))
+            0.94617469575755997 * z2 - 0.31539156525251999,                    # sqrt(5)*(3*z2 - 1)/(4*sqrt(pi))
+            -1.0925484305920792 * xz,                                          # -sqrt(15)*xz/(2*sqrt(pi))
+            0.54627421529603959 * x2 - 0.54627421529603959 * y2,               # sqrt(15)*(x2 - y2)/(4*sqrt(pi))
+        ]
+    if degree > 3:
+        outputs += [
+            0.59004358992664352 * y * (-3.0 * x2 + y2),                        # sqrt(70)*y*(-3*x2 + y2)/(8*sqrt(pi))
+            2.8906114426405538 * xy * z,                                       # sqrt(105)*xy*z/(2*sqrt(pi))
+            0.45704579946446572 * y * (1.0 - 5.0 * z2),                        # sqrt(42)*y*(1 - 5*z2)/(8*sqrt(pi))
+            0.3731763325901154 * z * (5.0 * z2 - 3.0),                         # sqrt(7)*z*(5*z2 - 3)/(4*sqrt(pi))
+            0.45704579946446572 * x * (1.0 - 5.0 * z2),                        # sqrt(42)*x*(1 - 5*z2)/(8*sqrt(pi))
+            1.4453057213202769 * z * (x2 - y2),                                # sqrt(105)*z*(x2 - y2)/(4*sqrt(pi))
+            0.59004358992664352 * x * (-x2 + 3.0 * y2),                        # sqrt(70)*x*(-x2 + 3*y2)/(8*sqrt(pi))
+        ]
+
+    return torch.stack(outputs, dim=-1)
@@ -3,7 +3,6 @@ import sys
 sys.path.append('./Musetalk')
 import os
 import time
-import re
 # from huggingface_hub import snapshot_download
 import requests
 import numpy as np
@@ -15,17 +14,18 @@ from tqdm import tqdm
 import copy
 from argparse import Namespace
 import gdown
-import imageio
 import json
 import shutil
 import threading
 import queue
-from moviepy.editor import *
 from musetalk.utils.utils import get_file_type,get_video_fps,datagen
 from musetalk.utils.preprocessing import get_landmark_and_bbox,read_imgs,coord_placeholder,get_bbox_range
 from musetalk.utils.blending import get_image,get_image_prepare_material,get_image_blending
 from musetalk.utils.utils import load_all_model
 import gradio as gr
+from src.utils.audio_clip import AudioClip, audio_path as to_audio_path
+from src.utils.videoio import FFmpegWriter, VideoReader, write_video
+from src.cost_time import instrument
 # ProjectDir = os.path.abspath(os.path.dirname(__file__))
 CheckpointsDir = "Musetalk/Musetalk/models"
 
@@ -102,17 +102,8 @@ def download_model():
         
 # download_model()  # for huggingface deployment.
 def video2imgs(vid_path, save_path, ext = '.png',cut_frame = 10000000):
-    cap = cv2.VideoCapture(vid_path)
-    count = 0
-    while True:
-        if count > cut_frame:
-            break
-        ret, frame = cap.read()
-        if ret:
-            cv2.imwrite(f"{save_path}/{count:08d}.png", frame)
-            count += 1
-        else:
-            break
+    for count, frame in enumerate(VideoReader(vid_path, end=cut_frame + 1, prefetch=8)):
+        cv2.imwrite(f"{save_path}/{count:08d}.png", frame)
 
 def osmakedirs(path_list):
     for path in path_list:
@@ -160,7 +151,8 @@ class MuseTalk_RealTime:
     
     def process_frames(self, 
                        res_frame_queue,
-                       video_len):
+                       video_len,
+                       writer=None):
         print(video_len)
         while True:
             if self.idx>=video_len-1:
@@ -183,10 +175,11 @@ class MuseTalk_RealTime:
             #combine_frame = get_image(ori_frame,res_frame,bbox)
             combine_frame = get_image_blending(ori_frame,res_frame,bbox,mask,mask_crop_box)
 
-            if self.skip_save_images is False:
-                cv2.imwrite(f"{self.avatar_path}/tmp/{str(self.idx).zfill(8)}.png",combine_frame)
+            if writer is not None:
+                writer.write(combine_frame)
             self.idx = self.idx + 1
     
+    @instrument
     def prepare_material(self, video_path, bbox_shift, progress=gr.Progress(track_tqdm=True)):
         self.video_path = video_path
         self.bbox_shift = bbox_shift
@@ -317,6 +310,7 @@ class MuseTalk_RealTime:
         torch.save(self.input_latent_list_cycle, os.path.join(self.latents_out_path)) 
         return bbox_shift_text
     
+    @instrument
     def inference_noprepare(self, audio_path,
                     source_video, bbox_shift,
                     batch_size = 4,
@@ -328,11 +322,12 @@ class MuseTalk_RealTime:
             video_path = source_video
             self.avatar_id = os.path.basename(video_path).split(".")[0]
             self.avatar_path = f"./results/avatars/{self.avatar_id}"
-        os.makedirs(self.avatar_path+'/tmp',exist_ok =True)   
         print("start inference")
         ############################################## extract audio feature ##############################################
         start_time = time.time()
-        whisper_feature = self.audio_processor.audio2feat(audio_path)
+        # whisper 可直接接收16k波形，内存中的TTS结果无需再次读盘解码
+        whisper_input = audio_path.resampled(16000) if isinstance(audio_path, AudioClip) else audio_path
+        whisper_feature = self.audio_processor.audio2feat(whisper_input)
         whisper_chunks = self.audio_processor.feature2chunks(feature_array=whisper_feature,fps=fps)
         print(f"processing audio:{audio_path} costs {(time.time() - start_time) * 1000}ms")
         ############################################## inference batch by batch ##############################################
@@ -340,7 +335,13 @@ class MuseTalk_RealTime:
         res_frame_queue = queue.Queue()
         self.idx = 0
         # # Create a sub-thread and start it
-        process_thread = threading.Thread(target=self.process_frames, args=(res_frame_queue, video_num))
+        # 融合后的帧经管道直接编码进最终视频并混入音频，不再逐帧写 PNG 后两次调用 ffmpeg
+        writer = None
+        if out_vid_name is not None and self.skip_save_images is False:
+            output_vid = os.path.join(self.video_out_path, out_vid_name+".mp4")
+            frame_h, frame_w = self.frame_list_cycle[0].shape[:2]
+            writer = FFmpegWriter(output_vid, fps, (frame_w, frame_h), audio=to_audio_path(audio_path))
+        process_thread = threading.Thread(target=self.process_frames, args=(res_frame_queue, video_num, writer))
         process_thread.start()
 
         gen = datagen(whisper_chunks,
@@ -374,22 +375,12 @@ class MuseTalk_RealTime:
                         video_num,
                         time.time()-start_time))
 
-        if out_vid_name is not None and self.skip_save_images is False: 
-            # optional
-            cmd_img2video = f"ffmpeg -y -v warning -r {fps} -f image2 -i {self.avatar_path}/tmp/%08d.png -vcodec libx264 -vf format=rgb24,scale=out_color_matrix=bt709,format=yuv420p -crf 18 {self.avatar_path}/temp.mp4"
-            print(cmd_img2video)
-            os.system(cmd_img2video)
-
-            output_vid = os.path.join(self.video_out_path, out_vid_name+".mp4") # on
-            cmd_combine_audio = f"ffmpeg -y -v warning -i {audio_path} -i {self.avatar_path}/temp.mp4 {output_vid}"
-            print(cmd_combine_audio)
-            os.system(cmd_combine_audio)
-
-            os.remove(f"{self.avatar_path}/temp.mp4")
-            shutil.rmtree(f"{self.avatar_path}/tmp")
+        if writer is not None:
+            writer.release()
             print(f"result is save to {output_vid}")
         print("\n")
         return output_vid
+    @instrument
     def inference(self, audio_path,
                   source_video, bbox_shift, 
                   batch_size = 4,
@@ -463,11 +454,12 @@ class MuseTalk_RealTime:
             bbox_shift_text = get_bbox_range(input_img_list, bbox_shift)
         
         out_vid_name = "res"
-        os.makedirs(self.avatar_path+'/tmp',exist_ok =True)   
         print("start inference")
         ############################################## extract audio feature ##############################################
         start_time = time.time()
-        whisper_feature = self.audio_processor.audio2feat(audio_path)
+        # whisper 可直接接收16k波形，内存中的TTS结果无需再次读盘解码
+        whisper_input = audio_path.resampled(16000) if isinstance(audio_path, AudioClip) else audio_path
+        whisper_feature = self.audio_processor.audio2feat(whisper_input)
         whisper_chunks = self.audio_processor.feature2chunks(feature_array=whisper_feature,fps=fps)
         print(f"processing audio:{audio_path} costs {(time.time() - start_time) * 1000}ms")
         ############################################## inference batch by batch ##############################################
@@ -475,7 +467,13 @@ class MuseTalk_RealTime:
         res_frame_queue = queue.Queue()
         self.idx = 0
         # # Create a sub-thread and start it
-        process_thread = threading.Thread(target=self.process_frames, args=(res_frame_queue, video_num))
+        # 融合后的帧经管道直接编码进最终视频并混入音频，不再逐帧写 PNG 后两次调用 ffmpeg
+        writer = None
+        if out_vid_name is not None and self.skip_save_images is False:
+            output_vid = os.path.join(self.video_out_path, out_vid_name+".mp4")
+            frame_h, frame_w = self.frame_list_cycle[0].shape[:2]
+            writer = FFmpegWriter(output_vid, fps, (frame_w, frame_h), audio=to_audio_path(audio_path))
+        process_thread = threading.Thread(target=self.process_frames, args=(res_frame_queue, video_num, writer))
         process_thread.start()
 
         gen = datagen(whisper_chunks,
@@ -509,19 +507,8 @@ class MuseTalk_RealTime:
                         video_num,
                         time.time()-start_time))
 
-        if out_vid_name is not None and self.skip_save_images is False: 
-            # optional
-            cmd_img2video = f"ffmpeg -y -v warning -r {fps} -f image2 -i {self.avatar_path}/tmp/%08d.png -vcodec libx264 -vf format=rgb24,scale=out_color_matrix=bt709,format=yuv420p -crf 18 {self.avatar_path}/temp.mp4"
-            print(cmd_img2video)
-            os.system(cmd_img2video)
-
-            output_vid = os.path.join(self.video_out_path, out_vid_name+".mp4") # on
-            cmd_combine_audio = f"ffmpeg -y -v warning -i {audio_path} -i {self.avatar_path}/temp.mp4 {output_vid}"
-            print(cmd_combine_audio)
-            os.system(cmd_combine_audio)
-
-            os.remove(f"{self.avatar_path}/temp.mp4")
-            shutil.rmtree(f"{self.avatar_path}/tmp")
+        if writer is not None:
+            writer.release()
             print(f"result is save to {output_vid}")
         print("\n")
         return output_vid, bbox_shift_text
@@ -541,6 +528,7 @@ class MuseTalk:
     
         
     @torch.no_grad()
+    @instrument
     def inference(self, audio_path, video_path, bbox_shift):
         args_dict={"result_dir":'./results/output', "fps":25, "batch_size":8, "output_vid_name":'', "use_saved_coord":False}#same with inferenece script
         args = Namespace(**args_dict)
@@ -563,11 +551,7 @@ class MuseTalk:
             # cmd = f"ffmpeg -v fatal -i {video_path} -start_number 0 {save_dir_full}/%08d.png"
             # os.system(cmd)
             # 读取视频
-            reader = imageio.get_reader(video_path)
-
-            # 保存图片
-            for i, im in enumerate(reader):
-                imageio.imwrite(f"{save_dir_full}/{i:08d}.png", im)
+            video2imgs(video_path, save_dir_full)
             input_img_list = sorted(glob.glob(os.path.join(save_dir_full, '*.[jpJP][pnPN]*[gG]')))
             fps = get_video_fps(video_path)
         else: # input img folder
@@ -576,7 +560,9 @@ class MuseTalk:
             fps = args.fps
         #print(input_img_list)
         ############################################## extract audio feature ##############################################
-        whisper_feature = self.audio_processor.audio2feat(audio_path)
+        # whisper 可直接接收16k波形，内存中的TTS结果无需再次读盘解码
+        whisper_input = audio_path.resampled(16000) if isinstance(audio_path, AudioClip) else audio_path
+        whisper_feature = self.audio_processor.audio2feat(whisper_input)
         whisper_chunks = self.audio_processor.feature2chunks(feature_array=whisper_feature,fps=fps)
         ############################################## preprocess input image  ##############################################
         if os.path.exists(crop_coord_save_path) and args.use_saved_coord:
@@ -624,101 +610,31 @@ class MuseTalk:
                 
         ############################################## pad to full image ##############################################
         print("pad talking image to original video")
-        for i, res_frame in enumerate(tqdm(res_frame_list)):
-            bbox = coord_list_cycle[i%(len(coord_list_cycle))]
-            ori_frame = copy.deepcopy(frame_list_cycle[i%(len(frame_list_cycle))])
-            x1, y1, x2, y2 = bbox
-            try:
-                res_frame = cv2.resize(res_frame.astype(np.uint8),(x2-x1,y2-y1))
-            except:
-        #                 print(bbox)
-                continue
-            
-            combine_frame = get_image(ori_frame,res_frame,bbox)
-            cv2.imwrite(f"{result_img_save_path}/{str(i).zfill(8)}.png",combine_frame)
-            
-        # cmd_img2video = f"ffmpeg -y -v fatal -r {fps} -f image2 -i {result_img_save_path}/%08d.png -vcodec libx264 -vf format=rgb24,scale=out_color_matrix=bt709,format=yuv420p temp.mp4"
-        # print(cmd_img2video)
-        # os.system(cmd_img2video)
-        # 帧率
-        fps = 25
-        # 图片路径
-        # 输出视频路径
-        output_video = 'temp.mp4'
-
-        # 读取图片
-        def is_valid_image(file):
-            pattern = re.compile(r'\d{8}\.png')
-            return pattern.match(file)
-
-        images = []
-        files = [file for file in os.listdir(result_img_save_path) if is_valid_image(file)]
-        files.sort(key=lambda x: int(x.split('.')[0]))
-
-        for file in files:
-            filename = os.path.join(result_img_save_path, file)
-            images.append(imageio.imread(filename))
-            
+        # 融合后的帧经管道直接编码并混入音频（一次编码），不再写 PNG、imageio 编码后再由 moviepy 重新编码
+        writer = None
+        try:
+            for i, res_frame in enumerate(tqdm(res_frame_list)):
+                bbox = coord_list_cycle[i%(len(coord_list_cycle))]
+                ori_frame = copy.deepcopy(frame_list_cycle[i%(len(frame_list_cycle))])
+                x1, y1, x2, y2 = bbox
+                try:
+                    res_frame = cv2.resize(res_frame.astype(np.uint8),(x2-x1,y2-y1))
+                except:
+            #                 print(bbox)
+                    continue
+
+                combine_frame = get_image(ori_frame,res_frame,bbox)
+                if writer is None:
+                    writer = FFmpegWriter(output_vid_name, fps, combine_frame.shape[1::-1], audio=to_audio_path(audio_path))
+                writer.write(combine_frame)
+        except BaseException as e:
+            if writer is not None:
+                writer.__exit__(type(e), e, e.__traceback__)
+            raise
+        if writer is None:
+            raise RuntimeError("no frame generated for {}".format(video_path))
+        writer.release()
 
-        # 保存视频
-        imageio.mimwrite(output_video, images, 'FFMPEG', fps=fps, codec='libx264', pixelformat='yuv420p')
-
-        # cmd_combine_audio = f"ffmpeg -y -v fatal -i {audio_path} -i temp.mp4 {output_vid_name}"
-        # print(cmd_combine_audio)
-        # os.system(cmd_combine_audio)
-
-        input_video = './temp.mp4'
-        # Check if the input_video and audio_path exist
-        if not os.path.exists(input_video):
-            raise FileNotFoundError(f"Input video file not found: {input_video}")
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
-        
-        # 读取视频
-        reader = imageio.get_reader(input_video)
-        fps = reader.get_meta_data()['fps']  # 获取原视频的帧率
-
-        # 将帧存储在列表中
-        frames = images
-
-        # 保存视频并添加音频
-        # imageio.mimwrite(output_vid_name, frames, 'FFMPEG', fps=fps, codec='libx264', audio_codec='aac', input_params=['-i', audio_path])
-        
-        # input_video = ffmpeg.input(input_video)
-        
-        # input_audio = ffmpeg.input(audio_path)
-        
-        print(len(frames))
-
-        # imageio.mimwrite(
-        #     output_video,
-        #     frames,
-        #     'FFMPEG',
-        #     fps=25,
-        #     codec='libx264',
-        #     audio_codec='aac',
-        #     input_params=['-i', audio_path],
-        #     output_params=['-y'],  # Add the '-y' flag to overwrite the output file if it exists
-        # )
-        # writer = imageio.get_writer(output_vid_name, fps = 25, codec='libx264', quality=10, pixelformat='yuvj444p')
-        # for im in frames:
-        #     writer.append_data(im)
-        # writer.close()
-
-        # Load the video
-        video_clip = VideoFileClip(input_video)
-
-        # Load the audio
-        audio_clip = AudioFileClip(audio_path)
-
-        # Set the audio to the video
-        video_clip = video_clip.set_audio(audio_clip)
-
-        # Write the output video
-        video_clip.write_videofile(output_vid_name, codec='libx264', audio_codec='aac',fps=25)
-
-        os.remove("temp.mp4")
-        #shutil.rmtree(result_img_save_path)
         print(f"result is save to {output_vid_name}", bbox_shift_text)
         return output_vid_name, bbox_shift_text
 
@@ -744,11 +660,11 @@ class MuseTalk:
         # command = f"ffmpeg -i {video} -r 25 -vcodec libx264 -vtag hvc1 -pix_fmt yuv420p crf 18   {output_video}  -y"
 
         # read video
-        reader = imageio.get_reader(video)
-        fps = reader.get_meta_data()['fps']  # get fps from original video
+        reader = VideoReader(video)
+        fps = reader.fps  # get fps from original video
 
         # conver fps to 25
-        frames = [im for im in reader]
+        frames = reader.read()
         target_fps = 25
         
         L = len(frames)
@@ -764,7 +680,7 @@ class MuseTalk:
             target_frames.append(frames[t_idx])
 
         # save video
-        imageio.mimwrite(output_video, target_frames, 'FFMPEG', fps=25, codec='libx264', quality=9, pixelformat='yuv420p')
+        write_video(target_frames, output_video, 25)
         return output_video
 
     
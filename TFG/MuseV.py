@@ -11,6 +11,9 @@ warnings.filterwarnings("ignore")
 # os.environ['PYTHONPATH'] = os.getenv('PYTHONPATH', '') + f':{current_dir}/MuseV/controlnet_aux/src'
 
 import sys
+# 在插入 MuseV 路径之前导入，避免与 MuseV 下的同名包冲突
+from src.utils.videoio import VideoReader, write_video
+from src.cost_time import instrument
 ProjectDir = "MuseV"
 CheckpointsDir =  "MuseV/checkpoints"
 print(ProjectDir, CheckpointsDir)
@@ -638,6 +641,7 @@ class MuseV():
 
         pass
 
+    @instrument
     def t2v_inference(self, prompt,
                       image_ph, seed,
                       fps, w, h, video_len,
@@ -961,35 +965,9 @@ class MuseV():
             )
             print("Save to", output_path)
             def convert_video_to_rgb(input_path, output_path):
-                # 打开视频文件
-                video_capture = cv2.VideoCapture(input_path)
-
-                # 获取视频的基本信息
-                fps = video_capture.get(cv2.CAP_PROP_FPS)
-                frame_width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-                frame_height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                total_frames = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
-
-                # 创建输出视频编写器
-                fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                output_video = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-
-                # 逐帧读取并转换为RGB
-                while True:
-                    ret, frame = video_capture.read()
-
-                    if not ret:
-                        break
-
-                    # 将帧从BGR格式转换为RGB格式
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                    # 将RGB帧写入输出视频文件
-                    output_video.write(rgb_frame)
-
-                # 释放资源
-                video_capture.release()
-                output_video.release()
+                # 读出的 BGR 帧按 RGB 送入编码器，即交换 R/B 通道
+                reader = VideoReader(input_path, prefetch=8)
+                write_video(reader, output_path, reader.fps, rgb=True)
 
                 print("视频转换完成。")
             res_path = 'results/result.mp4'
@@ -1,4 +1,3 @@
-import os
 import sys
 sys.path.append('./NeRF')
 import torch
@@ -6,6 +5,8 @@ import torch
 from nerf_triplane.provider import NeRFDataset_Test
 from nerf_triplane.utils import *
 from nerf_triplane.network import NeRFNetwork
+from extensions import set_backend
+from src.cost_time import instrument
 
 # Disable tf32 features to fix low numerical accuracy on RTX30XX GPUs
 try:
@@ -31,7 +32,7 @@ class Options:
         self.num_steps = 16
         self.upsample_steps = 0
         self.update_extra_interval = 16
-        self.max_ray_batch = 4096
+        self.max_ray_batch = 16384 # 仅用于纯 PyTorch 后端，按批推进光线以限制内存
         self.warmup_step = 10000
         self.amb_aud_loss = 1
         self.amb_eye_loss = 1
@@ -104,7 +105,10 @@ opt.cuda_ray = True
 opt.torso = True
 
 class NeRFTalk():
-    def __init__(self):
+    def __init__(self, backend=None):
+        # backend: 'auto' / 'cuda' / 'torch'，为 None 时由环境变量 NERF_BACKEND 决定（默认 auto，无 GPU 时使用纯 PyTorch 实现）
+        if backend is not None:
+            set_backend(backend)
         print(vars(opt))
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = NeRFNetwork(opt)
@@ -115,18 +119,21 @@ class NeRFTalk():
         metrics = []
         opt.ckpt = ckpt_path
         self.trainer = Trainer('ngp', opt, self.model, device=self.device, workspace=opt.workspace, criterion=criterion, fp16=opt.fp16, metrics=metrics, use_checkpoint=opt.ckpt)
+        # 位姿、背景与光线只与 pose 文件有关，在此构造一次，predict 时只更新音频特征
+        opt.aud = ''
+        self.test_data = NeRFDataset_Test(opt, device=self.device)
+        self.model.eye_areas = self.test_data.eye_area
                 
+    @instrument
     def predict(self, asr_wav):
-        opt.aud = asr_wav
-        
-        self.test_loader = NeRFDataset_Test(opt, device=self.device).dataloader()
-        self.model.aud_features = self.test_loader._data.auds
-        self.model.eye_areas = self.test_loader._data.eye_area
+        self.test_data.set_audio(asr_wav)
+        self.test_loader = self.test_data.dataloader()
+        self.model.aud_features = self.test_data.auds
         
-        self.trainer.test(self.test_loader, 
-                          save_path = opt.workspace,
-                          name = 'test')
-        return os.path.join(opt.workspace, f"test_audio.mp4")    
+        # 边渲染边编码并混入音频，返回时视频已合成完毕
+        return self.trainer.test(self.test_loader, 
+                                 save_path = opt.workspace,
+                                 name = 'test')
     
 if __name__ == '__main__':
     nerf = NeRFTalk()
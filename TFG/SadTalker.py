@@ -10,6 +10,10 @@ from src.facerender.animate import AnimateFromCoeff
 from src.generate_batch import get_data
 from src.generate_facerender_batch import get_facerender_data
 from src.utils.init_path import init_path
+from src.utils.audio_clip import AudioClip, audio_path as to_audio_path
+from src.utils.videoio import extract_audio, unique_video_path
+from src.utils.idle_cache import get_idle_cache
+from src.cost_time import instrument
 
 # from pydub import AudioSegment
 # def mp3_to_wav(mp3_filename,wav_filename,frame_rate):
@@ -37,6 +41,7 @@ class SadTalker():
         self.animate_from_coeff = AnimateFromCoeff(self.sadtalker_paths, self.device)
         self.audio_to_coeff = Audio2Coeff(self.sadtalker_paths, self.device)
 
+    @instrument
     def test(self, 
             pic_path,
             crop_pic_path,
@@ -160,7 +165,7 @@ class SadTalker():
         coeff = self.audio_to_coeff.generate(batch, save_dir, pose_style, ref_pose_coeff_path)
 
         #coeff2video
-        data = get_facerender_data(coeff, crop_pic_path, first_coeff_path, audio_path, batch_size, still_mode=still_mode, \
+        data = get_facerender_data(coeff, crop_pic_path, first_coeff_path, to_audio_path(audio_path), batch_size, still_mode=still_mode, \
             preprocess=preprocess, size=size, expression_scale = exp_scale, facemodel=facerender)
         return_path = self.animate_from_coeff.generate(data, save_dir,  pic_path, crop_info, enhancer='gfpgan' if use_enhancer else None, preprocess=preprocess, img_size=size, fps = fps)
         # video_name = data['video_name']
@@ -178,6 +183,7 @@ class SadTalker():
         
         return return_path
     
+    @instrument
     def test2(self, source_image, driven_audio, preprocess='crop', 
         still_mode=False,  use_enhancer=False, batch_size=1, size=256, 
         pose_style = 0, 
@@ -188,8 +194,14 @@ class SadTalker():
         ref_info = None,
         use_idle_mode = False,
         length_of_audio = 0, use_blink=True, fps = 20,
-        result_dir='./results/'):
+        result_dir='./results/', use_idle_cache=True):
         os.makedirs(result_dir, exist_ok=True)
+        if use_idle_mode and driven_audio is None and not use_ref_video and use_idle_cache:
+            # 待机视频走缓存，命中时不需要加载任何模型
+            return self.idle(source_image, length_of_audio, preprocess=preprocess, still_mode=still_mode,
+                             use_enhancer=use_enhancer, batch_size=batch_size, size=size, pose_style=pose_style,
+                             facerender=facerender, exp_scale=exp_scale, use_blink=use_blink, fps=fps,
+                             result_dir=result_dir)
         self.sadtalker_paths = init_path(self.checkpoint_path, self.config_path, size, False, preprocess)
         print(self.sadtalker_paths)
             
@@ -209,7 +221,10 @@ class SadTalker():
         pic_path = os.path.join(input_dir, os.path.basename(source_image)) 
         shutil.copy(source_image, input_dir)
 
-        if driven_audio is not None and os.path.isfile(driven_audio):
+        if isinstance(driven_audio, AudioClip):
+            # 内存中的TTS结果直接传给 get_data，无需复制到输入目录再读取
+            audio_path = driven_audio
+        elif driven_audio is not None and os.path.isfile(driven_audio):
             audio_path = os.path.join(input_dir, os.path.basename(driven_audio))  
             shutil.copy(driven_audio, input_dir)
 
@@ -228,8 +243,8 @@ class SadTalker():
             audio_path = os.path.join(save_dir, ref_video_videoname+'.wav')
             print('new audiopath:',audio_path)
             # if ref_video contains audio, set the audio from ref_video.
-            cmd = r"ffmpeg -y -hide_banner -loglevel error -i %s %s"%(ref_video, audio_path)
-            os.system(cmd)        
+            os.makedirs(save_dir, exist_ok=True)
+            extract_audio(ref_video, audio_path)
 
         os.makedirs(save_dir, exist_ok=True)
         
@@ -279,7 +294,7 @@ class SadTalker():
             coeff_path = self.audio_to_coeff.generate(batch, save_dir, pose_style, ref_pose_coeff_path)
 
         #coeff2video
-        data = get_facerender_data(coeff_path, crop_pic_path, first_coeff_path, audio_path, batch_size, still_mode=still_mode, \
+        data = get_facerender_data(coeff_path, crop_pic_path, first_coeff_path, to_audio_path(audio_path), batch_size, still_mode=still_mode, \
             preprocess=preprocess, size=size, expression_scale = exp_scale, facemodel=facerender)
         return_path = self.animate_from_coeff.generate(data, save_dir,  pic_path, crop_info, enhancer='gfpgan' if use_enhancer else None, preprocess=preprocess, img_size=size, fps = fps)
         # video_name = data['video_name']
@@ -296,8 +311,32 @@ class SadTalker():
         import gc; gc.collect()
         
         return return_path
-    
-    
+
+    @instrument
+    def idle(self, source_image, length_of_audio=5, preprocess='crop', still_mode=False, use_enhancer=False,
+             batch_size=1, size=256, pose_style=0, facerender='facevid2vid', exp_scale=1.0, use_blink=True,
+             fps=20, result_dir='./results/'):
+        """
+        生成 length_of_audio 秒的待机视频。同一形象与渲染参数只按时长档位渲染一次循环片段，
+        之后的待机请求循环拼接缓存片段；形象图片内容变化时缓存自动失效。
+        """
+        settings = {
+            'preprocess': preprocess, 'still_mode': still_mode, 'use_enhancer': use_enhancer, 'size': size,
+            'pose_style': pose_style, 'facerender': facerender, 'exp_scale': exp_scale,
+            'use_blink': use_blink, 'fps': fps,
+        }
+
+        def render(seconds):
+            return self.test2(source_image, None, preprocess, still_mode, use_enhancer, batch_size, size,
+                              pose_style, facerender, exp_scale, use_idle_mode=True, length_of_audio=seconds,
+                              use_blink=use_blink, fps=fps, result_dir=result_dir, use_idle_cache=False)
+
+        save_path = unique_video_path(result_dir, 'idle')
+        return_path = get_idle_cache().serve(source_image, settings, length_of_audio, save_path, render)
+        print(f'The idle video is saved in {return_path}')
+        return return_path
+
+
 if __name__ == '__main__':
     sadtalker = SadTalker()
     source_image = "inputs/girl.png"
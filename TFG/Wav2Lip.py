@@ -2,16 +2,23 @@ import sys
 sys.path.append('./')
 
 import numpy as np
-import cv2, os,  subprocess
+import cv2, os
+import hashlib
+from collections import OrderedDict
 from tqdm import tqdm
 import torch
-import platform
+import time
 from src.models import Wav2Lip as wav2lip_mdoel
 from src.utils import audio
-import face_detection
+from src.utils.audio_clip import AudioClip, audio_path
+from src.utils.frame_pipeline import FramePipeline
+from src.utils.videoio import FFmpegWriter, VideoReader, extract_audio, is_image, unique_video_path
+from src.utils.face_analysis import get_face_analysis
+from src.cost_time import instrument
 
 class Wav2Lip:
-    def __init__(self, path = 'checkpoints/wav2lip.pth'):
+    def __init__(self, path = 'checkpoints/wav2lip.pth', max_cached_faces = 8, paste_workers = 2,
+                 codec = 'libx264', preset = 'veryfast', crf = 18):
         self.fps = 25
         self.resize_factor = 1
         self.mel_step_size = 16
@@ -23,6 +30,18 @@ class Wav2Lip:
         self.nosmooth = False
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model = self.load_model(path)
+        # 人脸检测器由进程内共享的人脸分析服务提供，整段检测结果按素材内容哈希缓存（内存LRU）
+        self.face_analysis = get_face_analysis()
+        self.max_cached_faces = max_cached_faces
+        self.face_tracks = OrderedDict()
+        # 贴回与编码的工作线程数
+        self.paste_workers = paste_workers
+        # 输出视频直接由 ffmpeg 管道编码
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        # GFPGAN 增强服务按需加载，进程内共享
+        self._enhancer = None
 
     def load_model(self, checkpoint_path):
         model = wav2lip_mdoel()
@@ -49,35 +68,34 @@ class Wav2Lip:
     #     else:
     #         return None
                    
+    @instrument
     def predict(self, face, audio_file, batch_size, fps = 25,
-                enhance = False, resize_factor = 1, rotate = False, crop = [-1, -1, -1, -1]):
+                enhance = False, resize_factor = 1, rotate = False, crop = [0, -1, 0, -1], save_path = None):
         os.makedirs('results', exist_ok=True)
         os.makedirs('temp', exist_ok=True)
+        # 每次请求使用独立的输出文件
+        save_path = save_path or unique_video_path('results', 'wav2lip')
         
         if not os.path.isfile(face):
             raise ValueError('--face argument must be a valid path to video/image file')
 
-        elif face.split('.')[1] in ['jpg', 'png', 'jpeg']:
+        elif is_image(face):
             full_frames = [cv2.imread(face)]
             fps = fps
 
         else:
-            video_stream = cv2.VideoCapture(face)
-            fps = video_stream.get(cv2.CAP_PROP_FPS)
+            reader = VideoReader(face, prefetch=8)
+            fps = reader.fps
 
             print('Reading video frames...')
 
             full_frames = []
-            while 1:
-                still_reading, frame = video_stream.read()
-                if not still_reading:
-                    video_stream.release()
-                    break
+            for frame in reader:
                 if resize_factor > 1:
                     frame = cv2.resize(frame, (frame.shape[1]//resize_factor, frame.shape[0]//resize_factor))
 
                 if rotate:
-                    frame = cv2.rotate(frame, cv2.cv2.ROTATE_90_CLOCKWISE)
+                    frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
 
                 y1, y2, x1, x2 = crop
                 if x2 == -1: x2 = frame.shape[1]
@@ -88,14 +106,13 @@ class Wav2Lip:
                 full_frames.append(frame)
         print ("Number of frames available for inference: "+str(len(full_frames)))
 
-        if not audio_file.endswith('.wav'):
+        if not isinstance(audio_file, AudioClip) and not audio_file.endswith('.wav'):
             print('Extracting raw audio...')
-            command = 'ffmpeg -y -i {} -strict -2 {}'.format(audio_file, 'temp/temp.wav')
-
-            subprocess.call(command, shell=True)
-            audio_file = 'temp/temp.wav'
+            audio_file = extract_audio(audio_file, unique_video_path('temp', 'audio', '.wav'))
 
+        # AudioClip 直接使用内存中的16k波形，仅在最后合成视频时取其文件路径
         wav = audio.load_wav(audio_file, 16000)
+        audio_file = audio_path(audio_file)
         mel = audio.melspectrogram(wav)
         print(mel.shape)
         
@@ -118,65 +135,62 @@ class Wav2Lip:
         full_frames = full_frames[:len(mel_chunks)]
        
         batch_size = batch_size
-        gen = self.datagen(full_frames.copy(), mel_chunks, batch_size)
+        track_key = self.media_hash(face, resize_factor, rotate, tuple(crop))
+        gen = self.datagen(full_frames.copy(), mel_chunks, batch_size, track_key)
         
-        for i, (img_batch, mel_batch, frames, coords) in enumerate(tqdm(gen, 
-                                                total=int(np.ceil(float(len(mel_chunks))/batch_size)))):
-            if i == 0:
-                frame_h, frame_w = full_frames[0].shape[:-1]
-                out = cv2.VideoWriter('temp/result.avi', 
-                                        cv2.VideoWriter_fourcc(*'DIVX'), self.fps, (frame_w, frame_h))
-
-            img_batch = torch.FloatTensor(np.transpose(img_batch, (0, 3, 1, 2))).to(self.device)
-            mel_batch = torch.FloatTensor(np.transpose(mel_batch, (0, 3, 1, 2))).to(self.device)
-
-            with torch.no_grad():
-                pred = self.model(mel_batch, img_batch)
-
-            pred = pred.cpu().numpy().transpose(0, 2, 3, 1) * 255.
-            
-            for p, f, c in zip(pred, frames, coords):
-                y1, y2, x1, x2 = c
-                p = cv2.resize(p.astype(np.uint8), (x2 - x1, y2 - y1))
-
-                f[y1:y2, x1:x2] = p
-                out.write(f)
-
-        out.release()
+        frame_h, frame_w = full_frames[0].shape[:-1]
+        scale = self.enhancer.upscale if enhance else 1
+        # 原始 BGR 帧经管道送入 ffmpeg，编码同时混入音频
+        out = FFmpegWriter(save_path, self.fps, (frame_w * scale, frame_h * scale), audio=audio_file,
+                           codec=self.codec, preset=self.preset, crf=self.crf)
         if enhance:
-            import imageio
-            from src.utils.face_enhancer import enhancer_generator_with_len, enhancer_list
-            enhancer = 'gfpgan'
-            background_enhancer = None
-            video_save_dir = 'results'
-            video_name_enhance = 'res_enhanced.mp4'
-            enhanced_path = os.path.join(video_save_dir, 'temp_'+video_name_enhance)
-            av_path_enhancer = os.path.join(video_save_dir, video_name_enhance) 
-            return_path = av_path_enhancer
-            full_video_path = 'temp/result.avi'
-            try:
-                enhanced_images_gen_with_len = enhancer_generator_with_len(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(self.fps))
-
-            except:
-                enhanced_images_gen_with_len = enhancer_list(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(self.fps))
-            command = 'ffmpeg -y -i {} -i {} -strict -2 -q:v 1 {}'.format(audio_file, enhanced_path, 'results/example_answer.mp4')
-            subprocess.call(command, shell=platform.system() != 'Windows')
-        else:
-            command = 'ffmpeg -y -i {} -i {} -strict -2 -q:v 1 {}'.format(audio_file, 'temp/result.avi', 'results/example_answer.mp4')
-            subprocess.call(command, shell=platform.system() != 'Windows')
-        return 'results/example_answer.mp4'
-
-
-    def datagen(self, frames, mels, batch_size):
+            # 贴回后的帧在编码线程中攒批增强（多帧人脸一次前向）再编码，无需写出再读回视频
+            out = self.enhancer.writer(out, batch_size=max(batch_size, 8))
+        # 贴回、增强与编码在工作线程中进行，与下一个batch的推理重叠
+        pipeline = FramePipeline(out, self.paste_back, num_workers=self.paste_workers, max_queue=max(2 * batch_size, 8))
+
+        # 先退出 pipeline 再退出 writer：出错时编码线程与线程池先结束，再终止 ffmpeg
+        with out, pipeline:
+            for i, (img_batch, mel_batch, frames, coords) in enumerate(tqdm(gen, 
+                                                    total=int(np.ceil(float(len(mel_chunks))/batch_size)))):
+                start_model = time.time()
+                img_batch = torch.FloatTensor(np.transpose(img_batch, (0, 3, 1, 2))).to(self.device)
+                mel_batch = torch.FloatTensor(np.transpose(mel_batch, (0, 3, 1, 2))).to(self.device)
+
+                with torch.no_grad():
+                    pred = self.model(mel_batch, img_batch)
+
+                pred = pred.cpu().numpy().transpose(0, 2, 3, 1) * 255.
+                pipeline.record('model', time.time() - start_model, len(pred))
+                
+                for p, f, c in zip(pred, frames, coords):
+                    pipeline.submit((p, f, c))
+
+            pipeline.close()
+        return save_path
+
+    @property
+    def enhancer(self):
+        if self._enhancer is None:
+            from src.utils.face_enhancer import get_face_enhancer
+            self._enhancer = get_face_enhancer(method='gfpgan', bg_upsampler=None)
+        return self._enhancer
+
+    @staticmethod
+    def paste_back(item, out=None):
+        p, f, c = item
+        y1, y2, x1, x2 = c
+        f[y1:y2, x1:x2] = cv2.resize(p.astype(np.uint8), (x2 - x1, y2 - y1))
+        return f
+
+    def datagen(self, frames, mels, batch_size, track_key = None):
         img_batch, mel_batch, frame_batch, coords_batch = [], [], [], []
 
         if self.box[0] == -1:
             if not self.static:
-                face_det_results = self.face_detect(frames) # BGR2RGB for CNN face detection
+                face_det_results = self.face_detect(frames, track_key) # BGR2RGB for CNN face detection
             else:
-                face_det_results = self.face_detect([frames[0]])
+                face_det_results = self.face_detect([frames[0]], track_key)
         else:
             print('Using the specified bounding box instead of face detection...')
             y1, y2, x1, x2 = self.box
@@ -217,33 +231,18 @@ class Wav2Lip:
 
             yield img_batch, mel_batch, frame_batch, coords_batch
 
-    def face_detect(self, images):
-        try:
-            detector = face_detection.FaceAlignment(face_detection.LandmarksType.TWO_D, 
-                                                    flip_input=False, device=self.device)
-        except:
-            detector = face_detection.FaceAlignment(face_detection.LandmarksType._2D, 
-                                                    flip_input=False, device=self.device)
+    def media_hash(self, path, *params):
+        """素材文件内容 + 读取参数的哈希，作为人脸检测结果的缓存键"""
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(repr((params, self.pads)).encode('utf-8'))
+        return digest.hexdigest()
 
-        batch_size = self.face_det_batch_size
-        
-        while 1:
-            predictions = []
-            try:
-                for i in tqdm(range(0, len(images), batch_size)):
-                    # img_batch = torch.tensor(np.array(images[i:i + batch_size]), device=self.device)
-                    # img_batch = img_batch.permute(0, 3, 1, 2)
-                    # print(img_batch.shape, type(img_batch))
-                    # predictions.extend(detector.get_landmarks_from_batch(img_batch))
-                    predictions.extend(detector.get_detections_for_batch(np.array(images[i:i + batch_size])))
-            except Exception as e:
-                print("Error in face detection: {}".format(e))
-                if batch_size == 1: 
-                    raise RuntimeError('Image too big to run face detection on GPU. Please use the resize_factor argument')
-                batch_size //= 2
-                print('Recovering from OOM error; New batch size: {}'.format(batch_size))
-                continue
-            break
+    def detect_boxes(self, images):
+        """批量检测人脸，返回加上 pads 后的 (x1, y1, x2, y2) 框（未平滑）"""
+        predictions = self.face_analysis.detect(images, batch_size=self.face_det_batch_size)
 
         results = []
         pady1, pady2, padx1, padx2 = self.pads
@@ -258,12 +257,28 @@ class Wav2Lip:
             x2 = min(image.shape[1], rect[2] + padx2)
             
             results.append([x1, y1, x2, y2])
-
-        boxes = np.array(results)
+        return np.array(results).reshape(-1, 4)
+
+    @instrument
+    def face_detect(self, images, track_key = None):
+        # 已缓存的素材只检测尚未覆盖的帧（更长的音频需要更多视频帧时）
+        cached = self.face_tracks.get(track_key) if track_key is not None else None
+        if cached is None:
+            boxes = self.detect_boxes(images)
+        elif len(cached) < len(images):
+            boxes = np.concatenate([cached, self.detect_boxes(images[len(cached):])], axis=0)
+        else:
+            print('Using cached face detection results...')
+            boxes = cached
+        if track_key is not None:
+            self.face_tracks[track_key] = boxes
+            self.face_tracks.move_to_end(track_key)
+            while len(self.face_tracks) > self.max_cached_faces:
+                self.face_tracks.popitem(last=False)
+
+        boxes = boxes[:len(images)].copy()
         if not self.nosmooth: boxes = self.get_smoothened_boxes(boxes, T=5)
         results = [[image[y1: y2, x1:x2], (y1, y2, x1, x2)] for image, (x1, y1, x2, y2) in zip(images, boxes)]
-
-        del detector
         return results 
     
     def get_smoothened_boxes(self, boxes, T):
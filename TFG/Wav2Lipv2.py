@@ -6,36 +6,34 @@ sys.path.append('./')
 
 import argparse
 import copy
+import hashlib
+import itertools
+import json
 import math
 import os
-import platform
-import subprocess
+import shutil
 import sys
-import tempfile
+import threading
 import time
 import uuid
 import warnings
-from collections import defaultdict
 import time
 
 import cv2
 import numpy as np
 import torch
-from PIL import Image
 from tqdm import tqdm
 from src.modelsv2 import Wav2Lip as wav2lip_model
 from src.utils import audio
-
-import face_detection
-
-os.environ['YOLO_VERBOSE'] = 'False'
-from ultralytics import YOLO
-
+from src.utils.audio_clip import AudioClip
+from src.utils.frame_pipeline import FramePipeline
+from src.utils.face_analysis import get_face_analysis
+from src.utils.videoio import FFmpegWriter, VideoReader, extract_audio, is_image, unique_video_path, video_fps
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.torchalign import FacialLandmarkDetector
-from src.utils.utils import decompose_tfm, img_warp, img_warp_back_inv_m, metrix_M
+from src.utils.utils import decompose_tfm, img_warp, img_warp_back_inv_m_roi, metrix_M
 from src.utils.utils import laplacianSmooth
+from src.cost_time import instrument
 
 
 torch.manual_seed(1234)
@@ -65,24 +63,50 @@ def load_model(path):
 
 
 def get_video_fps(vfile):
-    cap = cv2.VideoCapture(vfile)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    cap.release()
-    return fps
+    return video_fps(vfile)
+
+
+class LazyFrames:
+    """按需从源视频顺序解码帧，已解码的帧保留在内存中供往返播放复用"""
+    def __init__(self, reader, frame_num):
+        self.reader = reader
+        self.frame_num = frame_num
+        self.frames = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.frame_num
+
+    def __getitem__(self, idx):
+        # 后处理线程会并发访问，解码部分需要加锁
+        if idx >= len(self.frames):
+            with self.lock:
+                while len(self.frames) <= idx:
+                    self.frames.append(next(self.reader))
+        return self.frames[idx]
 
 
 class Wav2Lipv2():
     def __init__(self, checkpoint_path = 'checkpoints/wav2lipv2.pth',pretrained_model_dir = 'checkpoints/weights', 
-                    pads = [0, 0, 0, 0], audio_smooth = True, rotate = False):
+                    pads = [0, 0, 0, 0], audio_smooth = True, rotate = False, avatar_dir = 'results/avatars/wav2lipv2',
+                    paste_workers = 2, face_det_batch_size = 8, codec = 'libx264', preset = 'veryfast', crf = 18):
 
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.face_det = YOLO(f'{pretrained_model_dir}/yolov8n-face/yolov8n-face.pt')
-
-        lmk_net = FacialLandmarkDetector(f'{pretrained_model_dir}/wflw/hrnet18_256x256_p1/')
-        lmk_net = lmk_net.to(self.device)
-        self.lmk_net = lmk_net.eval()
+        # YOLOv8-face 与 HRNet 由进程内共享的人脸分析服务加载，结果按帧哈希缓存
+        self.face_analysis = get_face_analysis()
+        self.face_det_weights = f'{pretrained_model_dir}/yolov8n-face/yolov8n-face.pt'
+        self.lmk_model_dir = f'{pretrained_model_dir}/wflw/hrnet18_256x256_p1/'
+        self.face_det_batch_size = face_det_batch_size
 
         self.pads = pads
+        # 贴回原图与编码的工作线程数
+        self.paste_workers = paste_workers
+        # 预处理后的形象包保存目录，按素材哈希区分
+        self.avatar_dir = avatar_dir
+        # 输出视频直接由 ffmpeg 管道编码
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
 
         self.checkpoint_path = checkpoint_path
         
@@ -113,103 +137,160 @@ class Wav2Lipv2():
         rightmouth = (landmark[82, :] + landmark[92, :]) / 2
         return (lefteye, righteye, nose, leftmouth, rightmouth)
 
-    @torch.no_grad()
     def detect_face(self, face_img):
-        boxes = self.face_det(face_img,
-                              imgsz=640,
-                              conf=0.01,
-                              iou=0.5,
-                              half=True,
-                              augment=False,
-                              device=self.device)[0].boxes
-        bboxes = boxes.xyxy.cpu().numpy()
-        return bboxes
+        return self.face_analysis.detect_yolo([face_img], self.face_det_weights)[0][:, :4]
 
-    @torch.no_grad()
     def detect_lmk(self, image, bbox=None):
         if isinstance(bbox, list):
             bbox = np.array(bbox)
-        img_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        bbox_tensor = torch.from_numpy(bbox[:, :4])
-        landmark = self.lmk_net(img_pil, bbox=bbox_tensor, device=self.device).cpu().numpy()
-        return landmark
-
-    def prepare_batch(self, img_batch, mel_batch, img_size):
-        img_size_h, img_size_w = img_size
-        img_batch, mel_batch = np.asarray(img_batch), np.asarray(mel_batch)
-
-        img_batch = img_batch / 255.
-
-        img_masked = img_batch.copy()
-        img_masked[:, img_size_h // 2:] = 0
-
-        img_batch = np.concatenate((img_masked, img_batch), axis=3)
-        # (B, 80, 16) -> (B, 80, 16, 1)
-        mel_batch = np.reshape(mel_batch, [len(mel_batch), mel_batch.shape[1], mel_batch.shape[2], 1])
-        return img_batch, mel_batch
+        return np.asarray(self.face_analysis.landmarks_hrnet([image] * len(bbox), bbox, self.lmk_model_dir))
+
+    def prepare_batch(self, face_batch, img_batch):
+        """
+        face_batch: (B, H, W, 3) uint8 人脸图
+        img_batch: 预分配的 (B, 6, H, W) float32 缓冲，原地写入 [下半遮挡图, 原图]
+        """
+        img_size_h = face_batch.shape[1]
+        np.divide(face_batch.transpose(0, 3, 1, 2), 255., out=img_batch[:, 3:], casting='unsafe')
+        img_batch[:, :3] = img_batch[:, 3:]
+        img_batch[:, :3, img_size_h // 2:] = 0
+        return img_batch
+
+    def read_frames(self, video_path, max_frame_num=-1):
+        end = 1 if self.static else (max_frame_num if max_frame_num > 0 else None)
+        for frame in VideoReader(video_path, end=end, prefetch=8):
+            if self.resize_factor > 1:
+                frame = cv2.resize(frame, (frame.shape[1] // self.resize_factor, frame.shape[0] // self.resize_factor))
+
+            if self.rotate:
+                frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+
+            y1, y2, x1, x2 = self.crop
+            if x2 == -1: x2 = frame.shape[1]
+            if y2 == -1: y2 = frame.shape[0]
+
+            yield frame[y1:y2, x1:x2]
+
+    def avatar_key(self, video_path, fps):
+        """素材内容哈希 + fps 及预处理参数，作为形象包的缓存键"""
+        digest = hashlib.sha1()
+        with open(video_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        params = (round(float(fps), 3), self.resize_factor, self.rotate, tuple(self.crop), tuple(self.pads),
+                  tuple(self.img_size), self.static)
+        digest.update(repr(params).encode('utf-8'))
+        return digest.hexdigest()
 
     def build_avatar(self, video_path, fps, max_frame_num=-1):
-        full_frames = []
-        if video_path.split('.')[1] in ['jpg', 'png', 'jpeg']:
-            full_frames = [cv2.imread(video_path)]
+        """
+        准备数字人形象：每帧的仿射矩阵、坐标与256x256人脸图。
+        结果按素材哈希保存在 avatar_dir 下，同一形象再次推理时跳过全部检测；
+        原始帧不保存，推理时从源视频按需解码。
+        """
+        key = self.avatar_key(video_path, fps)
+        avatar = self.load_avatar(key)
+        if avatar is not None and (avatar['complete'] or 0 < max_frame_num <= avatar['frame_num']):
+            print("Using prepared avatar {} ({} frames)".format(key[:8], avatar['frame_num']))
         else:
-            video_stream = cv2.VideoCapture(video_path)
-            print("fps={}".format(fps))
-            print('Reading video frames...')
-
-            while 1:
-                still_reading, frame = video_stream.read()
-                if not still_reading:
-                    video_stream.release()
-                    break
-                if self.resize_factor > 1:
-                    frame = cv2.resize(frame, (frame.shape[1] // self.resize_factor, frame.shape[0] // self.resize_factor))
-
-                if self.rotate:
-                    frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-
-                y1, y2, x1, x2 = self.crop
-                if x2 == -1: x2 = frame.shape[1]
-                if y2 == -1: y2 = frame.shape[0]
-
-                frame = frame[y1:y2, x1:x2]
-
-                full_frames.append(frame)
-
-                if max_frame_num > 0 and len(full_frames) >= max_frame_num or self.static:
-                    video_stream.release()
-                    break
-
-        print("Number of frames available for inference: " + str(len(full_frames)))
+            avatar = self.prepare_avatar(video_path, fps, max_frame_num, cached=avatar)
+            self.save_avatar(key, avatar)
+        print("Number of frames available for inference: " + str(avatar['frame_num']))
+        avatar['frames'] = LazyFrames(self.read_frames(video_path), avatar['frame_num'])
+        return avatar
 
+    @instrument
+    def prepare_avatar(self, video_path, fps, max_frame_num=-1, cached=None):
+        # 平滑是因果的：已缓存的前缀帧无需重算，恢复平滑器状态后只处理新增帧
+        start = cached['frame_num'] if cached is not None else 0
         self.kpts_smoother = laplacianSmooth()
         self.abox_smoother = laplacianSmooth()
+        if cached is not None:
+            self.kpts_smoother.pts_last = cached['kpts_last'].copy()
+            self.abox_smoother.pts_last = cached['abox_last'].copy()
+            print("Extending prepared avatar from {} frames".format(start))
+        print("fps={}".format(fps))
+        print('Reading video frames...')
+
+        faces, coords, ms, inv_ms, align_sizes = [], [], [], [], []
+        frame_num, frame_h, frame_w = 0, 0, 0
+        reader = enumerate(self.read_frames(video_path, max_frame_num))
+        with tqdm() as pbar:
+            while 1:
+                chunk = list(itertools.islice(reader, self.face_det_batch_size))
+                if not chunk:
+                    break
+                # 原始帧先整批检测人脸，结果留在人脸分析服务的缓存中，get_input_imginfo 直接命中
+                todo = [frame for frame_id, frame in chunk if frame_id >= start]
+                if todo:
+                    self.face_analysis.detect_yolo(todo, self.face_det_weights)
+                for frame_id, frame in chunk:
+                    frame_num = frame_id + 1
+                    frame_h, frame_w = frame.shape[:2]
+                    if frame_id < start:
+                        continue
+                    imginfo = self.get_input_imginfo(frame.copy())
+                    faces.append(imginfo['img'])
+                    coords.append(imginfo['coords'])
+                    ms.append(imginfo['m'])
+                    inv_ms.append(imginfo['inv_m'])
+                    align_h, align_w = imginfo['align_frame'].shape[:2]
+                    align_sizes.append((align_w, align_h))
+                pbar.update(len(chunk))
 
-        frame_info_list = []
-        print("-------          1")
-        #batch_size = 32
-        #for batch in tqdm(range(0, len(full_frames), batch_size)):
-            #batch_frames = full_frames[batch:batch + batch_size]
-            #batch_frame_info_list = []
-            #for frame in batch_frames:
-                #imginfo = self.get_input_imginfo(frame.copy())
-                #batch_frame_info_list.append(imginfo)
-            #frame_info_list.extend(batch_frame_info_list)
-        for frame_id in tqdm(range(len(full_frames))):
-            imginfo = self.get_input_imginfo(full_frames[frame_id].copy())
-            frame_info_list.append(imginfo)
-        print("-------          2")
-        self.kpts_smoother = None
-        self.abox_smoother = None
-
-        frame_h, frame_w = full_frames[0].shape[:2]
         avatar = {
             'fps': fps,
-            'frame_num': len(full_frames),
+            'frame_num': frame_num,
             'frame_h': frame_h,
             'frame_w': frame_w,
-            'frame_info_list': frame_info_list
+            'complete': self.static or max_frame_num <= 0 or frame_num < max_frame_num,
+            'faces': np.asarray(faces, dtype=np.uint8).reshape(-1, self.img_size[1], self.img_size[0], 3),
+            'coords': np.asarray(coords, dtype=np.int32).reshape(-1, 4),
+            'm': np.asarray(ms, dtype=np.float64).reshape(-1, 2, 3),
+            'inv_m': np.asarray(inv_ms, dtype=np.float64).reshape(-1, 2, 3),
+            'align_size': np.asarray(align_sizes, dtype=np.int32).reshape(-1, 2),
+            'kpts_last': self.kpts_smoother.pts_last,
+            'abox_last': self.abox_smoother.pts_last,
         }
+        if cached is not None:
+            for k in ['faces', 'coords', 'm', 'inv_m', 'align_size']:
+                avatar[k] = np.concatenate([cached[k], avatar[k]], axis=0)
+            if start == frame_num:
+                # 没有新增帧（视频已读完），沿用缓存的平滑器状态
+                avatar['kpts_last'], avatar['abox_last'] = cached['kpts_last'], cached['abox_last']
+        self.kpts_smoother = None
+        self.abox_smoother = None
+        return avatar
+
+    def save_avatar(self, key, avatar):
+        avatar_path = os.path.join(self.avatar_dir, key)
+        tmp_path = avatar_path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, 'faces.npy'), avatar['faces'])
+        np.savez(os.path.join(tmp_path, 'avatar.npz'), coords=avatar['coords'], m=avatar['m'], inv_m=avatar['inv_m'],
+                 align_size=avatar['align_size'], kpts_last=avatar['kpts_last'], abox_last=avatar['abox_last'])
+        meta = {k: avatar[k] for k in ['fps', 'frame_num', 'frame_h', 'frame_w', 'complete']}
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        shutil.rmtree(avatar_path, ignore_errors=True)
+        os.replace(tmp_path, avatar_path)
+        # 写入后改为 mmap 读取，避免同时持有两份人脸图
+        avatar['faces'] = np.load(os.path.join(avatar_path, 'faces.npy'), mmap_mode='r')
+
+    def load_avatar(self, key):
+        avatar_path = os.path.join(self.avatar_dir, key)
+        if not os.path.exists(os.path.join(avatar_path, 'meta.json')):
+            return None
+        try:
+            with open(os.path.join(avatar_path, 'meta.json')) as f:
+                avatar = json.load(f)
+            avatar['faces'] = np.load(os.path.join(avatar_path, 'faces.npy'), mmap_mode='r')
+            with np.load(os.path.join(avatar_path, 'avatar.npz')) as data:
+                avatar.update({k: data[k] for k in data.files})
+        except (OSError, ValueError) as e:
+            print("Failed to load prepared avatar {}: {}".format(key[:8], e))
+            return None
         return avatar
 
     @torch.no_grad()
@@ -264,54 +345,120 @@ class Wav2Lipv2():
             'inv_m': inv_m,
         }
 
-    def get_input_imginfo_by_index(self, idx, avatar):
-        return avatar['frame_info_list'][idx]
+    @staticmethod
+    def frame_indices(indices, frame_num):
+        # 视频为正序，倒序，正序，倒序，循环
+        idx = indices % frame_num
+        return np.where(indices // frame_num % 2 == 0, idx, frame_num - idx - 1)
 
-    def get_input_mel_by_index(self, index, wav_mel):
-        # 处理音频
+    def mel_starts(self, indices, wav_mel):
         T = 5
         mel_idx_multiplier = 80. / self.fps  # 一帧图像对应3.2帧音频
-        start_idx = int((index - (T - 1) // 2) * mel_idx_multiplier)
-        if start_idx < 0:
-            start_idx = 0
-        if start_idx + self.mel_step_size > len(wav_mel[0]):
-            start_idx = len(wav_mel[0]) - self.mel_step_size
-        mel = wav_mel[:, start_idx: start_idx + self.mel_step_size]
-        return mel
-
-    def get_intput_by_index(self, index, wav_mel, avatar):
-        mel = self.get_input_mel_by_index(index, wav_mel)
-
-        # 处理图片，视频为正序，倒序，正序，倒序，循环
-        frame_num = avatar['frame_num']
-        idx = index % frame_num
-        idx = idx if index // frame_num % 2 == 0 else frame_num - idx - 1
-
-        input_dict = {'mel': mel}
-        input_imginfo = self.get_input_imginfo_by_index(idx, avatar)
-        input_dict.update(copy.deepcopy(input_imginfo))
-        return input_dict
+        start_idx = np.trunc((indices - (T - 1) // 2) * mel_idx_multiplier).astype(np.int64)
+        start_idx = np.maximum(start_idx, 0)
+        return np.where(start_idx + self.mel_step_size > wav_mel.shape[1], wav_mel.shape[1] - self.mel_step_size, start_idx)
+
+    def gather_mels(self, start_idx, wav_mel):
+        # (80, T) -> (B, 1, 80, mel_step_size)，一次索引取出整个batch的音频窗口
+        mel_idx = start_idx[:, None] + np.arange(self.mel_step_size)
+        return np.ascontiguousarray(wav_mel[:, mel_idx].transpose(1, 0, 2)[:, None], dtype=np.float32)
+
+    def paste_back(self, pred, idx, avatar, out_frame, align_buffers):
+        """把预测的人脸贴回对齐图，再反变换写入复用的输出帧缓冲"""
+        frame = avatar['frames'][idx]
+        align_w, align_h = avatar['align_size'][idx]
+        align_frame = align_buffers.get((align_w, align_h))
+        if align_frame is None:
+            align_frame = align_buffers[(align_w, align_h)] = np.empty((align_h, align_w, 3), np.uint8)
+        cv2.warpAffine(frame, avatar['m'][idx], (int(align_w), int(align_h)), dst=align_frame, flags=cv2.INTER_CUBIC)
+        y1, y2, x1, x2 = avatar['coords'][idx]
+        align_frame[y1:y2, x1:x2] = cv2.resize(pred, (int(x2 - x1), int(y2 - y1)))
+        np.copyto(out_frame, frame)
+        return img_warp_back_inv_m_roi(align_frame, out_frame, avatar['inv_m'][idx])
+
+    @instrument
+    def render(self, avatar, wav_mel, gen_frame_num, batch_size, writer):
+        """
+        按batch推理并贴回原图，按顺序写入 writer，返回纯模型耗时。
+        人脸图、归一化输入与输出帧均使用预分配缓冲，不再对每帧做深拷贝；
+        贴回与编码由 FramePipeline 的工作线程完成，与下一个batch的推理重叠。
+        """
+        img_h, img_w = self.img_size
+        face_batch = np.empty((batch_size, img_h, img_w, 3), np.uint8)
+        img_batch = np.empty((batch_size, 6, img_h, img_w), np.float32)
+
+        # 每个工作线程各自持有对齐图缓冲
+        local = threading.local()
+        def paste(item, out_frame):
+            if not hasattr(local, 'align_buffers'):
+                local.align_buffers = {}
+            p, i = item
+            return self.paste_back(p, i, avatar, out_frame, local.align_buffers)
+        pipeline = FramePipeline(writer, paste, num_workers=self.paste_workers, max_queue=max(2 * batch_size, 8),
+                                 frame_shape=(avatar['frame_h'], avatar['frame_w'], 3))
+
+        frame_idx = self.frame_indices(np.arange(gen_frame_num), avatar['frame_num'])
+        mel_start = self.mel_starts(np.arange(gen_frame_num), wav_mel)
+        pure_model_time = 0.0
+
+        # 推理出错时也会结束编码线程与线程池
+        with pipeline:
+            for b0 in tqdm(range(0, gen_frame_num, batch_size)):
+                b1 = min(b0 + batch_size, gen_frame_num)
+                infer_size = b1 - b0
+                idx = frame_idx[b0:b1]
+                np.take(avatar['faces'], idx, axis=0, out=face_batch[:infer_size])
+                self.prepare_batch(face_batch[:infer_size], img_batch[:infer_size])
+                if self.audio_smooth:
+                    # 前后各多取一帧音频用于平滑
+                    mel_ids = np.concatenate([[max(0, b0 - 1)], np.arange(b0, b1), [min(b1, gen_frame_num - 1)]])
+                else:
+                    mel_ids = np.arange(b0, b1)
+                mel_batch = self.gather_mels(mel_start[mel_ids], wav_mel)
+
+                # pytorch 推理
+                start_model = time.time()
+                img_tensor = torch.from_numpy(img_batch[:infer_size]).to(device)
+                mel_tensor = torch.from_numpy(mel_batch).to(device)
+                with torch.no_grad():
+                    if self.audio_smooth:
+                        audio_embedding = self.model.audio_forward(mel_tensor, a_alpha=self.a_alpha)
+                        audio_embedding = 0.2 * audio_embedding[:-2] + 0.6 * audio_embedding[1:-1] + 0.2 * audio_embedding[2:]
+                        pred = self.model.inference(audio_embedding, img_tensor)
+                    else:
+                        pred = self.model(mel_tensor, img_tensor, a_alpha=self.a_alpha)
+                pred = (pred.detach().cpu().numpy().transpose(0, 2, 3, 1) * 255.).astype(np.uint8)
+                pure_model_time += time.time() - start_model
+                pipeline.record('model', time.time() - start_model, infer_size)
+
+                for p, i in zip(pred, idx):
+                    pipeline.submit((p, i))
+
+            pipeline.close()
+        return pure_model_time
 
+    @instrument
     def run(self, video_path, audio_path, batch_size = 4, enhance = False, outfile=None, fps = 25):
         if outfile is None:
             key = str(uuid.uuid4().hex)
             outfile = ("results/result_voice_{}.mp4".format(key))
 
 
-        fps = fps if video_path.split('.')[1] in ['jpg', 'png', 'jpeg'] else get_video_fps(video_path)
+        fps = fps if is_image(video_path) else get_video_fps(video_path)
         self.fps = fps
 
-        temp_audio_file = tempfile.NamedTemporaryFile(suffix=".wav")
-        temp_audio_file.name = "tempface.wav"
-        if not audio_path.endswith('.wav'):
-            print('Extracting raw audio...')
-            command = 'ffmpeg -y -i {} -strict -2 {}'.format(audio_path, temp_audio_file.name)
-            subprocess.call(command, shell=True)
-            wav_path = temp_audio_file.name
+        temp_wav = None
+        if isinstance(audio_path, AudioClip):
+            # 内存中的TTS结果：直接取16k波形，文件只用于最后的音视频合成
+            wav = audio.load_wav(audio_path, 16000)
+            wav_path = audio_path.to_file()
         else:
-            wav_path = audio_path
-
-        wav = audio.load_wav(wav_path, 16000)
+            if not audio_path.endswith('.wav'):
+                print('Extracting raw audio...')
+                temp_wav = wav_path = extract_audio(audio_path, unique_video_path('temp', 'audio', '.wav'))
+            else:
+                wav_path = audio_path
+            wav = audio.load_wav(wav_path, 16000)
         wav_mel = audio.melspectrogram(wav)
         mel_idx_multiplier = 80. / fps
         gen_frame_num = int(len(wav_mel[0]) / mel_idx_multiplier)
@@ -319,102 +466,36 @@ class Wav2Lipv2():
         avatar = self.build_avatar(video_path, fps, max_frame_num=gen_frame_num)
         torch.cuda.empty_cache()
 
-        img_size = self.img_size
-
         frame_h, frame_w = avatar['frame_h'], avatar['frame_w']
 
-        temp_face_file = tempfile.NamedTemporaryFile(suffix=".mp4")
-        temp_face_file.name = "tempface.mp4"
-        out = cv2.VideoWriter(temp_face_file.name, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_w, frame_h))
-
-        batch_data = defaultdict(list)
-
-        start_infer = time.time()
-        pure_model_time = 0.0
-
-        for i in tqdm(range(gen_frame_num)):
-            input_data = self.get_intput_by_index(i, wav_mel, avatar)
-            # 组batch
-            for k, v in input_data.items():
-                batch_data[k + '_batch'].append(v)
-
-            if len(batch_data.get('mel_batch')) == batch_size or i == gen_frame_num - 1:
-                infer_size = len(batch_data['mel_batch'])
-
-                img_batch = batch_data['img_batch']
-                mel_batch = batch_data['mel_batch']
-                frames = batch_data['frame_batch']
-                coords = batch_data['coords_batch']
-                align_frames = batch_data['align_frame_batch']
-                ms = batch_data['m_batch']
-                inv_ms = batch_data['inv_m_batch']
-
-                if self.audio_smooth:
-                    mel_batch.insert(0, self.get_input_mel_by_index(max(0, i - infer_size), wav_mel))
-                    mel_batch.append(self.get_input_mel_by_index(min(i + 1, gen_frame_num - 1), wav_mel))
-
-                img_batch, mel_batch = self.prepare_batch(img_batch, mel_batch, img_size)
-
-                # pytorch 推理
-                start_model = time.time()
-                img_batch = torch.FloatTensor(np.transpose(img_batch, (0, 3, 1, 2))).to(device)
-                mel_batch = torch.FloatTensor(np.transpose(mel_batch, (0, 3, 1, 2))).to(device)
-                with torch.no_grad():
-                    if self.audio_smooth:
-                        audio_embedding = self.model.audio_forward(mel_batch, a_alpha=1.25)
-                        audio_embedding = 0.2 * audio_embedding[:-2] + 0.6 * audio_embedding[1:-1] + 0.2 * audio_embedding[2:]
-                        pred = self.model.inference(audio_embedding, img_batch)
-                    else:
-                        pred = self.model(mel_batch, img_batch, a_alpha=1.25)
-                pred = pred.detach().cpu().numpy().transpose(0, 2, 3, 1) * 255.
-
-                end_model = time.time()
-                pure_model_time += (end_model - start_model)
-
-                for p, f, c, af, inv_m in zip(pred, frames, coords, align_frames, inv_ms):
-                    y1, y2, x1, x2 = c
-                    p = cv2.resize(p.astype(np.uint8), (x2 - x1, y2 - y1))
-                    af[y1:y2, x1:x2] = p      
-                    f = img_warp_back_inv_m(af, f, inv_m)
-                    out.write(f)
-
-                batch_data.clear()
-
-        end_infer = time.time()
-        latency_per_frame = (end_infer - start_infer) * 1000 / gen_frame_num
-        latency_model = pure_model_time * 1000 / gen_frame_num
-        print(f"每一帧延迟: {latency_per_frame:.3f} ms")
-        print(f"每一帧延迟，纯模型: {latency_model:.3f} ms")
-
-        out.release()
+        # 帧经管道直接编码进最终文件并同时混入音频，不再写中间视频后二次编码
+        scale = 1
         if enhance:
-            import imageio
-            from src.utils.face_enhancer import enhancer_generator_with_len, enhancer_list
-            enhancer = 'gfpgan'
-            background_enhancer = None
-            video_save_dir = 'results'
-            video_name_enhance = 'res_enhanced.mp4'
-            enhanced_path = os.path.join(video_save_dir, 'temp_'+video_name_enhance)
-            av_path_enhancer = os.path.join(video_save_dir, video_name_enhance) 
-            return_path = av_path_enhancer
-            full_video_path = temp_face_file.name
-            try:
-                enhanced_images_gen_with_len = enhancer_generator_with_len(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(self.fps))
-            except:
-                enhanced_images_gen_with_len = enhancer_list(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(self.fps))
-            command = 'ffmpeg -y -i "{}" -i "{}" -strict -2 -q:v 1 "{}"'.format(wav_path, enhanced_path, outfile)
-            subprocess.call(command, shell=platform.system() != 'Windows')
-        else:
-            command = 'ffmpeg -y -i "{}" -i "{}" -strict -2 -q:v 1 "{}"'.format(wav_path, temp_face_file.name, outfile)
-            subprocess.call(command, shell=platform.system() != 'Windows')
-
-        temp_face_file.close()
-        temp_audio_file.close()
+            from src.utils.face_enhancer import get_face_enhancer
+            enhancer = get_face_enhancer(method='gfpgan', bg_upsampler=None)
+            scale = enhancer.upscale
+        os.makedirs(os.path.dirname(outfile) or '.', exist_ok=True)
+        out = FFmpegWriter(outfile, fps, (frame_w * scale, frame_h * scale), audio=wav_path,
+                           codec=self.codec, preset=self.preset, crf=self.crf)
+        if enhance:
+            # 贴回后的帧直接攒批送入常驻的 GFPGAN 增强服务，不再写出视频后读回增强
+            out = enhancer.writer(out, batch_size=max(batch_size, 8))
+
+        try:
+            start_infer = time.time()
+            with out:
+                pure_model_time = self.render(avatar, wav_mel, gen_frame_num, batch_size, out)
+
+            end_infer = time.time()
+            latency_per_frame = (end_infer - start_infer) * 1000 / gen_frame_num
+            latency_model = pure_model_time * 1000 / gen_frame_num
+            print(f"每一帧延迟: {latency_per_frame:.3f} ms")
+            print(f"每一帧延迟，纯模型: {latency_model:.3f} ms")
+        finally:
+            if temp_wav is not None and os.path.exists(temp_wav):
+                os.remove(temp_wav)
         return outfile
 
-
     
 if __name__ == '__main__':
     current_dir = './'
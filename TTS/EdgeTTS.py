@@ -2,15 +2,37 @@ import asyncio
 import requests
 import json
 import os
+import re
+import ssl
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
+import aiohttp
 from edge_tts import Communicate, SubMaker
 from io import TextIOWrapper
 from typing import Any, TextIO, Union
 import sys
 sys.path.append('../Linly-Talker')
 from src import cost_time
-from src.cost_time import calculate_time    
+from src.cost_time import instrument    
+from src.utils.audio_clip import AudioClip
 os.environ["GRADIO_TEMP_DIR"]= './temp'
 
+try:
+    # edge-tts>=6.1.18 需要携带 Sec-MS-GEC 令牌才能连接服务
+    from edge_tts.drm import DRM
+    from edge_tts.constants import SEC_MS_GEC_VERSION
+except ImportError:
+    DRM = None
+    SEC_MS_GEC_VERSION = None
+
+try:
+    import certifi
+except ImportError:
+    certifi = None
+
 """
 Constants for the Edge TTS project. 
 https://github.com/rany2/edge-tts/blob/master/src/edge_tts/constants.py
@@ -24,6 +46,102 @@ VOICE_LIST = f"https://{BASE_URL}/voices/list?trustedclienttoken={TRUSTED_CLIENT
 
 DEFAULT_VOICE = "en-US-EmmaMultilingualNeural"
 
+WSS_HEADERS = {
+    "Pragma": "no-cache",
+    "Cache-Control": "no-cache",
+    "Origin": "chrome-extension://jdiccldimpdaibmpdkjnbmckianbfold",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.77 Safari/537.36 Edg/91.0.864.41",
+}
+
+# 语音列表磁盘缓存，过期后在后台刷新
+VOICE_CACHE_PATH = os.environ.get(
+    "EDGE_TTS_VOICE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "linly_talker", "edge_tts_voices.json"),
+)
+VOICE_CACHE_TTL = 7 * 24 * 3600
+
+SUPPORTED_VOICE_FALLBACK = ['zu-ZA-ThembaNeural', 'zu-ZA-ThandoNeural',  'zh-TW-YunJheNeural', 'zh-TW-HsiaoYuNeural', 'zh-TW-HsiaoChenNeural', 'zh-HK-WanLungNeural', 
+                           'zh-HK-HiuMaanNeural', 'zh-HK-HiuGaaiNeural', 'zh-CN-shaanxi-XiaoniNeural', 'zh-CN-liaoning-XiaobeiNeural', 
+                           'zh-CN-YunyangNeural', 'zh-CN-YunxiaNeural', 'zh-CN-YunxiNeural', 'zh-CN-YunjianNeural', 
+                           'zh-CN-XiaoyiNeural', 'zh-CN-XiaoxiaoNeural', 'vi-VN-NamMinhNeural', 'vi-VN-HoaiMyNeural', 
+                           'uz-UZ-SardorNeural', 'uz-UZ-MadinaNeural', 'ur-PK-UzmaNeural', 'ur-PK-AsadNeural', 
+                           'ur-IN-SalmanNeural', 'ur-IN-GulNeural', 'uk-UA-PolinaNeural', 'uk-UA-OstapNeural', 
+                           'tr-TR-EmelNeural', 'tr-TR-AhmetNeural', 'th-TH-PremwadeeNeural', 'th-TH-NiwatNeural', 
+                           'te-IN-ShrutiNeural', 'te-IN-MohanNeural', 'ta-SG-VenbaNeural', 'ta-SG-AnbuNeural', 
+                           'ta-MY-SuryaNeural', 'ta-MY-KaniNeural', 'ta-LK-SaranyaNeural', 'ta-LK-KumarNeural', 
+                           'ta-IN-ValluvarNeural', 'ta-IN-PallaviNeural', 'sw-TZ-RehemaNeural', 'sw-TZ-DaudiNeural', 
+                           'sw-KE-ZuriNeural', 'sw-KE-RafikiNeural', 'sv-SE-SofieNeural', 'sv-SE-MattiasNeural', 
+                           'su-ID-TutiNeural', 'su-ID-JajangNeural', 'sr-RS-SophieNeural', 'sr-RS-NicholasNeural', 'sq-AL-IlirNeural', 'sq-AL-AnilaNeural', 
+                           'so-SO-UbaxNeural', 'so-SO-MuuseNeural', 'sl-SI-RokNeural', 'sl-SI-PetraNeural', 
+                           'sk-SK-ViktoriaNeural', 'sk-SK-LukasNeural', 'si-LK-ThiliniNeural', 'si-LK-SameeraNeural', 
+                           'ru-RU-SvetlanaNeural', 'ru-RU-DmitryNeural', 'ro-RO-EmilNeural', 'ro-RO-AlinaNeural', 'pt-PT-RaquelNeural', 'pt-PT-DuarteNeural', 'pt-BR-ThalitaNeural', 'pt-BR-FranciscaNeural', 
+                           'pt-BR-AntonioNeural', 'ps-AF-LatifaNeural', 'ps-AF-GulNawazNeural', 'pl-PL-ZofiaNeural', 
+                           'pl-PL-MarekNeural', 'nl-NL-MaartenNeural', 'nl-NL-FennaNeural', 'nl-NL-ColetteNeural', 
+                           'nl-BE-DenaNeural', 'nl-BE-ArnaudNeural', 'ne-NP-SagarNeural', 'ne-NP-HemkalaNeural', 
+                           'nb-NO-PernilleNeural', 'nb-NO-FinnNeural', 'my-MM-ThihaNeural', 'my-MM-NilarNeural', 
+                           'mt-MT-JosephNeural', 'mt-MT-GraceNeural', 'ms-MY-YasminNeural', 'ms-MY-OsmanNeural', 
+                           'mr-IN-ManoharNeural', 'mr-IN-AarohiNeural', 'mn-MN-YesuiNeural', 'mn-MN-BataaNeural', 
+                           'ml-IN-SobhanaNeural', 'ml-IN-MidhunNeural', 'mk-MK-MarijaNeural', 'mk-MK-AleksandarNeural', 
+                           'lv-LV-NilsNeural', 'lv-LV-EveritaNeural', 'lt-LT-OnaNeural', 'lt-LT-LeonasNeural', 'lo-LA-KeomanyNeural', 'lo-LA-ChanthavongNeural', 
+                           'ko-KR-SunHiNeural', 'ko-KR-InJoonNeural', 'ko-KR-HyunsuNeural', 'kn-IN-SapnaNeural', 
+                           'kn-IN-GaganNeural', 'km-KH-SreymomNeural', 'km-KH-PisethNeural', 'kk-KZ-DauletNeural', 
+                           'kk-KZ-AigulNeural', 'ka-GE-GiorgiNeural', 'ka-GE-EkaNeural', 'jv-ID-SitiNeural', 'jv-ID-DimasNeural', 
+                           'ja-JP-NanamiNeural', 'ja-JP-KeitaNeural', 'it-IT-IsabellaNeural', 'it-IT-GiuseppeNeural', 'it-IT-ElsaNeural', 
+                           'it-IT-DiegoNeural', 'is-IS-GunnarNeural', 'is-IS-GudrunNeural', 'id-ID-GadisNeural', 'id-ID-ArdiNeural', 
+                           'hu-HU-TamasNeural', 'hu-HU-NoemiNeural', 'hr-HR-SreckoNeural', 'hr-HR-GabrijelaNeural', 'hi-IN-SwaraNeural', 
+                           'hi-IN-MadhurNeural', 'he-IL-HilaNeural', 'he-IL-AvriNeural', 'gu-IN-NiranjanNeural', 'gu-IN-DhwaniNeural', 
+                           'gl-ES-SabelaNeural', 'gl-ES-RoiNeural', 'ga-IE-OrlaNeural', 'ga-IE-ColmNeural', 'fr-FR-VivienneMultilingualNeural', 
+                           'fr-FR-RemyMultilingualNeural', 'fr-FR-HenriNeural', 'fr-FR-EloiseNeural', 'fr-FR-DeniseNeural', 'fr-CH-FabriceNeural', 
+                           'fr-CH-ArianeNeural', 'fr-CA-ThierryNeural', 'fr-CA-SylvieNeural', 'fr-CA-JeanNeural', 'fr-CA-AntoineNeural', 
+                           'fr-BE-GerardNeural', 'fr-BE-CharlineNeural', 'fil-PH-BlessicaNeural', 'fil-PH-AngeloNeural', 'fi-FI-NooraNeural', 
+                           'fi-FI-HarriNeural', 'fa-IR-FaridNeural', 'fa-IR-DilaraNeural', 'et-EE-KertNeural', 'et-EE-AnuNeural', 
+                           'es-VE-SebastianNeural', 'es-VE-PaolaNeural', 'es-UY-ValentinaNeural', 'es-UY-MateoNeural', 'es-US-PalomaNeural', 
+                           'es-US-AlonsoNeural', 'es-SV-RodrigoNeural', 'es-SV-LorenaNeural', 'es-PY-TaniaNeural', 'es-PY-MarioNeural', 
+                           'es-PR-VictorNeural', 'es-PR-KarinaNeural', 'es-PE-CamilaNeural', 'es-PE-AlexNeural', 'es-PA-RobertoNeural', 
+                           'es-PA-MargaritaNeural', 'es-NI-YolandaNeural', 'es-NI-FedericoNeural', 'es-MX-JorgeNeural', 'es-MX-DaliaNeural', 
+                           'es-HN-KarlaNeural', 'es-HN-CarlosNeural', 'es-GT-MartaNeural', 'es-GT-AndresNeural', 'es-GQ-TeresaNeural', 
+                           'es-GQ-JavierNeural', 'es-ES-XimenaNeural', 'es-ES-ElviraNeural', 'es-ES-AlvaroNeural', 'es-EC-LuisNeural', 
+                           'es-EC-AndreaNeural', 'es-DO-RamonaNeural', 'es-DO-EmilioNeural', 'es-CU-ManuelNeural', 'es-CU-BelkysNeural', 
+                           'es-CR-MariaNeural', 'es-CR-JuanNeural', 'es-CO-SalomeNeural', 'es-CO-GonzaloNeural', 'es-CL-LorenzoNeural', 
+                           'es-CL-CatalinaNeural', 'es-BO-SofiaNeural', 'es-BO-MarceloNeural', 'es-AR-TomasNeural', 'es-AR-ElenaNeural', 
+                           'en-ZA-LukeNeural', 'en-ZA-LeahNeural', 'en-US-SteffanNeural', 'en-US-RogerNeural', 'en-US-MichelleNeural', 
+                           'en-US-JennyNeural', 'en-US-GuyNeural', 'en-US-EricNeural', 'en-US-EmmaNeural', 'en-US-ChristopherNeural', 
+                           'en-US-BrianNeural', 'en-US-AvaNeural', 'en-US-AriaNeural', 'en-US-AndrewNeural', 'en-US-AnaNeural', 
+                           'en-TZ-ImaniNeural', 'en-TZ-ElimuNeural', 'en-SG-WayneNeural', 'en-SG-LunaNeural', 'en-PH-RosaNeural', 
+                           'en-PH-JamesNeural', 'en-NZ-MollyNeural', 'en-NZ-MitchellNeural', 'en-NG-EzinneNeural', 
+                           'en-NG-AbeoNeural', 'en-KE-ChilembaNeural', 'en-KE-AsiliaNeural', 'en-IN-PrabhatNeural', 
+                           'en-IN-NeerjaNeural', 'en-IN-NeerjaExpressiveNeural', 'en-IE-EmilyNeural', 'en-IE-ConnorNeural', 
+                           'en-HK-YanNeural', 'en-HK-SamNeural', 'en-GB-ThomasNeural', 'en-GB-SoniaNeural', 'en-GB-RyanNeural', 
+                           'en-GB-MaisieNeural', 'en-GB-LibbyNeural', 'en-CA-LiamNeural', 'en-CA-ClaraNeural', 'en-AU-WilliamNeural', 
+                           'en-AU-NatashaNeural', 'el-GR-NestorasNeural', 'el-GR-AthinaNeural', 'de-DE-SeraphinaMultilingualNeural', 
+                           'de-DE-KillianNeural', 'de-DE-KatjaNeural', 'de-DE-FlorianMultilingualNeural', 'de-DE-ConradNeural', 
+                           'de-DE-AmalaNeural', 'de-CH-LeniNeural', 'de-CH-JanNeural', 'de-AT-JonasNeural', 'de-AT-IngridNeural', 
+                           'da-DK-JeppeNeural', 'da-DK-ChristelNeural', 'cy-GB-NiaNeural', 'cy-GB-AledNeural', 'cs-CZ-VlastaNeural',
+                           'cs-CZ-AntoninNeural', 'ca-ES-JoanaNeural', 'ca-ES-EnricNeural', 'bs-BA-VesnaNeural', 'bs-BA-GoranNeural', 
+                           'bn-IN-TanishaaNeural', 'bn-IN-BashkarNeural', 'bn-BD-PradeepNeural', 'bn-BD-NabanitaNeural', 'bg-BG-KalinaNeural', 
+                           'bg-BG-BorislavNeural', 'az-AZ-BanuNeural', 'az-AZ-BabekNeural', 'ar-YE-SalehNeural', 'ar-YE-MaryamNeural', 
+                           'ar-TN-ReemNeural', 'ar-TN-HediNeural', 'ar-SY-LaithNeural', 'ar-SY-AmanyNeural', 'ar-SA-ZariyahNeural', 
+                           'ar-SA-HamedNeural', 'ar-QA-MoazNeural', 'ar-QA-AmalNeural', 'ar-OM-AyshaNeural', 'ar-OM-AbdullahNeural', 
+                           'ar-MA-MounaNeural', 'ar-MA-JamalNeural', 'ar-LY-OmarNeural', 'ar-LY-ImanNeural', 'ar-LB-RamiNeural', 'ar-LB-LaylaNeural', 
+                           'ar-KW-NouraNeural', 'ar-KW-FahedNeural', 'ar-JO-TaimNeural', 'ar-JO-SanaNeural', 'ar-IQ-RanaNeural', 'ar-IQ-BasselNeural', 
+                           'ar-EG-ShakirNeural', 'ar-EG-SalmaNeural', 'ar-DZ-IsmaelNeural', 'ar-DZ-AminaNeural', 'ar-BH-LailaNeural', 'ar-BH-AliNeural', 
+                           'ar-AE-HamdanNeural', 'ar-AE-FatimaNeural', 'am-ET-MekdesNeural', 'am-ET-AmehaNeural', 'af-ZA-WillemNeural', 'af-ZA-AdriNeural']
+
+def drm_params():
+    if DRM is None:
+        return {}
+    return {"Sec-MS-GEC": DRM.generate_sec_ms_gec(), "Sec-MS-GEC-Version": SEC_MS_GEC_VERSION}
+
+def with_query(url, params):
+    """在 url 后追加查询参数，url 本身是否已带查询串均可"""
+    if not params:
+        return url
+    separator = "&" if "?" in url else "?"
+    return url + separator + urlencode(params)
+
 def list_voices_fn(proxy=None):
     """
     List all available voices and their attributes.
@@ -48,91 +166,249 @@ def list_voices_fn(proxy=None):
         "Accept-Encoding": "gzip, deflate, br",
         "Accept-Language": "en-US,en;q=0.9",
     }
-    response = requests.get(VOICE_LIST, headers=headers, timeout=3)
+    proxies = {"http": proxy, "https": proxy} if proxy else None
+    response = requests.get(with_query(VOICE_LIST, drm_params()), headers=headers, proxies=proxies, timeout=3)
     data = json.loads(response.text)
     return data
 
+def load_cached_voices(cache_path=VOICE_CACHE_PATH, ttl=VOICE_CACHE_TTL):
+    """
+    读取磁盘缓存的语音列表。
+
+    Returns:
+        tuple: (voices, fresh)，缓存不存在或损坏时 voices 为 None。
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+        return cache["voices"], time.time() - cache["timestamp"] < ttl
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, False
+
+def save_cached_voices(voices, cache_path=VOICE_CACHE_PATH):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"timestamp": time.time(), "voices": voices}, file)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print("EdgeTTS语音列表缓存写入失败: ", e)
+
+def refresh_voices(proxy=None, cache_path=VOICE_CACHE_PATH):
+    voices = sorted([item['ShortName'] for item in list_voices_fn(proxy=proxy)], reverse=True)
+    save_cached_voices(voices, cache_path)
+    return voices
+
+def remove_incompatible_characters(text):
+    # 服务端不接受部分控制字符（例如OCR文本中常见的垂直制表符）
+    return "".join(" " if (0 <= ord(c) <= 8 or 11 <= ord(c) <= 12 or 14 <= ord(c) <= 31) else c for c in text)
+
+def split_sentences(text, min_chars=20, max_bytes=4096):
+    """
+    按标点切分为句子用于并发合成，过短的句子与相邻句合并，过长的句子按字节数硬切分。
+    """
+    pieces = [p for p in re.split(r'(?<=[。！？；!?;\n])|(?<=\.)\s+', text) if p and p.strip()]
+    sentences = []
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= min_chars:
+            sentences.append(buffer)
+            buffer = ""
+    if buffer.strip():
+        if sentences and len(buffer) < min_chars // 2:
+            sentences[-1] += buffer
+        else:
+            sentences.append(buffer)
+    chunks = []
+    for sentence in sentences:
+        while len(sentence.encode("utf-8")) > max_bytes:
+            cut = len(sentence.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore"))
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:]
+        if sentence.strip():
+            chunks.append(sentence)
+    return chunks
+
+def date_to_string():
+    return time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+
+def mkssml(text, voice, rate, volume, pitch):
+    return (
+        "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+        f"<voice name='{voice}'>"
+        f"<prosody pitch='{pitch}' rate='{rate}' volume='{volume}'>"
+        f"{escape(remove_incompatible_characters(text))}"
+        "</prosody>"
+        "</voice>"
+        "</speak>"
+    )
+
+def get_headers_and_data(data, header_length):
+    headers = {}
+    for line in data[:header_length].split(b"\r\n"):
+        if b":" in line:
+            key, value = line.split(b":", 1)
+            headers[key] = value
+    return headers, data[header_length + 2:]
+
+SPEECH_CONFIG = (
+    "Content-Type:application/json; charset=utf-8\r\n"
+    "Path:speech.config\r\n\r\n"
+    '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+    '"sentenceBoundaryEnabled":false,"wordBoundaryEnabled":false},'
+    '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"'
+    "}}}}\r\n"
+)
+
+class AsyncEdgeTTS:
+    """
+    EdgeTTS 异步客户端：复用同一个 aiohttp 会话与 websocket 连接池，
+    多个句子在并发上限内同时合成，连接在一轮合成(turn.end)结束后归还连接池。
+    """
+    def __init__(self, max_concurrency=4, proxy=None, wss_url=WSS_URL, connect_timeout=10, receive_timeout=60):
+        self.max_concurrency = max_concurrency
+        self.proxy = proxy
+        self.wss_url = wss_url
+        self.connect_timeout = connect_timeout
+        self.receive_timeout = receive_timeout
+        self._session = None
+        self._semaphore = None
+        self._idle = []
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                trust_env=True,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _connect(self):
+        session = await self._get_session()
+        ssl_ctx = None
+        if self.wss_url.startswith("wss://"):
+            ssl_ctx = ssl.create_default_context(cafile=certifi.where() if certifi else None)
+        url = with_query(self.wss_url, dict(drm_params(), ConnectionId=uuid.uuid4().hex))
+        websocket = await session.ws_connect(url, compress=15, proxy=self.proxy,
+                                             headers=WSS_HEADERS, ssl=ssl_ctx, heartbeat=30)
+        await websocket.send_str(f"X-Timestamp:{date_to_string()}\r\n" + SPEECH_CONFIG)
+        return websocket
+
+    async def _turn(self, websocket, ssml):
+        await websocket.send_str(
+            f"X-RequestId:{uuid.uuid4().hex}\r\n"
+            "Content-Type:application/ssml+xml\r\n"
+            f"X-Timestamp:{date_to_string()}Z\r\n"
+            "Path:ssml\r\n\r\n"
+            f"{ssml}"
+        )
+        audio = bytearray()
+        while True:
+            received = await websocket.receive(timeout=self.receive_timeout)
+            if received.type == aiohttp.WSMsgType.TEXT:
+                encoded_data = received.data.encode("utf-8")
+                parameters, _ = get_headers_and_data(encoded_data, encoded_data.find(b"\r\n\r\n"))
+                if parameters.get(b"Path") == b"turn.end":
+                    break
+            elif received.type == aiohttp.WSMsgType.BINARY:
+                header_length = int.from_bytes(received.data[:2], "big")
+                parameters, data = get_headers_and_data(received.data, header_length)
+                if parameters.get(b"Path") == b"audio" and data:
+                    audio.extend(data)
+            else:
+                # CLOSE / CLOSED / ERROR：连接已失效
+                raise ConnectionError(f"EdgeTTS websocket closed: {received.type}")
+        if not audio:
+            raise ValueError("No audio was received. Please verify that your parameters are correct.")
+        return bytes(audio)
+
+    @instrument('EdgeTTS.sentence')
+    async def synthesize(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        """合成单段文本，返回 MP3 字节流；复用的连接失效时用新连接重试一次。"""
+        await self._get_session()
+        ssml = mkssml(text, voice, rate, volume, pitch)
+        async with self._semaphore:
+            for attempt in range(2):
+                websocket = None
+                while self._idle and websocket is None:
+                    websocket = self._idle.pop()
+                    if websocket.closed:
+                        websocket = None
+                if websocket is None:
+                    websocket = await self._connect()
+                try:
+                    audio = await self._turn(websocket, ssml)
+                except (aiohttp.ClientError, ConnectionError, asyncio.TimeoutError):
+                    await websocket.close()
+                    if attempt == 1:
+                        raise
+                    continue
+                except Exception:
+                    await websocket.close()
+                    raise
+                self._idle.append(websocket)
+                return audio
+
+    async def synthesize_sentences(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        """按句切分后并发合成，按原顺序拼接 MP3 字节流。"""
+        sentences = split_sentences(text) or [text]
+        results = await asyncio.gather(*[
+            self.synthesize(sentence, voice, rate, volume, pitch) for sentence in sentences
+        ])
+        return b"".join(results)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
 
 class EdgeTTS:
-    def __init__(self, list_voices = False, proxy = None) -> None:
-        try:
-            voices = list_voices_fn(proxy=proxy)
-            self.SUPPORTED_VOICE = [item['ShortName'] for item in voices]
-            self.SUPPORTED_VOICE.sort(reverse=True)
-            # print(self.SUPPORTED_VOICE)
-            if list_voices:
-                print(", ".join(self.SUPPORTED_VOICE))
+    def __init__(self, list_voices = False, proxy = None, max_concurrency = 4, wss_url = WSS_URL,
+                 voice_cache = VOICE_CACHE_PATH, voice_cache_ttl = VOICE_CACHE_TTL) -> None:
+        self.proxy = proxy
+        self.client = AsyncEdgeTTS(max_concurrency=max_concurrency, proxy=proxy, wss_url=wss_url)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+        voices, fresh = load_cached_voices(voice_cache, voice_cache_ttl)
+        if voices is not None:
+            # 有缓存时不阻塞启动，过期则后台刷新
+            self.SUPPORTED_VOICE = voices
             self.network = True
-        except:
-            # print("网络无法连接，无法获取语音列表，可能Edge模式会出错，建议使用其他TTS方法")
-            self.network = False
-            self.SUPPORTED_VOICE = ['zu-ZA-ThembaNeural', 'zu-ZA-ThandoNeural',  'zh-TW-YunJheNeural', 'zh-TW-HsiaoYuNeural', 'zh-TW-HsiaoChenNeural', 'zh-HK-WanLungNeural', 
-                                    'zh-HK-HiuMaanNeural', 'zh-HK-HiuGaaiNeural', 'zh-CN-shaanxi-XiaoniNeural', 'zh-CN-liaoning-XiaobeiNeural', 
-                                    'zh-CN-YunyangNeural', 'zh-CN-YunxiaNeural', 'zh-CN-YunxiNeural', 'zh-CN-YunjianNeural', 
-                                    'zh-CN-XiaoyiNeural', 'zh-CN-XiaoxiaoNeural', 'vi-VN-NamMinhNeural', 'vi-VN-HoaiMyNeural', 
-                                    'uz-UZ-SardorNeural', 'uz-UZ-MadinaNeural', 'ur-PK-UzmaNeural', 'ur-PK-AsadNeural', 
-                                    'ur-IN-SalmanNeural', 'ur-IN-GulNeural', 'uk-UA-PolinaNeural', 'uk-UA-OstapNeural', 
-                                    'tr-TR-EmelNeural', 'tr-TR-AhmetNeural', 'th-TH-PremwadeeNeural', 'th-TH-NiwatNeural', 
-                                    'te-IN-ShrutiNeural', 'te-IN-MohanNeural', 'ta-SG-VenbaNeural', 'ta-SG-AnbuNeural', 
-                                    'ta-MY-SuryaNeural', 'ta-MY-KaniNeural', 'ta-LK-SaranyaNeural', 'ta-LK-KumarNeural', 
-                                    'ta-IN-ValluvarNeural', 'ta-IN-PallaviNeural', 'sw-TZ-RehemaNeural', 'sw-TZ-DaudiNeural', 
-                                    'sw-KE-ZuriNeural', 'sw-KE-RafikiNeural', 'sv-SE-SofieNeural', 'sv-SE-MattiasNeural', 
-                                    'su-ID-TutiNeural', 'su-ID-JajangNeural', 'sr-RS-SophieNeural', 'sr-RS-NicholasNeural', 'sq-AL-IlirNeural', 'sq-AL-AnilaNeural', 
-                                    'so-SO-UbaxNeural', 'so-SO-MuuseNeural', 'sl-SI-RokNeural', 'sl-SI-PetraNeural', 
-                                    'sk-SK-ViktoriaNeural', 'sk-SK-LukasNeural', 'si-LK-ThiliniNeural', 'si-LK-SameeraNeural', 
-                                    'ru-RU-SvetlanaNeural', 'ru-RU-DmitryNeural', 'ro-RO-EmilNeural', 'ro-RO-AlinaNeural', 'pt-PT-RaquelNeural', 'pt-PT-DuarteNeural', 'pt-BR-ThalitaNeural', 'pt-BR-FranciscaNeural', 
-                                    'pt-BR-AntonioNeural', 'ps-AF-LatifaNeural', 'ps-AF-GulNawazNeural', 'pl-PL-ZofiaNeural', 
-                                    'pl-PL-MarekNeural', 'nl-NL-MaartenNeural', 'nl-NL-FennaNeural', 'nl-NL-ColetteNeural', 
-                                    'nl-BE-DenaNeural', 'nl-BE-ArnaudNeural', 'ne-NP-SagarNeural', 'ne-NP-HemkalaNeural', 
-                                    'nb-NO-PernilleNeural', 'nb-NO-FinnNeural', 'my-MM-ThihaNeural', 'my-MM-NilarNeural', 
-                                    'mt-MT-JosephNeural', 'mt-MT-GraceNeural', 'ms-MY-YasminNeural', 'ms-MY-OsmanNeural', 
-                                    'mr-IN-ManoharNeural', 'mr-IN-AarohiNeural', 'mn-MN-YesuiNeural', 'mn-MN-BataaNeural', 
-                                    'ml-IN-SobhanaNeural', 'ml-IN-MidhunNeural', 'mk-MK-MarijaNeural', 'mk-MK-AleksandarNeural', 
-                                    'lv-LV-NilsNeural', 'lv-LV-EveritaNeural', 'lt-LT-OnaNeural', 'lt-LT-LeonasNeural', 'lo-LA-KeomanyNeural', 'lo-LA-ChanthavongNeural', 
-                                    'ko-KR-SunHiNeural', 'ko-KR-InJoonNeural', 'ko-KR-HyunsuNeural', 'kn-IN-SapnaNeural', 
-                                    'kn-IN-GaganNeural', 'km-KH-SreymomNeural', 'km-KH-PisethNeural', 'kk-KZ-DauletNeural', 
-                                    'kk-KZ-AigulNeural', 'ka-GE-GiorgiNeural', 'ka-GE-EkaNeural', 'jv-ID-SitiNeural', 'jv-ID-DimasNeural', 
-                                    'ja-JP-NanamiNeural', 'ja-JP-KeitaNeural', 'it-IT-IsabellaNeural', 'it-IT-GiuseppeNeural', 'it-IT-ElsaNeural', 
-                                    'it-IT-DiegoNeural', 'is-IS-GunnarNeural', 'is-IS-GudrunNeural', 'id-ID-GadisNeural', 'id-ID-ArdiNeural', 
-                                    'hu-HU-TamasNeural', 'hu-HU-NoemiNeural', 'hr-HR-SreckoNeural', 'hr-HR-GabrijelaNeural', 'hi-IN-SwaraNeural', 
-                                    'hi-IN-MadhurNeural', 'he-IL-HilaNeural', 'he-IL-AvriNeural', 'gu-IN-NiranjanNeural', 'gu-IN-DhwaniNeural', 
-                                    'gl-ES-SabelaNeural', 'gl-ES-RoiNeural', 'ga-IE-OrlaNeural', 'ga-IE-ColmNeural', 'fr-FR-VivienneMultilingualNeural', 
-                                    'fr-FR-RemyMultilingualNeural', 'fr-FR-HenriNeural', 'fr-FR-EloiseNeural', 'fr-FR-DeniseNeural', 'fr-CH-FabriceNeural', 
-                                    'fr-CH-ArianeNeural', 'fr-CA-ThierryNeural', 'fr-CA-SylvieNeural', 'fr-CA-JeanNeural', 'fr-CA-AntoineNeural', 
-                                    'fr-BE-GerardNeural', 'fr-BE-CharlineNeural', 'fil-PH-BlessicaNeural', 'fil-PH-AngeloNeural', 'fi-FI-NooraNeural', 
-                                    'fi-FI-HarriNeural', 'fa-IR-FaridNeural', 'fa-IR-DilaraNeural', 'et-EE-KertNeural', 'et-EE-AnuNeural', 
-                                    'es-VE-SebastianNeural', 'es-VE-PaolaNeural', 'es-UY-ValentinaNeural', 'es-UY-MateoNeural', 'es-US-PalomaNeural', 
-                                    'es-US-AlonsoNeural', 'es-SV-RodrigoNeural', 'es-SV-LorenaNeural', 'es-PY-TaniaNeural', 'es-PY-MarioNeural', 
-                                    'es-PR-VictorNeural', 'es-PR-KarinaNeural', 'es-PE-CamilaNeural', 'es-PE-AlexNeural', 'es-PA-RobertoNeural', 
-                                    'es-PA-MargaritaNeural', 'es-NI-YolandaNeural', 'es-NI-FedericoNeural', 'es-MX-JorgeNeural', 'es-MX-DaliaNeural', 
-                                    'es-HN-KarlaNeural', 'es-HN-CarlosNeural', 'es-GT-MartaNeural', 'es-GT-AndresNeural', 'es-GQ-TeresaNeural', 
-                                    'es-GQ-JavierNeural', 'es-ES-XimenaNeural', 'es-ES-ElviraNeural', 'es-ES-AlvaroNeural', 'es-EC-LuisNeural', 
-                                    'es-EC-AndreaNeural', 'es-DO-RamonaNeural', 'es-DO-EmilioNeural', 'es-CU-ManuelNeural', 'es-CU-BelkysNeural', 
-                                    'es-CR-MariaNeural', 'es-CR-JuanNeural', 'es-CO-SalomeNeural', 'es-CO-GonzaloNeural', 'es-CL-LorenzoNeural', 
-                                    'es-CL-CatalinaNeural', 'es-BO-SofiaNeural', 'es-BO-MarceloNeural', 'es-AR-TomasNeural', 'es-AR-ElenaNeural', 
-                                    'en-ZA-LukeNeural', 'en-ZA-LeahNeural', 'en-US-SteffanNeural', 'en-US-RogerNeural', 'en-US-MichelleNeural', 
-                                    'en-US-JennyNeural', 'en-US-GuyNeural', 'en-US-EricNeural', 'en-US-EmmaNeural', 'en-US-ChristopherNeural', 
-                                    'en-US-BrianNeural', 'en-US-AvaNeural', 'en-US-AriaNeural', 'en-US-AndrewNeural', 'en-US-AnaNeural', 
-                                    'en-TZ-ImaniNeural', 'en-TZ-ElimuNeural', 'en-SG-WayneNeural', 'en-SG-LunaNeural', 'en-PH-RosaNeural', 
-                                    'en-PH-JamesNeural', 'en-NZ-MollyNeural', 'en-NZ-MitchellNeural', 'en-NG-EzinneNeural', 
-                                    'en-NG-AbeoNeural', 'en-KE-ChilembaNeural', 'en-KE-AsiliaNeural', 'en-IN-PrabhatNeural', 
-                                    'en-IN-NeerjaNeural', 'en-IN-NeerjaExpressiveNeural', 'en-IE-EmilyNeural', 'en-IE-ConnorNeural', 
-                                    'en-HK-YanNeural', 'en-HK-SamNeural', 'en-GB-ThomasNeural', 'en-GB-SoniaNeural', 'en-GB-RyanNeural', 
-                                    'en-GB-MaisieNeural', 'en-GB-LibbyNeural', 'en-CA-LiamNeural', 'en-CA-ClaraNeural', 'en-AU-WilliamNeural', 
-                                    'en-AU-NatashaNeural', 'el-GR-NestorasNeural', 'el-GR-AthinaNeural', 'de-DE-SeraphinaMultilingualNeural', 
-                                    'de-DE-KillianNeural', 'de-DE-KatjaNeural', 'de-DE-FlorianMultilingualNeural', 'de-DE-ConradNeural', 
-                                    'de-DE-AmalaNeural', 'de-CH-LeniNeural', 'de-CH-JanNeural', 'de-AT-JonasNeural', 'de-AT-IngridNeural', 
-                                    'da-DK-JeppeNeural', 'da-DK-ChristelNeural', 'cy-GB-NiaNeural', 'cy-GB-AledNeural', 'cs-CZ-VlastaNeural',
-                                    'cs-CZ-AntoninNeural', 'ca-ES-JoanaNeural', 'ca-ES-EnricNeural', 'bs-BA-VesnaNeural', 'bs-BA-GoranNeural', 
-                                    'bn-IN-TanishaaNeural', 'bn-IN-BashkarNeural', 'bn-BD-PradeepNeural', 'bn-BD-NabanitaNeural', 'bg-BG-KalinaNeural', 
-                                    'bg-BG-BorislavNeural', 'az-AZ-BanuNeural', 'az-AZ-BabekNeural', 'ar-YE-SalehNeural', 'ar-YE-MaryamNeural', 
-                                    'ar-TN-ReemNeural', 'ar-TN-HediNeural', 'ar-SY-LaithNeural', 'ar-SY-AmanyNeural', 'ar-SA-ZariyahNeural', 
-                                    'ar-SA-HamedNeural', 'ar-QA-MoazNeural', 'ar-QA-AmalNeural', 'ar-OM-AyshaNeural', 'ar-OM-AbdullahNeural', 
-                                    'ar-MA-MounaNeural', 'ar-MA-JamalNeural', 'ar-LY-OmarNeural', 'ar-LY-ImanNeural', 'ar-LB-RamiNeural', 'ar-LB-LaylaNeural', 
-                                    'ar-KW-NouraNeural', 'ar-KW-FahedNeural', 'ar-JO-TaimNeural', 'ar-JO-SanaNeural', 'ar-IQ-RanaNeural', 'ar-IQ-BasselNeural', 
-                                    'ar-EG-ShakirNeural', 'ar-EG-SalmaNeural', 'ar-DZ-IsmaelNeural', 'ar-DZ-AminaNeural', 'ar-BH-LailaNeural', 'ar-BH-AliNeural', 
-                                    'ar-AE-HamdanNeural', 'ar-AE-FatimaNeural', 'am-ET-MekdesNeural', 'am-ET-AmehaNeural', 'af-ZA-WillemNeural', 'af-ZA-AdriNeural']
+            if not fresh:
+                threading.Thread(target=self._refresh_voices, args=(voice_cache,), daemon=True).start()
+        else:
+            try:
+                self.SUPPORTED_VOICE = refresh_voices(proxy, voice_cache)
+                self.network = True
+            except:
+                # print("网络无法连接，无法获取语音列表，可能Edge模式会出错，建议使用其他TTS方法")
+                self.network = False
+                self.SUPPORTED_VOICE = list(SUPPORTED_VOICE_FALLBACK)
+        if list_voices:
+            print(", ".join(self.SUPPORTED_VOICE))
+
+    def _refresh_voices(self, voice_cache):
+        try:
+            self.SUPPORTED_VOICE = refresh_voices(self.proxy, voice_cache)
+        except Exception as e:
+            print("EdgeTTS语音列表刷新失败，继续使用缓存: ", e)
+
+    def _run(self, coro):
+        # 连接池绑定在常驻的后台事件循环上，使同步调用之间可以复用websocket连接
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, daemon=True).start()
+                    self._loop = loop
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
 
     def preprocess(self, rate, volume, pitch):
         if rate >= 0:
@@ -146,7 +422,7 @@ class EdgeTTS:
         volume = 100 - volume
         volume = f'-{volume}%'
         return rate, volume, pitch
-    @calculate_time
+    @instrument
     def apredict(self,TEXT, VOICE, RATE, VOLUME, PITCH, OUTPUT_FILE='result.wav', OUTPUT_SUBS='result.vtt', words_in_cue = 8):
         async def amain() -> None:
             """Main function"""
@@ -174,13 +450,16 @@ class EdgeTTS:
             output_file.writelines(vtt_lines_without_spaces)
         return OUTPUT_FILE, OUTPUT_SUBS
 
-    @calculate_time
-    def predict(self,TEXT, VOICE, RATE, VOLUME, PITCH, OUTPUT_FILE='result.wav', OUTPUT_SUBS='result.vtt', words_in_cue = 8):
+    @instrument
+    def predict(self,TEXT, VOICE, RATE, VOLUME, PITCH, OUTPUT_FILE='result.wav', OUTPUT_SUBS='result.vtt', words_in_cue = 8, return_clip = False):
         rate, volume, pitch = self.preprocess(rate = RATE, volume = VOLUME, pitch = PITCH)
-        communicate = Communicate(TEXT, VOICE, rate = rate, volume = volume, pitch = pitch)
-        communicate.save_sync(OUTPUT_FILE)
+        audio = self._run(self.client.synthesize_sentences(TEXT, VOICE, rate, volume, pitch)).result()
+        with open(OUTPUT_FILE, "wb") as file:
+            file.write(audio)
+        if return_clip:
+            # mp3字节保留在内存中，数字人模块首次使用时才解码
+            return AudioClip.from_bytes(audio, path=OUTPUT_FILE), None
 
-        
         '''
         由于EdgeTTS的一些问题，并且最近发现其生成的字幕还是有些奇怪，所以会重新写一个字幕生成，暂不使用其字母生成
         '''
@@ -198,6 +477,21 @@ class EdgeTTS:
 
         return OUTPUT_FILE, None
 
+    @instrument
+    async def predict_async(self, TEXT, VOICE, RATE, VOLUME, PITCH, OUTPUT_FILE='result.wav', OUTPUT_SUBS='result.vtt'):
+        """在调用方事件循环中等待合成结果（例如FastAPI接口），不阻塞该事件循环"""
+        rate, volume, pitch = self.preprocess(rate = RATE, volume = VOLUME, pitch = PITCH)
+        audio = await asyncio.wrap_future(self._run(self.client.synthesize_sentences(TEXT, VOICE, rate, volume, pitch)))
+        with open(OUTPUT_FILE, "wb") as file:
+            file.write(audio)
+        return OUTPUT_FILE, None
+
+    def close(self):
+        if self._loop is not None:
+            self._run(self.client.close()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
 def test():
     tts = EdgeTTS(list_voices=False)
     TEXT = '''近日，苹果公司起诉高通公司，状告其未按照相关合约进行合作，高通方面尚未回应。这句话中“其”指的是谁？'''
@@ -1,5 +1,6 @@
 import os
 from paddlespeech.cli.tts.infer import TTSExecutor
+from src.cost_time import instrument
 
 """
 PaddleSpeech
@@ -76,6 +77,7 @@ class PaddleTTS:
     def __init__(self) -> None:
         pass
         
+    @instrument
     def predict(self, text, am, voc, spk_id = 174, lang = 'zh', male=False, save_path = 'output.wav'):
         self.tts = TTSExecutor()
         
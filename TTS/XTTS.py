@@ -1,6 +1,7 @@
 import torch
 import tempfile
 from TTS.api import TTS
+from src.cost_time import instrument
 
 
 class XTTSTalker():
@@ -11,6 +12,7 @@ class XTTSTalker():
         device = "cuda" if torch.cuda.is_available() else "cpu"
         self.tts = TTS("tts_models/multilingual/multi-dataset/xtts_v1.1").to(device)
 
+    @instrument
     def test(self, text, language='en'):
 
         tempf  = tempfile.NamedTemporaryFile(
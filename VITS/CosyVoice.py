@@ -1,40 +1,145 @@
 import os, sys
 sys.path.append('CosyVoice/third_party/Matcha-TTS')
 sys.path.append('CosyVoice/')
+import hashlib
+from collections import OrderedDict
 import torch
 from cosyvoice.cli.cosyvoice import CosyVoice
 from cosyvoice.utils.file_utils import load_wav, speed_change
 import librosa
 import torchaudio
+from src.utils.audio_clip import AudioClip
+from src.cost_time import instrument
 
 class CosyVoiceTTS:
-    def __init__(self, model_path):
+    def __init__(self, model_path, voice_cache_dir=None, max_cached_voices=16):
         self.model_path = model_path
         self.model = CosyVoice(model_path)
-        
+        # 已注册音色：prompt特征与说话人向量只提取一次，内存LRU + 磁盘持久化
+        self.voice_cache_dir = voice_cache_dir or os.path.join(model_path, 'registered_voices')
+        self.max_cached_voices = max_cached_voices
+        self.voices = OrderedDict()
+        self.voice_hits = 0
+        self.voice_misses = 0
+
     # SFT usage
-    def predict_sft(self, text, spks, save_path='sft.wav', speed_factor = 1.0):
+    @instrument
+    def predict_sft(self, text, spks, save_path='sft.wav', speed_factor = 1.0, return_clip = False):
         assert spks in self.model.list_avaliable_spks() and 'SFT' in self.model_path
         output = self.model.inference_sft(text, spks)
         if speed_factor != 1.0:
             output['tts_speech'] = self.speed_change(output['tts_speech'], speed = speed_factor)
-        torchaudio.save(save_path, output['tts_speech'], 22050)
-        return save_path
+        return self.save(output['tts_speech'], save_path, return_clip)
 
-    def predict_zero_shot(self, text, prompt_text, prompt_speech, save_path='zero_shot.wav', speed_factor = 1.0):
-        prompt_speech_16k = self.postprocess(load_wav(prompt_speech, 16000))
-        output = self.model.inference_zero_shot(text, prompt_text, prompt_speech_16k)
-        if speed_factor != 1.0:
-            output['tts_speech'] = self.speed_change(output['tts_speech'], speed = speed_factor)
-        torchaudio.save(save_path, output['tts_speech'], 22050)
-        return save_path
+    @instrument
+    def predict_zero_shot(self, text, prompt_text, prompt_speech, save_path='zero_shot.wav', speed_factor = 1.0, return_clip = False):
+        voice_id = self.register_voice(prompt_speech, prompt_text)
+        return self.predict_registered(text, voice_id, save_path=save_path, speed_factor=speed_factor, return_clip=return_clip)
+
+    @instrument
+    def predict_cross_lingual(self,prompt_text, prompt_speech, save_path='cross_lingual.wav', speed_factor = 1.0, return_clip = False):
+        # 跨语种模式下 prompt_text 即为待合成文本，prompt音频不需要对应文本
+        voice_id = self.register_voice(prompt_speech)
+        return self.predict_registered(prompt_text, voice_id, save_path=save_path, speed_factor=speed_factor, cross_lingual=True, return_clip=return_clip)
+
+    def register_voice(self, prompt_speech, prompt_text='', voice_id=None):
+        """
+        注册一个克隆音色，返回 voice_id。
+        相同的prompt音频内容与文本只会提取一次特征，之后直接复用缓存。
+        """
+        if voice_id is None:
+            with open(prompt_speech, 'rb') as f:
+                digest = hashlib.sha1(f.read())
+            digest.update(prompt_text.encode('utf-8'))
+            voice_id = digest.hexdigest()
+        self.get_voice(voice_id, prompt_speech, prompt_text)
+        return voice_id
+
+    def get_voice(self, voice_id, prompt_speech=None, prompt_text=''):
+        if voice_id in self.voices:
+            self.voices.move_to_end(voice_id)
+            self.voice_hits += 1
+            self._log_voice_stats('hit', voice_id)
+            return self.voices[voice_id]
 
-    def predict_cross_lingual(self,prompt_text, prompt_speech, save_path='cross_lingual.wav', speed_factor = 1.0):
+        cache_path = os.path.join(self.voice_cache_dir, f'{voice_id}.pt')
+        if os.path.exists(cache_path):
+            features = torch.load(cache_path, map_location='cpu')
+            self.voice_hits += 1
+            self._log_voice_stats('disk hit', voice_id)
+        elif prompt_speech is not None:
+            features = self.extract_voice_features(prompt_speech, prompt_text)
+            os.makedirs(self.voice_cache_dir, exist_ok=True)
+            torch.save(features, cache_path)
+            self.voice_misses += 1
+            self._log_voice_stats('miss', voice_id)
+        else:
+            raise KeyError(f"未注册的音色: {voice_id}")
+
+        self.voices[voice_id] = features
+        while len(self.voices) > self.max_cached_voices:
+            self.voices.popitem(last=False)
+        return features
+
+    def unregister_voice(self, voice_id):
+        self.voices.pop(voice_id, None)
+        cache_path = os.path.join(self.voice_cache_dir, f'{voice_id}.pt')
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    def _log_voice_stats(self, event, voice_id):
+        total = self.voice_hits + self.voice_misses
+        print(f"CosyVoice音色缓存{event}: {voice_id[:8]} (命中 {self.voice_hits}/{total}, 内存中 {len(self.voices)} 个)")
+
+    def extract_voice_features(self, prompt_speech, prompt_text=''):
+        # 与 CosyVoiceFrontEnd.frontend_zero_shot 中与合成文本无关的部分一致
+        frontend = self.model.frontend
         prompt_speech_16k = self.postprocess(load_wav(prompt_speech, 16000))
-        output = self.model.inference_cross_lingual(prompt_text, prompt_speech_16k)
+        prompt_text = frontend.text_normalize(prompt_text, split=False) if prompt_text else ''
+        prompt_text_token, prompt_text_token_len = frontend._extract_text_token(prompt_text)
+        prompt_speech_22050 = torchaudio.transforms.Resample(orig_freq=16000, new_freq=22050)(prompt_speech_16k)
+        speech_feat, speech_feat_len = frontend._extract_speech_feat(prompt_speech_22050)
+        speech_token, speech_token_len = frontend._extract_speech_token(prompt_speech_16k)
+        embedding = frontend._extract_spk_embedding(prompt_speech_16k)
+        features = {'prompt_text': prompt_text_token, 'prompt_text_len': prompt_text_token_len,
+                    'prompt_speech_token': speech_token, 'prompt_speech_token_len': speech_token_len,
+                    'prompt_speech_feat': speech_feat, 'prompt_speech_feat_len': speech_feat_len,
+                    'embedding': embedding}
+        return {k: v.cpu() for k, v in features.items()}
+
+    @instrument
+    def predict_registered(self, text, voice_id, save_path='zero_shot.wav', speed_factor = 1.0, cross_lingual=False, return_clip = False):
+        features = self.get_voice(voice_id)
+        frontend = self.model.frontend
+        device = frontend.device
+        features = {k: v.to(device) for k, v in features.items()}
+        tts_speeches = []
+        for i in frontend.text_normalize(text, split=True):
+            tts_text_token, tts_text_token_len = frontend._extract_text_token(i)
+            model_input = {'text': tts_text_token, 'text_len': tts_text_token_len,
+                           'flow_prompt_speech_token': features['prompt_speech_token'],
+                           'flow_prompt_speech_token_len': features['prompt_speech_token_len'],
+                           'prompt_speech_feat': features['prompt_speech_feat'],
+                           'prompt_speech_feat_len': features['prompt_speech_feat_len'],
+                           'llm_embedding': features['embedding'], 'flow_embedding': features['embedding']}
+            if not cross_lingual:
+                # 跨语种模式下LLM不使用prompt
+                model_input.update({'prompt_text': features['prompt_text'],
+                                    'prompt_text_len': features['prompt_text_len'],
+                                    'llm_prompt_speech_token': features['prompt_speech_token'],
+                                    'llm_prompt_speech_token_len': features['prompt_speech_token_len']})
+            model_output = self.model.model.inference(**model_input)
+            tts_speeches.append(model_output['tts_speech'])
+        output = {'tts_speech': torch.concat(tts_speeches, dim=1)}
         if speed_factor != 1.0:
             output['tts_speech'] = self.speed_change(output['tts_speech'], speed = speed_factor)
-        torchaudio.save(save_path, output['tts_speech'], 22050)
+        return self.save(output['tts_speech'], save_path, return_clip)
+
+    def save(self, tts_speech, save_path, return_clip=False):
+        torchaudio.save(save_path, tts_speech, 22050)
+        if return_clip:
+            # 同时返回内存中的波形，数字人模块无需再读取 save_path
+            return AudioClip(tts_speech, 22050, path=save_path)
         return save_path
 
     def speed_change(self, wav, target_sr = 22050, speed=1.0):
@@ -52,7 +157,7 @@ class CosyVoiceTTS:
             speech = speech / speech.abs().max() * max_val
         speech = torch.concat([speech, torch.zeros(1, int(target_sr * 0.2))], dim=1)
         return speech
-    
+
 if __name__ == "__main__":
     # SFT model example
     cosyvoice_sft = CosyVoiceTTS('checkpoints/CosyVoice_ckpt/CosyVoice-300M-SFT')
@@ -63,4 +168,8 @@ if __name__ == "__main__":
     cosyvoice_zero_shot = CosyVoiceTTS('checkpoints/CosyVoice_ckpt/CosyVoice-300M')
     prompt_speech = 'zero_shot_prompt.wav'
     cosyvoice_zero_shot.predict_zero_shot('收到好友从远方寄来的生日礼物，那份意外的惊喜与深深的祝福让我心中充满了甜蜜的快乐，笑容如花儿般绽放。', '希望你以后能够做的比我还好呦。',
-                                          prompt_speech, save_path='zero_shot_output.wav')
\ No newline at end of file
+                                          prompt_speech, save_path='zero_shot_output.wav')
+
+    # 注册音色后可直接按 voice_id 合成，不再重复提取prompt特征
+    voice_id = cosyvoice_zero_shot.register_voice(prompt_speech, '希望你以后能够做的比我还好呦。')
+    cosyvoice_zero_shot.predict_registered('今天天气很好。', voice_id, save_path='registered_output.wav')
@@ -3,8 +3,8 @@ import numpy as np
 import librosa
 import torch
 import re, os
-import librosa
-from transformers import AutoModelForMaskedLM, AutoTokenizer
+import gc
+import threading
 import sys
 sys.path.append('GPT_SoVITS/')
 from text import cleaned_text_to_sequence
@@ -16,32 +16,10 @@ from module.models import SynthesizerTrn
 from AR.models.t2s_lightning_module import Text2SemanticLightningModule
 from scipy.io.wavfile import write
 from time import time as ttime
+from src.utils.audio_clip import AudioClip
+from src.cost_time import instrument
 
-if torch.cuda.is_available():
-    device = "cuda"
-elif torch.backends.mps.is_available():
-    device = "mps"
-else:
-    device = "cpu"
-
-is_half = True
 splits = {"，", "。", "？", "！", ",", ".", "?", "!", "~", ":", "：", "—", "…", }
-if device == "cuda":
-    gpu_name = torch.cuda.get_device_name(0)
-    if (
-            ("16" in gpu_name and "V100" not in gpu_name.upper())
-            or "P40" in gpu_name.upper()
-            or "P10" in gpu_name.upper()
-            or "1060" in gpu_name
-            or "1070" in gpu_name
-            or "1080" in gpu_name
-    ):
-        is_half=False
-
-if device=="cpu":
-    is_half=False
-
-dtype=torch.float16 if is_half == True else torch.float32
 bert_path = os.environ.get(
     "bert_path", "GPT_SoVITS/pretrained_models/chinese-roberta-wwm-ext-large"
 )
@@ -50,19 +28,100 @@ cnhubert_base_path = os.environ.get(
 )
 cnhubert.cnhubert_base_path = cnhubert_base_path
 
-tokenizer = AutoTokenizer.from_pretrained(bert_path)
-bert_model = AutoModelForMaskedLM.from_pretrained(bert_path)
+class LazySingleton:
+    """线程安全的延迟加载单例：首次 get() 时调用 loader 创建，unload() 后下次使用时重新创建"""
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._instance = None
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._loader()
+                instance = self._instance
+        return instance
+
+    def unload(self):
+        with self._lock:
+            self._instance = None
+
+def _load_runtime():
+    if torch.cuda.is_available():
+        device = "cuda"
+    elif torch.backends.mps.is_available():
+        device = "mps"
+    else:
+        device = "cpu"
+
+    is_half = True
+    if device == "cuda":
+        gpu_name = torch.cuda.get_device_name(0)
+        if (
+                ("16" in gpu_name and "V100" not in gpu_name.upper())
+                or "P40" in gpu_name.upper()
+                or "P10" in gpu_name.upper()
+                or "1060" in gpu_name
+                or "1070" in gpu_name
+                or "1080" in gpu_name
+        ):
+            is_half=False
+
+    if device=="cpu":
+        is_half=False
+
+    dtype=torch.float16 if is_half == True else torch.float32
+    return device, is_half, dtype
+
+def _load_bert():
+    from transformers import AutoModelForMaskedLM, AutoTokenizer
+    device, is_half, _ = get_runtime()
+    tokenizer = AutoTokenizer.from_pretrained(bert_path)
+    bert_model = AutoModelForMaskedLM.from_pretrained(bert_path)
+    if is_half == True:
+        bert_model = bert_model.half().to(device)
+    else:
+        bert_model = bert_model.to(device)
+    return tokenizer, bert_model
+
+def _load_ssl():
+    device, is_half, _ = get_runtime()
+    ssl_model = cnhubert.get_model()
+    if is_half == True:
+        ssl_model = ssl_model.half().to(device)
+    else:
+        ssl_model = ssl_model.to(device)
+    return ssl_model
+
+_runtime = LazySingleton(_load_runtime)
+_bert = LazySingleton(_load_bert)
+_ssl = LazySingleton(_load_ssl)
+
+def get_runtime():
+    """返回 (device, is_half, dtype)，首次调用时才探测CUDA设备"""
+    return _runtime.get()
 
-if is_half == True:
-    bert_model = bert_model.half().to(device)
-else:
-    bert_model = bert_model.to(device)
+def get_bert():
+    """返回 (tokenizer, bert_model)，首次调用时加载 chinese-roberta-wwm-ext-large"""
+    return _bert.get()
 
-ssl_model = cnhubert.get_model()
-if is_half == True:
-    ssl_model = ssl_model.half().to(device)
-else:
-    ssl_model = ssl_model.to(device)
+def get_ssl_model():
+    """返回 CN-HuBERT 模型，首次调用时加载"""
+    return _ssl.get()
+
+def unload():
+    """释放 BERT 与 CN-HuBERT 全局模型，下次使用时会重新加载"""
+    _bert.unload()
+    _ssl.unload()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
 def get_spepc(hps, filename):
     audio = load_audio(filename, int(hps.data.sampling_rate))
@@ -79,20 +138,30 @@ def get_spepc(hps, filename):
     )
     return spec
 
-def get_bert_feature(text, word2ph):
+def get_bert_feature_batch(texts, word2phs):
+    # 所有中文片段padding后一次性送入BERT，再用repeat_interleave展开到音素级
+    if len(texts) == 0:
+        return []
+    for text, word2ph in zip(texts, word2phs):
+        assert len(word2ph) == len(text)
+    device, _, _ = get_runtime()
+    tokenizer, bert_model = get_bert()
     with torch.no_grad():
-        inputs = tokenizer(text, return_tensors="pt")
+        inputs = tokenizer(texts, return_tensors="pt", padding=True)
         for i in inputs:
             inputs[i] = inputs[i].to(device)
         res = bert_model(**inputs, output_hidden_states=True)
-        res = torch.cat(res["hidden_states"][-3:-2], -1)[0].cpu()[1:-1]
-    assert len(word2ph) == len(text)
-    phone_level_feature = []
-    for i in range(len(word2ph)):
-        repeat_feature = res[i].repeat(word2ph[i], 1)
-        phone_level_feature.append(repeat_feature)
-    phone_level_feature = torch.cat(phone_level_feature, dim=0)
-    return phone_level_feature.T
+        res = torch.cat(res["hidden_states"][-3:-2], -1).cpu()
+    lengths = torch.tensor([len(text) for text in texts])
+    starts = torch.cumsum(lengths, 0) - lengths
+    # 跳过[CLS]，按 (片段, 字) 索引一次性取回所有字向量
+    batch_index = torch.repeat_interleave(torch.arange(len(texts)), lengths)
+    token_index = torch.arange(int(lengths.sum())) - torch.repeat_interleave(starts, lengths) + 1
+    char_feature = res[batch_index, token_index]
+    repeats = torch.tensor(sum(word2phs, []), dtype=torch.long)
+    phone_level_feature = torch.repeat_interleave(char_feature, repeats, dim=0)
+    phone_counts = [sum(word2ph) for word2ph in word2phs]
+    return [feature.T for feature in torch.split(phone_level_feature, phone_counts, dim=0)]
 
 class DictToAttrRecursive(dict):
     def __init__(self, input_dict):
@@ -126,18 +195,6 @@ def clean_text_inf(text, language):
     phones = cleaned_text_to_sequence(phones)
     return phones, word2ph, norm_text
 
-def get_bert_inf(phones, word2ph, norm_text, language):
-    language=language.replace("all_","")
-    if language == "zh":
-        bert = get_bert_feature(norm_text, word2ph).to(device)#.to(dtype)
-    else:
-        bert = torch.zeros(
-            (1024, len(phones)),
-            dtype=torch.float16 if is_half == True else torch.float32,
-        ).to(device)
-
-    return bert
-
 def splite_en_inf(sentence, language):
     pattern = re.compile(r'[a-zA-Z ]+')
     textlist = []
@@ -172,15 +229,28 @@ def splite_en_inf(sentence, language):
 
     return textlist, langlist
 
-def nonen_clean_text_inf(text, language):
+def split_lang_inf(text, language):
     if(language!="auto"):
-        textlist, langlist = splite_en_inf(text, language)
-    else:
-        textlist=[]
-        langlist=[]
-        for tmp in LangSegment.getTexts(text):
-            langlist.append(tmp["lang"])
-            textlist.append(tmp["text"])
+        return splite_en_inf(text, language)
+    textlist=[]
+    langlist=[]
+    for tmp in LangSegment.getTexts(text):
+        langlist.append(tmp["lang"])
+        textlist.append(tmp["text"])
+    return textlist, langlist
+
+def get_lang_segments_inf(text, language):
+    textlist, langlist = split_lang_inf(text, language)
+    print(textlist)
+    print(langlist)
+    segments = []
+    for i in range(len(textlist)):
+        phones, word2ph, norm_text = clean_text_inf(textlist[i], langlist[i])
+        segments.append((langlist[i], phones, word2ph, norm_text))
+    return segments
+
+def nonen_clean_text_inf(text, language):
+    textlist, langlist = split_lang_inf(text, language)
     print(textlist)
     print(langlist)
     phones_list = []
@@ -200,27 +270,34 @@ def nonen_clean_text_inf(text, language):
 
     return phones, word2ph, norm_text
 
-def nonen_get_bert_inf(text, language):
-    if(language!="auto"):
-        textlist, langlist = splite_en_inf(text, language)
-    else:
-        textlist=[]
-        langlist=[]
-        for tmp in LangSegment.getTexts(text):
-            langlist.append(tmp["lang"])
-            textlist.append(tmp["text"])
-    print(textlist)
-    print(langlist)
+def get_bert_segments_batch(segments_list):
+    # segments_list: 每句一个 [(language, phones, word2ph, norm_text), ...]
+    # 所有句子中的中文片段合并为一次BERT前向，其余语种补零
+    zh_texts = []
+    zh_word2phs = []
+    plans = []
+    for segments in segments_list:
+        plan = []
+        for language, phones, word2ph, norm_text in segments:
+            if language.replace("all_","") == "zh":
+                plan.append(("zh", len(zh_texts)))
+                zh_texts.append(norm_text)
+                zh_word2phs.append(word2ph)
+            else:
+                plan.append(("zeros", len(phones)))
+        plans.append(plan)
+    zh_features = get_bert_feature_batch(zh_texts, zh_word2phs)
+    device, _, dtype = get_runtime()
     bert_list = []
-    for i in range(len(textlist)):
-        text = textlist[i]
-        lang = langlist[i]
-        phones, word2ph, norm_text = clean_text_inf(text, lang)
-        bert = get_bert_inf(phones, word2ph, norm_text, lang)
-        bert_list.append(bert)
-    bert = torch.cat(bert_list, dim=1)
-
-    return bert
+    for plan in plans:
+        features = []
+        for kind, value in plan:
+            if kind == "zh":
+                features.append(zh_features[value].to(device).to(dtype))
+            else:
+                features.append(torch.zeros((1024, value), dtype=dtype).to(device))
+        bert_list.append(torch.cat(features, dim=1))
+    return bert_list
 
 def get_first(text):
     pattern = "[" + "".join(re.escape(sep) for sep in splits) + "]"
@@ -234,16 +311,18 @@ def get_cleaned_text_fianl(text,language):
         phones, word2ph, norm_text = nonen_clean_text_inf(text, language)
     return phones, word2ph, norm_text
 
-def get_bert_final(phones, word2ph, norm_text, text_language, device, text):
-    if text_language == "en":
-        bert = get_bert_inf(phones, word2ph, norm_text, text_language)
-    elif text_language in {"zh", "ja","auto"}:
-        bert = nonen_get_bert_inf(text, text_language)
-    elif text_language == "all_zh":
-        bert = get_bert_feature(norm_text, word2ph).to(device)
-    else:
-        bert = torch.zeros((1024, len(phones))).to(device)
-    return bert
+def get_bert_final_batch(items):
+    # items: [(phones, word2ph, norm_text, language, text), ...]，一次请求内的所有句子
+    segments_list = []
+    for phones, word2ph, norm_text, language, text in items:
+        if language in {"zh", "ja", "auto"}:
+            segments = get_lang_segments_inf(text, language)
+        elif language == "all_zh":
+            segments = [("zh", phones, word2ph, norm_text)]
+        else:
+            segments = [(language, phones, word2ph, norm_text)]
+        segments_list.append(segments)
+    return get_bert_segments_batch(segments_list)
 
 def split(todo_text):
     todo_text = todo_text.replace("……", "。").replace("——", "，")
@@ -323,8 +402,16 @@ class GPT_SoVITS:
         self.model = None
         # is_half = True
         # device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    def unload(self):
+        # 释放本实例的GPT/SoVITS权重以及共享的BERT、CN-HuBERT
+        for name in ("t2s_model", "vq_model"):
+            if hasattr(self, name):
+                delattr(self, name)
+        unload()
         
     def load_model(self, gpt_path, sovits_path):
+        device, is_half, _ = get_runtime()
         self.hz = 50
         dict_s1 = torch.load(gpt_path, map_location="cpu")
         self.config = dict_s1["config"]
@@ -357,12 +444,15 @@ class GPT_SoVITS:
         self.vq_model.eval()
         print(self.vq_model.load_state_dict(dict_s2["weight"], strict=False))
     
-    def predict(self, ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut="不切", save_path = 'vits_res.wav'):
+    @instrument
+    def predict(self, ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut="不切", save_path = 'vits_res.wav', return_clip = False):
         print(ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut)
-        return self.get_tts_wav(ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut, save_path)
+        return self.get_tts_wav(ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut, save_path, return_clip)
 
-    def get_tts_wav(self, ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut="不切", save_path = 'vits_res.wav'):
+    def get_tts_wav(self, ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut="不切", save_path = 'vits_res.wav', return_clip = False):
         t0 = ttime()
+        device, is_half, dtype = get_runtime()
+        ssl_model = get_ssl_model()
         prompt_text = prompt_text.strip("\n")
         if (prompt_text[-1] not in splits): prompt_text += "。" if prompt_language != "en" else "."
         text = text.strip("\n")
@@ -422,8 +512,8 @@ class GPT_SoVITS:
         print("实际输入的目标文本(切句后):", text)
         texts = text.split("\n")
         audio_opt = []
-        bert1=get_bert_final(phones1, word2ph1, norm_text1, prompt_language, device, text).to(dtype)
-
+        # 参考文本与所有目标句子的BERT特征在一次前向中批量计算
+        bert_items = [(phones1, word2ph1, norm_text1, prompt_language, prompt_text)]
         for text in texts:
             # 解决输入目标文本的空行导致报错的问题
             if (len(text.strip()) == 0):
@@ -431,8 +521,12 @@ class GPT_SoVITS:
             if (text[-1] not in splits): text += "。" if text_language != "en" else "."
             print("实际输入的目标文本(每句):", text)
             phones2, word2ph2, norm_text2 = get_cleaned_text_fianl(text, text_language)
-            bert2 = get_bert_final(phones2, word2ph2, norm_text2, text_language, device, text).to(dtype)
+            bert_items.append((phones2, word2ph2, norm_text2, text_language, text))
+        bert_list = get_bert_final_batch(bert_items)
+        bert1 = bert_list[0].to(dtype)
 
+        for (phones2, word2ph2, norm_text2, _, text), bert2 in zip(bert_items[1:], bert_list[1:]):
+            bert2 = bert2.to(dtype)
             bert = torch.cat([bert1, bert2], 1)
 
             all_phoneme_ids = torch.LongTensor(phones1 + phones2).to(device).unsqueeze(0)
@@ -480,7 +574,11 @@ class GPT_SoVITS:
         # yield self.hps.data.sampling_rate, (np.concatenate(audio_opt, 0) * 32768).astype(
         #     np.int16
         # )
-        write(save_path, self.hps.data.sampling_rate, (np.concatenate(audio_opt, 0) * 32768).astype(np.int16))
+        wav = (np.concatenate(audio_opt, 0) * 32768).astype(np.int16)
+        write(save_path, self.hps.data.sampling_rate, wav)
+        if return_clip:
+            # 合成结果留在内存中交给数字人模块，save_path 仅供界面播放与最终合成视频
+            return AudioClip(wav, self.hps.data.sampling_rate, path=save_path)
         return save_path
 if __name__ == "__main__":
     GPT_SoVITS_inference = GPT_SoVITS()
@@ -14,6 +14,7 @@ import gradio as gr
 from TTS.tts.configs.xtts_config import XttsConfig
 from TTS.tts.models.xtts import Xtts
 from TTS.utils.generic_utils import get_user_data_dir
+from src.cost_time import instrument
 
 class XTTS():
     def __init__(self):
@@ -37,6 +38,7 @@ class XTTS():
 
         self.supported_languages = config.languages
 
+    @instrument
     def predict(self, 
         prompt,
         language,
@@ -4,7 +4,8 @@ from loguru import logger
 import gc, torch
 import sys
 sys.path.append('./')
-app = FastAPI()
+from src.cost_time import instrument_app
+app = instrument_app(FastAPI())
 
 # 全局变量用于存储当前加载的LLM模型
 from LLM import LLM
@@ -5,12 +5,17 @@ import os
 from loguru import logger
 import sys
 import gc
+import json
+import uuid
 import torch
 from typing import Optional
-from fastapi.responses import FileResponse
+from fastapi import Header
+from fastapi.responses import FileResponse, StreamingResponse
 
 sys.path.append("./")
-app = FastAPI()
+from src.cost_time import instrument_app
+from src.utils.jobs import get_job_queue
+app = instrument_app(FastAPI())
 
 # Global variable to store the currently loaded Talker model
 talker = None
@@ -48,6 +53,11 @@ async def change_model(model_name: str = Query(..., description="Name of the Tal
     """Change digital human conversation model and load corresponding resources."""
     global talker
 
+    # Queued and running jobs still use the current model; refuse to swap it under them
+    pending = get_job_queue().pending()
+    if pending:
+        raise HTTPException(status_code=409, detail=f"{pending} render job(s) pending, change the model after they finish.")
+
     # Clear memory to free up unnecessary resources before loading a new model
     await clear_memory()
 
@@ -79,6 +89,44 @@ async def change_model(model_name: str = Query(..., description="Name of the Tal
 
     return {"message": f"{model_name} model loaded successfully"}
 
+def render_video(model, request, image_path, audio_path):
+    """Run the talker on the saved inputs and return the video path (executed by a job worker)."""
+    if request.talker_method == 'SadTalker':
+        return model.test2(
+            image_path,
+            audio_path,
+            request.preprocess_type,
+            request.is_still_mode,
+            request.enhancer,
+            request.batch_size,
+            request.size_of_image,
+            request.pose_style,
+            request.facerender,
+            request.exp_weight,
+            REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH,
+            request.blink_every,
+            request.fps,
+        )
+    elif request.talker_method == 'Wav2Lip':
+        return model.predict(image_path, audio_path, request.batch_size)
+    elif request.talker_method == 'Wav2Lipv2':
+        return model.run(image_path, audio_path, request.batch_size)
+    elif request.talker_method == 'NeRFTalk':
+        return model.predict(audio_path)
+    raise ValueError(f"Unsupported method: {request.talker_method}")
+
+def job_info(job_id):
+    """Job status plus the URLs used to follow and fetch it."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    job.update(
+        status_url=f"/talker_jobs/{job_id}",
+        events_url=f"/talker_jobs/{job_id}/events",
+        result_url=f"/talker_jobs/{job_id}/result",
+    )
+    return job
+
 @app.post("/talker_response/")
 async def talker_response(
     preprocess_type: str = Form('crop'),
@@ -92,14 +140,21 @@ async def talker_response(
     blink_every: bool = Form(True),
     talker_method: str = Form('SadTalker'),
     fps: int = Form(30),
+    async_mode: bool = Form(False, description="Return the job ID immediately instead of waiting for the video"),
     source_image: UploadFile = File(..., description="The source image file"),
     driven_audio: UploadFile = File(..., description="The audio file that will drive the talking head"),
 ):
-    """Handle digital human conversation requests and generate video."""
+    """
+    Handle digital human conversation requests and generate video.
+    The render runs as a background job bound to the loaded model; jobs on one model run one at a time. With async_mode the
+    job ID is returned at once; follow /talker_jobs/{job_id}/events and download /talker_jobs/{job_id}/result.
+    """
     global talker
 
     if talker is None:
         raise HTTPException(status_code=400, detail="Talker model not loaded. Please load a model first.")
+    if talker_method not in ['SadTalker', 'Wav2Lip', 'Wav2Lipv2', 'NeRFTalk']:
+        raise HTTPException(status_code=400, detail="Unsupported method")
 
     # Assemble the request data into the TalkerRequest model
     request = TalkerRequest(
@@ -115,59 +170,68 @@ async def talker_response(
         talker_method=talker_method,
         fps=fps,
     )
-    # print(request)
-
-    # Temporary file paths
-    temp_image_path = "temp_source_image.jpg"
-    temp_audio_path = "temp_driven_audio.wav"
 
+    # Each request saves its uploads to its own directory, removed when the job ends
+    temp_dir = os.path.join("temp", "talker_jobs", uuid.uuid4().hex)
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_image_path = os.path.join(temp_dir, "source_image" + (os.path.splitext(source_image.filename or "")[1] or ".jpg"))
+    temp_audio_path = os.path.join(temp_dir, "driven_audio.wav")
     try:
-        # Save uploaded files temporarily
         with open(temp_image_path, "wb") as image_file:
             shutil.copyfileobj(source_image.file, image_file)
         with open(temp_audio_path, "wb") as audio_file:
             shutil.copyfileobj(driven_audio.file, audio_file)
-
-        # Video generation
-        if request.talker_method == 'SadTalker':
-            video_path = talker.test2(
-                temp_image_path, 
-                temp_audio_path,
-                request.preprocess_type, 
-                request.is_still_mode, 
-                request.enhancer, 
-                request.batch_size, 
-                request.size_of_image, 
-                request.pose_style, 
-                request.facerender, 
-                request.exp_weight, 
-                REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH,
-                request.blink_every, 
-                request.fps,
-            )
-        elif request.talker_method == 'Wav2Lip':
-            video_path = talker.predict(temp_image_path, temp_audio_path, request.batch_size)
-        elif request.talker_method == 'Wav2Lipv2':
-            video_path = talker.run(temp_image_path, temp_audio_path, request.batch_size)
-        elif request.talker_method == 'NeRFTalk':
-            video_path = talker.predict(temp_audio_path)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported method")
-
-        # Ensure the video file exists and return it
-        if os.path.exists(video_path):
-            return FileResponse(video_path, media_type='video/mp4', filename=os.path.basename(video_path))
-        else:
-            raise HTTPException(status_code=404, detail="Video file not found")
-    except Exception as e:
-        logger.error(f"Video generation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Video generation failed: {e}")
-    finally:
-        # Clean up temporary files
-        if os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    jobs = get_job_queue()
+    job_id = jobs.submit(request.talker_method, render_video, talker, request, temp_image_path, temp_audio_path,
+                         instance=talker, cleanup=[temp_dir])
+    if async_mode:
+        return job_info(job_id)
+
+    # Await the job on the event loop so waiting requests do not hold threadpool workers
+    job = await jobs.wait_async(job_id)
+    if job['status'] != 'done':
+        logger.error(f"Video generation failed: {job['error']}")
+        raise HTTPException(status_code=500, detail=f"Video generation failed: {job['error']}")
+    video_path = jobs.artifact(job_id)
+    return FileResponse(video_path, media_type='video/mp4', filename=os.path.basename(video_path))
+
+@app.get("/talker_jobs/{job_id}")
+async def talker_job(job_id: str):
+    """Status of a render job: queued / running / done / failed, current stage and frame counts."""
+    return job_info(job_id)
+
+@app.get("/talker_jobs/{job_id}/events")
+async def talker_job_events(job_id: str, last_event_id: Optional[int] = Header(None)):
+    """
+    Server-sent events for a render job: status changes and progress (stage, n, total) until it ends.
+    Reconnecting clients send Last-Event-ID to resume after the last event they received.
+    """
+    job_info(job_id)
+
+    # Async generator: open event streams wait on the event loop, not in a threadpool worker
+    async def stream():
+        async for event in get_job_queue().events_async(job_id, after=last_event_id or 0):
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/talker_jobs/{job_id}/result")
+async def talker_job_result(job_id: str):
+    """Download the video of a finished job (kept for JOB_TTL seconds after it ends)."""
+    job = job_info(job_id)
+    if job['status'] == 'failed':
+        raise HTTPException(status_code=500, detail=f"Video generation failed: {job['error']}")
+    video_path = get_job_queue().artifact(job_id)
+    if video_path is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return FileResponse(video_path, media_type='video/mp4', filename=os.path.basename(video_path))
 
 if __name__ == "__main__":
     import uvicorn
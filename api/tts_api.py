@@ -8,8 +8,9 @@ import asyncio
 from typing import Optional
 
 sys.path.append("./")
+from src.cost_time import instrument_app
 
-app = FastAPI()
+app = instrument_app(FastAPI())
 
 tts = None
 cosyvoice = None
@@ -106,7 +107,7 @@ def save_upload_file(upload_file: UploadFile, destination: str) -> str:
         buffer.write(upload_file.file.read())
     return destination
 
-def predict_edge_tts(request: TTSRequest):
+async def predict_edge_tts(request: TTSRequest):
     global edgetts
     if edgetts is None:
         raise HTTPException(status_code=400, detail="EdgeTTS 模型未加载")
@@ -114,9 +115,10 @@ def predict_edge_tts(request: TTSRequest):
         raise HTTPException(status_code=503, detail="EdgeTTS 模型网络问题")
 
     try:
-        edgetts.predict(request.text, request.voice, request.rate, request.volume, request.pitch, request.save_path, 'answer.vtt')
+        await edgetts.predict_async(request.text, request.voice, request.rate, request.volume, request.pitch, request.save_path, 'answer.vtt')
     except Exception as e:
-        os.system(f'edge-tts --text "{request.text}" --voice {request.voice} --write-media {request.save_path} --write-subtitles answer.vtt')
+        logger.error(f"EdgeTTS合成失败: {e}")
+        raise HTTPException(status_code=503, detail=f"EdgeTTS合成失败: {e}")
 
     return request.save_path
 
@@ -232,7 +234,7 @@ async def tts_response(
 
     try:
         if request.tts_method == 'EdgeTTS':
-            file_path = predict_edge_tts(request)
+            file_path = await predict_edge_tts(request)
         elif request.tts_method == 'PaddleTTS':
             file_path = predict_paddle_tts(request)
         elif request.tts_method == 'GPT-SoVITS克隆声音':
@@ -6,7 +6,7 @@ from LLM import LLM
 from ASR import WhisperASR
 from TFG import SadTalker 
 from TTS import EdgeTTS
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 
 from configs import *
 os.environ["GRADIO_TEMP_DIR"]= './temp'
@@ -46,7 +46,7 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -57,23 +57,20 @@ def Asr(audio):
         gr.Warning(question)
     return question
 
-@calculate_time
+@instrument
 def TTS_response(text, 
                  voice, rate, volume, pitch,):
-    try:
-        tts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
-    except:
-        os.system(f'edge-tts --text "{text}" --voice {voice} --write-media answer.wav --write-subtitles answer.vtt')
+    tts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
     return 'answer.wav', 'answer.vtt'
 
-@calculate_time
+@instrument
 def LLM_response(question, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 0, pitch = 0):
     answer = llm.generate(question)
     print(answer)
     answer_audio, answer_vtt, _ = TTS_response(answer, voice, rate, volume, pitch)
     return answer_audio, answer_vtt, answer
 
-@calculate_time
+@instrument
 def Talker_response(text, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 100, pitch = 0, batch_size = 2):
     voice = 'zh-CN-XiaoxiaoNeural' if voice not in tts.SUPPORTED_VOICE else voice
     # print(voice , rate , volume , pitch)
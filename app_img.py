@@ -6,7 +6,7 @@ from ASR import WhisperASR
 from TFG import SadTalker 
 from TTS import EdgeTTS
 
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 from configs import *
 description = """<p style="text-align: center; font-weight: bold;">
     <span style="font-size: 28px;">Linly 智能对话系统 (Linly-Talker)</span>
@@ -28,7 +28,7 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -39,23 +39,20 @@ def Asr(audio):
         gr.Warning(question)
     return question
 
-@calculate_time
+@instrument
 def TTS_response(text, 
                  voice, rate, volume, pitch,):
-    try:
-        tts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
-    except:
-        os.system(f'edge-tts --text "{text}" --voice {voice} --write-media answer.wav')
+    tts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
     return 'answer.wav', 'answer.vtt'
 
-@calculate_time
+@instrument
 def LLM_response(question, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 0, pitch = 0):
     answer = llm.generate(question)
     print(answer)
     TTS_response(answer, voice, rate, volume, pitch)
     return 'answer.wav', 'answer.vtt', answer
 
-@calculate_time
+@instrument
 def Talker_response(text, voice, rate, volume, pitch, source_image,
                     preprocess_type, 
                     is_still_mode,
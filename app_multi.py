@@ -8,7 +8,7 @@ from ASR import WhisperASR
 from TFG import SadTalker 
 from TTS import EdgeTTS
 
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 from configs import *
 os.environ["GRADIO_TEMP_DIR"]= './temp'
 
@@ -51,7 +51,7 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -62,17 +62,14 @@ def Asr(audio):
         gr.Warning(question)
     return question
 
-@calculate_time
+@instrument
 def LLM_response(question, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 0, pitch = 0):
     answer = llm.generate(question)
     print(answer)
-    try:
-        tts.predict(answer, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
-    except:
-        os.system(f'edge-tts --text "{answer}" --voice {voice} --write-media answer.wav')
+    tts.predict(answer, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
     return 'answer.wav', 'answer.vtt', answer
 
-@calculate_time
+@instrument
 def Talker_response(text, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 100, pitch = 0, batch_size = 2):
     voice = 'zh-CN-XiaoxiaoNeural' if voice not in tts.SUPPORTED_VOICE else voice
     talker = SadTalker(lazy_load=True)
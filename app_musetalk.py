@@ -1,7 +1,7 @@
 import os 
 import gradio as gr
 from zhconv import convert
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 from configs import *
 description = """<p style="text-align: center; font-weight: bold;">
     <span style="font-size: 28px;">Linly 智能对话系统 (Linly-Talker)</span>
@@ -23,7 +23,7 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -34,17 +34,14 @@ def Asr(audio):
         gr.Warning(question)
     return question
 
-@calculate_time
+@instrument
 def LLM_response(question, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 0, pitch = 0):
     answer = llm.generate(question)
     print(answer)
-    try:
-        os.system(f'edge-tts --text "{answer}" --voice {voice} --write-media answer.wav --write-subtitles answer.vtt')
-    except:
-        tts.predict(answer, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
+    tts.predict(answer, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
     return 'answer.wav', 'answer.vtt', answer
 
-@calculate_time
+@instrument
 def Talker_response(text, voice, rate, volume, pitch, source_video, bbox_shift):
     voice = 'zh-CN-XiaoxiaoNeural' if voice not in tts.SUPPORTED_VOICE else voice
     driven_audio, driven_vtt, _ = LLM_response(text, voice, rate, volume, pitch)
@@ -2,7 +2,7 @@ import os
 import random 
 import gradio as gr
 
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 
 from configs import *
 os.environ["GRADIO_TEMP_DIR"]= './temp'
@@ -38,23 +38,20 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def TTS_response(text, 
                  voice, rate, volume, pitch,
                  am, voc, lang, male,
                  tts_method = 'PaddleTTS', save_path = 'answer.wav'):
     print(text, voice, rate, volume, pitch, am, voc, lang, male, tts_method, save_path)
     if tts_method == 'Edge-TTS':
-        try:
-            edgetts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
-        except:
-            os.system(f'edge-tts --text "{text}" --voice {voice} --write-media answer.wav')
+        edgetts.predict(text, voice, rate, volume, pitch , 'answer.wav', 'answer.vtt')
         return 'answer.wav'
     elif tts_method == 'PaddleTTS':
         paddletts.predict(text, am, voc, lang = lang, male=male, save_path = save_path)
         return save_path
 
-@calculate_time
+@instrument
 def Talker_response(source_image, source_video, method = 'SadTalker', driven_audio = '', batch_size = 2):
     # print(source_image, method , driven_audio, batch_size)
     if source_video:
@@ -7,7 +7,7 @@ from ASR import WhisperASR, FunASR
 from TFG import SadTalker 
 from TTS import EdgeTTS
 from VITS import GPT_SoVITS
-from src.cost_time import calculate_time
+from src.cost_time import instrument
 
 from configs import *
 os.environ["GRADIO_TEMP_DIR"]= './temp'
@@ -48,7 +48,7 @@ ref_info = 'pose'
 use_idle_mode = False
 length_of_audio = 5
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -58,7 +58,7 @@ def Asr(audio):
         question = 'Gradio 的麦克风有时候可能音频还未传入，请重试一下'
     return question
 
-@calculate_time
+@instrument
 def LLM_response(question_audio, question, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 0, pitch = 0):
     answer = llm.generate(question)
     print(answer)
@@ -94,7 +94,7 @@ def LLM_response(question_audio, question, voice = 'zh-CN-XiaoxiaoNeural', rate
                     save_path = 'answer.wav')
     return 'answer.wav', None, answer
 
-@calculate_time
+@instrument
 def Talker_response(question_audio, text, voice = 'zh-CN-XiaoxiaoNeural', rate = 0, volume = 100, pitch = 0, batch_size = 2):
     # voice = 'zh-CN-XiaoxiaoNeural' if voice not in tts.SUPPORTED_VOICE else voice
     # print(voice , rate , volume , pitch)
@@ -0,0 +1,179 @@
+"""
+SadTalker audio2exp / audio2pose 推理基准测试
+
+使用随机初始化的权重（不需要下载模型），对比旧实现与批量实现：
+- audio2exp: 旧实现每 10 帧一次前向；新实现每次前向 128 帧
+- audio2pose: 旧实现逐 seq_len 窗口运行音频编码器与 CVAE 解码器；新实现所有帧一次编码、所有窗口并入 batch 维
+- 姿态平滑: 旧实现经 CPU numpy 调用 scipy savgol_filter；新实现 savgol_smooth 在张量上卷积
+
+先校验输出一致（相同随机种子下 z 采样相同），再测量耗时。
+
+用法:
+    python benchmarks/audio2coeff.py --seconds 60
+    python benchmarks/audio2coeff.py --seconds 60 --device cuda
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from scipy.signal import savgol_filter
+from yacs.config import CfgNode as CN
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.audio2pose_models.audio2pose import Audio2Pose
+from src.audio2exp_models.networks import SimpleWrapperV2
+from src.audio2exp_models.audio2exp import Audio2Exp
+from src.test_audio2coeff import savgol_smooth
+
+
+def legacy_exp_test(model, batch):
+    """改动前的 Audio2Exp.test（每 10 帧一次前向）"""
+    mel_input = batch['indiv_mels']
+    T = mel_input.shape[1]
+    exp_coeff_pred = []
+    for i in range(0, T, 10):
+        current_mel_input = mel_input[:,i:i+10]
+        ref = batch['ref'][:, :, :64][:, i:i+10]
+        ratio = batch['ratio_gt'][:, i:i+10]
+        audiox = current_mel_input.view(-1, 1, 80, 16)
+        exp_coeff_pred += [model.netG(audiox, ref, ratio)]
+    return torch.cat(exp_coeff_pred, axis=1)
+
+
+def legacy_pose_test(model, x):
+    """改动前的 Audio2Pose.test（逐窗口前向）"""
+    batch = {}
+    ref = x['ref']
+    batch['ref'] = x['ref'][:,0,-6:]
+    batch['class'] = x['class']
+    bs = ref.shape[0]
+    indiv_mels_use = x['indiv_mels'][:, 1:]
+    num_frames = int(x['num_frames']) - 1
+    div = num_frames//model.seq_len
+    re = num_frames%model.seq_len
+    pose_motion_pred_list = [torch.zeros(batch['ref'].unsqueeze(1).shape, dtype=batch['ref'].dtype,
+                                         device=batch['ref'].device)]
+    for i in range(div):
+        batch['z'] = torch.randn(bs, model.latent_dim).to(ref.device)
+        batch['audio_emb'] = model.audio_encoder(indiv_mels_use[:, i*model.seq_len:(i+1)*model.seq_len,:,:,:])
+        batch = model.netG.test(batch)
+        pose_motion_pred_list.append(batch['pose_motion_pred'])
+    if re != 0:
+        batch['z'] = torch.randn(bs, model.latent_dim).to(ref.device)
+        audio_emb = model.audio_encoder(indiv_mels_use[:, -1*model.seq_len:,:,:,:])
+        if audio_emb.shape[1] != model.seq_len:
+            pad_dim = model.seq_len-audio_emb.shape[1]
+            audio_emb = torch.cat([audio_emb[:, :1].repeat(1, pad_dim, 1), audio_emb], 1)
+        batch['audio_emb'] = audio_emb
+        batch = model.netG.test(batch)
+        pose_motion_pred_list.append(batch['pose_motion_pred'][:,-1*re:,:])
+    return ref[:, :1, -6:] + torch.cat(pose_motion_pred_list, dim = 1)
+
+
+def legacy_smooth(pose_pred, device):
+    pose_len = pose_pred.shape[1]
+    window = int((pose_len-1)/2)*2+1 if pose_len < 13 else 13
+    return torch.Tensor(savgol_filter(np.array(pose_pred.cpu()), window, 2, axis=1)).to(device)
+
+
+def new_smooth(pose_pred):
+    pose_len = pose_pred.shape[1]
+    window = int((pose_len-1)/2)*2+1 if pose_len < 13 else 13
+    return savgol_smooth(pose_pred.float(), window, 2)
+
+
+def build_models(device):
+    with open(os.path.join(ROOT, 'src', 'config', 'auido2pose.yaml')) as f:
+        cfg_pose = CN.load_cfg(f)
+    with open(os.path.join(ROOT, 'src', 'config', 'auido2exp.yaml')) as f:
+        cfg_exp = CN.load_cfg(f)
+    torch.manual_seed(0)
+    pose_model = Audio2Pose(cfg_pose, None, device=device).to(device).eval()
+    exp_model = Audio2Exp(SimpleWrapperV2().to(device).eval(), cfg_exp, device=device).eval()
+    # 随机化 BatchNorm 统计量，避免恒等归一化掩盖差异
+    for m in list(pose_model.modules()) + list(exp_model.modules()):
+        if isinstance(m, torch.nn.BatchNorm2d):
+            m.running_mean.uniform_(-0.1, 0.1)
+            m.running_var.uniform_(0.5, 1.5)
+    return pose_model, exp_model
+
+
+def make_batch(num_frames, device, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    return {
+        'indiv_mels': torch.randn(1, num_frames, 1, 80, 16, generator=g).to(device),
+        'ref': torch.randn(1, num_frames, 70, generator=g).to(device),
+        'ratio_gt': torch.rand(1, num_frames, 1, generator=g).to(device),
+        'num_frames': num_frames,
+        'class': torch.LongTensor([0]).to(device),
+    }
+
+
+def sync(device):
+    if device.startswith('cuda'):
+        torch.cuda.synchronize()
+
+
+def timed(fn, device, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        sync(device)
+        t0 = time.perf_counter()
+        out = fn()
+        sync(device)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+@torch.no_grad()
+def check(pose_model, exp_model, device):
+    for num_frames in [2, 3, 12, 13, 32, 33, 64, 65, 100]:
+        batch = make_batch(num_frames, device, seed=num_frames)
+        ref = legacy_exp_test(exp_model, batch)
+        out = exp_model.test(batch)['exp_coeff_pred']
+        assert torch.allclose(out, ref, atol=1e-4), f'audio2exp mismatch at {num_frames} frames'
+
+        torch.manual_seed(num_frames)
+        ref = legacy_pose_test(pose_model, batch)
+        torch.manual_seed(num_frames)
+        out = pose_model.test(batch)['pose_pred']
+        assert out.shape == ref.shape and torch.allclose(out, ref, atol=1e-4), f'audio2pose mismatch at {num_frames} frames'
+
+        if num_frames >= 3:
+            assert torch.allclose(new_smooth(ref), legacy_smooth(ref, device), atol=1e-5), \
+                f'savgol mismatch at {num_frames} frames'
+    print('regression check passed')
+
+
+@torch.no_grad()
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SadTalker audio2exp / audio2pose inference")
+    parser.add_argument("--seconds", type=float, default=60, help="音频时长（25fps）")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pose_model, exp_model = build_models(args.device)
+    check(pose_model, exp_model, args.device)
+
+    batch = make_batch(int(args.seconds * 25), args.device)
+    t_old, _ = timed(lambda: legacy_exp_test(exp_model, batch), args.device, args.repeat)
+    t_new, _ = timed(lambda: exp_model.test(batch), args.device, args.repeat)
+    print(f"audio2exp   legacy {t_old:7.3f}s  batched {t_new:7.3f}s  ({t_old / t_new:.1f}x)")
+
+    t_old, pose = timed(lambda: legacy_pose_test(pose_model, batch), args.device, args.repeat)
+    t_new, _ = timed(lambda: pose_model.test(batch), args.device, args.repeat)
+    print(f"audio2pose  legacy {t_old:7.3f}s  batched {t_new:7.3f}s  ({t_old / t_new:.1f}x)")
+
+    t_old, _ = timed(lambda: legacy_smooth(pose, args.device), args.device, args.repeat)
+    t_new, _ = timed(lambda: new_smooth(pose), args.device, args.repeat)
+    print(f"savgol      legacy {t_old * 1000:7.3f}ms batched {t_new * 1000:7.3f}ms ({t_old / t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
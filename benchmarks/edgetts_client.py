@@ -0,0 +1,229 @@
+"""
+EdgeTTS 客户端回归测试与连接池基准
+
+不访问网络：
+- 用桩客户端返回固定的 wav 字节，检查 predict(return_clip=True) 写出音频文件、
+  返回可解码的 AudioClip（webui 的 Edge-TTS -> 数字人流程依赖这一返回值）；
+- 用本地 websocket 替身服务（按 Edge 协议回复 audio 与 turn.end）检查 AsyncEdgeTTS：
+  连接 URL 的查询参数、连接复用、并发上限与按序拼接、服务端断开后重连；
+  再对比复用连接与每句新建连接的合成耗时。
+
+用法:
+    python benchmarks/edgetts_client.py --sentences 20 --delay-ms 5
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from scipy.io import wavfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LINLY_TIMING_VERBOSE', '0')
+
+from TTS.EdgeTTS import EdgeTTS
+from src.utils.audio_clip import AudioClip
+
+SR = 24000
+VOICE = 'zh-CN-XiaoxiaoNeural'
+
+
+def make_wav(seconds=0.5):
+    t = np.arange(int(SR * seconds)) / SR
+    buffer = io.BytesIO()
+    wavfile.write(buffer, SR, (np.sin(2 * np.pi * 220 * t) * 16000).astype(np.int16))
+    return buffer.getvalue()
+
+
+class StubClient:
+    """代替 AsyncEdgeTTS：记录调用参数，返回固定音频"""
+    def __init__(self, audio):
+        self.audio = audio
+        self.calls = []
+
+    async def synthesize_sentences(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        self.calls.append((text, voice, rate, volume, pitch))
+        return self.audio
+
+    async def close(self):
+        pass
+
+
+class StandInServer:
+    """
+    本地 Edge TTS websocket 替身：每个 ssml 请求等待 delay 秒后回复一段音频（内容为请求文本）与 turn.end。
+    close_after: 每个连接完成若干轮后由服务端主动断开；drop_first: 第一个请求不回复直接断开。
+    """
+    def __init__(self, delay=0.0, close_after=None, drop_first=False):
+        self.delay = delay
+        self.close_after = close_after
+        self.drop_first = drop_first
+        self.queries = []
+        self.active = 0
+        self.peak = 0
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_get('/edge', self.handler)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def url(self, query=''):
+        return 'ws://127.0.0.1:%d/edge%s' % (self.port, query)
+
+    async def handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.queries.append(dict(request.query))
+        turns = 0
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT or 'Path:ssml' not in msg.data:
+                continue
+            if self.drop_first:
+                self.drop_first = False
+                await ws.close()
+                break
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(self.delay)
+            self.active -= 1
+            text = re.search(r">([^<>]*)</prosody>", msg.data).group(1).encode('utf-8')
+            header = b"X-RequestId:0\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n"
+            await ws.send_bytes(len(header).to_bytes(2, 'big') + header + text)
+            await ws.send_str("X-RequestId:0\r\nContent-Type:application/json; charset=utf-8\r\n"
+                              "Path:turn.end\r\n\r\n{}")
+            turns += 1
+            if self.close_after is not None and turns >= self.close_after:
+                await ws.close()
+                break
+        return ws
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def make_tts(workdir, client=None, **kwargs):
+    # 预先写好语音列表缓存，避免构造时联网
+    voice_cache = os.path.join(workdir, 'voices.json')
+    with open(voice_cache, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': time.time(), 'voices': [VOICE]}, f)
+    tts = EdgeTTS(voice_cache=voice_cache, **kwargs)
+    if client is not None:
+        tts.client = client
+    return tts
+
+
+def synthesize(tts, text):
+    return tts._run(tts.client.synthesize(text, VOICE)).result()
+
+
+def check_pool(workdir):
+    # 连接复用：顺序合成只建立一个连接；URL 无查询串时也能正确追加参数
+    server = StandInServer()
+    tts = make_tts(workdir, max_concurrency=1, wss_url=server.url())
+    try:
+        for i in range(5):
+            assert synthesize(tts, 'sentence %d' % i) == b'sentence %d' % i
+        assert len(server.queries) == 1, server.queries
+        assert list(server.queries[0]) == ['ConnectionId'] and re.fullmatch('[0-9a-f]{32}', server.queries[0]['ConnectionId'])
+    finally:
+        tts.close()
+        server.close()
+
+    # 已带查询串的 URL 追加参数；并发上限内同时合成，结果按原顺序拼接
+    server = StandInServer(delay=0.05)
+    tts = make_tts(workdir, max_concurrency=2, wss_url=server.url('?TrustedClientToken=abc'))
+    try:
+        text = '第一句话在这里结束了。第二句话也在这里结束。第三句话同样在这里结束。第四句话最后在这里结束。'
+        sentences = [s for s in re.split('(?<=。)', text) if s]
+        audio = tts._run(tts.client.synthesize_sentences(text, VOICE)).result()
+        assert audio == ''.join(sentences).encode('utf-8')
+        assert server.peak == 2 and len(server.queries) == 2, (server.peak, server.queries)
+        assert all(q['TrustedClientToken'] == 'abc' and len(q['ConnectionId']) == 32 for q in server.queries)
+    finally:
+        tts.close()
+        server.close()
+
+    # 服务端在每轮结束后断开：下一次合成换新连接重试，调用方无感知
+    server = StandInServer(close_after=1)
+    tts = make_tts(workdir, max_concurrency=1, wss_url=server.url())
+    try:
+        for i in range(3):
+            assert synthesize(tts, 'reconnect %d' % i) == b'reconnect %d' % i
+        assert len(server.queries) == 3, server.queries
+    finally:
+        tts.close()
+        server.close()
+
+    # 请求发出后连接被断开：用新连接重试一次
+    server = StandInServer(drop_first=True)
+    tts = make_tts(workdir, max_concurrency=1, wss_url=server.url())
+    try:
+        assert synthesize(tts, 'dropped') == b'dropped'
+        assert len(server.queries) == 2, server.queries
+    finally:
+        tts.close()
+        server.close()
+
+
+def check(workdir):
+    audio = make_wav()
+    client = StubClient(audio)
+    tts = make_tts(workdir, client)
+    try:
+        output = os.path.join(workdir, 'answer.wav')
+        clip, subs = tts.predict('你好。', VOICE, 10, 100, -5, output, return_clip=True)
+        assert isinstance(clip, AudioClip) and subs is None, (clip, subs)
+        assert client.calls == [('你好。', VOICE, '+10%', '-0%', '-5Hz')], client.calls
+        assert clip.path == output and open(output, 'rb').read() == audio
+        assert clip.sample_rate is None, 'audio must be decoded lazily'
+        assert len(clip.pcm) == SR // 2 and clip.sample_rate == SR
+
+        # 默认仍返回文件路径
+        assert tts.predict('你好。', VOICE, 0, 100, 0, output) == (output, None)
+    finally:
+        tts.close()
+
+    check_pool(workdir)
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EdgeTTS client regression check and connection pool benchmark")
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=5, help="替身服务每句的合成耗时")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        check(workdir)
+
+        # 复用连接 vs 服务端每句后断开（等价于每句新建连接）
+        for name, close_after in (('pooled', None), ('reconnect', 1)):
+            server = StandInServer(delay=args.delay_ms / 1000, close_after=close_after)
+            tts = make_tts(workdir, max_concurrency=1, wss_url=server.url())
+            try:
+                t0 = time.perf_counter()
+                for i in range(args.sentences):
+                    synthesize(tts, 'sentence %d' % i)
+                elapsed = time.perf_counter() - t0
+            finally:
+                tts.close()
+                server.close()
+            print(f"{name:10s} {elapsed / args.sentences * 1e3:7.2f} ms/sentence  ({len(server.queries)} connections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+每次请求的视频编码次数基准测试 (encode passes per request)
+
+统计各 TFG 后端输出阶段启动了多少次有损视频编码（ffmpeg 进程或 cv2.VideoWriter），
+对比改动前的写法（imageio.mimsave / cv2.VideoWriter 写中间文件，再用 ffmpeg 合成音频重新编码）
+与统一的 videoio（FFmpegWriter 管道直接编码并混入音频）。
+
+使用随机帧模拟渲染结果，不需要模型，需要 ffmpeg（可用 FFMPEG_BINARY 指定）。
+
+用法:
+    python benchmarks/encode_passes.py --frames 100
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.utils import videoio
+from src.utils.paste_pic import paste_pic
+
+FFMPEG = videoio.FFMPEG
+
+
+class EncodeCounter:
+    """拦截 subprocess.Popen、os.system 与 cv2.VideoWriter，统计视频编码次数（纯流复制、只提取音频的不计）"""
+    def __init__(self):
+        self.count = 0
+
+    @staticmethod
+    def _is_encode(args):
+        cmd = args if isinstance(args, str) else ' '.join(str(a) for a in args)
+        if 'ffmpeg' not in cmd or ' -i ' not in cmd:
+            return False
+        if '-vcodec copy' in cmd or '-c:v copy' in cmd or ' -vn' in cmd:
+            return False
+        # imageio-ffmpeg 会启动 ffmpeg 探测编码器或解码读取，只统计输出到文件的编码
+        return '-f null' not in cmd and '-f image2pipe' not in cmd and not cmd.rstrip().endswith(' -')
+
+    def __enter__(self):
+        self._popen, self._writer, self._system = subprocess.Popen, cv2.VideoWriter, os.system
+        counter = self
+
+        class Popen(self._popen):
+            def __init__(self, args, *a, **kw):
+                if counter._is_encode(args):
+                    counter.count += 1
+                super().__init__(args, *a, **kw)
+
+        def video_writer(*a, **kw):
+            counter.count += 1
+            return counter._writer(*a, **kw)
+
+        def system(cmd):
+            if counter._is_encode(cmd):
+                counter.count += 1
+            return counter._system(cmd)
+
+        subprocess.Popen = Popen
+        cv2.VideoWriter = video_writer
+        os.system = system
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen, cv2.VideoWriter, os.system = self._popen, self._writer, self._system
+
+
+def legacy_save_video_with_watermark(video, audio, save_path):
+    """改动前的 save_video_with_watermark（h264 重新编码）"""
+    temp_file = str(uuid.uuid4()) + '.mp4'
+    cmd = r'%s -y -hide_banner -loglevel error -i "%s" -i "%s" -vcodec h264 "%s"' % (FFMPEG, video, audio, temp_file)
+    subprocess.run(cmd, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    shutil.move(temp_file, save_path)
+
+
+def legacy_paste_pic(video_path, full_img, crop_info, audio, full_video_path):
+    """改动前的 paste_pic：读回裁剪视频、写 MP4V 临时文件，再 h264 重新编码合成音频"""
+    video_stream = cv2.VideoCapture(video_path)
+    fps = video_stream.get(cv2.CAP_PROP_FPS)
+    crop_frames = []
+    while 1:
+        still_reading, frame = video_stream.read()
+        if not still_reading:
+            video_stream.release()
+            break
+        crop_frames.append(frame)
+    clx, cly, crx, cry = crop_info[1]
+    lx, ly, rx, ry = [int(v) for v in crop_info[2]]
+    oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
+    tmp_path = str(uuid.uuid4()) + '.mp4'
+    out_tmp = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MP4V'), fps, full_img.shape[1::-1])
+    for crop_frame in crop_frames:
+        p = cv2.resize(crop_frame.astype(np.uint8), (ox2-ox1, oy2 - oy1))
+        mask = 255*np.ones(p.shape, p.dtype)
+        location = ((ox1+ox2) // 2, (oy1+oy2) // 2)
+        out_tmp.write(cv2.seamlessClone(p, full_img, mask, location, cv2.NORMAL_CLONE))
+    out_tmp.release()
+    legacy_save_video_with_watermark(tmp_path, audio, full_video_path)
+    os.remove(tmp_path)
+
+
+def sadtalker_legacy(ctx, full):
+    import imageio
+    path = os.path.join(ctx['dir'], 'temp_sadtalker.mp4')
+    imageio.mimsave(path, ctx['frames_rgb'], fps=25.)
+    legacy_save_video_with_watermark(path, ctx['audio'], os.path.join(ctx['dir'], 'sadtalker.mp4'))
+    if full:
+        legacy_paste_pic(path, ctx['full_img'], ctx['crop_info'], ctx['audio'], os.path.join(ctx['dir'], 'sadtalker_full.mp4'))
+    os.remove(path)
+
+
+def sadtalker_videoio(ctx, full):
+    videoio.write_video(ctx['frames_rgb'], os.path.join(ctx['dir'], 'sadtalker.mp4'), 25., audio=ctx['audio'], rgb=True)
+    if full:
+        cv2.imwrite(ctx['pic'], ctx['full_img'])
+        paste_pic(ctx['frames_rgb'], ctx['pic'], ctx['crop_info'], ctx['audio'],
+                  os.path.join(ctx['dir'], 'sadtalker_full.mp4'), fps=25., rgb=True, workers=1)
+
+
+def wav2lipv2_legacy(ctx):
+    temp = os.path.join(ctx['dir'], 'tempface.mp4')
+    out = cv2.VideoWriter(temp, cv2.VideoWriter_fourcc(*'mp4v'), 25, ctx['frames'][0].shape[1::-1])
+    for frame in ctx['frames']:
+        out.write(frame)
+    out.release()
+    command = '{} -y -loglevel error -i "{}" -i "{}" -strict -2 -q:v 1 "{}"'.format(
+        FFMPEG, ctx['audio'], temp, os.path.join(ctx['dir'], 'wav2lipv2.mp4'))
+    subprocess.call(command, shell=True)
+
+
+def pipe_videoio(ctx):
+    """Wav2Lip / Wav2Lipv2 / MuseTalk 现在的写法：帧经管道直接编码并混入音频"""
+    with videoio.FFmpegWriter(os.path.join(ctx['dir'], 'output.mp4'), 25, ctx['frames'][0].shape[1::-1],
+                              audio=ctx['audio']) as writer:
+        for frame in ctx['frames']:
+            writer.write(frame)
+
+
+def musetalk_legacy(ctx):
+    tmp = os.path.join(ctx['dir'], 'tmp')
+    os.makedirs(tmp, exist_ok=True)
+    for i, frame in enumerate(ctx['frames']):
+        cv2.imwrite(f"{tmp}/{str(i).zfill(8)}.png", frame)
+    temp = os.path.join(ctx['dir'], 'temp.mp4')
+    os.system(f"{FFMPEG} -y -v error -r 25 -f image2 -i {tmp}/%08d.png -vcodec libx264 -vf format=rgb24,scale=out_color_matrix=bt709,format=yuv420p -crf 18 {temp}")
+    os.system(f"{FFMPEG} -y -v error -i {ctx['audio']} -i {temp} {os.path.join(ctx['dir'], 'musetalk.mp4')}")
+    os.remove(temp)
+    shutil.rmtree(tmp)
+
+
+def make_context(workdir, frames, size):
+    rng = np.random.RandomState(0)
+    full_img = cv2.GaussianBlur(rng.randint(0, 255, (size * 2, size * 2, 3)).astype(np.uint8), (15, 15), 4)
+    crop_frames = [cv2.GaussianBlur(rng.randint(0, 255, (size, size, 3)).astype(np.uint8), (7, 7), 2)
+                   for _ in range(frames)]
+    audio = os.path.join(workdir, 'audio.wav')
+    subprocess.run([FFMPEG, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=d=%f' % (frames / 25.), audio],
+                   check=True)
+    return {
+        'dir': workdir,
+        'audio': audio,
+        'frames': crop_frames,
+        'frames_rgb': [f[..., ::-1].copy() for f in crop_frames],
+        'full_img': full_img,
+        'pic': os.path.join(workdir, 'full.png'),
+        'crop_info': ((size, size), (size // 2, size // 2, size // 2 + size, size // 2 + size), (4, 4, size - 4, size - 4)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count video encode passes per request for each TFG output stage")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--size", type=int, default=256)
+    args = parser.parse_args()
+
+    os.environ.setdefault('IMAGEIO_FFMPEG_EXE', shutil.which(FFMPEG) or FFMPEG)
+    cases = [
+        ('SadTalker crop', lambda c: sadtalker_legacy(c, False), lambda c: sadtalker_videoio(c, False)),
+        ('SadTalker full', lambda c: sadtalker_legacy(c, True), lambda c: sadtalker_videoio(c, True)),
+        ('Wav2Lipv2', wav2lipv2_legacy, pipe_videoio),
+        ('MuseTalk', musetalk_legacy, pipe_videoio),
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            ctx = make_context(workdir, args.frames, args.size)
+            print(f"{'stage':<16} {'legacy':>18} {'videoio':>18}")
+            for name, legacy, current in cases:
+                row = []
+                for fn in (legacy, current):
+                    with EncodeCounter() as counter:
+                        t0 = time.perf_counter()
+                        fn(ctx)
+                        elapsed = time.perf_counter() - t0
+                    row.append(f"{counter.count} pass {elapsed:6.2f}s")
+                print(f"{name:<16} {row[0]:>18} {row[1]:>18}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+SadTalker 渲染输入构建基准测试 (get_facerender_data semantics)
+
+对比旧实现（逐帧 transform_semantic_target + np.array 拼接、gen_camera_pose 的 Python 循环）
+与向量化的 transform_semantic_target_batch / gen_camera_pose：
+先校验两者输出逐元素一致（回归检查），再测量耗时。
+
+用法:
+    python benchmarks/facerender_batch.py --frames 2000 --batch-size 2
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.generate_facerender_batch import transform_semantic_target, transform_semantic_target_batch, gen_camera_pose
+
+
+def legacy_target_semantics(generated_3dmm, semantic_radius, batch_size):
+    """改动前 get_facerender_data 中的实现"""
+    target_semantics_list = []
+    frame_num = generated_3dmm.shape[0]
+    for frame_idx in range(frame_num):
+        target_semantics = transform_semantic_target(generated_3dmm, frame_idx, semantic_radius)
+        target_semantics_list.append(target_semantics)
+
+    remainder = frame_num%batch_size
+    if remainder!=0:
+        for _ in range(batch_size-remainder):
+            target_semantics_list.append(target_semantics)
+
+    target_semantics_np = np.array(target_semantics_list)
+    target_semantics_np = target_semantics_np.reshape(batch_size, -1, target_semantics_np.shape[-2], target_semantics_np.shape[-1])
+    return torch.FloatTensor(target_semantics_np)
+
+
+def legacy_gen_camera_pose(camera_degree_list, frame_num, batch_size):
+    """改动前的 gen_camera_pose（去掉了调试输出）"""
+    new_degree_list = []
+    if len(camera_degree_list) == 1:
+        for _ in range(frame_num):
+            new_degree_list.append(camera_degree_list[0])
+        remainder = frame_num%batch_size
+        if remainder!=0:
+            for _ in range(batch_size-remainder):
+                new_degree_list.append(new_degree_list[-1])
+        new_degree_np = np.array(new_degree_list).reshape(batch_size, -1)
+        return new_degree_np
+
+    degree_sum = 0.
+    for i, degree in enumerate(camera_degree_list[1:]):
+        degree_sum += abs(degree-camera_degree_list[i])
+
+    degree_per_frame = degree_sum/(frame_num-1)
+    for i, degree in enumerate(camera_degree_list[1:]):
+        degree_last = camera_degree_list[i]
+        degree_step = degree_per_frame * abs(degree-degree_last)/(degree-degree_last)
+        new_degree_list =  new_degree_list + list(np.arange(degree_last, degree, degree_step))
+    if len(new_degree_list) > frame_num:
+        new_degree_list = new_degree_list[:frame_num]
+    elif len(new_degree_list) < frame_num:
+        for _ in range(frame_num-len(new_degree_list)):
+            new_degree_list.append(new_degree_list[-1])
+
+    remainder = frame_num%batch_size
+    if remainder!=0:
+        for _ in range(batch_size-remainder):
+            new_degree_list.append(new_degree_list[-1])
+    new_degree_np = np.array(new_degree_list).reshape(batch_size, -1)
+    return new_degree_np
+
+
+def check(frame_nums, batch_sizes, semantic_radius=13):
+    rng = np.random.RandomState(0)
+    for frame_num in frame_nums:
+        coeff = rng.randn(frame_num, 70)
+        for batch_size in batch_sizes:
+            ref = legacy_target_semantics(coeff, semantic_radius, batch_size)
+            out = torch.from_numpy(transform_semantic_target_batch(coeff, semantic_radius, batch_size))
+            assert out.shape == ref.shape and out.dtype == ref.dtype, (out.shape, ref.shape)
+            assert torch.equal(out, ref), f'target semantics mismatch: frames={frame_num} batch={batch_size}'
+            for degrees in ([15], [0, 20], [-10, 10, -5], [30, -30, 0, 10]):
+                if frame_num == 1 and len(degrees) > 1:
+                    continue  # 旧实现此时除零
+                ref = legacy_gen_camera_pose(degrees, frame_num, batch_size)
+                out = gen_camera_pose(degrees, frame_num, batch_size)
+                assert out.shape == ref.shape and np.allclose(out, ref, rtol=0, atol=1e-9), \
+                    f'camera pose mismatch: frames={frame_num} batch={batch_size} degrees={degrees}'
+    print('regression check passed')
+
+
+def bench(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark get_facerender_data semantics construction")
+    parser.add_argument("--frames", type=int, default=2000, help="帧数（25fps 下 80 秒）")
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check([1, 2, 7, 26, 27, 100, 101], [1, 2, 3, 8])
+
+    coeff = np.random.RandomState(1).randn(args.frames, 70)
+    t_old = bench(lambda: legacy_target_semantics(coeff, 13, args.batch_size), args.repeat)
+    t_new = bench(lambda: torch.from_numpy(transform_semantic_target_batch(coeff, 13, args.batch_size)), args.repeat)
+    print(f"target semantics  legacy {t_old * 1000:8.2f} ms  vectorized {t_new * 1000:8.2f} ms  ({t_old / t_new:.1f}x)")
+
+    degrees = [-20, 20, -10, 10, 0]
+    t_old = bench(lambda: legacy_gen_camera_pose(degrees, args.frames, args.batch_size), args.repeat)
+    t_new = bench(lambda: gen_camera_pose(degrees, args.frames, args.batch_size), args.repeat)
+    print(f"gen_camera_pose   legacy {t_old * 1000:8.2f} ms  vectorized {t_new * 1000:8.2f} ms  ({t_old / t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
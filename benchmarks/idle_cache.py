@@ -0,0 +1,117 @@
+"""
+待机视频缓存 (IdleClipCache) 基准测试
+
+用随机平滑帧模拟 SadTalker 待机渲染（不需要模型，每帧加入固定的渲染耗时），对比：
+- 每次待机请求都完整渲染一次（改动前的 use_idle_mode）
+- IdleClipCache：首次按时长档位渲染循环片段，之后循环拼接缓存片段（视频流复制）
+同时检查循环片段首尾衔接、形象变化与参数变化时缓存失效。需要 ffmpeg（可用 FFMPEG_BINARY 指定）。
+
+用法:
+    python benchmarks/idle_cache.py --requests 10 --seconds 8 --render-ms 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.utils.idle_cache import IdleClipCache, make_loopable
+from src.utils.videoio import VideoReader, write_video
+
+FPS = 25
+
+
+class Renderer:
+    """模拟待机渲染：逐帧生成缓慢变化的画面并编码为视频"""
+    def __init__(self, workdir, size, render_ms):
+        self.workdir = workdir
+        self.size = size
+        self.render_ms = render_ms
+        self.calls = 0
+
+    def __call__(self, seconds):
+        self.calls += 1
+        rng = np.random.RandomState(self.calls)
+        base = cv2.GaussianBlur(rng.randint(0, 255, (self.size, self.size, 3)).astype(np.uint8), (31, 31), 8)
+        frames = []
+        for i in range(int(round(seconds * FPS))):
+            time.sleep(self.render_ms / 1000.)
+            frames.append(np.roll(base, i, axis=1))
+        path = os.path.join(self.workdir, 'render_%d.mp4' % self.calls)
+        return write_video(frames, path, FPS)
+
+
+def check(workdir):
+    # 循环片段：最后一帧接回第一帧的跳变不大于片段内部相邻帧的跳变
+    frames = [np.full((8, 8, 3), v, np.uint8) for v in np.linspace(0, 200, 60)]
+    looped = make_loopable(frames, 12)
+    assert len(looped) == 48
+    steps = [np.abs(looped[i + 1].astype(int) - looped[i].astype(int)).max() for i in range(len(looped) - 1)]
+    seam = np.abs(looped[0].astype(int) - looped[-1].astype(int)).max()
+    assert seam <= max(steps) + 1, (seam, max(steps))
+
+    avatar = os.path.join(workdir, 'avatar.png')
+    cv2.imwrite(avatar, np.zeros((32, 32, 3), np.uint8))
+    renderer = Renderer(workdir, 64, 0)
+    cache = IdleClipCache(os.path.join(workdir, 'check_cache'))
+    settings = {'size': 256, 'preprocess': 'crop', 'fps': FPS}
+    out = os.path.join(workdir, 'idle.mp4')
+    cache.serve(avatar, settings, 3, out, renderer)
+    cache.serve(avatar, settings, 4.5, out, renderer)
+    assert renderer.calls == 1, 'same bucket should hit the cache'
+    assert abs(len(VideoReader(out)) - 4.5 * FPS) <= 2
+    cache.serve(avatar, settings, 12, out, renderer)
+    assert renderer.calls == 2 and abs(len(VideoReader(out)) - 12 * FPS) <= 2
+    cache.serve(avatar, dict(settings, size=512), 3, out, renderer)
+    assert renderer.calls == 3, 'changed settings must not hit'
+    cv2.imwrite(avatar, np.full((32, 32, 3), 255, np.uint8))
+    cache.serve(avatar, settings, 3, out, renderer)
+    assert renderer.calls == 4, 'changed avatar must not hit'
+    assert len(cache._index) == 1, 'clips of the old avatar should be removed'
+    # 索引持久化，重新打开后仍然命中
+    IdleClipCache(cache.cache_dir).serve(avatar, settings, 3, out, renderer)
+    assert renderer.calls == 4
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark idle clip cache")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--render-ms", type=float, default=40, help="模拟每帧渲染耗时")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        check(workdir)
+        avatar = os.path.join(workdir, 'avatar.png')
+        out = os.path.join(workdir, 'idle.mp4')
+
+        renderer = Renderer(workdir, args.size, args.render_ms)
+        t0 = time.perf_counter()
+        for _ in range(args.requests):
+            renderer(args.seconds)
+        t_old = time.perf_counter() - t0
+
+        renderer = Renderer(workdir, args.size, args.render_ms)
+        cache = IdleClipCache(os.path.join(workdir, 'cache'))
+        settings = {'size': args.size, 'fps': FPS}
+        t0 = time.perf_counter()
+        cache.serve(avatar, settings, args.seconds, out, renderer)
+        t_first = time.perf_counter() - t0
+        for _ in range(args.requests - 1):
+            cache.serve(avatar, settings, args.seconds, out, renderer)
+        t_new = time.perf_counter() - t0
+
+    print(f"render every time  {t_old:7.2f}s  ({t_old / args.requests:.2f}s/request)")
+    print(f"idle clip cache    {t_new:7.2f}s  (first {t_first:.2f}s, hit {(t_new - t_first) / max(args.requests - 1, 1):.3f}s/request)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+启动耗时基准测试 (Import-time benchmark)
+
+在独立子进程中测量 webui.py / api/tts_api.py 启动阶段的导入耗时与峰值内存，
+用于验证 GPT-SoVITS 全局模型延迟加载带来的启动开销下降。
+
+用法:
+    python benchmarks/import_time.py --repeat 3
+    python benchmarks/import_time.py --scenario tts_api --json import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 每个场景对应一段在全新解释器中执行的启动代码
+SCENARIOS = {
+    # webui.py __main__ 中 UI 启动前的导入与 GPT-SoVITS 初始化
+    "webui": "import webui\nfrom VITS import GPT_SoVITS\nGPT_SoVITS()",
+    # api/tts_api.py 导入以及切换到 GPT-SoVITS 时的类初始化
+    "tts_api": "import api.tts_api\nfrom VITS import GPT_SoVITS\nGPT_SoVITS()",
+    # 仅导入 VITS 包（EdgeTTS 用户同样会付出的开销）
+    "vits": "import VITS",
+}
+
+PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+exec(compile({code!r}, "<benchmark>", "exec"))
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("__BENCH__", elapsed, rss_kb)
+"""
+
+
+def run_once(code):
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=ROOT, code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("__BENCH__"):
+            _, elapsed, rss_kb = line.split()
+            return float(elapsed), int(rss_kb) / 1024
+    raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "benchmark failed")
+
+
+def run_scenario(name, repeat):
+    times, rss = [], []
+    for _ in range(repeat):
+        elapsed, peak_mb = run_once(SCENARIOS[name])
+        times.append(elapsed)
+        rss.append(peak_mb)
+    return {
+        "scenario": name,
+        "repeat": repeat,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "peak_rss_mb": max(rss),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup import time of Linly-Talker entry points")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="要测试的场景，可重复指定，默认全部")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景重复次数")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        try:
+            result = run_scenario(name, args.repeat)
+        except RuntimeError as e:
+            result = {"scenario": name, "error": str(e)}
+            print(f"{name:<10} failed: {e}")
+        else:
+            print(f"{name:<10} median {result['median_s']:.3f}s  "
+                  f"(min {result['min_s']:.3f}s, max {result['max_s']:.3f}s)  "
+                  f"peak RSS {result['peak_rss_mb']:.1f} MB")
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+阶段计时 (src/cost_time) 开销基准测试
+
+先校验嵌套 span、协程与线程中的 trace 传递、外部 trace_id 校验与 profile 文件命名、分位数与 Prometheus / JSON 导出，
+再测量每个 span 的额外开销（与直接调用空函数相比），确认可以放在逐批次的热路径上。
+
+用法:
+    python benchmarks/instrumentation.py --calls 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LINLY_TIMING_VERBOSE', '0')
+
+from src import cost_time
+from src.cost_time import instrument, record, registry, span, trace
+
+
+def check():
+    registry.reset()
+
+    @instrument('stage')
+    def stage(seconds):
+        time.sleep(seconds)
+
+    @instrument('async_stage')
+    async def async_stage():
+        await asyncio.sleep(0.001)
+        return cost_time.current_trace_id()
+
+    with trace('request', trace_id='abc') as t:
+        with span('outer', frames=3):
+            stage(0.001)
+            record('encode', 0.5)
+        assert asyncio.run(async_stage()) == 'abc', 'trace id must follow asyncio tasks'
+    root = t.to_dict()
+    assert [c['name'] for c in root['children']] == ['outer', 'async_stage']
+    assert [c['name'] for c in root['children'][0]['children']] == ['stage', 'encode']
+    assert root['children'][0]['attrs'] == {'frames': 3}
+
+    # 外部传入的 trace_id 只接受 [A-Za-z0-9_-]{1,64}，其它（路径穿越、过长）重新生成
+    for bad in ('../escaped', 'a/b', 'x' * 65, ''):
+        with trace('request', trace_id=bad) as t:
+            pass
+        assert t.trace_id != bad and re.fullmatch('[0-9a-f]{16}', t.trace_id), t.trace_id
+
+    # profile 文件名由新生成的 ID 决定，总在 PROFILE_DIR 内；结束前修改根 span 名称后按新名称统计
+    with tempfile.TemporaryDirectory() as tmp:
+        profile_dir, cost_time.PROFILE_DIR = cost_time.PROFILE_DIR, tmp
+        try:
+            with trace('GET unmatched', trace_id='req-1', profile='cprofile') as t:
+                t.root.name = 'GET /talker_jobs/{job_id}'
+        finally:
+            cost_time.PROFILE_DIR = profile_dir
+        assert t.trace_id == 'req-1' and os.path.dirname(t.profile_path) == tmp
+        assert re.fullmatch('[0-9a-f]{32}\\.prof', os.path.basename(t.profile_path)), t.profile_path
+    assert 'GET /talker_jobs/{job_id}' in registry.stats() and 'GET unmatched' not in registry.stats()
+
+    # 没有进行中的请求时，最外层调用自动成为新请求
+    stage(0)
+    assert registry.traces(1)[0]['name'] == 'stage'
+
+    for v in range(1, 101):
+        record('latency', v / 100)
+    stats = registry.stats()['latency']
+    assert stats['count'] == 100 and abs(stats['p50'] - 0.51) < 1e-9 and abs(stats['p99'] - 1.0) < 1e-9
+    text = cost_time.prometheus_text()
+    assert 'linly_stage_seconds_bucket{stage="latency",le="+Inf"} 100' in text
+    assert 'linly_stage_seconds_quantile{stage="latency",quantile="0.95"}' in text
+    assert json.loads(cost_time.metrics_json())['stages']['encode']['count'] == 1
+    registry.reset()
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark instrumentation overhead")
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    check()
+
+    def plain():
+        pass
+
+    timed = instrument('noop')(plain)
+    t0 = time.perf_counter()
+    for _ in range(args.calls):
+        plain()
+    t_plain = time.perf_counter() - t0
+    with trace('bench'):
+        t0 = time.perf_counter()
+        for _ in range(args.calls):
+            timed()
+        t_span = time.perf_counter() - t0
+    print(f"span overhead  {(t_span - t_plain) / args.calls * 1e6:6.2f} us/call  ({args.calls} calls)")
+
+
+if __name__ == "__main__":
+    main()
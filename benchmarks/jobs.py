@@ -0,0 +1,193 @@
+"""
+后台渲染任务队列 (src/utils/jobs) 基准测试
+
+先校验：submit 立即返回任务 ID、同一模型实例的任务依次执行（不同实例可并行）、pending 计数、
+tqdm 进度事件（阶段名 / 帧数）、按 ID 取回结果、失败状态、事件断点续传、异步订阅（不占用线程）以及 TTL 过期清理；
+再用一个模拟渲染（逐帧 sleep 的 tqdm 循环）对比同步渲染与提交任务时请求被阻塞的时间。
+
+用法:
+    python benchmarks/jobs.py --frames 50 --frame-ms 20 --requests 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LINLY_TIMING_VERBOSE', '0')
+
+from tqdm import tqdm
+
+from src.cost_time import span
+from src.utils.jobs import JobQueue
+
+
+def fake_render(out_dir, frames=10, frame_s=0.0, fail=False, running=None):
+    """模拟渲染：人脸检测 + 逐帧渲染两个 tqdm 循环，写出结果文件"""
+    if running is not None:
+        running.append(1)
+        peak = len(running)
+    with span('FakeTalker.render'):
+        for _ in tqdm(range(2), desc='Face Detection'):
+            pass
+        for _ in tqdm(range(frames)):
+            time.sleep(frame_s)
+    if running is not None:
+        running.pop()
+    if fail:
+        raise ValueError('broken audio')
+    path = tempfile.NamedTemporaryFile(dir=out_dir, suffix='.mp4', delete=False).name
+    with open(path, 'w') as f:
+        f.write('video' if running is None else str(peak))
+    return path
+
+
+class FakeTalker:
+    """非线程安全的模型实例：记录同时进入 predict 的调用数"""
+    def __init__(self):
+        self.running = []
+
+    def predict(self, out_dir, frames=3, frame_s=0.05):
+        return fake_render(out_dir, frames, frame_s, running=self.running)
+
+
+def job_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('job-')]
+
+
+def check():
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = JobQueue(os.path.join(tmp, 'jobs'), ttl=60)
+
+        # submit 立即返回，任务结束后按 ID 取回结果，输入临时目录被删除
+        upload = os.path.join(tmp, 'upload')
+        os.makedirs(upload)
+        t0 = time.perf_counter()
+        job_id = jobs.submit('SadTalker', fake_render, tmp, frames=5, frame_s=0.05, cleanup=[upload])
+        assert time.perf_counter() - t0 < 0.05, 'submit must not wait for the render'
+        assert jobs.get(job_id)['status'] in ('queued', 'running')
+        assert jobs.artifact(job_id) is None
+        events = [e for e in jobs.events(job_id) if e is not None]
+        status = jobs.get(job_id)
+        assert status['status'] == 'done' and status['n'] == 5 and status['total'] == 5, status
+        path = jobs.artifact(job_id)
+        assert os.path.dirname(path) == os.path.join(tmp, 'jobs', job_id) and open(path).read() == 'video'
+        assert not os.path.exists(upload), 'job inputs must be removed'
+
+        # 进度事件：阶段名取 desc，没有 desc 时取当前 span
+        assert [e['status'] for e in events if e['type'] == 'status'] == ['queued', 'running', 'done']
+        progress = [e for e in events if e['type'] == 'progress']
+        assert progress[0] == dict(progress[0], stage='Face Detection', n=0, total=2)
+        assert progress[-1] == dict(progress[-1], stage='FakeTalker.render', n=5, total=5)
+        assert [e['id'] for e in events] == list(range(1, len(events) + 1))
+        # 断点续传：只产出 Last-Event-ID 之后的事件
+        assert [e['id'] for e in jobs.events(job_id, after=3)] == [e['id'] for e in events[3:]]
+
+        # 异步订阅：与同步 events 产出相同的事件，心跳超时产出 None；
+        # 大量订阅者只在一个事件循环中等待，不新增线程
+        async def watch_async(job_id, subscribers=50):
+            async def collect():
+                return [e async for e in jobs.events_async(job_id, heartbeat=0.01)]
+            before = threading.active_count()
+            tasks = [asyncio.ensure_future(collect()) for _ in range(subscribers)]
+            await asyncio.sleep(0.05)
+            extra = threading.active_count() - before
+            results = await asyncio.gather(*tasks)
+            return results, extra, await jobs.wait_async(job_id)
+
+        job_id = jobs.submit('SadTalker', fake_render, tmp, frames=5, frame_s=0.03)
+        results, extra, status = asyncio.run(watch_async(job_id))
+        assert extra == 0, extra
+        assert status['status'] == 'done', status
+        assert all(None in r and [e for e in r if e is not None] == list(jobs.events(job_id)) for r in results)
+        assert asyncio.run(jobs.wait_async(job_id))['status'] == 'done'
+        assert not jobs._get(job_id).waiters, 'finished subscribers must unregister'
+
+        # 同一实例的任务依次执行，即使以不同模型名提交；显式传入 instance 与绑定方法效果相同
+        talker = FakeTalker()
+        ids = [jobs.submit('Wav2Lip', talker.predict, tmp) for _ in range(2)]
+        ids += [jobs.submit('Wav2Lipv2', FakeTalker.predict, talker, tmp, instance=talker) for _ in range(2)]
+        assert jobs.pending() == 4
+        peaks = [int(open(jobs.artifact(i)).read()) for i in ids if jobs.wait(i)['status'] == 'done']
+        assert peaks == [1] * 4, peaks
+
+        # 不同实例（例如更换模型前后）之间可以并行
+        talkers = [FakeTalker(), FakeTalker()]
+        ids = [jobs.submit('Wav2Lip', t.predict, tmp, frames=5) for t in talkers]
+        time.sleep(0.1)
+        assert jobs.get(ids[0])['status'] == jobs.get(ids[1])['status'] == 'running'
+        assert all(jobs.wait(i)['status'] == 'done' for i in ids)
+        assert jobs.pending() == 0
+
+        # 队列清空后工作线程退出，旧实例不会留下线程
+        deadline = time.time() + 2
+        while job_threads() and time.time() < deadline:
+            time.sleep(0.01)
+        assert not job_threads(), job_threads()
+
+        # 失败的任务报告错误，不产生结果
+        failed = jobs.submit('SadTalker', fake_render, tmp, fail=True)
+        status = jobs.wait(failed, timeout=10)
+        assert status['status'] == 'failed' and status['error'] == 'ValueError: broken audio', status
+        assert jobs.artifact(failed) is None
+
+        # 其它线程中的 tqdm 不受影响
+        bar = tqdm(range(3), disable=True)
+        assert getattr(bar, '_linly_job', None) is None
+
+        # TTL 过期后任务与结果目录一起删除
+        jobs.ttl = 0
+        time.sleep(0.01)
+        assert jobs.purge() >= 1 and jobs.get(job_id) is None and not os.path.exists(path)
+        assert list(jobs.events(job_id)) == []
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request blocking time with the render job queue")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--frame-ms", type=float, default=20)
+    parser.add_argument("--requests", type=int, default=4)
+    args = parser.parse_args()
+
+    check()
+
+    frame_s = args.frame_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        for _ in range(args.requests):
+            os.remove(fake_render(tmp, args.frames, frame_s))
+        t_sync = (time.perf_counter() - t0) / args.requests
+
+        jobs = JobQueue(os.path.join(tmp, 'jobs'), ttl=60)
+        t0 = time.perf_counter()
+        ids = [jobs.submit('SadTalker', fake_render, tmp, args.frames, frame_s) for _ in range(args.requests)]
+        t_submit = (time.perf_counter() - t0) / args.requests
+        first_progress = []
+
+        def watch(job_id):
+            start = time.perf_counter()
+            for event in jobs.events(job_id):
+                if event is not None and event['type'] == 'progress':
+                    first_progress.append(time.perf_counter() - start)
+                    return
+
+        watcher = threading.Thread(target=watch, args=(ids[-1],))
+        watcher.start()
+        for job_id in ids:
+            jobs.wait(job_id)
+        t_total = time.perf_counter() - t0
+        watcher.join()
+
+    print(f"sync render      {t_sync * 1e3:8.1f} ms/request blocked")
+    print(f"job submit       {t_submit * 1e3:8.3f} ms/request blocked")
+    print(f"queue drained    {t_total * 1e3:8.1f} ms for {args.requests} requests (concurrency 1)")
+    print(f"last job         first progress event after {first_progress[0] * 1e3:.1f} ms (waits in queue)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+NeRF 纯 PyTorch 后端一致性检查与 CPU 帧率基准
+
+1. 一致性：把 raymarching / gridencoder / freqencoder / shencoder 的 PyTorch 实现与
+   CUDA kernel 的逐光线标量转写（float32，在 CPU 上计算的小规模样例）逐项对比；
+   有 GPU 且 CUDA 扩展可用时，同时与 CUDA 扩展的输出对比。
+2. 帧率：用真实的编码器（hashgrid 三平面 + SH）与一个小 MLP 组成替身辐射场，
+   按 NeRFRenderer.run_cuda 的推理循环（march_rays -> 网络 -> composite_rays_triplane）
+   以较低分辨率渲染，统计不同 max_ray_batch 下的 fps。
+
+用法:
+    python benchmarks/nerf_cpu_backend.py
+    python benchmarks/nerf_cpu_backend.py --height 128 --width 128 --frames 5 --max-ray-batch 4096 16384
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'NeRF'))
+
+import extensions
+import raymarching
+from gridencoder import GridEncoder
+from gridencoder import torch_impl as grid_torch
+from freqencoder import torch_impl as freq_torch
+from shencoder import torch_impl as sh_torch
+
+f32 = np.float32
+SQRT3 = f32(1.7320508075688772)
+
+
+# ----------------------------------------
+# CUDA kernel 的逐光线标量转写（参考实现）
+# ----------------------------------------
+
+def ref_expand_bits(v):
+    v = (v * 0x00010001) & 0xFF0000FF
+    v = (v * 0x00000101) & 0x0F00F00F
+    v = (v * 0x00000011) & 0xC30C30C3
+    v = (v * 0x00000005) & 0x49249249
+    return v
+
+
+def ref_morton3D(x, y, z):
+    return ref_expand_bits(x) | (ref_expand_bits(y) << 1) | (ref_expand_bits(z) << 2)
+
+
+def ref_clamp(x, lo, hi):
+    return f32(min(hi, max(lo, x)))
+
+
+def ref_mip(x, C):
+    return int(min(C - 1, max(0, np.frexp(f32(x))[1])))
+
+
+def ref_near_far(rays_o, rays_d, aabb, min_near):
+    nears, fars = [], []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for o, d in zip(rays_o, rays_d):
+            rd = f32(1) / d
+            near, far = None, None
+            hit = True
+            for k in range(3):
+                n_k, f_k = (aabb[k] - o[k]) * rd[k], (aabb[k + 3] - o[k]) * rd[k]
+                if n_k > f_k:
+                    n_k, f_k = f_k, n_k
+                if k == 0:
+                    near, far = n_k, f_k
+                    continue
+                if near > f_k or n_k > far:
+                    hit = False
+                    break
+                near, far = max(near, n_k), min(far, f_k)
+            if not hit:
+                near = far = np.finfo(np.float32).max
+            elif near < min_near:
+                near = f32(min_near)
+            nears.append(near)
+            fars.append(far)
+    return np.array(nears, f32), np.array(fars, f32)
+
+
+def ref_march(n_alive, n_step, rays_alive, rays_t, rays_o, rays_d, bound, bitfield, C, H, nears, fars, dt_gamma, max_steps):
+    xyzs = np.zeros((n_alive * n_step, 3), f32)
+    dirs = np.zeros((n_alive * n_step, 3), f32)
+    deltas = np.zeros((n_alive * n_step, 2), f32)
+    dt_max = f32(2) * SQRT3 * f32(1 << (C - 1)) / f32(H)
+    dt_min = min(dt_max, f32(2) * SQRT3 / f32(max_steps))
+    rH, H3, bound, dt_gamma = f32(1) / f32(H), H * H * H, f32(bound), f32(dt_gamma)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for n in range(n_alive):
+            index = rays_alive[n]
+            o, d = rays_o[index], rays_d[index]
+            rd = f32(1) / d
+            t, far = rays_t[index], fars[index]
+            step = 0
+            while t < far and step < n_step:
+                x = np.array([ref_clamp(o[k] + t * d[k], -bound, bound) for k in range(3)], f32)
+                dt = ref_clamp(t * dt_gamma, dt_min, dt_max)
+                level = max(ref_mip(np.abs(x).max(), C), ref_mip(dt * f32(H) * f32(0.5), C))
+                mip_bound = min(f32(2.0 ** level), bound)
+                mip_rbound = f32(1) / mip_bound
+                ng = [int(ref_clamp(f32(0.5 * float(x[k] * mip_rbound + f32(1)) * H), f32(0), f32(H - 1))) for k in range(3)]
+                idx = level * H3 + ref_morton3D(*ng)
+                if (bitfield[idx // 8] >> (idx % 8)) & 1:
+                    out = n * n_step + step
+                    xyzs[out], dirs[out] = x, d
+                    t = f32(t + dt)
+                    deltas[out] = dt, t
+                    step += 1
+                else:
+                    tv = [(((f32(ng[k]) + f32(0.5) + f32(0.5) * f32(np.copysign(1, d[k]))) * rH * f32(2) - f32(1)) * mip_bound - x[k]) * rd[k] for k in range(3)]
+                    tt = f32(t + max(f32(0), np.fmin(tv[0], np.fmin(tv[1], tv[2]))))
+                    while True:
+                        t = f32(t + ref_clamp(t * dt_gamma, dt_min, dt_max))
+                        if not t < tt:
+                            break
+    return xyzs, dirs, deltas
+
+
+def ref_composite_triplane(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, ambs_aud, ambs_eye, uncertainties, weights_sum, depth, image, amb_aud_sum, amb_eye_sum, uncertainty_sum, T_thresh):
+    for n in range(n_alive):
+        index = rays_alive[n]
+        t, ws, d, rgb = rays_t[index], weights_sum[index], depth[index], image[index].copy()
+        a_aud, a_eye, u = amb_aud_sum[index], amb_eye_sum[index], uncertainty_sum[index]
+        step = 0
+        while step < n_step:
+            i = n * n_step + step
+            if deltas[i, 0] == 0:
+                break
+            alpha = f32(1) - np.exp(-sigmas[i] * deltas[i, 0])
+            T = f32(1) - ws
+            weight = alpha * T
+            ws = f32(ws + weight)
+            t = deltas[i, 1]
+            d = f32(d + weight * t)
+            rgb = rgb + weight * rgbs[i]
+            a_aud, a_eye = f32(a_aud + ambs_aud[i]), f32(a_eye + ambs_eye[i])
+            u = f32(u + weight * uncertainties[i])
+            if T < T_thresh:
+                break
+            step += 1
+        if step < n_step:
+            rays_alive[n] = -1
+        else:
+            rays_t[index] = t
+        weights_sum[index], depth[index], image[index] = ws, d, rgb
+        amb_aud_sum[index], amb_eye_sum[index], uncertainty_sum[index] = a_aud, a_eye, u
+
+
+def ref_grid_encode(inputs, embeddings, offsets, per_level_scale, H, gridtype, align_corners):
+    primes = [1, 2654435761, 805459861]
+    B, D = inputs.shape
+    L, C = len(offsets) - 1, embeddings.shape[1]
+    S = f32(np.log2(per_level_scale))
+    outputs = np.zeros((B, L * C), f32)
+    for b in range(B):
+        if ((inputs[b] < 0) | (inputs[b] > 1)).any():
+            continue
+        for level in range(L):
+            hashmap_size = offsets[level + 1] - offsets[level]
+            scale = f32(np.exp2(f32(level) * S) * f32(H) - f32(1))
+            resolution = int(np.ceil(scale)) + 1
+            pos = inputs[b] * scale + f32(0 if align_corners else 0.5)
+            pos_grid = np.floor(pos).astype(np.int64)
+            pos = pos - pos_grid.astype(f32)
+            for idx in range(1 << D):
+                w = f32(1)
+                local = []
+                for d in range(D):
+                    bit = (idx >> d) & 1
+                    w = w * (pos[d] if bit else f32(1) - pos[d])
+                    local.append(int(pos_grid[d]) + bit)
+                stride, index = 1, 0
+                for d in range(D):
+                    if stride > hashmap_size:
+                        break
+                    index += local[d] * stride
+                    stride *= resolution if align_corners else resolution + 1
+                if gridtype == 0 and stride > hashmap_size:
+                    index = 0
+                    for d in range(D):
+                        index ^= (local[d] * primes[d]) & 0xFFFFFFFF
+                index = offsets[level] + index % hashmap_size
+                outputs[b, level * C:(level + 1) * C] += w * embeddings[index]
+    return outputs
+
+
+def ref_freq_encode(inputs, degree):
+    out = [inputs]
+    for f in range(degree):
+        x = inputs * f32(2 ** f)
+        out += [np.sin(x), np.sin(x + f32(np.pi / 2))]
+    return np.concatenate(out, -1).astype(f32)
+
+
+def ref_sh4(inputs):
+    x, y, z = inputs[:, 0].astype(np.float64), inputs[:, 1].astype(np.float64), inputs[:, 2].astype(np.float64)
+    c0, c1, c2 = 0.5 / np.sqrt(np.pi), np.sqrt(3) / (2 * np.sqrt(np.pi)), np.sqrt(15) / (2 * np.sqrt(np.pi))
+    return np.stack([
+        np.full_like(x, c0), -c1 * y, c1 * z, -c1 * x,
+        c2 * x * y, -c2 * y * z, np.sqrt(5) * (3 * z * z - 1) / (4 * np.sqrt(np.pi)), -c2 * x * z, c2 * (x * x - y * y) / 2,
+        np.sqrt(70) * y * (-3 * x * x + y * y) / (8 * np.sqrt(np.pi)), np.sqrt(105) * x * y * z / (2 * np.sqrt(np.pi)),
+        np.sqrt(42) * y * (1 - 5 * z * z) / (8 * np.sqrt(np.pi)), np.sqrt(7) * z * (5 * z * z - 3) / (4 * np.sqrt(np.pi)),
+        np.sqrt(42) * x * (1 - 5 * z * z) / (8 * np.sqrt(np.pi)), np.sqrt(105) * z * (x * x - y * y) / (4 * np.sqrt(np.pi)),
+        np.sqrt(70) * x * (-x * x + 3 * y * y) / (8 * np.sqrt(np.pi)),
+    ], -1)
+
+
+# ----------------------------------------
+# 样例场景
+# ----------------------------------------
+
+def make_scene(num_rays, C=2, H=32, bound=2, seed=0):
+    rng = np.random.RandomState(seed)
+    # 相机在包围盒外，光线大致朝向原点
+    cam = rng.uniform(-1, 1, (num_rays, 3)).astype(f32)
+    cam = cam / np.linalg.norm(cam, axis=-1, keepdims=True) * f32(2.5 * bound)
+    target = rng.uniform(-0.5 * bound, 0.5 * bound, (num_rays, 3)).astype(f32)
+    rays_d = target - cam
+    rays_d = (rays_d / np.linalg.norm(rays_d, axis=-1, keepdims=True)).astype(f32)
+    rays_d[0, 1] = 0  # 轴平行光线，检查除零路径
+    # 各级 cascade 中位于半径 0.6 球内的体素占用，外加随机噪声
+    coords = np.stack(np.meshgrid(*[np.arange(H)] * 3, indexing='ij'), -1).reshape(-1, 3)
+    morton = ref_morton3D(coords[:, 0], coords[:, 1], coords[:, 2])
+    grid = np.zeros((C, H ** 3), f32)
+    for c in range(C):
+        p = (coords + 0.5) / H * 2 - 1
+        occ = (np.linalg.norm(p, axis=-1) < 0.6) ^ (rng.rand(H ** 3) < 0.05)
+        grid[c, morton] = occ.astype(f32) * 20
+    return torch.from_numpy(cam), torch.from_numpy(rays_d), torch.from_numpy(grid)
+
+
+def report(name, a, b, atol):
+    a = a.detach().cpu().numpy() if torch.is_tensor(a) else np.asarray(a)
+    b = b.detach().cpu().numpy() if torch.is_tensor(b) else np.asarray(b)
+    diff = float(np.abs(a.astype(np.float64) - b.astype(np.float64)).max()) if a.size else 0.0
+    ok = a.shape == b.shape and diff <= atol
+    print(f"  {'ok' if ok else 'FAIL':<5}{name:<34} max abs diff {diff:.3g}")
+    return ok
+
+
+def check_parity(num_rays=64, n_step=4):
+    print("[INFO] torch backend vs scalar CUDA kernel transcription")
+    extensions.set_backend('torch')
+    C, H, bound, min_near, dt_gamma, max_steps, T_thresh = 2, 32, 2, 0.05, 1 / 256, 64, 1e-4
+    rays_o, rays_d, grid = make_scene(num_rays, C, H, bound)
+    aabb = torch.tensor([-bound, -bound, -bound, bound, bound, bound], dtype=torch.float32)
+    results = []
+
+    coords = torch.randint(0, 128, (1000, 3), dtype=torch.int32)
+    morton = raymarching.morton3D(coords)
+    results.append(report('morton3D', morton, ref_morton3D(*coords.long().numpy().T), 0))
+    results.append(report('morton3D_invert', raymarching.morton3D_invert(morton), coords, 0))
+
+    bitfield = raymarching.packbits(grid, 10)
+    results.append(report('packbits', bitfield, np.packbits(grid.numpy().reshape(-1) > 10, bitorder='little'), 0))
+
+    small = torch.rand(2, 8 ** 3)
+    dense = np.zeros((2, 8, 8, 8), f32)
+    xyz = raymarching.morton3D_invert(torch.arange(8 ** 3)).long().numpy()
+    dense[:, xyz[:, 0], xyz[:, 1], xyz[:, 2]] = small.numpy()
+    dilated = dense.copy()
+    for axis in (1, 2, 3):
+        for shift in (1, -1):
+            rolled = np.roll(dense, shift, axis)
+            edge = [slice(None)] * 4
+            edge[axis] = 0 if shift == 1 else -1
+            rolled[tuple(edge)] = -np.inf
+            dilated = np.maximum(dilated, rolled)
+    results.append(report('morton3D_dilation', raymarching.morton3D_dilation(small), dilated[:, xyz[:, 0], xyz[:, 1], xyz[:, 2]], 0))
+
+    nears, fars = raymarching.near_far_from_aabb(rays_o, rays_d, aabb, min_near)
+    ref_nears, ref_fars = ref_near_far(rays_o.numpy(), rays_d.numpy(), aabb.numpy(), min_near)
+    results.append(report('near_far_from_aabb', torch.stack([nears, fars]), np.stack([ref_nears, ref_fars]), 1e-5))
+
+    # 完整的推理循环：torch 实现与参考实现各自维护状态，逐轮对比
+    N = num_rays
+    state = {}
+    for name in ('torch', 'ref'):
+        state[name] = dict(rays_alive=torch.arange(N, dtype=torch.int32), rays_t=nears.clone(),
+                           sums=[torch.zeros(N) for _ in range(5)], image=torch.zeros(N, 3))
+    field = torch.Generator().manual_seed(0)
+    step, rounds, marched_ok = 0, 0, True
+    while step < max_steps:
+        ts, rs = state['torch'], state['ref']
+        n_alive = ts['rays_alive'].shape[0]
+        if n_alive <= 0:
+            break
+        n_step = max(min(N // n_alive, 8), 1)
+        xyzs, dirs, deltas = raymarching.march_rays(n_alive, n_step, ts['rays_alive'], ts['rays_t'], rays_o, rays_d, bound, bitfield, C, H, nears, fars, 128, False, dt_gamma, max_steps)
+        ref = ref_march(n_alive, n_step, rs['rays_alive'].numpy(), rs['rays_t'].numpy(), rays_o.numpy(), rays_d.numpy(), bound, bitfield.numpy(), C, H, nears.numpy(), fars.numpy(), dt_gamma, max_steps)
+        M = n_alive * n_step
+        marched_ok &= all(np.allclose(a[:M].numpy(), b, atol=1e-5) for a, b in zip((xyzs, dirs, deltas), ref))
+
+        # 替身网络输出（两边共用同一份）
+        sigmas, rgbs, amb_aud, amb_eye, unc = [torch.rand(xyzs.shape[0], *s, generator=field) * k for s, k in (((), 30), ((3,), 1), ((), 1), ((), 1), ((), 1))]
+        weights_sum, depth, amb_aud_sum, amb_eye_sum, unc_sum = ts['sums']
+        raymarching.composite_rays_triplane(n_alive, n_step, ts['rays_alive'], ts['rays_t'], sigmas, rgbs, deltas, amb_aud, amb_eye, unc, weights_sum, depth, ts['image'], amb_aud_sum, amb_eye_sum, unc_sum, T_thresh)
+        ref_alive = rs['rays_alive'].numpy().copy()
+        ref_t = rs['rays_t'].numpy()
+        ref_sums = [s.numpy() for s in rs['sums']]
+        ref_composite_triplane(n_alive, n_step, ref_alive, ref_t, sigmas.numpy(), rgbs.numpy(), torch.from_numpy(ref[2]).numpy(), amb_aud.numpy(), amb_eye.numpy(), unc.numpy(),
+                               ref_sums[0], ref_sums[1], rs['image'].numpy(), ref_sums[2], ref_sums[3], ref_sums[4], T_thresh)
+        marched_ok &= np.array_equal(ts['rays_alive'].numpy(), ref_alive)
+
+        ts['rays_alive'] = ts['rays_alive'][ts['rays_alive'] >= 0]
+        rs['rays_alive'] = torch.from_numpy(ref_alive[ref_alive >= 0])
+        step += n_step
+        rounds += 1
+
+    results.append(report(f'march_rays ({rounds} rounds)', float(not marched_ok), 0.0, 0))
+    for i, name in enumerate(('weights_sum', 'depth', 'amb_aud_sum', 'amb_eye_sum', 'uncertainty_sum')):
+        results.append(report(f'composite_rays_triplane {name}', state['torch']['sums'][i], state['ref']['sums'][i], 1e-4))
+    results.append(report('composite_rays_triplane image', state['torch']['image'], state['ref']['image'], 1e-4))
+
+    for gridtype, D, log2_hashmap_size, align_corners in (('hash', 3, 10, False), ('hash', 2, 14, False), ('tiled', 2, 16, True)):
+        encoder = GridEncoder(input_dim=D, num_levels=4, level_dim=2, base_resolution=16, log2_hashmap_size=log2_hashmap_size, desired_resolution=256, gridtype=gridtype, align_corners=align_corners)
+        encoder.embeddings.data.uniform_(-1, 1)
+        inputs = torch.rand(200, D) * 1.1 - 0.05  # 少量越界输入
+        out = grid_torch.grid_encode(inputs, encoder.embeddings, encoder.offsets, encoder.per_level_scale, encoder.base_resolution, False, encoder.gridtype_id, align_corners)
+        ref = ref_grid_encode(inputs.numpy(), encoder.embeddings.detach().numpy(), encoder.offsets.tolist(), encoder.per_level_scale, encoder.base_resolution, encoder.gridtype_id, align_corners)
+        results.append(report(f'grid_encode ({gridtype}, D={D})', out, ref, 1e-5))
+
+    inputs = torch.rand(100, 3) * 2 - 1
+    results.append(report('freq_encode', freq_torch.freq_encode(inputs, 6, 39), ref_freq_encode(inputs.numpy(), 6), 1e-5))
+    inputs = inputs / inputs.norm(dim=-1, keepdim=True)
+    results.append(report('sh_encode (degree 4)', sh_torch.sh_encode(inputs, 4), ref_sh4(inputs.numpy()), 1e-5))
+
+    if torch.cuda.is_available():
+        extensions.set_backend('auto')
+        if not raymarching.use_torch_backend():
+            print("[INFO] torch backend vs CUDA extension")
+            cuda_nears, cuda_fars = raymarching.near_far_from_aabb(rays_o.cuda(), rays_d.cuda(), aabb.cuda(), min_near)
+            results.append(report('near_far_from_aabb (cuda)', torch.stack([cuda_nears, cuda_fars]).cpu(), torch.stack([nears, fars]), 1e-5))
+            n_alive = N
+            rays_alive = torch.arange(N, dtype=torch.int32)
+            args = (n_alive, 4, rays_alive, nears, rays_o, rays_d, bound, bitfield, C, H, nears, fars, -1, False, dt_gamma, max_steps)
+            cuda_out = raymarching.march_rays(*[a.cuda() if torch.is_tensor(a) else a for a in args])
+            extensions.set_backend('torch')
+            torch_out = raymarching.march_rays(*args)
+            for name, a, b in zip(('xyzs', 'dirs', 'deltas'), cuda_out, torch_out):
+                # CUDA 中的 FMA 可能导致个别样本在体素边界处落入不同格子
+                results.append(report(f'march_rays {name} (cuda)', a.cpu(), b, 1e-3))
+    extensions.set_backend('torch')
+
+    print(f"[INFO] {sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+# ----------------------------------------
+# 帧率
+# ----------------------------------------
+
+class TinyField(nn.Module):
+    """与 NeRFNetwork 推理接口一致的替身辐射场：三平面 hashgrid + SH 方向编码 + 小 MLP"""
+    def __init__(self, bound=1, hidden=64):
+        super().__init__()
+        self.bound = bound
+        self.planes = nn.ModuleList([GridEncoder(input_dim=2, num_levels=12, level_dim=1, base_resolution=64, log2_hashmap_size=14, desired_resolution=512 * bound) for _ in range(3)])
+        from shencoder import SHEncoder
+        self.encoder_dir = SHEncoder(degree=4)
+        self.sigma_net = nn.Sequential(nn.Linear(36, hidden), nn.ReLU(), nn.Linear(hidden, 1 + 15))
+        self.color_net = nn.Sequential(nn.Linear(15 + 16, hidden), nn.ReLU(), nn.Linear(hidden, 3))
+
+    def forward(self, xyzs, dirs):
+        x, y, z = xyzs.unbind(-1)
+        feat = torch.cat([self.planes[0](torch.stack([x, y], -1), bound=self.bound),
+                          self.planes[1](torch.stack([y, z], -1), bound=self.bound),
+                          self.planes[2](torch.stack([x, z], -1), bound=self.bound)], -1)
+        h = self.sigma_net(feat)
+        sigma = torch.exp(h[..., 0])
+        rgb = torch.sigmoid(self.color_net(torch.cat([h[..., 1:], self.encoder_dir(dirs)], -1)))
+        zeros = torch.zeros_like(sigma)
+        return sigma, rgb, zeros, zeros, zeros
+
+
+def render_rays(field, rays_o, rays_d, bitfield, C, H, bound, max_ray_batch, dt_gamma=1 / 256, max_steps=16, T_thresh=1e-4):
+    """NeRFRenderer.run_cuda 推理分支的同构实现"""
+    N = rays_o.shape[0]
+    aabb = torch.tensor([-bound, -bound, -bound, bound, bound, bound], dtype=torch.float32)
+    nears, fars = raymarching.near_far_from_aabb(rays_o, rays_d, aabb, 0.05)
+    weights_sum, depth, amb_aud_sum, amb_eye_sum, uncertainty_sum = [torch.zeros(N) for _ in range(5)]
+    image = torch.zeros(N, 3)
+    rays_t = nears.clone()
+    batch = max_ray_batch if max_ray_batch > 0 else N
+    samples = 0
+    for head in range(0, N, batch):
+        n_rays = min(batch, N - head)
+        rays_alive = torch.arange(head, head + n_rays, dtype=torch.int32)
+        step = 0
+        while step < max_steps:
+            n_alive = rays_alive.shape[0]
+            if n_alive <= 0:
+                break
+            n_step = max(min(n_rays // n_alive, 8), 1)
+            xyzs, dirs, deltas = raymarching.march_rays(n_alive, n_step, rays_alive, rays_t, rays_o, rays_d, bound, bitfield, C, H, nears, fars, 128, False, dt_gamma, max_steps)
+            sigmas, rgbs, amb_aud, amb_eye, unc = field(xyzs, dirs)
+            raymarching.composite_rays_triplane(n_alive, n_step, rays_alive, rays_t, sigmas, rgbs, deltas, amb_aud, amb_eye, unc, weights_sum, depth, image, amb_aud_sum, amb_eye_sum, uncertainty_sum, T_thresh)
+            rays_alive = rays_alive[rays_alive >= 0]
+            samples += xyzs.shape[0]
+            step += n_step
+    return image + (1 - weights_sum)[:, None], samples
+
+
+def make_camera_rays(height, width, radius=3.35, fovy=21.24):
+    focal = height / (2 * np.tan(np.radians(fovy) / 2))
+    j, i = torch.meshgrid(torch.arange(height, dtype=torch.float32) + 0.5, torch.arange(width, dtype=torch.float32) + 0.5, indexing='ij')
+    dirs = torch.stack([(i - width / 2) / focal, (j - height / 2) / focal, -torch.ones_like(i)], -1).reshape(-1, 3)
+    rays_d = dirs / dirs.norm(dim=-1, keepdim=True)
+    rays_o = torch.tensor([0, 0, radius], dtype=torch.float32).expand_as(rays_d)
+    return rays_o.contiguous(), rays_d
+
+
+def benchmark_fps(height, width, frames, max_ray_batches, grid_size=128):
+    extensions.set_backend('torch')
+    torch.manual_seed(0)
+    field = TinyField().eval()
+    C, bound = 1, 1
+    # 中心半径 0.5 的球体被占用，近似人头区域
+    coords = raymarching.morton3D_invert(torch.arange(grid_size ** 3)).float()
+    occ = ((coords + 0.5) / grid_size * 2 - 1).norm(dim=-1) < 0.5
+    bitfield = raymarching.packbits(occ.float()[None] * 20, 10)
+    rays_o, rays_d = make_camera_rays(height, width)
+
+    print(f"[INFO] torch backend render fps at {width}x{height} ({os.cpu_count()} CPUs, {torch.get_num_threads()} threads)")
+    reference = None
+    for max_ray_batch in max_ray_batches:
+        with torch.no_grad():
+            render_rays(field, rays_o, rays_d, bitfield, C, grid_size, bound, max_ray_batch)  # warmup
+            t0 = time.perf_counter()
+            for _ in range(frames):
+                image, samples = render_rays(field, rays_o, rays_d, bitfield, C, grid_size, bound, max_ray_batch)
+            elapsed = (time.perf_counter() - t0) / frames
+        if reference is None:
+            reference = image
+        diff = (image - reference).abs().max().item()
+        label = 'all' if max_ray_batch <= 0 else str(max_ray_batch)
+        print(f"  max_ray_batch {label:>6}  {elapsed * 1000:8.1f} ms/frame  {1 / elapsed:6.2f} fps  {samples / elapsed / 1e6:6.2f} M samples/s  max diff {diff:.2g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the pure-PyTorch NeRF backend against the CUDA kernels and measure CPU render fps")
+    parser.add_argument("--height", type=int, default=128)
+    parser.add_argument("--width", type=int, default=128)
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument("--max-ray-batch", type=int, nargs='+', default=[-1, 4096, 1024], help="-1 表示一次处理所有光线")
+    parser.add_argument("--skip-parity", action='store_true')
+    parser.add_argument("--skip-fps", action='store_true')
+    args = parser.parse_args()
+
+    ok = True
+    if not args.skip_parity:
+        ok = check_parity()
+    if not args.skip_fps:
+        benchmark_fps(args.height, args.width, args.frames, args.max_ray_batch)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
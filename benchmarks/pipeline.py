@@ -0,0 +1,381 @@
+"""
+端到端流水线基准测试 (ASR -> LLM -> TTS -> TFG, CPU)
+
+每个阶段在独立的子进程中构建：模型按仓库里的真实结构随机初始化，输入由固定随机种子合成
+（见 benchmarks/pipeline_stages.py），不需要 GPU、网络与 checkpoints。预热后重复执行完整请求，记录：
+- 请求延迟 p50 / p95 / p99，以及请求内部各阶段 span 的统计（src/cost_time）
+- 吞吐：每秒生成的视频帧数 / 音频秒数 / token 数
+- 子进程峰值 RSS（计时结束时读取，不含 profiler 的开销）
+- 分配统计：另起一个子进程不计时地运行一次，torch 算子分配次数与字节数（profiler）、Python / numpy 峰值（tracemalloc）；
+  这一步内存开销大，失败（如 OOM）时只丢掉分配统计，已测得的延迟照常保留；--no-allocations 跳过
+结果写成 JSON；--compare 对比两份结果，变差超过阈值的指标标记为 REGRESSION 并以非零状态退出。
+缺少依赖的阶段记为 skipped 并给出原因；子进程异常退出记为 failed（返回码、终止信号与 traceback 末尾），
+超时记为 timeout。需要 ffmpeg（可用 FFMPEG_BINARY 指定）。
+
+用法:
+    python benchmarks/pipeline.py --json pipeline.json
+    python benchmarks/pipeline.py --stage tfg.wav2lip --stage tfg.wav2lipv2 --seconds 2 --repeat 5
+    python benchmarks/pipeline.py --stage chain --talker wav2lip
+    python benchmarks/pipeline.py --compare base.json pipeline.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_stages import STAGES, TALKERS, build_stage, make_face, make_speech
+
+# 对比时检查的指标与方向：+1 表示变大为退化，-1 表示变小为退化（吞吐按实际单位动态加入）
+METRICS = [
+    ('latency.p50', 1),
+    ('latency.p95', 1),
+    ('peak_rss_mb', 1),
+    ('allocations.torch_allocs', 1),
+    ('allocations.torch_alloc_mb', 1),
+    ('allocations.py_peak_mb', 1),
+]
+
+
+def summarize(samples):
+    """请求延迟的分位数，与 src/cost_time 的 Histogram 使用相同的取值方式"""
+    from src.cost_time import Histogram
+    hist = Histogram()
+    for value in samples:
+        hist.observe(value)
+    stats = hist.snapshot()
+    return {'p50': stats['p50'], 'p95': stats['p95'], 'p99': stats['p99'], 'mean': stats['mean'],
+            'min': min(samples), 'max': stats['max']}
+
+
+def measure_allocations(run):
+    """在 torch profiler 与 tracemalloc 下执行一次请求（不计入延迟）"""
+    import torch
+    tracemalloc.start()
+    try:
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True) as prof:
+            run()
+        _, py_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # 每个算子自身净分配为正的调用计为一次分配（释放单独记在 [memory] 事件中）
+    allocs = [evt.self_cpu_memory_usage for evt in prof.events() if evt.self_cpu_memory_usage > 0]
+    return {'torch_allocs': len(allocs), 'torch_alloc_mb': sum(allocs) / 2 ** 20, 'py_peak_mb': py_peak / 2 ** 20}
+
+
+def run_stage(args):
+    """子进程中执行：构建阶段、预热，再按 args.mode 计时（timing）或统计分配（allocations），返回结果字典"""
+    import torch
+    from src.cost_time import registry, trace
+    torch.set_num_threads(args.threads)
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix='linly_bench_')
+    try:
+        t0 = time.perf_counter()
+        try:
+            ctx, run = build_stage(args.child, seconds=args.seconds, batch_size=args.batch_size, seed=args.seed,
+                                   talker=args.talker, workdir=workdir)
+        except ImportError as e:
+            return {'status': 'skipped', 'reason': '{}: {}'.format(type(e).__name__, e)}
+        setup_s = time.perf_counter() - t0
+        # 各后端会在当前目录下创建 results / temp，放到临时目录中
+        os.chdir(workdir)
+        for _ in range(args.warmup):
+            run()
+        if args.mode == 'allocations':
+            return {'status': 'ok', 'allocations': measure_allocations(run)}
+
+        registry.reset()
+        latencies, totals = [], {}
+        for _ in range(args.repeat):
+            with trace('bench.' + args.child):
+                t0 = time.perf_counter()
+                units = run()
+                latencies.append(time.perf_counter() - t0)
+            for unit, value in units.items():
+                totals[unit] = totals.get(unit, 0) + value
+        spans = {name: {k: stats[k] for k in ('count', 'mean', 'p50', 'p95', 'max')}
+                 for name, stats in registry.stats().items() if name != 'bench.' + args.child}
+
+        return {
+            'status': 'ok',
+            'setup_s': setup_s,
+            'repeat': args.repeat,
+            'latency': summarize(latencies),
+            'units': {unit: value / args.repeat for unit, value in totals.items()},
+            'throughput': {unit + '_per_s': value / sum(latencies) for unit, value in totals.items()},
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'spans': spans,
+        }
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def output_tail(text, lines=15):
+    """子进程输出的末尾：去掉 tqdm 进度条，有 traceback 时从最后一个 traceback 开始"""
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', 'replace')
+    rows = [row.rstrip() for row in re.split(r'[\r\n]+', text or '')]
+    rows = [row for row in rows if row.strip() and not re.search(r'\d+%\|', row)]
+    starts = [i for i, row in enumerate(rows) if row.startswith('Traceback (most recent call last)')]
+    if starts:
+        rows = rows[starts[-1]:]
+    return rows[-lines:]
+
+
+def failure(returncode, output):
+    """子进程没有写出结果：原因为返回码（被信号终止时给出信号名）加上最后一行错误"""
+    if returncode < 0:
+        try:
+            code = signal.Signals(-returncode).name
+        except ValueError:
+            code = 'signal %d' % -returncode
+        if code == 'SIGKILL':
+            code += ' (out of memory?)'
+    else:
+        code = 'exit code %d' % returncode
+    tail = output_tail(output)
+    reason = code + (': ' + tail[-1].strip() if tail else '')
+    return {'status': 'failed', 'reason': reason, 'returncode': returncode, 'output': tail}
+
+
+def run_child(name, args, mode):
+    """在全新解释器中运行一个阶段，避免各阶段的模型与分配互相影响峰值内存"""
+    fd, out = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', name, '--mode', mode, '--out', out,
+           '--seconds', str(args.seconds), '--repeat', str(args.repeat), '--warmup', str(args.warmup),
+           '--batch-size', str(args.batch_size), '--seed', str(args.seed), '--threads', str(args.threads),
+           '--talker', args.talker]
+    threads = str(args.threads)
+    env = dict(os.environ, OMP_NUM_THREADS=threads, MKL_NUM_THREADS=threads, PYTHONHASHSEED=str(args.seed),
+               LINLY_TIMING_VERBOSE='0', CUDA_VISIBLE_DEVICES='')
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=args.timeout)
+        if os.path.getsize(out):
+            with open(out) as f:
+                return json.load(f)
+        return failure(proc.returncode, proc.stderr or proc.stdout)
+    except subprocess.TimeoutExpired as e:
+        return {'status': 'timeout', 'reason': 'timeout after %ds' % args.timeout,
+                'output': output_tail(e.stderr or e.stdout)}
+    finally:
+        os.remove(out)
+
+
+def bench_stage(name, args):
+    """先在子进程中计时；成功后再另起子进程统计分配，其失败只记录在 allocations_error 中"""
+    result = run_child(name, args, 'timing')
+    if result['status'] != 'ok' or not args.allocations:
+        return result
+    allocs = run_child(name, args, 'allocations')
+    if allocs['status'] == 'ok':
+        result['allocations'] = allocs['allocations']
+    else:
+        result['allocations_error'] = '{}: {}'.format(allocs['status'], allocs['reason'])
+    return result
+
+
+def metadata(args):
+    import torch
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'threads': args.threads,
+        'seed': args.seed,
+        'seconds': args.seconds,
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+        'batch_size': args.batch_size,
+        'talker': args.talker,
+        'allocations': args.allocations,
+    }
+
+
+def lookup(result, path):
+    value = result
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(base, new, threshold):
+    """
+    逐阶段对比两份结果，返回 (rows, regressions)。
+    row 为 (阶段, 指标, 旧值, 新值, 相对变化, 是否退化)；任一方未成功运行的阶段只给出状态，
+    原来能运行、现在不能运行（失败或缺少依赖）也算退化；只测了部分阶段时缺少的阶段不算。
+    """
+    rows, regressions = [], []
+    for stage in sorted(set(base['stages']) | set(new['stages'])):
+        b, n = base['stages'].get(stage), new['stages'].get(stage)
+        statuses = [r['status'] if r else 'missing' for r in (b, n)]
+        if statuses != ['ok', 'ok']:
+            regressed = statuses[0] == 'ok' and statuses[1] != 'missing'
+            rows.append((stage, 'status', statuses[0], statuses[1], None, regressed))
+            if regressed:
+                regressions.append((stage, 'status', None))
+            continue
+        metrics = METRICS + [('throughput.' + k, -1) for k in sorted(set(b['throughput']) & set(n['throughput']))]
+        for metric, direction in metrics:
+            old, cur = lookup(b, metric), lookup(n, metric)
+            if old is None or cur is None:
+                continue
+            change = (cur - old) / old if old else 0.0
+            regressed = direction * change > threshold
+            rows.append((stage, metric, old, cur, change, regressed))
+            if regressed:
+                regressions.append((stage, metric, change))
+    return rows, regressions
+
+
+def print_compare(rows, threshold):
+    print(f"{'stage':<16} {'metric':<28} {'base':>12} {'new':>12} {'change':>8}")
+    for stage, metric, old, cur, change, regressed in rows:
+        if change is None:
+            print(f"{stage:<16} {metric:<28} {old:>12} {cur:>12}{'  REGRESSION' if regressed else ''}")
+            continue
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{stage:<16} {metric:<28} {old:>12.4g} {cur:>12.4g} {change:>+7.1%}{flag}")
+    print(f"threshold {threshold:.0%}")
+
+
+def print_result(name, result):
+    if result['status'] != 'ok':
+        print(f"{name:<16} {result['status']:<8} {result['reason']}")
+        for row in result.get('output', [])[:-1]:
+            print(' ' * 26 + row)
+        return
+    latency, allocs = result['latency'], result.get('allocations')
+    throughput = '  '.join(f"{v:.3g} {k[:-len('_per_s')]}/s" for k, v in result['throughput'].items())
+    if allocs is not None:
+        allocs = (f"torch allocs {allocs['torch_allocs']} ({allocs['torch_alloc_mb']:.0f}MB)  "
+                  f"py peak {allocs['py_peak_mb']:.1f}MB")
+    else:
+        allocs = 'allocations ' + result.get('allocations_error', 'skipped')
+    print(f"{name:<16} ok       p50 {latency['p50']:7.3f}s  p95 {latency['p95']:7.3f}s  p99 {latency['p99']:7.3f}s  "
+          f"{throughput}  rss {result['peak_rss_mb']:.0f}MB  {allocs}")
+
+
+def check():
+    # 合成输入由种子决定
+    with tempfile.TemporaryDirectory() as workdir:
+        a = make_speech(os.path.join(workdir, 'a.wav'), 0.5, seed=3)
+        b = make_speech(os.path.join(workdir, 'b.wav'), 0.5, seed=3)
+        with open(a, 'rb') as fa, open(b, 'rb') as fb:
+            assert fa.read() == fb.read(), 'synthetic speech must be deterministic'
+    assert np.array_equal(make_face(5), make_face(5)) and not np.array_equal(make_face(5), make_face(6))
+
+    stats = summarize([i / 100 for i in range(1, 101)])
+    assert abs(stats['p50'] - 0.51) < 1e-9 and abs(stats['p99'] - 1.0) < 1e-9 and stats['min'] == 0.01
+
+    def result(p50, fps, rss=1000, status='ok'):
+        return {'status': status, 'reason': 'ImportError', 'latency': {'p50': p50, 'p95': p50 * 1.2},
+                'throughput': {'frames_per_s': fps}, 'peak_rss_mb': rss,
+                'allocations': {'torch_allocs': 100, 'torch_alloc_mb': 50.0, 'py_peak_mb': 10.0}}
+    base = {'stages': {'a': result(1.0, 25), 'b': result(1.0, 25), 'c': result(1.0, 25), 'd': result(1.0, 25)}}
+    new = {'stages': {'a': result(1.2, 25), 'b': result(0.9, 20.5), 'c': result(0.95, 24.5, rss=1050),
+                      'd': result(1.0, 25, status='skipped'), 'e': result(1.0, 25, status='skipped')}}
+    rows, regressions = compare(base, new, 0.1)
+    assert sorted((s, m) for s, m, _ in regressions) == [('a', 'latency.p50'), ('a', 'latency.p95'),
+                                                          ('b', 'throughput.frames_per_s'), ('d', 'status')], regressions
+    assert ('e', 'status', 'missing', 'skipped', None, False) in rows
+    # 没有分配统计（跳过或 OOM）的阶段只对比其它指标；超时算退化
+    del new['stages']['c']['allocations']
+    new['stages']['a'] = {'status': 'timeout', 'reason': 'timeout after 1s'}
+    rows, regressions = compare(base, new, 0.1)
+    metrics = [row[1] for row in rows if row[0] == 'c']
+    assert ('a', 'status', None) in regressions
+    assert 'latency.p50' in metrics and not [m for m in metrics if m.startswith('allocations')], metrics
+
+    # 失败原因：终止信号名与 traceback 末尾，去掉 tqdm 进度条
+    output = ("loading\nFace Renderer::   0%|          | 0/4 [00:00<?, ?it/s]\r"
+              "Face Renderer::  25%|##5       | 1/4 [00:01<00:03, 1.00s/it]\n")
+    result = failure(-9, output)
+    assert result['reason'] == 'SIGKILL (out of memory?): loading' and result['output'] == ['loading'], result
+    output += "Traceback (most recent call last):\n  File \"x.py\", line 1, in <module>\nValueError: bad shape\n"
+    result = failure(1, output)
+    assert result['reason'] == 'exit code 1: ValueError: bad shape' and result['output'][0].startswith('Traceback')
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end CPU benchmark of the talking-head pipeline")
+    parser.add_argument("--stage", choices=sorted(STAGES), action="append", help="要测试的阶段，可重复指定，默认全部")
+    parser.add_argument("--seconds", type=float, default=1.0, help="合成语音时长（秒），即每次请求的音频长度")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段计时的请求次数")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1, help="torch / OpenMP 线程数，固定以便不同机器间对比")
+    parser.add_argument("--talker", choices=sorted(TALKERS), default='sadtalker', help="chain 阶段使用的数字人后端")
+    parser.add_argument("--timeout", type=int, default=3600, help="单个阶段（每个子进程）的超时（秒）")
+    parser.add_argument("--no-allocations", dest="allocations", action="store_false",
+                        help="不运行分配统计（profiler + tracemalloc）的子进程")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="对比两份 JSON 结果")
+    parser.add_argument("--threshold", type=float, default=0.1, help="相对变差超过该比例视为退化")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--out", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=('timing', 'allocations'), default='timing', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.out, 'w') as f:
+            json.dump(run_stage(args), f)
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        rows, regressions = compare(base, new, args.threshold)
+        print_compare(rows, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+        return
+
+    check()
+    report = {'meta': metadata(args), 'stages': {}}
+    for name in args.stage or list(STAGES):
+        report['stages'][name] = result = bench_stage(name, args)
+        print_result(name, result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+端到端基准测试的合成输入与各阶段替身模型（供 benchmarks/pipeline.py 使用）
+
+所有模型都按仓库里的真实结构构建，但使用固定随机种子的随机权重（Whisper、BERT、HuBERT、
+LLM、MuseTalk 的 UNet / VAE 缩小了层数或通道数），不读取 checkpoints，不需要 GPU 与网络；
+调用的是各后端真实的推理入口（predict / run / transcribe / inference_noprepare ...），
+因此耗时与内存反映的是本仓库代码路径本身，而不是模型效果。
+缺少依赖时构建函数直接抛出 ImportError，由调用方把该阶段记为跳过。
+"""
+import json
+import os
+import sys
+import tempfile
+import types
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import soundfile as sf
+import torch
+import yaml
+from scipy.io import savemat
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SR = 16000
+FPS = 25
+FACE_SIZE = 256
+# Wav2Lip 使用固定人脸框（y1, y2, x1, x2）代替人脸检测
+FACE_BOX = [64, 224, 48, 208]
+PROMPT_TEXT = '这是一段用于测试的参考音频。'
+REPLY_TEXT = '今天天气很好，我们一起去公园散步吧。'
+QUESTION_TEXT = '周末有什么好的安排吗？'
+
+
+# ---------------------------------------------------------------- 合成输入
+
+def make_speech(path, seconds, seed=0):
+    """按音节起伏的谐波“语音”：基频在 110~220Hz 间缓慢变化，每秒约 4 个音节，加少量噪声"""
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    f0 = 160 + 50 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None) ** 2
+    wav = 0.3 * voiced * envelope + 0.01 * rng.randn(len(t))
+    sf.write(path, (wav / np.abs(wav).max() * 0.8).astype(np.float32), SR)
+    return path
+
+
+def make_face(seed=0, shift=(0, 0), mouth=0.5):
+    """画一张简单的人脸（BGR）：背景、脸、眼睛与张合程度为 mouth 的嘴"""
+    rng = np.random.RandomState(seed)
+    img = np.full((FACE_SIZE, FACE_SIZE, 3), rng.randint(60, 120, 3), np.uint8)
+    cx, cy = FACE_SIZE // 2 + shift[0], FACE_SIZE // 2 + shift[1]
+    cv2.ellipse(img, (cx, cy), (72, 92), 0, 0, 360, (140, 170, 220), -1)
+    for dx in (-30, 30):
+        cv2.circle(img, (cx + dx, cy - 25), 9, (40, 40, 40), -1)
+    cv2.ellipse(img, (cx, cy + 45), (26, int(4 + 14 * mouth)), 0, 0, 360, (60, 60, 170), -1)
+    return cv2.GaussianBlur(img, (5, 5), 1)
+
+
+def make_face_video(path, frames, seed=0):
+    from src.utils.videoio import write_video
+    video = [make_face(seed, (int(3 * np.sin(i / 7)), int(2 * np.cos(i / 9))), 0.5 + 0.5 * np.sin(i / 3))
+             for i in range(frames)]
+    return write_video(video, path, FPS)
+
+
+def make_first_coeff(path, seed=0):
+    """SadTalker 预处理输出的 3DMM 系数（coeff_3dmm 1x73，full_3dmm 1x257）"""
+    rng = np.random.RandomState(seed)
+    savemat(path, {'coeff_3dmm': (0.1 * rng.randn(1, 73)).astype(np.float32),
+                   'full_3dmm': (0.1 * rng.randn(1, 257)).astype(np.float32)})
+    return path
+
+
+def make_inputs(workdir, seconds, seed=0):
+    """生成一次请求用到的全部输入，返回路径字典"""
+    inputs = {
+        'speech': make_speech(os.path.join(workdir, 'speech.wav'), seconds, seed),
+        # GPT-SoVITS 要求参考音频在 3~10 秒之间
+        'ref_speech': make_speech(os.path.join(workdir, 'ref_speech.wav'), 4, seed + 1),
+        'face_image': os.path.join(workdir, 'face.png'),
+        'face_video': make_face_video(os.path.join(workdir, 'face.mp4'), max(int(seconds * FPS), 1), seed),
+        'first_coeff': make_first_coeff(os.path.join(workdir, 'face.mat'), seed),
+    }
+    cv2.imwrite(inputs['face_image'], make_face(seed))
+    return inputs
+
+
+def make_vocab(path, texts):
+    """用文本中出现的字符构造 BERT 词表（中文按字切分）"""
+    chars = sorted(set(''.join(texts)) - {' '})
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + chars) + '\n')
+    return path
+
+
+def video_frames(path):
+    from src.utils.videoio import VideoReader
+    return len(VideoReader(path))
+
+
+def audio_seconds(path):
+    info = sf.info(path)
+    return info.frames / info.samplerate
+
+
+# ---------------------------------------------------------------- ASR
+
+def build_whisper(ctx):
+    """WhisperASR：tiny 结构的随机权重模型（文本上下文缩短，限制随机权重下的解码长度）"""
+    from whisper.model import ModelDimensions, Whisper
+    from ASR.Whisper import WhisperASR
+    asr = WhisperASR.__new__(WhisperASR)
+    asr.model = Whisper(ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6,
+                                        n_audio_layer=4, n_vocab=51865, n_text_ctx=64, n_text_state=384,
+                                        n_text_head=6, n_text_layer=4)).eval()
+    return asr
+
+
+def stage_whisper(ctx):
+    asr = build_whisper(ctx)
+
+    def run():
+        asr.transcribe(ctx.inputs['speech'])
+        return {'audio_s': ctx.seconds}
+    return run
+
+
+# ---------------------------------------------------------------- LLM
+
+def build_llm(ctx):
+    """Qwen2：两层的随机权重 Qwen2ForCausalLM，BERT 分词器 + 简单对话模板"""
+    from transformers import BertTokenizer, Qwen2Config, Qwen2ForCausalLM
+    from LLM.Qwen2 import Qwen2
+    vocab = make_vocab(os.path.join(ctx.workdir, 'llm_vocab.txt'),
+                       [PROMPT_TEXT, REPLY_TEXT, QUESTION_TEXT, '请用少于个字回答以下问题'])
+    tokenizer = BertTokenizer(vocab)
+    tokenizer.chat_template = "{% for m in messages %}{{ m['content'] }}\n{% endfor %}"
+    config = Qwen2Config(vocab_size=tokenizer.vocab_size, hidden_size=64, intermediate_size=128,
+                         num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2,
+                         max_position_embeddings=1024, eos_token_id=None, pad_token_id=tokenizer.pad_token_id)
+    llm = Qwen2.__new__(Qwen2)
+    llm.mode = 'offline'
+    llm.prefix_prompt = '请用少于25个字回答以下问题\n\n'
+    llm.history = None
+    llm.model, llm.tokenizer = Qwen2ForCausalLM(config).eval(), tokenizer
+    return llm
+
+
+def llm_reply(llm, question):
+    """随机权重的回复按字拼接、截断后作为 TTS 输入（不能用时退回固定回复）"""
+    answer = llm.generate(question)
+    if answer.startswith('对不起'):
+        raise RuntimeError('LLM stand-in failed, see the printed exception')
+    answer = ''.join(answer.split())[:24]
+    return answer if len(answer) >= 4 else REPLY_TEXT
+
+
+def stage_llm(ctx):
+    llm = build_llm(ctx)
+
+    def run():
+        answer = llm.generate(QUESTION_TEXT)
+        return {'tokens': len(llm.tokenizer.tokenize(answer))}
+    return run
+
+
+# ---------------------------------------------------------------- TTS
+
+def build_gpt_sovits(ctx):
+    """
+    GPT_SoVITS：GPT (s1longer.yaml) 与 SoVITS (s2.json) 按原配置随机初始化；
+    共享的 BERT / CN-HuBERT 单例预先放入两层的随机权重模型。
+    max_sec 限制随机权重下自回归生成的语义 token 数。
+    """
+    from transformers import BertConfig, BertForMaskedLM, BertTokenizer, HubertConfig, HubertModel
+    sys.path.append(os.path.join(ROOT, 'GPT_SoVITS'))
+    import VITS.GPT_SoVITS as sovits
+    from AR.models.t2s_lightning_module import Text2SemanticLightningModule
+    from module.models import SynthesizerTrn
+
+    torch.manual_seed(ctx.seed)
+    tokenizer = BertTokenizer(make_vocab(os.path.join(ctx.workdir, 'bert_vocab.txt'),
+                                         [PROMPT_TEXT, REPLY_TEXT, QUESTION_TEXT, '。，？！.,?!']))
+    bert = BertForMaskedLM(BertConfig(vocab_size=tokenizer.vocab_size, hidden_size=1024, num_hidden_layers=2,
+                                      num_attention_heads=16, intermediate_size=1024)).eval()
+    sovits._bert._instance = (tokenizer, bert)
+    hubert = HubertModel(HubertConfig(hidden_size=768, num_hidden_layers=2, num_attention_heads=12,
+                                      intermediate_size=1024)).eval()
+    sovits._ssl._instance = types.SimpleNamespace(model=hubert)
+
+    tts = sovits.GPT_SoVITS()
+    tts.hz = 50
+    with open(os.path.join(ROOT, 'GPT_SoVITS', 'configs', 's1longer.yaml')) as f:
+        tts.config = yaml.safe_load(f)
+    tts.config['data']['max_sec'] = tts.max_sec = max(int(ctx.seconds), 1)
+    tts.t2s_model = Text2SemanticLightningModule(tts.config, '****', is_train=False).eval()
+    with open(os.path.join(ROOT, 'GPT_SoVITS', 'configs', 's2.json')) as f:
+        tts.hps = sovits.DictToAttrRecursive(json.load(f))
+    tts.hps.model.semantic_frame_rate = '25hz'
+    vq_model = SynthesizerTrn(tts.hps.data.filter_length // 2 + 1,
+                              tts.hps.train.segment_size // tts.hps.data.hop_length,
+                              n_speakers=tts.hps.data.n_speakers, **tts.hps.model)
+    del vq_model.enc_q
+    tts.vq_model = vq_model.eval()
+    return tts
+
+
+def tts_predict(tts, ctx, text, save_path):
+    return tts.predict(ctx.inputs['ref_speech'], PROMPT_TEXT, '中文', text, '中文', save_path=save_path)
+
+
+def stage_gpt_sovits(ctx):
+    tts = build_gpt_sovits(ctx)
+    save_path = os.path.join(ctx.workdir, 'tts.wav')
+
+    def run():
+        tts_predict(tts, ctx, REPLY_TEXT, save_path)
+        return {'audio_s': audio_seconds(save_path)}
+    return run
+
+
+# ---------------------------------------------------------------- TFG
+
+def build_sadtalker(ctx):
+    """SadTalker：Audio2Coeff 与 facerender 按 src/config 随机初始化，跳过人脸裁剪与 3DMM 提取（使用合成系数）"""
+    from yacs.config import CfgNode as CN
+    from src.audio2exp_models.audio2exp import Audio2Exp
+    from src.audio2exp_models.networks import SimpleWrapperV2
+    from src.audio2pose_models.audio2pose import Audio2Pose
+    from src.facerender.animate import AnimateFromCoeff
+    from src.facerender.modules.generator import OcclusionAwareSPADEGenerator
+    from src.facerender.modules.keypoint_detector import HEEstimator, KPDetector
+    from src.facerender.modules.mapping import MappingNet
+    from src.generate_batch import get_data
+    from src.generate_facerender_batch import get_facerender_data
+    from src.test_audio2coeff import Audio2Coeff
+
+    torch.manual_seed(ctx.seed)
+    config_dir = os.path.join(ROOT, 'src', 'config')
+    with open(os.path.join(config_dir, 'auido2pose.yaml')) as f:
+        cfg_pose = CN.load_cfg(f)
+    with open(os.path.join(config_dir, 'auido2exp.yaml')) as f:
+        cfg_exp = CN.load_cfg(f)
+    audio_to_coeff = Audio2Coeff.__new__(Audio2Coeff)
+    audio_to_coeff.device = 'cpu'
+    audio_to_coeff.audio2pose_model = Audio2Pose(cfg_pose, None, device='cpu').eval()
+    audio_to_coeff.audio2exp_model = Audio2Exp(SimpleWrapperV2().eval(), cfg_exp, device='cpu').eval()
+
+    with open(os.path.join(config_dir, 'facerender.yaml')) as f:
+        params = yaml.safe_load(f)['model_params']
+    animate = AnimateFromCoeff.__new__(AnimateFromCoeff)
+    animate.device = 'cpu'
+    animate.generator = OcclusionAwareSPADEGenerator(**params['generator_params'], **params['common_params']).eval()
+    animate.kp_extractor = KPDetector(**params['kp_detector_params'], **params['common_params']).eval()
+    animate.he_estimator = HEEstimator(**params['he_estimator_params'], **params['common_params']).eval()
+    animate.mapping = MappingNet(**params['mapping_params']).eval()
+
+    crop_info = ((FACE_SIZE, FACE_SIZE), (0, 0, FACE_SIZE, FACE_SIZE), (0, 0, FACE_SIZE, FACE_SIZE))
+    save_dir = os.path.join(ctx.workdir, 'sadtalker')
+    os.makedirs(save_dir, exist_ok=True)
+
+    def render(audio):
+        # 与 SadTalker.test 相同的 audio2coeff -> coeff2video 流程
+        first_coeff, pic = ctx.inputs['first_coeff'], ctx.inputs['face_image']
+        batch = get_data(first_coeff, audio, 'cpu', ref_eyeblink_coeff_path=None, fps=FPS)
+        coeff = audio_to_coeff.generate(batch, save_dir, 0, None)
+        data = get_facerender_data(coeff, pic, first_coeff, audio, ctx.batch_size, size=FACE_SIZE)
+        return animate.generate(data, save_dir, pic, crop_info, img_size=FACE_SIZE, fps=FPS)
+    return render
+
+
+def build_wav2lip(ctx):
+    """Wav2Lip：src.models.Wav2Lip 随机初始化，固定人脸框代替人脸检测"""
+    from TFG.Wav2Lip import Wav2Lip
+    from src.models import Wav2Lip as Wav2LipModel
+
+    torch.manual_seed(ctx.seed)
+    w = Wav2Lip.__new__(Wav2Lip)
+    w.fps = FPS
+    w.resize_factor = 1
+    w.mel_step_size = 16
+    w.static = False
+    w.img_size = 96
+    w.face_det_batch_size = 8
+    w.box = list(FACE_BOX)
+    w.pads = [0, 10, 0, 0]
+    w.nosmooth = False
+    w.device = 'cpu'
+    w.model = Wav2LipModel().eval()
+    w.face_analysis = None
+    w.max_cached_faces = 8
+    w.face_tracks = OrderedDict()
+    w.paste_workers = 2
+    w.codec, w.preset, w.crf = 'libx264', 'veryfast', 18
+    w._enhancer = None
+    save_path = os.path.join(ctx.workdir, 'wav2lip.mp4')
+
+    def render(audio):
+        # 显式传入整帧裁剪范围，不依赖 predict 的默认值
+        return w.predict(ctx.inputs['face_video'], audio, ctx.batch_size, crop=[0, -1, 0, -1], save_path=save_path)
+    return render
+
+
+def build_wav2lipv2(ctx):
+    """
+    Wav2Lipv2：src.modelsv2.Wav2Lip 随机初始化；预先写入合成的形象包（仿射矩阵与人脸图），
+    run() 命中形象缓存，跳过 YOLO / HRNet 检测
+    """
+    from TFG.Wav2Lipv2 import Wav2Lipv2
+    from src.modelsv2 import Wav2Lip as Wav2LipModel
+
+    torch.manual_seed(ctx.seed)
+    w = Wav2Lipv2.__new__(Wav2Lipv2)
+    w.device = 'cpu'
+    w.face_analysis = None
+    w.face_det_batch_size = 8
+    w.pads = [0, 0, 0, 0]
+    w.paste_workers = 2
+    w.avatar_dir = os.path.join(ctx.workdir, 'avatars')
+    w.codec, w.preset, w.crf = 'libx264', 'veryfast', 18
+    w.img_size = (256, 256)
+    w.fps = FPS
+    w.a_alpha = 1.25
+    w.audio_smooth = True
+    w.resize_factor = 1
+    w.static = False
+    w.kpts_smoother = w.abox_smoother = None
+    w.crop = [0, -1, 0, -1]
+    w.lpb_size = 256
+    w.mel_step_size = 16
+    w.rotate = False
+    w.model = Wav2LipModel().eval()
+
+    video = ctx.inputs['face_video']
+    frame_num = video_frames(video)
+    rng = np.random.RandomState(ctx.seed)
+    align = 300
+    ms, inv_ms = [], []
+    for _ in range(frame_num):
+        m = cv2.getRotationMatrix2D((FACE_SIZE / 2, FACE_SIZE / 2), rng.uniform(-5, 5), 1.1)
+        m[:, 2] += (align - FACE_SIZE) / 2
+        ms.append(m)
+        inv_ms.append(cv2.invertAffineTransform(m))
+    w.save_avatar(w.avatar_key(video, FPS), {
+        'fps': FPS, 'frame_num': frame_num, 'frame_h': FACE_SIZE, 'frame_w': FACE_SIZE, 'complete': True,
+        'faces': np.stack([cv2.resize(make_face(ctx.seed), w.img_size)] * frame_num),
+        'coords': np.tile(np.array([[30, 270, 30, 270]], np.int32), (frame_num, 1)),
+        'm': np.stack(ms), 'inv_m': np.stack(inv_ms),
+        'align_size': np.full((frame_num, 2), align, np.int32),
+        'kpts_last': np.zeros((1, 2)), 'abox_last': np.zeros((1, 2)),
+    })
+    save_path = os.path.join(ctx.workdir, 'wav2lipv2.mp4')
+
+    def render(audio):
+        return w.run(video, audio, ctx.batch_size, outfile=save_path, fps=FPS)
+    return render
+
+
+def build_musetalk(ctx):
+    """
+    MuseTalk_RealTime：tiny 结构的随机权重 Whisper 特征提取、缩小通道数的 UNet2DConditionModel 与 AutoencoderKL，
+    形象素材（帧、坐标、潜变量、融合掩码）直接合成，跳过 prepare_material 的人脸检测与 VAE 编码
+    """
+    sys.path.append(os.path.join(ROOT, 'Musetalk'))
+    from diffusers import AutoencoderKL, UNet2DConditionModel
+    from torchvision import transforms
+    from TFG.MuseTalk import MuseTalk_RealTime
+    from musetalk.models.unet import PositionalEncoding, UNet
+    from musetalk.models.vae import VAE
+    from musetalk.whisper.audio2feature import Audio2Feature
+    from musetalk.whisper.whisper.model import ModelDimensions, Whisper
+    from src.utils.videoio import VideoReader
+
+    torch.manual_seed(ctx.seed)
+    m = MuseTalk_RealTime.__new__(MuseTalk_RealTime)
+    m.device = 'cpu'
+    m.audio_processor = Audio2Feature.__new__(Audio2Feature)
+    m.audio_processor.whisper_model_type = 'tiny'
+    m.audio_processor.model = Whisper(ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6,
+                                                      n_audio_layer=4, n_vocab=51865, n_text_ctx=64, n_text_state=384,
+                                                      n_text_head=6, n_text_layer=4)).eval()
+    vae = VAE.__new__(VAE)
+    vae.vae = AutoencoderKL(down_block_types=('DownEncoderBlock2D',) * 4, up_block_types=('UpDecoderBlock2D',) * 4,
+                            block_out_channels=(32, 32, 64, 64), latent_channels=4, norm_num_groups=32).eval()
+    vae.device = torch.device('cpu')
+    vae._use_float16 = False
+    vae.scaling_factor = vae.vae.config.scaling_factor
+    vae.transform = transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
+    vae._resized_img = 256
+    vae._mask_tensor = vae.get_mask_tensor()
+    m.vae = vae
+    m.unet = UNet.__new__(UNet)
+    m.unet.model = UNet2DConditionModel(sample_size=32, in_channels=8, out_channels=4, layers_per_block=1,
+                                        block_out_channels=(32, 64), norm_num_groups=32,
+                                        down_block_types=('CrossAttnDownBlock2D', 'DownBlock2D'),
+                                        up_block_types=('UpBlock2D', 'CrossAttnUpBlock2D'),
+                                        cross_attention_dim=384, attention_head_dim=8).eval()
+    m.unet.device = torch.device('cpu')
+    m.pe = PositionalEncoding(d_model=384)
+    m.timesteps = torch.tensor([0])
+    m.load = True
+
+    # 合成的形象素材：帧来自人脸视频，人脸框与 FACE_BOX 一致，融合掩码为人脸框外扩区域
+    y1, y2, x1, x2 = FACE_BOX
+    crop_box = [max(x1 - 16, 0), max(y1 - 16, 0), min(x2 + 16, FACE_SIZE), min(y2 + 16, FACE_SIZE)]
+    frames = list(VideoReader(ctx.inputs['face_video']))
+    m.frame_list_cycle = frames + frames[::-1]
+    m.coord_list_cycle = [(x1, y1, x2, y2)] * len(m.frame_list_cycle)
+    m.input_latent_list_cycle = [torch.randn(1, 8, 32, 32) for _ in m.frame_list_cycle]
+    mask = np.zeros((crop_box[3] - crop_box[1], crop_box[2] - crop_box[0]), np.uint8)
+    mask[8:-8, 8:-8] = 255
+    m.mask_list_cycle = [mask] * len(m.frame_list_cycle)
+    m.mask_coords_list_cycle = [crop_box] * len(m.frame_list_cycle)
+    m.skip_save_images = False
+    m.avatar_id = 'bench'
+    m.avatar_path = os.path.join(ctx.workdir, 'musetalk')
+    m.video_out_path = os.path.join(m.avatar_path, 'vid_output')
+    os.makedirs(m.video_out_path, exist_ok=True)
+
+    def render(audio):
+        return m.inference_noprepare(audio, ctx.inputs['face_video'], 0, batch_size=ctx.batch_size, fps=FPS,
+                                     progress=None)
+    return render
+
+
+TALKERS = {
+    'sadtalker': build_sadtalker,
+    'wav2lip': build_wav2lip,
+    'wav2lipv2': build_wav2lipv2,
+    'musetalk': build_musetalk,
+}
+
+
+def talker_stage(name):
+    def stage(ctx):
+        render = TALKERS[name](ctx)
+
+        def run():
+            return {'frames': video_frames(render(ctx.inputs['speech'])), 'audio_s': ctx.seconds}
+        return run
+    stage.__name__ = 'stage_' + name
+    return stage
+
+
+# ---------------------------------------------------------------- ASR -> LLM -> TTS -> TFG
+
+def stage_chain(ctx):
+    """一次完整的对话请求：识别提问语音、生成回复、合成语音，再驱动数字人"""
+    from src.cost_time import span
+    asr, llm, tts = build_whisper(ctx), build_llm(ctx), build_gpt_sovits(ctx)
+    render = TALKERS[ctx.talker](ctx)
+    tts_path = os.path.join(ctx.workdir, 'chain_tts.wav')
+
+    def run():
+        with span('chain.asr'):
+            question = asr.transcribe(ctx.inputs['speech']) or QUESTION_TEXT
+        with span('chain.llm'):
+            answer = llm_reply(llm, question)
+        with span('chain.tts'):
+            tts_predict(tts, ctx, answer, tts_path)
+        with span('chain.tfg'):
+            video = render(tts_path)
+        return {'frames': video_frames(video), 'audio_s': audio_seconds(tts_path)}
+    return run
+
+
+STAGES = {
+    'asr.whisper': stage_whisper,
+    'llm.qwen2': stage_llm,
+    'tts.gpt_sovits': stage_gpt_sovits,
+    'tfg.sadtalker': talker_stage('sadtalker'),
+    'tfg.wav2lip': talker_stage('wav2lip'),
+    'tfg.wav2lipv2': talker_stage('wav2lipv2'),
+    'tfg.musetalk': talker_stage('musetalk'),
+    'chain': stage_chain,
+}
+
+
+def build_stage(name, seconds=2.0, batch_size=8, seed=0, talker='sadtalker', workdir=None):
+    """构建阶段，返回 (ctx, run)；run() 执行一次请求并返回处理量 {'frames': ..., 'audio_s': ...}"""
+    ctx = types.SimpleNamespace(seconds=seconds, batch_size=batch_size, seed=seed, talker=talker,
+                                workdir=workdir or tempfile.mkdtemp(prefix='linly_bench_'))
+    ctx.inputs = make_inputs(ctx.workdir, seconds, seed)
+    return ctx, STAGES[name](ctx)
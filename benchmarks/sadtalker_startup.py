@@ -0,0 +1,178 @@
+"""
+SadTalker 冷启动基准测试 (SadTalker startup benchmark)
+
+在独立子进程中测量 SadTalker 初始化阶段读取合并权重 SadTalker_V0.0.2_<size>.safetensors
+的耗时与峰值内存，对比：
+- legacy: 每个子网络各自 safetensors.torch.load_file 整个文件，再线性扫描过滤键（改动前的做法）
+- mmap:   open_safetensor 只打开一次（mmap），按前缀只读取各子网络需要的张量
+- init:   完整的 SadTalker 初始化（AnimateFromCoeff + Audio2Coeff + CropAndExtract，需要全部权重与依赖）
+
+没有下载权重时可用 --synthetic-mb 生成同样前缀结构的随机权重文件，只测 legacy / mmap。
+
+用法:
+    python benchmarks/sadtalker_startup.py --checkpoint checkpoints/SadTalker_V0.0.2_256.safetensors
+    python benchmarks/sadtalker_startup.py --synthetic-mb 700 --scenario legacy --scenario mmap
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各子网络在合并权重中的前缀及加载顺序（与 SadTalker 初始化一致）
+CONSUMERS = ['generator', 'kp_extractor', 'audio2pose', 'audio2exp', 'face_3drecon']
+
+# 目标参数按权重元数据预先分配，模拟 load_state_dict 拷贝进已构建好的网络
+SETUP = """
+import torch
+from safetensors import safe_open
+DTYPES = {{'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+          'I64': torch.int64, 'I32': torch.int32, 'U8': torch.uint8, 'BOOL': torch.bool}}
+with safe_open({path!r}, framework='pt') as f:
+    params = {{}}
+    for k in f.keys():
+        s = f.get_slice(k)
+        params[k] = torch.zeros(s.get_shape(), dtype=DTYPES[s.get_dtype()])
+def load_into(prefix, state_dict):
+    for k, v in state_dict.items():
+        params[prefix + '.' + k].copy_(v)
+"""
+
+SCENARIOS = {
+    "legacy": """
+import safetensors.torch
+from src.utils.safetensor_helper import load_x_from_safetensor
+for prefix in {consumers!r}:
+    checkpoint = safetensors.torch.load_file({path!r})
+    load_into(prefix, load_x_from_safetensor(checkpoint, prefix))
+""",
+    "mmap": """
+from src.utils.safetensor_helper import open_safetensor
+for prefix in {consumers!r}:
+    checkpoint = open_safetensor({path!r})
+    load_into(prefix, checkpoint.state_dict(prefix))
+    checkpoint.release()
+""",
+    "init": """
+from TFG.SadTalker import SadTalker
+from src.utils.preprocess import CropAndExtract
+talker = SadTalker()
+CropAndExtract(talker.sadtalker_paths, talker.device)
+""",
+}
+
+PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+exec(compile({setup!r}, "<setup>", "exec"))
+base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+exec(compile({code!r}, "<benchmark>", "exec"))
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("__BENCH__", elapsed, rss_kb, base_kb)
+"""
+
+
+def run_once(name, path):
+    fmt = dict(path=path, consumers=[p for p in CONSUMERS if p in available_prefixes(path)])
+    setup = SETUP.format(**fmt) if name != "init" else ""
+    code = SCENARIOS[name].format(**fmt)
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=ROOT, setup=setup, code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("__BENCH__"):
+            _, elapsed, rss_kb, base_kb = line.split()
+            return float(elapsed), int(rss_kb) / 1024, (int(rss_kb) - int(base_kb)) / 1024
+    raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "benchmark failed")
+
+
+def available_prefixes(path):
+    from safetensors import safe_open
+    with safe_open(path, framework='pt') as f:
+        return {k.split('.', 1)[0] for k in f.keys()}
+
+
+def make_synthetic(path, size_mb):
+    """按 CONSUMERS 前缀生成随机权重，大小比例大致与真实 256 模型一致"""
+    import torch
+    from safetensors.torch import save_file
+    share = {'generator': 0.55, 'kp_extractor': 0.1, 'audio2pose': 0.15, 'audio2exp': 0.05, 'face_3drecon': 0.15}
+    tensors = {}
+    for prefix, ratio in share.items():
+        numel = int(size_mb * ratio * (1 << 20) / 4)
+        chunk = 1 << 20
+        for i in range(max(numel // chunk, 1)):
+            tensors['{}.layer{}.weight'.format(prefix, i)] = torch.randn(chunk)
+    save_file(tensors, path)
+
+
+def run_scenario(name, path, repeat):
+    times, rss, delta = [], [], []
+    for _ in range(repeat):
+        elapsed, peak_mb, delta_mb = run_once(name, path)
+        times.append(elapsed)
+        rss.append(peak_mb)
+        delta.append(delta_mb)
+    return {
+        "scenario": name,
+        "repeat": repeat,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "peak_rss_mb": max(rss),
+        "peak_rss_increase_mb": max(delta),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SadTalker checkpoint cold-start time and peak RSS")
+    parser.add_argument("--checkpoint", default=os.path.join(ROOT, "checkpoints", "SadTalker_V0.0.2_256.safetensors"))
+    parser.add_argument("--synthetic-mb", type=int, default=0, help="生成指定大小的随机权重代替真实权重")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="要测试的场景，可重复指定，默认 legacy 与 mmap")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景重复次数")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    tmpdir = None
+    path = args.checkpoint
+    if args.synthetic_mb > 0:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "synthetic.safetensors")
+        make_synthetic(path, args.synthetic_mb)
+    elif not os.path.exists(path):
+        parser.error("checkpoint {} not found, download it or use --synthetic-mb".format(path))
+
+    results = []
+    try:
+        for name in args.scenario or ["legacy", "mmap"]:
+            try:
+                result = run_scenario(name, path, args.repeat)
+            except RuntimeError as e:
+                result = {"scenario": name, "error": str(e)}
+                print(f"{name:<8} failed: {e}")
+            else:
+                print(f"{name:<8} median {result['median_s']:.3f}s  "
+                      f"(min {result['min_s']:.3f}s, max {result['max_s']:.3f}s)  "
+                      f"peak RSS {result['peak_rss_mb']:.1f} MB (+{result['peak_rss_increase_mb']:.1f} MB while loading)")
+            results.append(result)
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
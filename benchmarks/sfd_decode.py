@@ -0,0 +1,146 @@
+"""
+S3FD 候选框解码与 NMS 一致性检查与基准
+
+用随机生成的各 stride 层分类 / 回归输出（softmax 之后的分数图，含若干高分人脸区域）代替网络输出，
+对比改动前的逐 anchor 解码 + 逐图片 nms（sfd_detector.detect_from_batch 的旧实现）与
+decode_detections + batch_nms，torchvision.ops.batched_nms 与 NumPy nms 回退两条路径都检查，
+最终检测结果（NMS 后分数 > 0.5）需逐框一致。
+
+用法:
+    python benchmarks/sfd_decode.py
+    python benchmarks/sfd_decode.py --size 320 --batch-size 8 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from face_detection.detection.sfd import bbox as sfd_bbox
+from face_detection.detection.sfd.bbox import batch_decode, batch_nms, nms
+from face_detection.detection.sfd.detect import decode_detections
+
+SEEDS = range(9)
+BATCH_SIZES = (1, 4, 8)
+
+
+def make_outputs(batch_size, size, seed, faces=3):
+    """六个 stride 层的 [cls, reg, cls, reg, ...]，cls 已做 softmax"""
+    gen = torch.Generator().manual_seed(seed)
+    olist = []
+    for i in range(6):
+        stride = 2 ** (i + 2)
+        h = w = max(size // stride, 1)
+        logit = torch.randn(batch_size, h, w, generator=gen) * 1.5 - 4
+        # 每张图片放几块高分区域，NMS 后留下若干检测框；
+        # logit 不超过 4，避免 softmax 饱和后出现完全相同的分数（并列时两种实现的保留顺序可能不同）
+        for b in range(batch_size):
+            for _ in range(faces):
+                y, x = torch.randint(0, h, (2,), generator=gen).tolist()
+                region = logit[b, max(y - 1, 0):y + 2, max(x - 1, 0):x + 2]
+                region.copy_(torch.maximum(region, 4 * torch.rand(region.shape, generator=gen)))
+        cls = torch.stack([torch.zeros_like(logit), logit], 1).softmax(dim=1)
+        reg = torch.randn(batch_size, 4, h, w, generator=gen) * 0.5
+        olist += [cls, reg]
+    return olist
+
+
+def legacy_detect_from_batch(olist):
+    """改动前 batch_detect 的解码循环与 detect_from_batch 的逐图片 nms"""
+    BB = olist[0].shape[0]
+    bboxlist = []
+    for i in range(len(olist) // 2):
+        ocls, oreg = olist[i * 2], olist[i * 2 + 1]
+        stride = 2**(i + 2)    # 4,8,16,32,64,128
+        poss = zip(*np.where(ocls[:, 1, :, :] > 0.05))
+        for Iindex, hindex, windex in poss:
+            axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
+            score = ocls[:, 1, hindex, windex]
+            loc = oreg[:, :, hindex, windex].contiguous().view(BB, 1, 4)
+            priors = torch.Tensor([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]]).view(1, 1, 4)
+            variances = [0.1, 0.2]
+            box = batch_decode(loc, priors, variances)
+            box = box[:, 0] * 1.0
+            bboxlist.append(torch.cat([box, score.unsqueeze(1)], 1).cpu().numpy())
+    bboxlists = np.array(bboxlist)
+    if 0 == len(bboxlists):
+        bboxlists = np.zeros((1, BB, 5))
+    keeps = [nms(bboxlists[:, i, :], 0.3) for i in range(bboxlists.shape[1])]
+    bboxlists = [bboxlists[keep, i, :] for i, keep in enumerate(keeps)]
+    return [[x for x in bboxlist if x[-1] > 0.5] for bboxlist in bboxlists]
+
+
+def new_detect_from_batch(olist):
+    """batch_detect 的 decode_detections 与 detect_from_batch 的 batch_nms"""
+    dets, image_idx = decode_detections(olist)
+    dets, image_idx = dets.numpy(), image_idx.numpy()
+    bboxlists = [dets[image_idx == b] for b in range(olist[0].shape[0])]
+    keeps = batch_nms(bboxlists, 0.3)
+    bboxlists = [bboxlist[keep, :] for bboxlist, keep in zip(bboxlists, keeps)]
+    return [[x for x in bboxlist if x[-1] > 0.5] for bboxlist in bboxlists]
+
+
+def as_sorted(dets):
+    dets = np.asarray(dets, dtype=np.float32).reshape(-1, 5)
+    return dets[np.lexsort(dets.T[::-1])]
+
+
+def compare(legacy, new):
+    assert len(legacy) == len(new)
+    for a, b in zip(legacy, new):
+        a, b = as_sorted(a), as_sorted(b)
+        assert a.shape == b.shape, (a.shape, b.shape)
+        np.testing.assert_allclose(a, b, rtol=1e-5, atol=1e-3)
+    return sum(len(a) for a in legacy)
+
+
+def check(size=128):
+    paths = [('numpy', None)]
+    if sfd_bbox.batched_nms is not None:
+        paths.insert(0, ('torchvision', sfd_bbox.batched_nms))
+    original = sfd_bbox.batched_nms
+    try:
+        for name, impl in paths:
+            sfd_bbox.batched_nms = impl
+            faces = 0
+            for batch_size in BATCH_SIZES:
+                for seed in SEEDS:
+                    olist = make_outputs(batch_size, size, seed)
+                    faces += compare(legacy_detect_from_batch(olist), new_detect_from_batch(olist))
+            assert faces > 0, 'synthetic score maps must produce detections'
+            print(f"{name:12s} {len(SEEDS)} seeds x batch {BATCH_SIZES}: {faces} detections match")
+    finally:
+        sfd_bbox.batched_nms = original
+
+    # 没有任何候选框时每张图片返回空列表
+    empty = [torch.stack([torch.ones(2, 1, 4, 4), torch.zeros(2, 1, 4, 4)], 1)[:, :, 0], torch.zeros(2, 4, 4, 4)] * 6
+    assert new_detect_from_batch(empty) == [[], []]
+    print('regression check passed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3FD decode + NMS parity check and benchmark")
+    parser.add_argument("--size", type=int, default=320)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check()
+
+    olist = make_outputs(args.batch_size, args.size, seed=0)
+    for name, fn in (('legacy', legacy_detect_from_batch), ('tensorized', new_detect_from_batch)):
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn(olist)
+            times.append(time.perf_counter() - t0)
+        print(f"{name:12s} {np.median(times) * 1e3:10.1f} ms  (B={args.batch_size}, {args.size}x{args.size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,11 @@ import argparse
 import numpy as np
 import torch
 
+try:
+    from torchvision.ops import batched_nms
+except ImportError:
+    batched_nms = None
+
 try:
     from iou import IOU
 except BaseException:
@@ -64,6 +69,28 @@ def nms(dets, thresh):
     return keep
 
 
+def batch_nms(bboxlists, thresh):
+    """
+    对一个 batch 中每张图片的候选框分别做 NMS，返回每张图片保留的下标。
+    有 torchvision 时使用 batched_nms 一次处理整个 batch，否则逐图片回退到 nms。
+    """
+    if batched_nms is None:
+        return [nms(dets, thresh) for dets in bboxlists]
+    sizes = [len(dets) for dets in bboxlists]
+    if sum(sizes) == 0:
+        return [[] for _ in bboxlists]
+    dets = torch.from_numpy(np.concatenate([np.asarray(d, dtype=np.float32).reshape(-1, 5) for d in bboxlists], 0))
+    idxs = torch.repeat_interleave(torch.arange(len(sizes)), torch.tensor(sizes))
+    # nms 按像素计算面积 (x2 - x1 + 1)，右下角加 1 后与 torchvision 的 IoU 完全一致
+    boxes = dets[:, :4].clone()
+    boxes[:, 2:] += 1
+    keep = batched_nms(boxes, dets[:, 4], idxs, thresh)
+    offsets = np.cumsum([0] + sizes)
+    keep_idxs = idxs[keep].numpy()
+    keep = keep.numpy()
+    return [list(keep[keep_idxs == b] - offsets[b]) for b in range(len(sizes))]
+
+
 def encode(matched, priors, variances):
     """Encode the variances from the priorbox layers into the ground truth boxes
     we have matched (based on jaccard overlap) with the prior boxes.
@@ -16,46 +16,44 @@ from .net_s3fd import s3fd
 from .bbox import *
 
 
-def detect(net, img, device):
-    img = img - np.array([104, 117, 123])
-    img = img.transpose(2, 0, 1)
-    img = img.reshape((1,) + img.shape)
-
-    if 'cuda' in device:
-        torch.backends.cudnn.benchmark = True
-
-    img = torch.from_numpy(img).float().to(device)
-    BB, CC, HH, WW = img.size()
-    with torch.no_grad():
-        olist = net(img)
-
-    bboxlist = []
-    for i in range(len(olist) // 2):
-        olist[i * 2] = F.softmax(olist[i * 2], dim=1)
-    olist = [oelem.data.cpu() for oelem in olist]
+def decode_detections(olist, threshold=0.05):
+    """
+    将 S3FD 各层输出一次性解码为候选框。
+    每个 stride 层用 nonzero 取出所有超过阈值的 anchor，由索引网格直接计算 priors，
+    避免逐 anchor 构造张量与 decode。
+    Return:
+        dets: (K, 5) tensor [x1, y1, x2, y2, score]
+        image_idx: (K,) tensor，候选框所属图片在 batch 中的下标
+    """
+    variances = [0.1, 0.2]
+    dets, image_idx = [], []
     for i in range(len(olist) // 2):
         ocls, oreg = olist[i * 2], olist[i * 2 + 1]
-        FB, FC, FH, FW = ocls.size()  # feature map size
         stride = 2**(i + 2)    # 4,8,16,32,64,128
-        anchor = stride * 4
-        poss = zip(*np.where(ocls[:, 1, :, :] > 0.05))
-        for Iindex, hindex, windex in poss:
-            axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
-            score = ocls[0, 1, hindex, windex]
-            loc = oreg[0, :, hindex, windex].contiguous().view(1, 4)
-            priors = torch.Tensor([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]])
-            variances = [0.1, 0.2]
-            box = decode(loc, priors, variances)
-            x1, y1, x2, y2 = box[0] * 1.0
-            # cv2.rectangle(imgshow,(int(x1),int(y1)),(int(x2),int(y2)),(0,0,255),1)
-            bboxlist.append([x1, y1, x2, y2, score])
-    bboxlist = np.array(bboxlist)
+        scores = ocls[:, 1, :, :]
+        bindex, hindex, windex = torch.nonzero(scores > threshold, as_tuple=True)
+        if bindex.numel() == 0:
+            continue
+        anchor = torch.full_like(windex, stride * 4, dtype=torch.float32)
+        priors = torch.stack([stride / 2 + windex * stride, stride / 2 + hindex * stride, anchor, anchor], 1).float()
+        loc = oreg[bindex, :, hindex, windex]
+        box = decode(loc, priors, variances)
+        dets.append(torch.cat([box, scores[bindex, hindex, windex].unsqueeze(1)], 1))
+        image_idx.append(bindex)
+    if not dets:
+        return torch.zeros((0, 5)), torch.zeros((0,), dtype=torch.long)
+    return torch.cat(dets, 0), torch.cat(image_idx, 0)
+
+
+def detect(net, img, device):
+    bboxlist = batch_detect(net, img.reshape((1,) + img.shape), device)[0]
     if 0 == len(bboxlist):
         bboxlist = np.zeros((1, 5))
 
     return bboxlist
 
 def batch_detect(net, imgs, device):
+    """返回每张图片的候选框列表，元素为 (K, 5) 的 ndarray [x1, y1, x2, y2, score]"""
     imgs = imgs - np.array([104, 117, 123])
     imgs = imgs.transpose(0, 3, 1, 2)
 
@@ -67,31 +65,13 @@ def batch_detect(net, imgs, device):
     with torch.no_grad():
         olist = net(imgs)
 
-    bboxlist = []
     for i in range(len(olist) // 2):
         olist[i * 2] = F.softmax(olist[i * 2], dim=1)
     olist = [oelem.data.cpu() for oelem in olist]
-    for i in range(len(olist) // 2):
-        ocls, oreg = olist[i * 2], olist[i * 2 + 1]
-        FB, FC, FH, FW = ocls.size()  # feature map size
-        stride = 2**(i + 2)    # 4,8,16,32,64,128
-        anchor = stride * 4
-        poss = zip(*np.where(ocls[:, 1, :, :] > 0.05))
-        for Iindex, hindex, windex in poss:
-            axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
-            score = ocls[:, 1, hindex, windex]
-            loc = oreg[:, :, hindex, windex].contiguous().view(BB, 1, 4)
-            priors = torch.Tensor([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]]).view(1, 1, 4)
-            variances = [0.1, 0.2]
-            box = batch_decode(loc, priors, variances)
-            box = box[:, 0] * 1.0
-            # cv2.rectangle(imgshow,(int(x1),int(y1)),(int(x2),int(y2)),(0,0,255),1)
-            bboxlist.append(torch.cat([box, score.unsqueeze(1)], 1).cpu().numpy())
-    bboxlist = np.array(bboxlist)
-    if 0 == len(bboxlist):
-        bboxlist = np.zeros((1, BB, 5))
+    dets, image_idx = decode_detections(olist)
+    dets, image_idx = dets.numpy(), image_idx.numpy()
 
-    return bboxlist
+    return [dets[image_idx == b] for b in range(BB)]
 
 def flip_detect(net, img, device):
     img = cv2.flip(img, 1)
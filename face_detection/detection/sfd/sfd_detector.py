@@ -40,8 +40,8 @@ class SFDDetector(FaceDetector):
 
     def detect_from_batch(self, images):
         bboxlists = batch_detect(self.face_detector, images, device=self.device)
-        keeps = [nms(bboxlists[:, i, :], 0.3) for i in range(bboxlists.shape[1])]
-        bboxlists = [bboxlists[keep, i, :] for i, keep in enumerate(keeps)]
+        keeps = batch_nms(bboxlists, 0.3)
+        bboxlists = [bboxlist[keep, :] for bboxlist, keep in zip(bboxlists, keeps)]
         bboxlists = [[x for x in bboxlist if x[-1] > 0.5] for bboxlist in bboxlists]
 
         return bboxlists
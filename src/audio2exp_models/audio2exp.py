@@ -10,7 +10,7 @@ class Audio2Exp(nn.Module):
         self.device = device
         self.netG = netG.to(device)
 
-    def test(self, batch):
+    def test(self, batch, frames_per_pass=128):
 
         mel_input = batch['indiv_mels']                         # bs T 1 80 16
         bs = mel_input.shape[0]
@@ -18,15 +18,16 @@ class Audio2Exp(nn.Module):
 
         exp_coeff_pred = []
 
-        for i in tqdm(range(0, T, 10),'audio2exp:'): # every 10 frames
+        # 逐帧独立（BatchNorm 为 eval 模式），每次前向处理 frames_per_pass 帧而不是 10 帧
+        for i in tqdm(range(0, T, frames_per_pass),'audio2exp:'):
             
-            current_mel_input = mel_input[:,i:i+10]
+            current_mel_input = mel_input[:,i:i+frames_per_pass]
 
             #ref = batch['ref'][:, :, :64].repeat((1,current_mel_input.shape[1],1))           #bs T 64
-            ref = batch['ref'][:, :, :64][:, i:i+10]
-            ratio = batch['ratio_gt'][:, i:i+10]                               #bs T
+            ref = batch['ref'][:, :, :64][:, i:i+frames_per_pass]
+            ratio = batch['ratio_gt'][:, i:i+frames_per_pass]                               #bs T
 
-            audiox = current_mel_input.view(-1, 1, 80, 16)                  # bs*T 1 80 16
+            audiox = current_mel_input.reshape(-1, 1, 80, 16)                  # bs*T 1 80 16
 
             curr_exp_coeff_pred  = self.netG(audiox, ref, ratio)         # bs T 64 
 
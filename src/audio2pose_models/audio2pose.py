@@ -45,7 +45,15 @@ class Audio2Pose(nn.Module):
 
         return batch
 
-    def test(self, x):
+    def encode_audio(self, mels, frames_per_pass=128):
+        """mels: bs T 1 80 16 -> bs T 512，按帧独立编码，每次前向处理 frames_per_pass 帧"""
+        bs, T = mels.shape[:2]
+        frames = mels.reshape(bs * T, *mels.shape[2:])
+        audio_emb = torch.cat([self.audio_encoder.audio_encoder(frames[i:i + frames_per_pass])
+                               for i in range(0, bs * T, frames_per_pass)], dim=0)
+        return audio_emb.reshape(bs, T, -1)
+
+    def test(self, x, windows_per_pass=64):
 
         batch = {}
         ref = x['ref']                            #bs 1 70
@@ -61,32 +69,43 @@ class Audio2Pose(nn.Module):
         #  
         div = num_frames//self.seq_len
         re = num_frames%self.seq_len
-        audio_emb_list = []
-        pose_motion_pred_list = [torch.zeros(batch['ref'].unsqueeze(1).shape, dtype=batch['ref'].dtype, 
-                                                device=batch['ref'].device)]
-
-        for i in range(div):
-            z = torch.randn(bs, self.latent_dim).to(ref.device)
-            batch['z'] = z
-            audio_emb = self.audio_encoder(indiv_mels_use[:, i*self.seq_len:(i+1)*self.seq_len,:,:,:]) #bs seq_len 512
-            batch['audio_emb'] = audio_emb
-            batch = self.netG.test(batch)
-            pose_motion_pred_list.append(batch['pose_motion_pred'])  #list of bs seq_len 6
-        
+        n_windows = div + (re != 0)
+
+        # 与逐窗口采样相同的随机数序列：窗口 i 的 z 等于第 i 次 torch.randn(bs, latent_dim)
+        z = torch.randn(n_windows, bs, self.latent_dim).to(ref.device)
+
+        # 所有帧一次编码，再切成 seq_len 窗口；余数窗口取最后 seq_len 帧（不足时用首帧在前面补齐）
+        audio_emb = self.encode_audio(indiv_mels_use)    #bs T-1 512
+        windows = [audio_emb[:, i*self.seq_len:(i+1)*self.seq_len] for i in range(div)]
         if re != 0:
-            z = torch.randn(bs, self.latent_dim).to(ref.device)
-            batch['z'] = z
-            audio_emb = self.audio_encoder(indiv_mels_use[:, -1*self.seq_len:,:,:,:]) #bs seq_len  512
-            if audio_emb.shape[1] != self.seq_len:
-                pad_dim = self.seq_len-audio_emb.shape[1]
-                pad_audio_emb = audio_emb[:, :1].repeat(1, pad_dim, 1) 
-                audio_emb = torch.cat([pad_audio_emb, audio_emb], 1) 
-            batch['audio_emb'] = audio_emb
+            last = audio_emb[:, -1*self.seq_len:]
+            if last.shape[1] != self.seq_len:
+                pad_dim = self.seq_len-last.shape[1]
+                last = torch.cat([last[:, :1].repeat(1, pad_dim, 1), last], 1)
+            windows.append(last)
+        windows = torch.stack(windows, dim=0)                              #n_windows bs seq_len 512
+
+        # 所有窗口并入 batch 维，每次前向 windows_per_pass 个窗口
+        pose_motion_pred = []
+        for i in range(0, n_windows, windows_per_pass):
+            n = min(windows_per_pass, n_windows - i)
+            batch['z'] = z[i:i+n].reshape(n * bs, -1)
+            batch['audio_emb'] = windows[i:i+n].reshape(n * bs, self.seq_len, -1)
+            batch['ref'] = x['ref'][:,0,-6:].repeat(n, 1)
+            batch['class'] = x['class'].repeat(n)
             batch = self.netG.test(batch)
-            pose_motion_pred_list.append(batch['pose_motion_pred'][:,-1*re:,:])   
+            pose_motion_pred.append(batch['pose_motion_pred'].reshape(n, bs, self.seq_len, -1))
+        pose_motion_pred = torch.cat(pose_motion_pred, dim=0).transpose(0, 1)     #bs n_windows seq_len 6
+
+        pose_motion_pred_list = [torch.zeros(bs, 1, 6, dtype=ref.dtype, device=ref.device),
+                                 pose_motion_pred[:, :div].reshape(bs, div * self.seq_len, 6)]
+        if re != 0:
+            pose_motion_pred_list.append(pose_motion_pred[:, -1, -1*re:])
         
         pose_motion_pred = torch.cat(pose_motion_pred_list, dim = 1)
         batch['pose_motion_pred'] = pose_motion_pred
+        batch['ref'] = x['ref'][:,0,-6:]
+        batch['class'] = x['class']
 
         pose_pred = ref[:, :1, -6:] + pose_motion_pred  # bs T 6
 
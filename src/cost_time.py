@@ -1,11 +1,410 @@
+"""
+耗时统计与性能分析 (instrumentation)
+
+- span(name) / @instrument: 嵌套的阶段计时。调用时没有进行中的请求则自动开启一个新请求 (trace)，
+  每个请求有独立的 trace_id，span 沿 contextvars 传递（asyncio 任务、FastAPI 线程池中同样有效）；
+- 每个阶段的耗时进入直方图，统计 count / sum / p50 / p95 / p99，可导出 Prometheus 文本格式与 JSON；
+- trace(profile='cprofile' | 'torch'): 对单个请求开启 cProfile 或 torch profiler，结果以随机文件名保存到 PROFILE_DIR；
+- instrument_app(app): 给 FastAPI 服务加上请求追踪中间件与 /metrics、/metrics.json 接口，
+  请求按路由模板（而不是具体路径）统计；
+  gradio 等其它应用用 start_metrics_server(port) 在后台线程提供同样的接口。
+calculate_time 保留为 instrument 的别名。
+"""
+import contextlib
+import contextvars
+import cProfile
+import functools
+import inspect
+import json
+import os
+import re
+import threading
 import time
+import uuid
+from collections import OrderedDict, deque
+
+PROFILE_DIR = os.environ.get('LINLY_PROFILE_DIR', './results/profile')
+# 自动开启的请求默认使用的 profiler（空表示不开启），单个请求可通过 trace(profile=...) 指定
+DEFAULT_PROFILE = os.environ.get('LINLY_PROFILE') or None
+# 是否允许客户端用请求头 X-Profile 为自己的请求开启 profiler（默认关闭）
+PROFILE_HEADER = os.environ.get('LINLY_PROFILE_HEADER', '0') == '1'
+# webui 等非 FastAPI 应用提供指标接口的端口（空表示不开启）
+METRICS_PORT = os.environ.get('LINLY_METRICS_PORT') or None
+# 请求结束时是否打印各阶段耗时（原 calculate_time 的行为）
+VERBOSE = os.environ.get('LINLY_TIMING_VERBOSE', '1') != '0'
+# Prometheus 直方图桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = contextvars.ContextVar('linly_span', default=None)
+# 外部传入的 trace_id（如请求头 X-Request-ID）只接受这种格式，否则重新生成
+_TRACE_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class Histogram:
+    """累计的分桶计数（Prometheus）加最近 window 个样本（分位数）"""
+    def __init__(self, buckets=BUCKETS, window=2048):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self):
+        stats = {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else 0.0,
+                 'max': self.max}
+        for q in QUANTILES:
+            stats['p%g' % (q * 100)] = self.quantile(q)
+        return stats
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'start', 'end', 'children')
+
+    def __init__(self, name, attrs=None, start=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.children = []
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        node = {'name': self.name, 'start': self.start - origin, 'duration': self.duration}
+        if self.attrs:
+            node['attrs'] = self.attrs
+        if self.children:
+            node['children'] = [child.to_dict(origin) for child in self.children]
+        return node
+
+
+class Trace:
+    """一次请求：根 span 与其下嵌套的各阶段"""
+    def __init__(self, name, trace_id=None, attrs=None):
+        self.trace_id = trace_id if trace_id and _TRACE_ID.fullmatch(trace_id) else uuid.uuid4().hex[:16]
+        self.root = Span(name, attrs)
+        self.created = time.time()
+        self.profile_path = None
+        self._lock = threading.Lock()
+
+    def add(self, parent, span):
+        with self._lock:
+            parent.children.append(span)
+
+    def to_dict(self):
+        return {'trace_id': self.trace_id, 'created': self.created, 'profile': self.profile_path,
+                **self.root.to_dict()}
+
+
+class Registry:
+    def __init__(self, max_traces=200):
+        self._lock = threading.Lock()
+        self._stages = OrderedDict()
+        self._traces = deque(maxlen=max_traces)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = Histogram()
+            self._stages[stage].observe(seconds)
+
+    def add_trace(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def stats(self):
+        with self._lock:
+            return {stage: hist.snapshot() for stage, hist in self._stages.items()}
+
+    def traces(self, limit=None):
+        with self._lock:
+            traces = list(self._traces)
+        return [t.to_dict() for t in traces[-limit if limit else 0:]]
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._traces.clear()
+
+    def to_json(self, traces=20):
+        return json.dumps({'stages': self.stats(), 'traces': self.traces(traces)}, ensure_ascii=False, indent=1)
+
+    def to_prometheus(self, metric='linly_stage_seconds'):
+        lines = ['# HELP %s Stage latency in seconds' % metric, '# TYPE %s histogram' % metric]
+        quantile_lines = ['# HELP %s_quantile Stage latency quantiles over recent samples' % metric,
+                          '# TYPE %s_quantile gauge' % metric]
+        with self._lock:
+            stages = list(self._stages.items())
+            for stage, hist in stages:
+                label = 'stage="%s"' % _escape_label(stage)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.bucket_counts):
+                    cumulative += count
+                    lines.append('%s_bucket{%s,le="%g"} %d' % (metric, label, bound, cumulative))
+                lines.append('%s_bucket{%s,le="+Inf"} %d' % (metric, label, hist.count))
+                lines.append('%s_sum{%s} %.6f' % (metric, label, hist.sum))
+                lines.append('%s_count{%s} %d' % (metric, label, hist.count))
+                for q in QUANTILES:
+                    quantile_lines.append('%s_quantile{%s,quantile="%g"} %.6f' % (metric, label, q, hist.quantile(q)))
+        return '\n'.join(lines + quantile_lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def _start_profiler(kind):
+    if not kind:
+        return None
+    try:
+        if kind == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if kind == 'torch':
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+            profiler.__enter__()
+            return profiler
+    except ValueError as e:
+        # cProfile 同一时刻只能有一个在运行（并发请求同时开启时）
+        print('profiler 启动失败，本次请求不做性能分析: {}'.format(e))
+        return None
+    raise ValueError('Unknown profiler {}'.format(kind))
+
+
+def _stop_profiler(profiler, kind):
+    if profiler is None:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # 文件名总是新生成的 ID，不使用外部传入的 trace_id；对应关系记录在 trace 的 profile 字段
+    name = uuid.uuid4().hex
+    if kind == 'cprofile':
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, name + '.prof')
+        profiler.dump_stats(path)
+    else:
+        profiler.__exit__(None, None, None)
+        path = os.path.join(PROFILE_DIR, name + '.json')
+        profiler.export_chrome_trace(path)
+    return path
+
+
+def _restore(token, previous):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # 在另一个 context 中结束（例如跨线程消费的生成器），直接恢复之前的值
+        _current.set(previous)
+
+
+@contextlib.contextmanager
+def trace(name='request', trace_id=None, profile=None, **attrs):
+    """
+    开启一次请求追踪，profile 为 'cprofile' 或 'torch' 时对该请求做性能分析。
+    结束前可修改 t.root.name，耗时按修改后的名称统计（中间件在路由匹配后才知道路由模板）。
+    """
+    t = Trace(name, trace_id, attrs)
+    previous = _current.get()
+    token = _current.set((t, t.root))
+    profiler = _start_profiler(profile)
+    try:
+        yield t
+    finally:
+        t.profile_path = _stop_profiler(profiler, profile)
+        t.root.end = time.perf_counter()
+        _restore(token, previous)
+        name = t.root.name
+        registry.observe(name, t.root.duration)
+        registry.add_trace(t)
+        if VERBOSE:
+            stages = ', '.join('%s %.3fs' % (child.name, child.duration) for child in t.root.children)
+            print('[trace %s] %s 运行时间: %.3f 秒%s' % (t.trace_id, name, t.root.duration,
+                                                    ' (%s)' % stages if stages else ''))
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """计时一个阶段；没有进行中的请求时作为新请求的根"""
+    current = _current.get()
+    if current is None:
+        with trace(name, profile=DEFAULT_PROFILE, **attrs) as t:
+            yield t.root
+        return
+    t, parent = current
+    s = Span(name, attrs)
+    t.add(parent, s)
+    token = _current.set((t, s))
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        _restore(token, current)
+        registry.observe(name, s.duration)
+
+
+def record(name, seconds, **attrs):
+    """记录一段已经测得的耗时（例如分散在多次调用中的编码时间）"""
+    current = _current.get()
+    if current is not None:
+        t, parent = current
+        s = Span(name, attrs, start=time.perf_counter() - seconds)
+        s.end = s.start + seconds
+        t.add(parent, s)
+    registry.observe(name, seconds)
+
+
+def current_trace_id():
+    current = _current.get()
+    return current[0].trace_id if current is not None else None
+
+
+def current_span_name():
+    """当前最内层阶段的名称（没有进行中的请求时为 None）"""
+    current = _current.get()
+    return current[1].name if current is not None else None
+
+
+def instrument(name=None, **attrs):
+    """
+    阶段计时装饰器，@instrument 或 @instrument('stage')，默认阶段名为函数的 __qualname__。
+    支持普通函数、协程函数与生成器函数（生成器统计从开始到耗尽的总时间）。
+    """
+    if callable(name):
+        return instrument()(name)
+
+    def decorator(func):
+        stage = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(stage, **attrs):
+                    return await func(*args, **kwargs)
+        elif inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # 生成器可能在不同线程中被逐步消费（如 gradio 流式输出），不设置 context，只记录总耗时
+                start = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    record(stage, time.perf_counter() - start, **attrs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(stage, **attrs):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 兼容旧代码
+calculate_time = instrument
+
+
+def metrics_json(traces=20):
+    return registry.to_json(traces)
+
+
+def prometheus_text():
+    return registry.to_prometheus()
+
+
+def instrument_app(app):
+    """
+    FastAPI 服务：每个请求一次 trace，响应头返回 X-Trace-ID；并提供 /metrics（Prometheus）与 /metrics.json 接口。
+    - 请求头 X-Request-ID 符合 [A-Za-z0-9_-]{1,64} 时作为 trace_id，否则重新生成；
+    - 请求头 X-Profile 指定 profiler，只在 LINLY_PROFILE_HEADER=1 时生效；
+    - 耗时按 "方法 路由模板"（如 GET /talker_jobs/{job_id}）统计，未匹配任何路由的请求记为 "方法 unmatched"，
+      避免每个任务 ID 或扫描路径各产生一个直方图。
+    """
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse, Response
+
+    @app.middleware('http')
+    async def trace_request(request: Request, call_next):
+        if request.url.path.startswith('/metrics'):
+            return await call_next(request)
+        profile = (PROFILE_HEADER and request.headers.get('X-Profile')) or DEFAULT_PROFILE
+        if profile not in (None, 'cprofile', 'torch'):
+            profile = None
+        with trace(request.method + ' unmatched', trace_id=request.headers.get('X-Request-ID'),
+                   profile=profile) as t:
+            try:
+                response = await call_next(request)
+            finally:
+                # 路由匹配后 scope 中才有 route，取其路径模板作为统计名称
+                route = getattr(request.scope.get('route'), 'path', None)
+                if route is not None:
+                    t.root.name = request.method + ' ' + route
+        response.headers['X-Trace-ID'] = t.trace_id
+        return response
+
+    @app.get('/metrics', response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(prometheus_text(), media_type='text/plain; version=0.0.4')
+
+    @app.get('/metrics.json')
+    async def metrics_json_endpoint(traces: int = 20):
+        return Response(metrics_json(traces), media_type='application/json')
+
+    return app
+
+
+def start_metrics_server(port=METRICS_PORT, host='0.0.0.0'):
+    """在后台线程提供 /metrics（Prometheus）与 /metrics.json，port 为空时不启动"""
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/metrics':
+                body, content_type = prometheus_text(), 'text/plain; version=0.0.4'
+            elif path == '/metrics.json':
+                body, content_type = metrics_json(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
 
-# 定义装饰器
-def calculate_time(func):
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        print(f"函数 {func.__name__} 运行时间： {end_time - start_time} 秒")
-        return result
-    return wrapper
\ No newline at end of file
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print('Metrics server started on {}:{}'.format(host, port))
+    return server
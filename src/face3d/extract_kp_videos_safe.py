@@ -10,12 +10,11 @@ from tqdm import tqdm
 from itertools import cycle
 from torch.multiprocessing import Pool, Process, set_start_method
 
-from facexlib.alignment import landmark_98_to_68
-from facexlib.detection import init_detection_model
-
 from facexlib.utils import load_file_from_url
 from facexlib.alignment.awing_arch import FAN
 
+from src.utils.face_analysis import get_face_analysis
+
 def init_alignment_model(model_name, half=False, device='cuda', model_rootpath=None):
     if model_name == 'awing_fan':
         model = FAN(num_modules=4, num_landmarks=98, device=device)
@@ -42,8 +41,9 @@ class KeypointExtractor():
         except:
             root_path = 'gfpgan/weights'
         root_path = 'gfpgan/weights'
-        self.detector = init_alignment_model('awing_fan',device=device, model_rootpath=root_path)   
-        self.det_net = init_detection_model('retinaface_resnet50', half=False,device=device, model_rootpath=root_path)
+        # RetinaFace 与 AWing FAN 由共享的人脸分析服务在首次使用时加载（进程内只加载一次），结果按帧哈希缓存
+        self.root_path = root_path
+        self.face_analysis = get_face_analysis()
 
     def extract_keypoint(self, images, name=None, info=True):
         if isinstance(images, list):
@@ -67,21 +67,13 @@ class KeypointExtractor():
         else:
             while True:
                 try:
-                    with torch.no_grad():
-                        # face detection -> face alignment.
-                        img = np.array(images)
-                        bboxes = self.det_net.detect_faces(images, 0.97)
-                        
-                        bboxes = bboxes[0]
-                        img = img[int(bboxes[1]):int(bboxes[3]), int(bboxes[0]):int(bboxes[2]), :]
-
-                        keypoints = landmark_98_to_68(self.detector.get_landmarks(img)) # [0]
-
-                        #### keypoints to the original location
-                        keypoints[:,0] += int(bboxes[0])
-                        keypoints[:,1] += int(bboxes[1])
-
-                        break
+                    # face detection -> face alignment.
+                    keypoints = self.face_analysis.landmarks_fan([images], 0.97, self.root_path)[0]
+                    if keypoints is None:
+                        print('No face detected in this image')
+                        shape = [68, 2]
+                        keypoints = -1. * np.ones(shape)
+                    break
                 except RuntimeError as e:
                     if str(e).startswith('CUDA'):
                         print("Warning: out of memory, sleep for 1s")
@@ -89,11 +81,6 @@ class KeypointExtractor():
                     else:
                         print(e)
                         break    
-                except TypeError:
-                    print('No face detected in this image')
-                    shape = [68, 2]
-                    keypoints = -1. * np.ones(shape)                    
-                    break
             if name is not None:
                 np.savetxt(os.path.splitext(name)[0]+'.txt', keypoints.reshape(-1))
             return keypoints
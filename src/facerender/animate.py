@@ -4,8 +4,7 @@ import yaml
 import numpy as np
 import warnings
 from skimage import img_as_ubyte
-import safetensors
-import safetensors.torch 
+from src.utils.safetensor_helper import open_safetensor
 warnings.filterwarnings('ignore')
 
 
@@ -18,30 +17,15 @@ from src.facerender.modules.generator import  OcclusionAwareSPADEGenerator
 from src.facerender.modules.make_animation import make_animation 
 
 # from pydub import AudioSegment 
-from src.utils.face_enhancer import enhancer_generator_with_len, enhancer_list
+from src.utils.face_enhancer import enhance_video
 from src.utils.paste_pic import paste_pic
-from src.utils.videoio import save_video_with_watermark
-import imageio
+from src.utils.videoio import write_video, iter_video_frames
 try:
     import webui  # in webui
     in_webui = True
 except:
     in_webui = False
 
-def opencv_save_video(path, videos, fps = 25, img_size = 256):
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(path, fourcc, float(fps), (img_size, img_size))
-
-    # Write each frame to the video file
-    for frame in videos:
-        video_writer.write(frame)
-        # cv2.imshow("Stream", frame)
-        # if cv2.waitKey(1) & 0xFF == ord('q'):
-        #     break
-
-    # Release the video writer and close the file
-    video_writer.release()
-
 class AnimateFromCoeff():
 
     def __init__(self, sadtalker_path, device):
@@ -99,26 +83,14 @@ class AnimateFromCoeff():
                         kp_detector=None, he_estimator=None,  
                         device="cpu"):
 
-        checkpoint = safetensors.torch.load_file(checkpoint_path)
+        checkpoint = open_safetensor(checkpoint_path)
 
         if generator is not None:
-            x_generator = {}
-            for k,v in checkpoint.items():
-                if 'generator' in k:
-                    x_generator[k.replace('generator.', '')] = v
-            generator.load_state_dict(x_generator)
+            checkpoint.load_into(generator, 'generator')
         if kp_detector is not None:
-            x_generator = {}
-            for k,v in checkpoint.items():
-                if 'kp_extractor' in k:
-                    x_generator[k.replace('kp_extractor.', '')] = v
-            kp_detector.load_state_dict(x_generator)
+            checkpoint.load_into(kp_detector, 'kp_extractor')
         if he_estimator is not None:
-            x_generator = {}
-            for k,v in checkpoint.items():
-                if 'he_estimator' in k:
-                    x_generator[k.replace('he_estimator.', '')] = v
-            he_estimator.load_state_dict(x_generator)
+            checkpoint.load_into(he_estimator, 'he_estimator')
         
         return None
 
@@ -199,15 +171,7 @@ class AnimateFromCoeff():
             # result = [ cv2.cvtColor(result_i, cv2.COLOR_BGR2RGB) for result_i in result ]
             
         video_name = x['video_name']  + '.mp4'
-        path = os.path.join(video_save_dir, 'temp_'+video_name)
         print("fps: ", fps, len(result))
-        # imageio.mimsave(path, result,  fps=float(fps))
-        
-        # OpenCV save
-        # save_video(path, result, fps, img_size)
-        print(path)
-        # mimsave
-        imageio.mimsave(path, result,  fps=float(fps))
         
         av_path = os.path.join(video_save_dir, video_name)
         return_path = av_path 
@@ -224,14 +188,16 @@ class AnimateFromCoeff():
         # word = word1[start_time:end_time]
         # word.export(new_audio_path, format="wav")
 
-        save_video_with_watermark(path, audio_path, av_path, watermark= False)
+        # 结果帧经管道直接编码并混入音频，一次编码
+        write_video(result, av_path, float(fps), audio=audio_path, rgb=True)
 
         if 'full' in preprocess.lower():
             # only add watermark to the full image.
             video_name_full = x['video_name']  + '_full.mp4'
             full_video_path = os.path.join(video_save_dir, video_name_full)
             return_path = full_video_path
-            paste_pic(path, pic_path, crop_info, audio_path, full_video_path, extended_crop= True if 'ext' in preprocess.lower() else False)
+            paste_pic(result, pic_path, crop_info, audio_path, full_video_path, extended_crop= True if 'ext' in preprocess.lower() else False,
+                      fps=fps, rgb=True)
             print(f'The generated video is named {video_save_dir}/{video_name_full}') 
         else:
             full_video_path = av_path 
@@ -239,26 +205,14 @@ class AnimateFromCoeff():
         ### paste back then enhancers
         if enhancer:
             video_name_enhancer = x['video_name']  + '_enhanced.mp4'
-            enhanced_path = os.path.join(video_save_dir, 'temp_'+video_name_enhancer)
             av_path_enhancer = os.path.join(video_save_dir, video_name_enhancer) 
             return_path = av_path_enhancer
 
-            try:
-                enhanced_images_gen_with_len = enhancer_generator_with_len(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(fps))
-                # print(enhanced_images_gen_with_len.shape)
-                # save_video(enhanced_path, enhanced_images_gen_with_len, fps, img_size)
-            except:
-                enhanced_images_gen_with_len = enhancer_list(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                # print(enhanced_images_gen_with_len.shape)
-                # save_video(enhanced_path, enhanced_images_gen_with_len, fps, img_size)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(fps))
-            
-            save_video_with_watermark(enhanced_path, audio_path, av_path_enhancer, watermark= False)
-            # print(f'The generated video is named {video_save_dir}/{video_name_enhancer}')
-            os.remove(enhanced_path)
-
-        os.remove(path)
+            # 增强服务常驻；未贴回原图时直接增强内存中的结果帧，否则逐帧解码贴回后的视频，
+            # 增强结果流式编码并同时混入音频
+            frames = iter_video_frames(full_video_path) if 'full' in preprocess.lower() else result
+            enhance_video(frames, av_path_enhancer, float(fps), audio=audio_path,
+                          method=enhancer, bg_upsampler=background_enhancer, rgb=True)
 
         return return_path
 
@@ -3,6 +3,7 @@ import torch
 import torch.nn.functional as F
 import numpy as np
 from tqdm import tqdm 
+from src.cost_time import instrument
 
 def normalize_kp(kp_source, kp_driving, kp_driving_initial, adapt_movement_scale=False,
                  use_relative_movement=False, use_relative_jacobian=False):
@@ -99,6 +100,7 @@ def keypoint_transformation(kp_canonical, he, wo_exp=False):
 
 
 
+@instrument
 def make_animation(source_image, source_semantics, target_semantics,
                             generator, kp_detector, he_estimator, mapping, 
                             yaw_c_seq=None, pitch_c_seq=None, roll_c_seq=None,
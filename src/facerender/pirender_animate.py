@@ -10,16 +10,15 @@ import safetensors.torch
 warnings.filterwarnings('ignore')
 
 
-import imageio
 import torch
 
 from src.facerender.pirender.config import Config
 from src.facerender.pirender.face_model import FaceGenerator
 
 from pydub import AudioSegment 
-from src.utils.face_enhancer import enhancer_generator_with_len, enhancer_list
+from src.utils.face_enhancer import enhance_video
 from src.utils.paste_pic import paste_pic
-from src.utils.videoio import save_video_with_watermark
+from src.utils.videoio import write_video, iter_video_frames
 
 try:
     import webui  # in webui
@@ -73,9 +72,6 @@ class AnimateFromCoeff_PIRender():
             result = [ cv2.resize(result_i,(img_size, int(img_size * original_size[1]/original_size[0]) )) for result_i in result ]
         
         video_name = x['video_name']  + '.mp4'
-        path = os.path.join(video_save_dir, 'temp_'+video_name)
-        
-        imageio.mimsave(path, result,  fps=float(25))
 
         av_path = os.path.join(video_save_dir, video_name)
         return_path = av_path 
@@ -92,7 +88,8 @@ class AnimateFromCoeff_PIRender():
         word = word1[start_time:end_time]
         word.export(new_audio_path, format="wav")
 
-        save_video_with_watermark(path, new_audio_path, av_path, watermark= False)
+        # 结果帧经管道直接编码并混入音频，一次编码
+        write_video(result, av_path, float(25), audio=new_audio_path, rgb=True)
         print(f'The generated video is named {video_save_dir}/{video_name}') 
 
         if 'full' in preprocess.lower():
@@ -100,7 +97,8 @@ class AnimateFromCoeff_PIRender():
             video_name_full = x['video_name']  + '_full.mp4'
             full_video_path = os.path.join(video_save_dir, video_name_full)
             return_path = full_video_path
-            paste_pic(path, pic_path, crop_info, new_audio_path, full_video_path, extended_crop= True if 'ext' in preprocess.lower() else False)
+            paste_pic(result, pic_path, crop_info, new_audio_path, full_video_path, extended_crop= True if 'ext' in preprocess.lower() else False,
+                      fps=25, rgb=True)
             print(f'The generated video is named {video_save_dir}/{video_name_full}') 
         else:
             full_video_path = av_path 
@@ -108,22 +106,16 @@ class AnimateFromCoeff_PIRender():
         #### paste back then enhancers
         if enhancer:
             video_name_enhancer = x['video_name']  + '_enhanced.mp4'
-            enhanced_path = os.path.join(video_save_dir, 'temp_'+video_name_enhancer)
             av_path_enhancer = os.path.join(video_save_dir, video_name_enhancer) 
             return_path = av_path_enhancer
 
-            try:
-                enhanced_images_gen_with_len = enhancer_generator_with_len(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(25))
-            except:
-                enhanced_images_gen_with_len = enhancer_list(full_video_path, method=enhancer, bg_upsampler=background_enhancer)
-                imageio.mimsave(enhanced_path, enhanced_images_gen_with_len, fps=float(25))
-            
-            save_video_with_watermark(enhanced_path, new_audio_path, av_path_enhancer, watermark= False)
+            # 增强服务常驻；未贴回原图时直接增强内存中的结果帧，否则逐帧解码贴回后的视频，
+            # 增强结果流式编码并同时混入音频
+            frames = iter_video_frames(full_video_path) if 'full' in preprocess.lower() else result
+            enhance_video(frames, av_path_enhancer, float(25), audio=new_audio_path,
+                          method=enhancer, bg_upsampler=background_enhancer, rgb=True)
             print(f'The generated video is named {video_save_dir}/{video_name_enhancer}')
-            os.remove(enhanced_path)
 
-        os.remove(path)
         os.remove(new_audio_path)
 
         return return_path
@@ -6,6 +6,8 @@ import numpy as np
 import random
 import scipy.io as scio
 import src.utils.audio as audio
+from src.utils.audio_clip import AudioClip
+from src.cost_time import instrument
 
 def crop_pad_audio(wav, audio_length):
     if len(wav) > audio_length:
@@ -48,12 +50,16 @@ def generate_blink_seq_randomly(num_frames):
             break
     return ratio
 
+@instrument
 def get_data(first_coeff_path, audio_path, device, ref_eyeblink_coeff_path, still=False, idlemode=False, length_of_audio=False, use_blink=True, fps=25):
 
     syncnet_mel_step_size = 16
 
     pic_name = os.path.splitext(os.path.split(first_coeff_path)[-1])[0]
-    audio_name = os.path.splitext(os.path.split(audio_path)[-1])[0]
+    if isinstance(audio_path, AudioClip):
+        audio_name = audio_path.name
+    else:
+        audio_name = os.path.splitext(os.path.split(audio_path)[-1])[0]
 
     
     # if idlemode:
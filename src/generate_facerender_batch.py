@@ -5,6 +5,8 @@ from skimage import  img_as_float32, transform
 import torch
 import scipy.io as scio
 import os
+from src.cost_time import instrument
+@instrument
 def get_facerender_data(coeff, pic_path, first_coeff_path, audio_path, 
                         batch_size, input_yaw_list=None, input_pitch_list=None, input_roll_list=None, 
                         expression_scale=1.0, still_mode = False, preprocess='crop', size = 256, facemodel='facevid2vid'):
@@ -54,21 +56,10 @@ def get_facerender_data(coeff, pic_path, first_coeff_path, audio_path,
     #             f.write(str(i)[:7]   + '  '+'\t')
     #         f.write('\n')
 
-    target_semantics_list = [] 
     frame_num = generated_3dmm.shape[0]
     data['frame_num'] = frame_num
-    for frame_idx in range(frame_num):
-        target_semantics = transform_semantic_target(generated_3dmm, frame_idx, semantic_radius)
-        target_semantics_list.append(target_semantics)
-
-    remainder = frame_num%batch_size
-    if remainder!=0:
-        for _ in range(batch_size-remainder):
-            target_semantics_list.append(target_semantics)
-
-    target_semantics_np = np.array(target_semantics_list)             #frame_num 70 semantic_radius*2+1
-    target_semantics_np = target_semantics_np.reshape(batch_size, -1, target_semantics_np.shape[-2], target_semantics_np.shape[-1])
-    data['target_semantics_list'] = torch.FloatTensor(target_semantics_np)
+    target_semantics_np = transform_semantic_target_batch(generated_3dmm, semantic_radius, batch_size)   #batch_size frame_num/batch_size 70 semantic_radius*2+1
+    data['target_semantics_list'] = torch.from_numpy(target_semantics_np)
     data['video_name'] = video_name
     data['audio_path'] = audio_path
     
@@ -96,40 +87,36 @@ def transform_semantic_target(coeff_3dmm, frame_index, semantic_radius):
     coeff_3dmm_g = coeff_3dmm[index, :]
     return coeff_3dmm_g.transpose(1,0)
 
+def pad_frame_index(frame_num, batch_size):
+    """帧序号补齐到 batch_size 的整数倍，补齐部分重复最后一帧"""
+    padded_num = -(-frame_num // batch_size) * batch_size
+    return np.minimum(np.arange(padded_num), frame_num - 1)
+
+def transform_semantic_target_batch(coeff_3dmm, semantic_radius, batch_size):
+    """
+    一次性构建所有帧的滑动窗口语义（等价于逐帧 transform_semantic_target 后补齐并 reshape）。
+    coeff_3dmm: (frame_num, C)
+    返回 float32 (batch_size, padded_num/batch_size, C, semantic_radius*2+1)
+    """
+    num_frames = coeff_3dmm.shape[0]
+    frame_index = pad_frame_index(num_frames, batch_size)
+    # 每行是一帧的窗口，越界的邻帧截断到首尾帧
+    index = np.clip(frame_index[:, None] + np.arange(-semantic_radius, semantic_radius + 1)[None, :], 0, num_frames - 1)
+    windows = np.asarray(coeff_3dmm, dtype=np.float32)[index]          #padded_num semantic_radius*2+1 C
+    windows = np.ascontiguousarray(windows.transpose(0, 2, 1))
+    return windows.reshape(batch_size, -1, windows.shape[-2], windows.shape[-1])
+
 def gen_camera_pose(camera_degree_list, frame_num, batch_size):
 
-    new_degree_list = [] 
     if len(camera_degree_list) == 1:
-        for _ in range(frame_num):
-            new_degree_list.append(camera_degree_list[0]) 
-        remainder = frame_num%batch_size
-        if remainder!=0:
-            for _ in range(batch_size-remainder):
-                new_degree_list.append(new_degree_list[-1])
-        new_degree_np = np.array(new_degree_list).reshape(batch_size, -1) 
-        return new_degree_np
-
-    degree_sum = 0.
-    for i, degree in enumerate(camera_degree_list[1:]):
-        degree_sum += abs(degree-camera_degree_list[i])
-    
-    degree_per_frame = degree_sum/(frame_num-1)
-    for i, degree in enumerate(camera_degree_list[1:]):
-        degree_last = camera_degree_list[i]
-        degree_step = degree_per_frame * abs(degree-degree_last)/(degree-degree_last)
-        new_degree_list =  new_degree_list + list(np.arange(degree_last, degree, degree_step))
-    if len(new_degree_list) > frame_num:
-        new_degree_list = new_degree_list[:frame_num]
-    elif len(new_degree_list) < frame_num:
-        for _ in range(frame_num-len(new_degree_list)):
-            new_degree_list.append(new_degree_list[-1])
-    print(len(new_degree_list))
-    print(frame_num)
-
-    remainder = frame_num%batch_size
-    if remainder!=0:
-        for _ in range(batch_size-remainder):
-            new_degree_list.append(new_degree_list[-1])
-    new_degree_np = np.array(new_degree_list).reshape(batch_size, -1) 
-    return new_degree_np
-    
+        new_degree_np = np.full(frame_num, camera_degree_list[0])
+    else:
+        degrees = np.asarray(camera_degree_list, dtype=np.float64)
+        diffs = degrees[1:] - degrees[:-1]
+        degree_per_frame = np.abs(diffs).sum()/(frame_num-1)
+        new_degree_np = np.concatenate([np.arange(degree_last, degree, degree_per_frame * np.sign(diff))
+                                        for degree_last, degree, diff in zip(degrees[:-1], degrees[1:], diffs)])
+        # 截断或用最后一个角度补齐到 frame_num
+        new_degree_np = new_degree_np[np.minimum(np.arange(frame_num), len(new_degree_np) - 1)]
+
+    return new_degree_np[pad_frame_index(frame_num, batch_size)].reshape(batch_size, -1)
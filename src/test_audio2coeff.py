@@ -3,15 +3,14 @@ import torch
 import numpy as np
 from scipy.io import savemat, loadmat
 from yacs.config import CfgNode as CN
-from scipy.signal import savgol_filter
-
-import safetensors
-import safetensors.torch 
+import torch.nn.functional as F
+from functools import lru_cache
 
 from src.audio2pose_models.audio2pose import Audio2Pose
 from src.audio2exp_models.networks import SimpleWrapperV2 
 from src.audio2exp_models.audio2exp import Audio2Exp
-from src.utils.safetensor_helper import load_x_from_safetensor  
+from src.utils.safetensor_helper import open_safetensor
+from src.cost_time import instrument
 
 def load_cpk(checkpoint_path, model=None, optimizer=None, device="cpu"):
     checkpoint = torch.load(checkpoint_path, map_location=torch.device(device))
@@ -22,6 +21,30 @@ def load_cpk(checkpoint_path, model=None, optimizer=None, device="cpu"):
 
     return checkpoint['epoch']
 
+@lru_cache(maxsize=None)
+def savgol_projection(window_length, polyorder):
+    """ 窗口内多项式最小二乘拟合的投影矩阵 (window_length, window_length)，
+    中间一行即 Savitzky-Golay 卷积核，首尾行用于 mode='interp' 的边界拟合 """
+    t = np.arange(window_length, dtype=np.float64)
+    V = np.vander(t, polyorder + 1)
+    return V @ np.linalg.pinv(V)
+
+def savgol_smooth(x, window_length, polyorder):
+    """ 沿 dim=1 的 Savitzky-Golay 平滑，等价于 scipy.signal.savgol_filter(x, window_length, polyorder, axis=1)，
+    直接在 x 所在设备上计算，不经过 CPU numpy。x: bs T C """
+    if window_length <= polyorder:
+        return x
+    proj = torch.from_numpy(savgol_projection(window_length, polyorder)).to(x.dtype).to(x.device)
+    half = window_length // 2
+    bs, T, C = x.shape
+    # 中间部分：一维卷积（conv1d 为互相关，核无需翻转）
+    kernel = proj[half].reshape(1, 1, -1)
+    middle = F.conv1d(x.transpose(1, 2).reshape(bs * C, 1, T), kernel).reshape(bs, C, -1).transpose(1, 2)
+    # 首尾 half 帧：对首/尾 window_length 帧做多项式拟合后取值
+    head = torch.einsum('ij,bjc->bic', proj[:half], x[:, :window_length])
+    tail = torch.einsum('ij,bjc->bic', proj[half + 1:], x[:, -window_length:])
+    return torch.cat([head, middle, tail], dim=1)
+
 class Audio2Coeff():
 
     def __init__(self, sadtalker_path, device):
@@ -42,8 +65,7 @@ class Audio2Coeff():
         
         try:
             if sadtalker_path['use_safetensor']:
-                checkpoints = safetensors.torch.load_file(sadtalker_path['checkpoint'])
-                self.audio2pose_model.load_state_dict(load_x_from_safetensor(checkpoints, 'audio2pose'))
+                open_safetensor(sadtalker_path['checkpoint']).load_into(self.audio2pose_model, 'audio2pose')
             else:
                 load_cpk(sadtalker_path['audio2pose_checkpoint'], model=self.audio2pose_model, device=device)
         except:
@@ -57,8 +79,7 @@ class Audio2Coeff():
         netG.eval()
         try:
             if sadtalker_path['use_safetensor']:
-                checkpoints = safetensors.torch.load_file(sadtalker_path['checkpoint'])
-                netG.load_state_dict(load_x_from_safetensor(checkpoints, 'audio2exp'))
+                open_safetensor(sadtalker_path['checkpoint']).load_into(netG, 'audio2exp')
             else:
                 load_cpk(sadtalker_path['audio2exp_checkpoint'], model=netG, device=device)
         except:
@@ -71,6 +92,7 @@ class Audio2Coeff():
  
         self.device = device
 
+    @instrument
     def generate(self, batch, coeff_save_dir, pose_style, ref_pose_coeff_path=None):
 
         with torch.no_grad():
@@ -88,9 +110,9 @@ class Audio2Coeff():
             pose_len = pose_pred.shape[1]
             if pose_len<13: 
                 pose_len = int((pose_len-1)/2)*2+1
-                pose_pred = torch.Tensor(savgol_filter(np.array(pose_pred.cpu()), pose_len, 2, axis=1)).to(self.device)
+                pose_pred = savgol_smooth(pose_pred.float(), pose_len, 2)
             else:
-                pose_pred = torch.Tensor(savgol_filter(np.array(pose_pred.cpu()), 13, 2, axis=1)).to(self.device) 
+                pose_pred = savgol_smooth(pose_pred.float(), 13, 2)
             
             coeffs_pred = torch.cat((exp_pred, pose_pred), dim=-1)            #bs T 70
 
@@ -5,8 +5,12 @@ import numpy as np
 from scipy import signal
 from scipy.io import wavfile
 from src.utils.hparams import hparams as hp
+from src.utils.audio_clip import AudioClip
 
 def load_wav(path, sr):
+    if isinstance(path, AudioClip):
+        # 内存中的TTS结果，直接复用缓存的重采样波形
+        return path.resampled(sr)
     return librosa.core.load(path, sr=sr)[0]
 
 def save_wav(wav, path, sr):
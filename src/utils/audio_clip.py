@@ -0,0 +1,154 @@
+"""
+内存音频对象 (AudioClip)
+
+TTS 合成结果以 PCM + 采样率的形式直接交给各个 Talker（SadTalker / Wav2Lip /
+Wav2Lipv2 / MuseTalk），避免每个模块重复读盘、解码与重采样。
+重采样结果按采样率缓存；只有最终 ffmpeg 合成音视频时才按需落盘一次。
+"""
+import io
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class AudioClip:
+    def __init__(self, pcm=None, sample_rate=None, path=None, data=None):
+        """
+        pcm: 单声道 float32 波形 (numpy / torch 均可)
+        sample_rate: pcm 的采样率
+        path: 对应的音频文件（如 TTS 已写出的 answer.wav），合成视频时直接复用
+        data: 未解码的音频字节（如 EdgeTTS 返回的 mp3），首次使用时才解码
+        """
+        self._temp_path = None
+        if pcm is None and path is None and data is None:
+            raise ValueError("AudioClip 需要 pcm、path 或 data 中的至少一个")
+        if pcm is not None:
+            if sample_rate is None:
+                raise ValueError("传入 pcm 时必须指定 sample_rate")
+            pcm = self._to_mono_float32(pcm)
+        self._pcm = pcm
+        self._data = data
+        self.sample_rate = sample_rate
+        self.path = path
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        # 延迟解码：只用于合成视频时不需要读取内容
+        return cls(path=os.fspath(path))
+
+    @classmethod
+    def from_bytes(cls, data, path=None):
+        return cls(path=path, data=bytes(data))
+
+    @staticmethod
+    def _to_mono_float32(pcm):
+        if hasattr(pcm, 'detach'):
+            pcm = pcm.detach().cpu().numpy()
+        pcm = np.asarray(pcm)
+        if pcm.dtype == np.int16:
+            pcm = pcm.astype(np.float32) / 32768.0
+        pcm = pcm.astype(np.float32, copy=False)
+        if pcm.ndim > 1:
+            # (channels, samples) 或 (samples, channels) 统一为单声道
+            axis = 0 if pcm.shape[0] < pcm.shape[-1] else -1
+            pcm = pcm.mean(axis=axis)
+        return pcm
+
+    def _decode(self):
+        import librosa
+        if self._data is not None:
+            try:
+                pcm, sr = librosa.load(io.BytesIO(self._data), sr=None)
+            except Exception:
+                # 部分 libsndfile 版本不支持 mp3 字节流，回退到已写出的文件
+                if self.path is None:
+                    raise
+                pcm, sr = librosa.load(self.path, sr=None)
+        else:
+            pcm, sr = librosa.load(self.path, sr=None)
+        self._pcm, self.sample_rate = self._to_mono_float32(pcm), sr
+
+    @property
+    def pcm(self):
+        if self._pcm is None:
+            with self._lock:
+                if self._pcm is None:
+                    self._decode()
+        return self._pcm
+
+    def resampled(self, sample_rate):
+        """返回指定采样率的波形，相同采样率只计算一次"""
+        pcm = self.pcm
+        if sample_rate == self.sample_rate:
+            return pcm
+        with self._lock:
+            if sample_rate not in self._views:
+                import librosa
+                self._views[sample_rate] = librosa.resample(pcm, orig_sr=self.sample_rate, target_sr=sample_rate)
+            return self._views[sample_rate]
+
+    @property
+    def duration(self):
+        return len(self.pcm) / self.sample_rate
+
+    @property
+    def name(self):
+        if self.path is not None:
+            return os.path.splitext(os.path.basename(self.path))[0]
+        return 'audio'
+
+    def to_file(self, path=None):
+        """
+        返回可供 ffmpeg 使用的音频文件路径。
+        已有文件时直接复用，否则写出一次 wav 并缓存路径。
+        """
+        if path is None and self.path is not None and os.path.exists(self.path):
+            return self.path
+        if path is None:
+            if self._temp_path is None:
+                fd, self._temp_path = tempfile.mkstemp(suffix='.wav')
+                os.close(fd)
+                self._write_wav(self._temp_path)
+            return self._temp_path
+        self._write_wav(path)
+        return path
+
+    def _write_wav(self, path):
+        from scipy.io import wavfile
+        pcm = np.clip(self.pcm, -1.0, 1.0)
+        wavfile.write(path, self.sample_rate, (pcm * 32767).astype(np.int16))
+
+    def __fspath__(self):
+        return self.to_file()
+
+    def __del__(self):
+        if self._temp_path is not None and os.path.exists(self._temp_path):
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+
+    def __repr__(self):
+        sr = self.sample_rate if self._pcm is not None else '?'
+        return f"AudioClip(name={self.name!r}, sample_rate={sr})"
+
+
+def as_audio_clip(audio):
+    """将文件路径 / (sr, ndarray) 元组 / AudioClip 统一转换为 AudioClip"""
+    if isinstance(audio, AudioClip):
+        return audio
+    if isinstance(audio, (tuple, list)) and len(audio) == 2:
+        sample_rate, pcm = audio
+        return AudioClip(pcm, sample_rate)
+    return AudioClip.from_file(audio)
+
+
+def audio_path(audio):
+    """返回音频对应的文件路径（供 ffmpeg 合成使用），路径输入原样返回"""
+    if isinstance(audio, AudioClip):
+        return audio.to_file()
+    return audio
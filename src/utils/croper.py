@@ -6,12 +6,10 @@ import argparse
 import scipy
 import numpy as np
 from PIL import Image
-import torch
 from tqdm import tqdm
 from itertools import cycle
 
 from src.face3d.extract_kp_videos_safe import KeypointExtractor
-from facexlib.alignment import landmark_98_to_68
 
 import numpy as np
 from PIL import Image
@@ -24,21 +22,8 @@ class Preprocesser:
         """get landmark with dlib
         :return: np.array shape=(68, 2)
         """
-        with torch.no_grad():
-            dets = self.predictor.det_net.detect_faces(img_np, 0.97)
-
-        if len(dets) == 0:
-            return None
-        det = dets[0]
-
-        img = img_np[int(det[1]):int(det[3]), int(det[0]):int(det[2]), :]
-        lm = landmark_98_to_68(self.predictor.detector.get_landmarks(img)) # [0]
-
-        #### keypoints to the original location
-        lm[:,0] += int(det[0])
-        lm[:,1] += int(det[1])
-
-        return lm
+        # 与 KeypointExtractor 共用人脸分析服务，同一张源图重复请求时直接命中缓存
+        return self.predictor.face_analysis.landmarks_fan([img_np], 0.97, self.predictor.root_path)[0]
 
     def align_face(self, img, lm, output_size=1024):
         """
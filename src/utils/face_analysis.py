@@ -0,0 +1,269 @@
+"""
+人脸分析服务 (FaceAnalysis)
+
+SadTalker / Wav2Lip / Wav2Lipv2 / MuseTalk 共用的人脸检测与关键点模型：
+- 每种检测器在进程内只加载一次（首次使用时加载，import 时不加载）；
+- detect(frames) / landmarks(frames) 批量接口，结果按帧内容哈希做 LRU 缓存，
+  同一素材重复推理、或 MuseTalk 先估计 bbox_shift 范围再检测时不会重复计算。
+
+检测器：
+- S3FD (face_detection.FaceAlignment)：人脸框，Wav2Lip / MuseTalk
+- DWPose (mmpose)：68 点人脸关键点，MuseTalk
+- YOLOv8-face + HRNet (WFLW 98 点)：Wav2Lipv2
+- RetinaFace + AWing FAN (facexlib，WFLW 98 点转 68 点)：SadTalker 裁剪与 3DMM 提取
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from tqdm import tqdm
+from src.cost_time import instrument
+
+DWPOSE_CONFIG = './Musetalk/musetalk/utils/dwpose/rtmpose-l_8xb32-270e_coco-ubody-wholebody-384x288.py'
+DWPOSE_CHECKPOINT = './Musetalk/models/dwpose/dw-ll_ucoco_384.pth'
+FACEXLIB_ROOT = 'gfpgan/weights'
+
+_models = {}
+_models_lock = threading.Lock()
+_service = None
+
+
+def default_device():
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def _get_model(key, build):
+    """进程级模型缓存，key 相同的模型只构建一次"""
+    with _models_lock:
+        if key not in _models:
+            print('Loading face analysis model: {}'.format(key[0]))
+            _models[key] = build()
+        return _models[key]
+
+
+def load_s3fd(device=None):
+    device = device or default_device()
+
+    def build():
+        import face_detection
+        landmarks_type = getattr(face_detection.LandmarksType, 'TWO_D', None) or face_detection.LandmarksType._2D
+        return face_detection.FaceAlignment(landmarks_type, flip_input=False, device=device)
+    return _get_model(('s3fd', device), build)
+
+
+def load_dwpose(config_file=DWPOSE_CONFIG, checkpoint_file=DWPOSE_CHECKPOINT, device=None):
+    device = device or default_device()
+
+    def build():
+        from mmpose.apis import init_model
+        return init_model(config_file, checkpoint_file, device=device)
+    return _get_model(('dwpose', config_file, checkpoint_file, device), build)
+
+
+def load_yolo_face(weights):
+    def build():
+        import os
+        os.environ['YOLO_VERBOSE'] = 'False'
+        from ultralytics import YOLO
+        return YOLO(weights)
+    return _get_model(('yolov8-face', weights), build)
+
+
+def load_hrnet(model_dir, device=None):
+    device = device or default_device()
+
+    def build():
+        from src.torchalign import FacialLandmarkDetector
+        return FacialLandmarkDetector(model_dir).to(device).eval()
+    return _get_model(('hrnet', model_dir, device), build)
+
+
+def load_retinaface(model_rootpath=FACEXLIB_ROOT, device=None):
+    device = device or default_device()
+
+    def build():
+        from facexlib.detection import init_detection_model
+        return init_detection_model('retinaface_resnet50', half=False, device=device, model_rootpath=model_rootpath)
+    return _get_model(('retinaface', model_rootpath, device), build)
+
+
+def load_awing_fan(model_rootpath=FACEXLIB_ROOT, device=None):
+    device = device or default_device()
+
+    def build():
+        from src.face3d.extract_kp_videos_safe import init_alignment_model
+        return init_alignment_model('awing_fan', device=device, model_rootpath=model_rootpath)
+    return _get_model(('awing_fan', model_rootpath, device), build)
+
+
+class FaceAnalysis:
+    def __init__(self, device=None, max_cached_frames=4096):
+        self.device = device or default_device()
+        # (检测器, 帧哈希, 参数) -> 结果
+        self.max_cached_frames = max_cached_frames
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def frame_hash(frame):
+        frame = np.ascontiguousarray(frame)
+        digest = hashlib.sha1(frame.data)
+        digest.update(repr((frame.shape, frame.dtype.str)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _memo_get(self, key):
+        with self._lock:
+            if key not in self._memo:
+                return None
+            self._memo.move_to_end(key)
+            return self._memo[key]
+
+    def _memo_put(self, key, value):
+        with self._lock:
+            self._memo[key] = value
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_cached_frames:
+                self._memo.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def _memoized(self, kind, frames, compute, params=()):
+        """
+        对 frames 逐帧查缓存，未命中的帧交给 compute(未命中帧列表) 一次性计算。
+        返回与 frames 一一对应的结果（numpy 结果返回副本，调用方可原地修改）。
+        """
+        keys = [(kind, self.frame_hash(frame), params) for frame in frames]
+        results = [self._memo_get(key) for key in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            computed = compute([frames[i] for i in missing])
+            for i, r in zip(missing, computed):
+                # 检测不到人脸时结果为 None，用 False 占位以区分未缓存
+                results[i] = False if r is None else r
+                self._memo_put(keys[i], results[i])
+        return [None if r is False else (r.copy() if isinstance(r, np.ndarray) else r) for r in results]
+
+    @instrument
+    def detect(self, frames, batch_size=16):
+        """
+        S3FD 批量人脸检测。
+        frames: BGR 图像列表；返回每帧的 (x1, y1, x2, y2)，检测不到人脸时为 None。
+        显存不足时自动减半 batch_size 重试。
+        """
+        def compute(images):
+            detector = load_s3fd(self.device)
+            bs = batch_size
+            while 1:
+                predictions = []
+                try:
+                    for i in tqdm(range(0, len(images), bs)):
+                        batch = images[i:i + bs]
+                        # 不同分辨率的帧不能拼成一批
+                        if any(image.shape != batch[0].shape for image in batch):
+                            for image in batch:
+                                predictions.extend(detector.get_detections_for_batch(np.asarray([image])))
+                        else:
+                            predictions.extend(detector.get_detections_for_batch(np.asarray(batch)))
+                except Exception as e:
+                    print("Error in face detection: {}".format(e))
+                    if bs == 1:
+                        raise RuntimeError('Image too big to run face detection on GPU. Please use the resize_factor argument')
+                    bs //= 2
+                    print('Recovering from OOM error; New batch size: {}'.format(bs))
+                    continue
+                return predictions
+        return self._memoized('s3fd', frames, compute)
+
+    @instrument
+    def landmarks(self, frames, config_file=DWPOSE_CONFIG, checkpoint_file=DWPOSE_CHECKPOINT):
+        """
+        DWPose 人脸关键点。
+        返回每帧第一个人的 68 个人脸关键点 (68, 2) float 数组。
+        """
+        def compute(images):
+            from mmpose.apis import inference_topdown
+            from mmpose.structures import merge_data_samples
+            model = load_dwpose(config_file, checkpoint_file, self.device)
+            outputs = []
+            for image in images:
+                results = merge_data_samples(inference_topdown(model, image))
+                outputs.append(np.asarray(results.pred_instances.keypoints[0][23:91]))
+            return outputs
+        return self._memoized('dwpose', frames, compute, (config_file, checkpoint_file))
+
+    @torch.no_grad()
+    @instrument
+    def detect_yolo(self, frames, weights, imgsz=640, conf=0.01, iou=0.5):
+        """
+        YOLOv8-face 批量人脸检测。
+        返回每帧的 (N, 6) 数组 [x1, y1, x2, y2, conf, cls]，按置信度从高到低排列。
+        """
+        def compute(images):
+            model = load_yolo_face(weights)
+            results = model(list(images), imgsz=imgsz, conf=conf, iou=iou, half=True, augment=False,
+                            device=self.device)
+            return [result.boxes.data.cpu().numpy() for result in results]
+        return self._memoized('yolov8-face', frames, compute, (weights, imgsz, conf, iou))
+
+    @torch.no_grad()
+    @instrument
+    def landmarks_hrnet(self, frames, bboxes, model_dir):
+        """
+        HRNet (WFLW) 关键点。
+        bboxes: 每帧一个人脸框 [x1, y1, x2, y2, ...]；返回每帧 (98, 2) 关键点。
+        """
+        from PIL import Image
+        import cv2
+        outputs = []
+        for frame, bbox in zip(frames, bboxes):
+            bbox = np.asarray(bbox, dtype=np.float32).reshape(1, -1)[:, :4]
+
+            def compute(images, bbox=bbox):
+                model = load_hrnet(model_dir, self.device)
+                img_pil = Image.fromarray(cv2.cvtColor(images[0], cv2.COLOR_BGR2RGB))
+                landmark = model(img_pil, bbox=torch.from_numpy(bbox), device=self.device)
+                return [landmark.cpu().numpy()[0]]
+            # 关键点依赖人脸框，框也作为缓存键的一部分
+            outputs.extend(self._memoized('hrnet', [frame], compute, (model_dir, bbox.tobytes())))
+        return outputs
+
+    @torch.no_grad()
+    @instrument
+    def landmarks_fan(self, frames, threshold=0.97, model_rootpath=FACEXLIB_ROOT):
+        """
+        RetinaFace 检测 + AWing FAN 关键点（SadTalker）。
+        frames: RGB 的 ndarray 或 PIL 图像列表，原样交给 RetinaFace（PIL 输入会被转换为 BGR，ndarray 不转换，
+        与改动前 SadTalker 裁剪 / 关键点提取的输入保持一致）；
+        返回每帧第一张人脸的 68 个关键点 (68, 2)，检测不到人脸时为 None。
+        """
+        def compute(images):
+            from facexlib.alignment import landmark_98_to_68
+            det_net = load_retinaface(model_rootpath, self.device)
+            detector = load_awing_fan(model_rootpath, self.device)
+            outputs = []
+            for image in images:
+                bboxes = det_net.detect_faces(image, threshold)
+                if len(bboxes) == 0:
+                    outputs.append(None)
+                    continue
+                x1, y1, x2, y2 = [int(v) for v in bboxes[0][:4]]
+                lm = landmark_98_to_68(detector.get_landmarks(np.array(image)[y1:y2, x1:x2, :]))
+                # 关键点坐标换算回原图
+                lm[:, 0] += x1
+                lm[:, 1] += y1
+                outputs.append(lm)
+            return outputs
+        pil_input = any(not isinstance(frame, np.ndarray) for frame in frames)
+        return self._memoized('retinaface-fan', frames, compute, (threshold, model_rootpath, pil_input))
+
+def get_face_analysis():
+    """进程内共享的人脸分析服务，各 TFG 后端共用同一份模型与缓存"""
+    global _service
+    with _models_lock:
+        if _service is None:
+            _service = FaceAnalysis()
+        return _service
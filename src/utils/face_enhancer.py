@@ -1,13 +1,28 @@
+"""
+人脸增强 (GFPGAN / RestoreFormer)
+
+FaceEnhancer 是常驻的增强服务：restorer 在进程内按 (method, bg_upsampler) 只构建一次，
+渲染流水线直接把帧送进来（无需先写出视频再读回），增强结果流式交给编码器。
+- 多帧的人脸裁剪拼成一个 batch 送入修复网络，一次前向处理多张人脸；
+- 可选（redetect_threshold > 0）：上次检测到的人脸区域与当前帧同一区域几乎相同时复用其 5 点关键点，跳过人脸检测。
+"""
 import os
+import threading
+
+import numpy as np
 import torch 
 
 
 from tqdm import tqdm
 
-from src.utils.videoio import load_video_to_cv2
+from src.utils.videoio import iter_video_frames, count_video_frames
+from src.cost_time import instrument
 
 import cv2
 
+_enhancers = {}
+_enhancers_lock = threading.Lock()
+
 
 class GeneratorWithLen(object):
     """ From https://stackoverflow.com/a/7460929 """
@@ -30,18 +45,236 @@ def enhancer_generator_with_len(images, method='gfpgan', bg_upsampler='realesrga
     """ Provide a generator with a __len__ method so that it can passed to functions that
     call len()"""
 
-    if os.path.isfile(images): # handle video to images
-        # TODO: Create a generator version of load_video_to_cv2
-        images = load_video_to_cv2(images)
-
+    length = count_video_frames(images) if isinstance(images, str) else len(images)
     gen = enhancer_generator_no_len(images, method=method, bg_upsampler=bg_upsampler)
-    gen_with_len = GeneratorWithLen(gen, len(images))
+    gen_with_len = GeneratorWithLen(gen, length)
     return gen_with_len
 
 def enhancer_generator_no_len(images, method='gfpgan', bg_upsampler='realesrgan'):
     """ Provide a generator function so that all of the enhanced images don't need
     to be stored in memory at the same time. This can save tons of RAM compared to
-    the enhancer function. """
+    the enhancer function. images: RGB frames or a video path (decoded lazily). """
+    print('face enhancer....')
+    if isinstance(images, str) and os.path.isfile(images): # handle video to images
+        images = iter_video_frames(images)
+
+    enhancer = get_face_enhancer(method=method, bg_upsampler=bg_upsampler)
+    for r_img in tqdm(enhancer.stream(images, rgb=True), 'Face Enhancer:'):
+        yield r_img
+
+
+@instrument
+def enhance_video(frames, save_path, fps, audio=None, method='gfpgan', bg_upsampler='realesrgan', rgb=True,
+                  **writer_kwargs):
+    """
+    渲染结果直接增强并编码为视频（可同时混入音频），不再写出中间视频后读回。
+    frames: 帧的可迭代对象（列表或生成器），rgb 指定其颜色顺序
+    """
+    from src.utils.videoio import FFmpegWriter
+    enhancer = get_face_enhancer(method=method, bg_upsampler=bg_upsampler)
+    writer = None
+    try:
+        for frame in tqdm(enhancer.stream(frames, rgb=rgb), 'Face Enhancer:'):
+            if writer is None:
+                writer = FFmpegWriter(save_path, fps, frame.shape[1::-1], audio=audio,
+                                      input_pix_fmt='rgb24' if rgb else 'bgr24', **writer_kwargs)
+            writer.write(frame)
+    except BaseException as e:
+        if writer is not None:
+            writer.__exit__(type(e), e, e.__traceback__)
+        raise
+    if writer is None:
+        raise ValueError('没有需要增强的帧')
+    return writer.release()
+
+
+class FaceEnhancer:
+    """
+    常驻的人脸增强服务，输入输出均为 BGR uint8 图像（与 GFPGANer.enhance 一致）。
+    GFPGANer 的 face_helper 有内部状态，同一服务的调用串行执行。
+    """
+    def __init__(self, restorer, batch_size=8, redetect_threshold=0, thumb_size=64):
+        """
+        batch_size: 每次送入修复网络的最多帧数（其中所有人脸拼成一个 batch）
+        redetect_threshold: 上次检测到的人脸区域（关键点外接框外扩）与当前帧同一区域的缩略图平均绝对差
+            低于该值时复用关键点；默认 0 表示每帧都检测（头部移动几个像素时复用会导致贴回错位）
+        """
+        self.restorer = restorer
+        self.batch_size = batch_size
+        self.redetect_threshold = redetect_threshold
+        self.thumb_size = thumb_size
+        self.upscale = restorer.upscale
+        self.device = restorer.device
+        self._lock = threading.Lock()
+        self._last_shape = None
+        self._last_thumb = None
+        self._last_landmarks = None
+        self.stats = {'frames': 0, 'detected': 0, 'faces': 0}
+
+    def reset(self):
+        """开始处理新的视频时清掉上一段的检测结果"""
+        with self._lock:
+            self._last_shape = None
+            self._last_thumb = None
+            self._last_landmarks = None
+
+    def _face_thumbnail(self, img, landmarks):
+        """人脸区域（所有人脸 5 点关键点的外接框，四周各外扩一个框长）的缩略图，没有人脸时取整帧"""
+        if landmarks:
+            h, w = img.shape[:2]
+            points = np.concatenate([np.asarray(l).reshape(-1, 2) for l in landmarks])
+            (x0, y0), (x1, y1) = points.min(0), points.max(0)
+            pad = max(x1 - x0, y1 - y0)
+            x0, y0 = max(int(x0 - pad), 0), max(int(y0 - pad), 0)
+            x1, y1 = min(int(x1 + pad) + 1, w), min(int(y1 + pad) + 1, h)
+            if x1 > x0 and y1 > y0:
+                img = img[y0:y1, x0:x1]
+        return cv2.resize(img, (self.thumb_size, self.thumb_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _locate(self, img):
+        """检测（或复用）人脸关键点并裁剪对齐，返回 (input_img, affine_matrices, cropped_faces)"""
+        helper = self.restorer.face_helper
+        helper.clean_all()
+        helper.read_image(img)
+        img = helper.input_img
+        if (self.redetect_threshold > 0 and self._last_thumb is not None and img.shape == self._last_shape
+                and float(np.abs(self._face_thumbnail(img, self._last_landmarks) - self._last_thumb).mean())
+                < self.redetect_threshold):
+            helper.all_landmarks_5 = [l.copy() for l in self._last_landmarks]
+        else:
+            helper.get_face_landmarks_5(only_center_face=False, eye_dist_threshold=5)
+            self.stats['detected'] += 1
+            if self.redetect_threshold > 0:
+                self._last_shape = img.shape
+                self._last_landmarks = [l.copy() for l in helper.all_landmarks_5]
+                self._last_thumb = self._face_thumbnail(img, self._last_landmarks)
+        helper.align_warp_face()
+        # clean_all 会新建这些列表，保存引用即可
+        return helper.input_img, helper.affine_matrices, helper.cropped_faces
+
+    @torch.no_grad()
+    def restore_faces(self, faces):
+        """所有人脸裁剪（BGR 512x512）拼成一个 batch 前向；显存不足等错误时退回逐张处理"""
+        if not faces:
+            return []
+        batch = torch.from_numpy(np.stack(faces)[..., ::-1].copy()).permute(0, 3, 1, 2).float()
+        batch = batch.div_(255.).sub_(0.5).div_(0.5)
+        try:
+            outputs = [self.restorer.gfpgan(batch.to(self.device), return_rgb=False, weight=0.5)[0]]
+        except RuntimeError as error:
+            print(f'\tBatched inference failed ({error}), falling back to per-face inference.')
+            outputs = []
+            for face, t in zip(faces, batch):
+                try:
+                    outputs.append(self.restorer.gfpgan(t[None].to(self.device), return_rgb=False, weight=0.5)[0])
+                except RuntimeError as error:
+                    print(f'\tFailed inference for GFPGAN: {error}.')
+                    outputs.append(torch.from_numpy(face[..., ::-1].copy()).permute(2, 0, 1)[None].float()
+                                   .div(255.).sub(0.5).div(0.5))
+        restored = torch.cat([o.float().cpu() for o in outputs]).clamp_(-1, 1).add_(1).div_(2)
+        restored = restored.permute(0, 2, 3, 1).numpy()[..., ::-1]
+        return list((restored * 255.0).round().astype(np.uint8))
+
+    @instrument
+    def enhance(self, frames):
+        """增强一组帧（BGR），返回对应的增强结果列表"""
+        with self._lock:
+            located = [self._locate(frame) for frame in frames]
+            restored = self.restore_faces([face for _, _, faces in located for face in faces])
+            helper = self.restorer.face_helper
+            bg_upsampler = self.restorer.bg_upsampler
+            results, k = [], 0
+            for input_img, affine_matrices, faces in located:
+                helper.clean_all()
+                helper.input_img = input_img
+                helper.affine_matrices = affine_matrices
+                for face in restored[k:k + len(faces)]:
+                    helper.add_restored_face(face)
+                k += len(faces)
+                bg_img = bg_upsampler.enhance(input_img, outscale=self.upscale)[0] if bg_upsampler is not None else None
+                helper.get_inverse_affine(None)
+                results.append(helper.paste_faces_to_input_image(upsample_img=bg_img))
+            self.stats['frames'] += len(frames)
+            self.stats['faces'] += k
+            return results
+
+    def stream(self, frames, rgb=False, batch_size=None):
+        """按 batch_size 分批增强任意可迭代的帧序列，逐帧产出结果"""
+        batch_size = batch_size or self.batch_size
+        self.reset()
+        batch = []
+        for frame in frames:
+            batch.append(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if rgb else frame)
+            if len(batch) == batch_size:
+                yield from self._emit(batch, rgb)
+                batch = []
+        if batch:
+            yield from self._emit(batch, rgb)
+
+    def _emit(self, batch, rgb):
+        for r_img in self.enhance(batch):
+            yield cv2.cvtColor(r_img, cv2.COLOR_BGR2RGB) if rgb else r_img
+
+    def writer(self, writer, batch_size=None):
+        """包装一个 writer（FFmpegWriter / cv2.VideoWriter）：写入的帧先攒批增强再交给它编码"""
+        return EnhancingWriter(self, writer, batch_size or self.batch_size)
+
+
+class EnhancingWriter:
+    """
+    writer 包装，可直接作为 FramePipeline 的 writer。
+    写入的 BGR 帧攒够 batch_size 后统一增强再写入内层 writer，release 时处理剩余的帧。
+    """
+    def __init__(self, enhancer, writer, batch_size=8):
+        self.enhancer = enhancer
+        self.writer = writer
+        self.batch_size = batch_size
+        self.pending = []
+        enhancer.reset()
+
+    def write(self, frame):
+        # 调用方可能复用帧缓冲，这里保留副本
+        self.pending.append(np.array(frame, dtype=np.uint8))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            frames, self.pending = self.pending, []
+            for r_img in self.enhancer.enhance(frames):
+                self.writer.write(r_img)
+
+    def release(self):
+        self.flush()
+        return self.writer.release()
+
+    close = release
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.release()
+        else:
+            self.pending = []
+            if hasattr(self.writer, '__exit__'):
+                self.writer.__exit__(exc_type, exc, tb)
+            else:
+                self.writer.release()
+
+
+def get_face_enhancer(method='gfpgan', bg_upsampler='realesrgan'):
+    """进程内共享的增强服务，同一 (method, bg_upsampler) 的 restorer 只构建一次"""
+    key = (method, bg_upsampler)
+    with _enhancers_lock:
+        if key not in _enhancers:
+            _enhancers[key] = FaceEnhancer(load_restorer(method=method, bg_upsampler=bg_upsampler))
+        return _enhancers[key]
+
+def load_restorer(method='gfpgan', bg_upsampler='realesrgan'):
+    """ Build a GFPGANer restorer (restorer.enhance takes and returns BGR images).
+    Prefer get_face_enhancer, which keeps one restorer per process. """
     try:
         from gfpgan import GFPGANer
     except ImportError:
@@ -57,10 +290,7 @@ def enhancer_generator_no_len(images, method='gfpgan', bg_upsampler='realesrgan'
         except Exception as e:
             print(f"Failed to install GFPGAN library. Error: {e}")
             # Handle the error or raise it again if needed
-        
-    print('face enhancer....')
-    if not isinstance(images, list) and os.path.isfile(images): # handle video to images
-        images = load_video_to_cv2(images)
+
 
     # ------------------------ set up GFPGAN restorer ------------------------
     if  method == 'gfpgan':
@@ -120,18 +350,4 @@ def enhancer_generator_no_len(images, method='gfpgan', bg_upsampler='realesrgan'
         arch=arch,
         channel_multiplier=channel_multiplier,
         bg_upsampler=bg_upsampler)
-
-    # ------------------------ restore ------------------------
-    for idx in tqdm(range(len(images)), 'Face Enhancer:'):
-        
-        img = cv2.cvtColor(images[idx], cv2.COLOR_RGB2BGR)
-        
-        # restore faces and background if necessary
-        cropped_faces, restored_faces, r_img = restorer.enhance(
-            img,
-            has_aligned=False,
-            only_center_face=False,
-            paste_back=True)
-        
-        r_img = cv2.cvtColor(r_img, cv2.COLOR_BGR2RGB)
-        yield r_img
+    return restorer
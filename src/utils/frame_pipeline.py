@@ -0,0 +1,128 @@
+"""
+推理 / 后处理 / 编码流水线 (FramePipeline)
+
+主线程（生产者）只负责按 batch 执行模型推理并提交每一帧；
+线程池并行完成 resize、反变换贴回、融合等后处理，
+独立的编码线程按提交顺序把结果写入 writer（cv2.VideoWriter 或 ffmpeg 管道）。
+队列有界，后处理或编码跟不上时生产者会被阻塞，内存占用保持稳定。
+作为上下文管理器使用时，推理或后处理出错也会结束编码线程与线程池，不会遗留线程。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class FramePipeline:
+    STAGES = ('model', 'postprocess', 'encode')
+
+    def __init__(self, writer, process_fn, num_workers=2, max_queue=16, frame_shape=None):
+        """
+        writer: 具有 write(frame) 方法的对象
+        process_fn: process_fn(item, out) -> frame，在工作线程中执行；
+            out 为复用的输出帧缓冲（未指定 frame_shape 时为 None）
+        frame_shape: 指定后预分配 max_queue + 1 个 uint8 输出帧缓冲并循环复用
+        """
+        self.writer = writer
+        self.process_fn = process_fn
+        self.executor = ThreadPoolExecutor(max_workers=max(1, num_workers), thread_name_prefix='frame_pipeline')
+        self.pending = queue.Queue(maxsize=max_queue)
+        self.buffers = None
+        if frame_shape is not None:
+            # 同时在途的帧最多 max_queue + 1 个（队列中 + 编码线程持有），缓冲足够时不会死锁
+            self.buffers = queue.Queue()
+            for _ in range(max_queue + 1):
+                self.buffers.put(np.empty(frame_shape, np.uint8))
+        self.stats = {stage: [0.0, 0] for stage in self.STAGES}
+        self.stats_lock = threading.Lock()
+        self.frames_written = 0
+        self.error = None
+        self.aborted = False
+        self.start_time = time.perf_counter()
+        self.encoder = threading.Thread(target=self._encode_loop, name='frame_pipeline_encoder', daemon=True)
+        self.encoder.start()
+
+    def record(self, stage, seconds, frames=0):
+        with self.stats_lock:
+            self.stats[stage][0] += seconds
+            self.stats[stage][1] += frames
+
+    def submit(self, item):
+        """提交一帧待后处理的数据，按提交顺序编码"""
+        if self.error is not None:
+            self._shutdown()
+            raise self.error
+        out = self.buffers.get() if self.buffers is not None else None
+        future = self.executor.submit(self._process, item, out)
+        self.pending.put((future, out))
+
+    def _process(self, item, out):
+        start = time.perf_counter()
+        frame = self.process_fn(item, out)
+        self.record('postprocess', time.perf_counter() - start, 1)
+        return frame
+
+    def _encode_loop(self):
+        while True:
+            task = self.pending.get()
+            if task is None:
+                break
+            future, out = task
+            try:
+                frame = future.result()
+                if self.error is None and not self.aborted:
+                    start = time.perf_counter()
+                    self.writer.write(frame)
+                    self.record('encode', time.perf_counter() - start, 1)
+                    self.frames_written += 1
+            except Exception as e:
+                # 记录第一个错误，继续清空队列以免生产者阻塞
+                if self.error is None:
+                    self.error = e
+            finally:
+                if out is not None:
+                    self.buffers.put(out)
+
+    def _shutdown(self):
+        if self.encoder.is_alive():
+            self.pending.put(None)
+            self.encoder.join()
+        self.executor.shutdown(wait=True)
+
+    def abort(self):
+        """放弃未编码的帧：取消排队中的后处理，结束编码线程与线程池（不写入 writer）"""
+        self.aborted = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 正常结束时 close() 已等待编码完成，这里只是兜底；出错时丢弃剩余帧
+        if exc_type is None:
+            self._shutdown()
+        else:
+            self.abort()
+
+    def close(self, verbose=True):
+        """等待所有帧编码完成，返回各阶段统计"""
+        self._shutdown()
+        if self.error is not None:
+            raise self.error
+        return self.report(verbose)
+
+    def report(self, verbose=True):
+        wall = time.perf_counter() - self.start_time
+        report = {'frames': self.frames_written, 'wall_s': wall,
+                  'fps': self.frames_written / wall if wall > 0 else 0.0}
+        for stage, (busy, frames) in self.stats.items():
+            report[stage] = {'busy_s': busy, 'frames': frames, 'fps': frames / busy if busy > 0 else 0.0}
+        if verbose:
+            for stage in self.STAGES:
+                s = report[stage]
+                print(f"{stage:<12} {s['frames']:6d} frames  {s['busy_s']:7.2f}s busy  {s['fps']:8.1f} fps")
+            print(f"{'end-to-end':<12} {report['frames']:6d} frames  {wall:7.2f}s wall  {report['fps']:8.1f} fps")
+        return report
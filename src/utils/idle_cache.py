@@ -0,0 +1,200 @@
+"""
+待机视频缓存 (idle clip cache)
+
+展台 / 数字人待机时，同一形象会反复渲染同样的静音待机动画。这里按
+(形象内容哈希, 渲染参数, 时长档位) 只渲染一次，保存为首尾可无缝衔接的循环片段，
+之后的待机请求直接循环拼接缓存片段（视频流复制，不重新编码）：
+- 形象图片内容变化时，旧片段自动失效并删除；渲染参数是缓存键的一部分，参数变化不会命中旧片段；
+- 片段与索引保存在磁盘上（IDLE_CACHE_DIR），进程重启后仍可用，按 LRU 淘汰。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.videoio import VideoReader, run_ffmpeg, write_video
+
+IDLE_CACHE_DIR = os.environ.get('IDLE_CACHE_DIR', './results/idle_cache')
+# 待机时长档位（秒），超过最大档位时循环最大档位的片段
+DURATION_BUCKETS = (2, 5, 10)
+# 首尾交叉淡化的时长（秒），渲染时多渲染这么长
+CROSSFADE = 0.5
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def duration_bucket(duration, buckets=DURATION_BUCKETS):
+    for bucket in buckets:
+        if duration <= bucket:
+            return bucket
+    return buckets[-1]
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_loopable(frames, overlap):
+    """
+    把末尾 overlap 帧交叉淡化进开头，返回 len(frames) - overlap 帧，
+    最后一帧之后接回第一帧时画面连续。
+    """
+    frames = list(frames)
+    overlap = min(int(overlap), len(frames) // 2)
+    if overlap <= 0:
+        return frames
+    n = len(frames) - overlap
+    looped = frames[:n]
+    for i in range(overlap):
+        alpha = (i + 1) / (overlap + 1)
+        blended = frames[n + i].astype(np.float32) * (1 - alpha) + frames[i].astype(np.float32) * alpha
+        looped[i] = blended.round().astype(np.uint8)
+    return looped
+
+
+def loop_clip(clip_path, duration, save_path, sample_rate=16000):
+    """循环片段到 duration 秒并配上静音音轨，视频流直接复制（按帧数截断，流复制时 -t 不精确）"""
+    frames = max(int(round(duration * (VideoReader(clip_path).fps or 25))), 1)
+    run_ffmpeg(['-stream_loop', '-1', '-i', clip_path,
+                '-f', 'lavfi', '-t', '%.3f' % duration, '-i', 'anullsrc=r=%d:cl=mono' % sample_rate,
+                '-frames:v', frames, '-map', '0:v:0', '-map', '1:a:0',
+                '-c:v', 'copy', '-c:a', 'aac', save_path], encode=False)
+    return save_path
+
+
+class IdleClipCache:
+    def __init__(self, cache_dir=IDLE_CACHE_DIR, max_entries=32, buckets=DURATION_BUCKETS, crossfade=CROSSFADE):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.buckets = tuple(sorted(buckets))
+        self.crossfade = crossfade
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        # 形象路径 -> (mtime, size, 内容哈希)，避免每次请求都重新读取图片计算哈希
+        self._digests = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = OrderedDict()
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = OrderedDict(json.load(f))
+            except (OSError, ValueError):
+                print('idle cache index is broken, starting empty: {}'.format(self.index_path))
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _drop(self, key):
+        entry = self._index.pop(key)
+        clip_path = os.path.join(self.cache_dir, entry['clip'])
+        if os.path.exists(clip_path):
+            os.remove(clip_path)
+
+    def avatar_digest(self, avatar):
+        stat = os.stat(avatar)
+        path = os.path.abspath(avatar)
+        cached = self._digests.get(path)
+        if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+            cached = (stat.st_mtime, stat.st_size, file_digest(avatar))
+            self._digests[path] = cached
+        return cached[2]
+
+    def key(self, avatar, settings, bucket):
+        digest = hashlib.sha1(self.avatar_digest(avatar).encode('utf-8'))
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        digest.update(str(bucket).encode('utf-8'))
+        return digest.hexdigest()
+
+    def invalidate(self, avatar, keep_digest=None):
+        """删除该形象的缓存片段（keep_digest 指定时只删除内容哈希不同的旧片段）"""
+        path = os.path.abspath(avatar)
+        with self._lock:
+            stale = [key for key, entry in self._index.items()
+                     if entry['avatar'] == path and entry['digest'] != keep_digest]
+            for key in stale:
+                self._drop(key)
+            if stale:
+                self._save_index()
+        return len(stale)
+
+    def get(self, avatar, settings, duration):
+        """命中时返回循环片段路径，否则返回 None"""
+        bucket = duration_bucket(duration, self.buckets)
+        self.invalidate(avatar, keep_digest=self.avatar_digest(avatar))
+        key = self.key(avatar, settings, bucket)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            clip_path = os.path.join(self.cache_dir, entry['clip'])
+            if not os.path.isfile(clip_path):
+                self._index.pop(key)
+                self._save_index()
+                return None
+            self._index.move_to_end(key)
+            return clip_path
+
+    def render_seconds(self, duration):
+        """填充缓存时需要渲染的时长：档位时长加上交叉淡化部分"""
+        return duration_bucket(duration, self.buckets) + self.crossfade
+
+    def put(self, avatar, settings, duration, rendered_video):
+        """把渲染好的待机视频做成循环片段存入缓存，返回片段路径"""
+        bucket = duration_bucket(duration, self.buckets)
+        key = self.key(avatar, settings, bucket)
+        reader = VideoReader(rendered_video)
+        fps = reader.fps or settings.get('fps', 25)
+        frames = make_loopable(reader, round(self.crossfade * fps))
+        clip_name = key + '.mp4'
+        clip_path = os.path.join(self.cache_dir, clip_name)
+        tmp_path = os.path.join(self.cache_dir, key + '.tmp.mp4')
+        write_video(frames, tmp_path, fps)
+        os.replace(tmp_path, clip_path)
+        with self._lock:
+            self._index[key] = {
+                'avatar': os.path.abspath(avatar),
+                'digest': self.avatar_digest(avatar),
+                'settings': settings,
+                'bucket': bucket,
+                'clip': clip_name,
+                'frames': len(frames),
+                'fps': fps,
+                'created': time.time(),
+            }
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_entries:
+                self._drop(next(iter(self._index)))
+            self._save_index()
+        return clip_path
+
+    def serve(self, avatar, settings, duration, save_path, render):
+        """
+        生成 duration 秒的待机视频到 save_path。
+        未命中时调用 render(render_seconds) 渲染一次（返回视频路径）并存入缓存。
+        """
+        clip_path = self.get(avatar, settings, duration)
+        if clip_path is None:
+            rendered = render(self.render_seconds(duration))
+            clip_path = self.put(avatar, settings, duration, rendered)
+        return loop_clip(clip_path, duration, save_path)
+
+
+def get_idle_cache():
+    """进程内共享的待机视频缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IdleClipCache()
+        return _cache
@@ -0,0 +1,347 @@
+"""
+后台渲染任务队列 (render jobs)
+
+长视频渲染不再阻塞 HTTP 请求：submit() 立即返回任务 ID，任务按模型实例进入各自的队列，
+每个实例由一个工作线程依次执行（模型不是线程安全的，同一实例不会被并发调用；不同实例之间可以并行）。
+- 模型实例在提交时绑定，之后更换全局模型不影响已排队的任务；有未完成的任务时 pending() 非零，
+  webui / API 据此拒绝更换模型；
+- 执行期间已有的 tqdm 循环（人脸检测、Face Renderer、逐 batch 推理……）转换为进度事件
+  （阶段名、已完成数 / 总数），通过 events() 订阅，用于 SSE 推送或 Gradio 进度条；
+  异步服务用 events_async() / wait_async()，在事件循环中等待，不占用线程池的线程；
+- 结果视频移动到 JOB_DIR/<任务ID>/ 下，任务结束后 JOB_TTL 秒内可按 ID 取回，过期后连同文件一起删除；
+- 队列在进程内，进程重启后未完成的任务丢失，残留的结果目录按修改时间过期清理。
+"""
+import asyncio
+import contextvars
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from src.cost_time import current_span_name, trace
+
+JOB_DIR = os.environ.get('JOB_DIR', './results/jobs')
+# 任务结束后结果保留的时长（秒）
+JOB_TTL = float(os.environ.get('JOB_TTL', 3600))
+# 同一个 tqdm 循环两次进度事件的最小间隔（秒），开始与结束时总会发送
+PROGRESS_INTERVAL = 0.2
+
+_current_job = contextvars.ContextVar('linly_job', default=None)
+_tqdm_lock = threading.Lock()
+_tqdm_patched = False
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def track_tqdm():
+    """
+    给 tqdm 打补丁：在任务线程中创建的进度条把进度转发给当前任务，其它线程中的进度条不受影响。
+    阶段名取进度条的 desc，没有 desc 时取当前 cost_time 阶段（如 Wav2Lip.predict）。
+    """
+    global _tqdm_patched
+    with _tqdm_lock:
+        if _tqdm_patched:
+            return
+        _tqdm_patched = True
+    from tqdm import std
+    init, update, close = std.tqdm.__init__, std.tqdm.update, std.tqdm.close
+
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        job = _current_job.get()
+        self._linly_job = job
+        if job is not None:
+            self._linly_stage = (getattr(self, 'desc', '') or '').strip(' :：') or current_span_name() or job.model
+            job.report(self, final=True)
+
+    def _update(self, n=1):
+        result = update(self, n)
+        job = getattr(self, '_linly_job', None)
+        if job is not None:
+            job.report(self)
+        return result
+
+    def _close(self):
+        # close 可能被调用多次（__del__ 中也会调用），只发送一次结束进度
+        job = getattr(self, '_linly_job', None)
+        if job is not None:
+            self._linly_job = None
+            job.report(self, final=True)
+        return close(self)
+
+    std.tqdm.__init__, std.tqdm.update, std.tqdm.close = __init__, _update, _close
+
+
+class Job:
+    def __init__(self, model, fn, args, kwargs, cleanup=(), instance=None):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        # 执行任务的模型实例，同一实例的任务排在同一个队列里
+        self.instance = instance
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        # 任务结束后删除的输入文件 / 目录
+        self.cleanup = list(cleanup)
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stage = None
+        self.n = None
+        self.total = None
+        self.artifact = None
+        self.error = None
+        self.events = deque(maxlen=256)
+        self.seq = 0
+        self.cond = threading.Condition()
+        # 异步订阅者的 (事件循环, asyncio.Event)，有新事件时在各自的循环中 set
+        self.waiters = set()
+        self._reported = {}
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def emit(self, kind, status=None, **data):
+        with self.cond:
+            if status is not None:
+                self.status = status
+            self.seq += 1
+            event = dict(data, id=self.seq, type=kind, status=self.status, time=time.time())
+            self.events.append(event)
+            self.cond.notify_all()
+            for loop, waiter in self.waiters:
+                try:
+                    loop.call_soon_threadsafe(waiter.set)
+                except RuntimeError:
+                    # 订阅者的事件循环已关闭
+                    pass
+        return event
+
+    def since(self, after):
+        """(id > after 的事件, 任务是否已结束)"""
+        with self.cond:
+            return [event for event in self.events if event['id'] > after], self.done
+
+    def report(self, bar, final=False):
+        """tqdm 进度 -> 进度事件，同一进度条按 PROGRESS_INTERVAL 节流"""
+        now = time.time()
+        key = id(bar)
+        if not final and now - self._reported.get(key, 0) < PROGRESS_INTERVAL:
+            return
+        self._reported[key] = now
+        self.stage = getattr(bar, '_linly_stage', self.model)
+        self.n, self.total = int(bar.n), int(bar.total) if bar.total else None
+        self.emit('progress', stage=self.stage, n=self.n, total=self.total, unit=getattr(bar, 'unit', 'it'))
+
+    def to_dict(self, ttl=None):
+        return {
+            'job_id': self.id,
+            'model': self.model,
+            'status': self.status,
+            'stage': self.stage,
+            'n': self.n,
+            'total': self.total,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'expires': self.finished + ttl if self.finished is not None and ttl is not None else None,
+            'artifact': os.path.basename(self.artifact) if self.artifact else None,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, job_dir=JOB_DIR, ttl=JOB_TTL):
+        self.job_dir = job_dir
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._queues = {}
+        self._lock = threading.Lock()
+        os.makedirs(job_dir, exist_ok=True)
+        track_tqdm()
+        # 之前的进程留下的结果目录同样按 TTL 过期
+        now = time.time()
+        for name in os.listdir(job_dir):
+            path = os.path.join(job_dir, name)
+            if os.path.isdir(path) and now - os.path.getmtime(path) > ttl:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def submit(self, model, fn, *args, instance=None, cleanup=(), **kwargs):
+        """
+        把 fn(*args, **kwargs) 放入模型实例的队列，返回任务 ID；fn 返回结果视频路径。
+        instance 为执行任务的模型实例，默认取绑定方法的 __self__（如 talker.predict），
+        两者都没有时按 model 名称排队。
+        """
+        self.purge()
+        if instance is None:
+            instance = getattr(fn, '__self__', None)
+        job = Job(model, fn, args, kwargs, cleanup, instance)
+        # 排队中的任务持有实例的引用，实例在队列清空前不会被回收，id 不会被复用
+        key = id(instance) if instance is not None else model
+        with self._lock:
+            self._jobs[job.id] = job
+            q = self._queues.get(key)
+            if q is None:
+                q = self._queues[key] = deque()
+                threading.Thread(target=self._worker, args=(key, q), name='job-%s' % model, daemon=True).start()
+            job.emit('status', position=len(q))
+            q.append(job)
+        return job.id
+
+    def _worker(self, key, q):
+        while True:
+            with self._lock:
+                if not q:
+                    # 队列空闲时退出，更换模型后旧实例不会留下线程
+                    del self._queues[key]
+                    return
+                job = q.popleft()
+            self._run(job)
+
+    def pending(self):
+        """排队中与执行中的任务数"""
+        with self._lock:
+            return sum(not job.done for job in self._jobs.values())
+
+    def _run(self, job):
+        job.started = time.time()
+        job.emit('status', 'running')
+        token = _current_job.set(job)
+        try:
+            # 任务 ID 同时作为 trace_id，各阶段耗时可在 /metrics.json 的 traces 中按 ID 查到
+            with trace('job.' + job.model, trace_id=job.id):
+                result = job.fn(*job.args, **job.kwargs)
+            job.artifact = self._store(job, result)
+        except Exception as e:
+            job.error = '{}: {}'.format(type(e).__name__, e)
+            print('job {} ({}) failed: {}'.format(job.id, job.model, job.error))
+        finally:
+            _current_job.reset(token)
+            # 释放输入（内存中的音频等），删除上传的临时文件，之后才通知任务结束
+            job.fn = job.args = job.kwargs = job.instance = None
+            for path in job.cleanup:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+            job.finished = time.time()
+        if job.error is None:
+            job.emit('status', 'done', artifact=os.path.basename(job.artifact))
+        else:
+            job.emit('status', 'failed', error=job.error)
+
+    def _store(self, job, result):
+        """把结果视频移动到任务目录，避免被后续请求覆盖或清理"""
+        if not isinstance(result, str) or not os.path.isfile(result):
+            raise RuntimeError('render produced no video: {!r}'.format(result))
+        job_dir = os.path.join(self.job_dir, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, os.path.basename(result))
+        shutil.move(result, path)
+        return path
+
+    def _get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get(self, job_id):
+        """任务状态字典，不存在或已过期时返回 None"""
+        self.purge()
+        job = self._get(job_id)
+        return job.to_dict(self.ttl) if job is not None else None
+
+    def artifact(self, job_id):
+        """已完成任务的结果视频路径，未完成、失败或已过期时返回 None"""
+        self.purge()
+        job = self._get(job_id)
+        return job.artifact if job is not None and job.status == 'done' else None
+
+    def wait(self, job_id, timeout=None):
+        """阻塞到任务结束，返回状态字典（超时仍未结束时返回当前状态）"""
+        job = self._get(job_id)
+        if job is None:
+            return None
+        with job.cond:
+            job.cond.wait_for(lambda: job.done, timeout)
+        return job.to_dict(self.ttl)
+
+    def events(self, job_id, after=0, heartbeat=15):
+        """
+        依次产出 id > after 的事件，任务结束且事件发送完后停止；
+        heartbeat 秒内没有新事件时产出 None（SSE 用来发送保活注释）。
+        """
+        job = self._get(job_id)
+        if job is None:
+            return
+        while True:
+            with job.cond:
+                job.cond.wait_for(lambda: job.seq > after or job.done, heartbeat)
+            pending, finished = job.since(after)
+            for event in pending:
+                after = event['id']
+                yield event
+            if finished and not pending:
+                return
+            if not pending:
+                yield None
+
+    async def events_async(self, job_id, after=0, heartbeat=15):
+        """events() 的异步版本：在事件循环中等待新事件，任务线程通过 call_soon_threadsafe 唤醒"""
+        job = self._get(job_id)
+        if job is None:
+            return
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with job.cond:
+            job.waiters.add(waiter)
+        try:
+            while True:
+                # 先清除再取事件：之后产生的事件一定会再次 set，不会漏掉唤醒
+                waiter[1].clear()
+                pending, finished = job.since(after)
+                for event in pending:
+                    after = event['id']
+                    yield event
+                if pending:
+                    continue
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with job.cond:
+                job.waiters.discard(waiter)
+
+    async def wait_async(self, job_id):
+        """wait() 的异步版本：等待任务结束并返回状态字典，不占用线程"""
+        job = self._get(job_id)
+        if job is None:
+            return None
+        # 只关心结束，跳过已有的事件
+        async for _ in self.events_async(job_id, after=job.seq):
+            pass
+        return job.to_dict(self.ttl)
+
+    def purge(self):
+        """删除结束超过 TTL 的任务及其结果目录"""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished is not None and now - job.finished > self.ttl]
+            for job in expired:
+                self._jobs.pop(job.id)
+        for job in expired:
+            shutil.rmtree(os.path.join(self.job_dir, job.id), ignore_errors=True)
+        return len(expired)
+
+
+def get_job_queue():
+    """进程内共享的渲染任务队列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -1,69 +1,139 @@
+"""
+把生成的人脸裁剪视频贴回原图 (paste back)
+
+PasteCompositor 在构造时一次性算好贴回区域、融合位置与掩码，逐帧只做缩放与融合：
+- seamless: cv2.seamlessClone 泊松融合（与原实现逐像素一致），只在贴回区域外扩几个像素的 ROI 上求解；
+- alpha: 边缘羽化的 alpha 混合，速度快得多，适合实时场景。
+paste_pic 接受视频路径或渲染器直接给出的帧序列，多线程并行融合（resize / seamlessClone 会释放 GIL）并保持输出顺序，
+结果直接编码进带音频的最终文件。
+"""
 import cv2, os
 import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-import uuid
 
-from src.utils.videoio import save_video_with_watermark 
+from src.utils.videoio import FFmpegWriter, VideoReader
+from src.cost_time import instrument
 
-def paste_pic(video_path, pic_path, crop_info, new_audio_path, full_video_path, extended_crop=False):
+# seamlessClone 求解区域在贴回区域外扩的像素数（边界条件取自原图，外扩后结果不变）
+ROI_MARGIN = 2
+# 融合线程数上限；服务进程中多个任务可能同时贴回，不按 CPU 核数无上限地开线程
+PASTE_WORKERS = int(os.environ.get('PASTE_WORKERS', min(os.cpu_count() or 1, 4)))
 
-    if not os.path.isfile(pic_path):
-        raise ValueError('pic_path must be a valid path to video/image file')
-    elif pic_path.split('.')[-1] in ['jpg', 'png', 'jpeg']:
-        # loader for first frame
-        full_img = cv2.imread(pic_path)
-    else:
-        # loader for videos
-        video_stream = cv2.VideoCapture(pic_path)
-        fps = video_stream.get(cv2.CAP_PROP_FPS)
-        full_frames = [] 
-        while 1:
-            still_reading, frame = video_stream.read()
-            if not still_reading:
-                video_stream.release()
-                break 
-            break 
-        full_img = frame
-    frame_h = full_img.shape[0]
-    frame_w = full_img.shape[1]
-
-    video_stream = cv2.VideoCapture(video_path)
-    fps = video_stream.get(cv2.CAP_PROP_FPS)
-    crop_frames = []
-    while 1:
-        still_reading, frame = video_stream.read()
-        if not still_reading:
-            video_stream.release()
-            break
-        crop_frames.append(frame)
-    
-    if len(crop_info) != 3:
-        print("you didn't crop the image")
-        return
-    else:
-        r_w, r_h = crop_info[0]
-        clx, cly, crx, cry = crop_info[1]
-        lx, ly, rx, ry = crop_info[2]
-        lx, ly, rx, ry = int(lx), int(ly), int(rx), int(ry)
-        # oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
-        # oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
 
+class PasteCompositor:
+    def __init__(self, full_img, crop_info, extended_crop=False, mode='seamless', feather=None):
+        """
+        full_img: 原图 (BGR)
+        crop_info: preprocess 返回的 (原始尺寸, 裁剪框, 四边形框)
+        mode: 'seamless'（泊松融合）或 'alpha'（羽化 alpha 混合）
+        feather: alpha 模式羽化宽度（像素），默认为贴回区域短边的 1/10
+        """
+        if mode not in ('seamless', 'alpha'):
+            raise ValueError('Unknown paste mode {}'.format(mode))
+        self.full_img = full_img
+        self.mode = mode
+        clx, cly, crx, cry = crop_info[1]
+        lx, ly, rx, ry = [int(v) for v in crop_info[2]]
         if extended_crop:
             oy1, oy2, ox1, ox2 = cly, cry, clx, crx
         else:
             oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
+        oy1, oy2, ox1, ox2 = int(oy1), int(oy2), int(ox1), int(ox2)
+        self.size = (ox2 - ox1, oy2 - oy1)
+        frame_h, frame_w = full_img.shape[:2]
+
+        if mode == 'seamless':
+            self.mask = 255 * np.ones((oy2 - oy1, ox2 - ox1, 3), np.uint8)
+            y0, x0 = max(oy1 - ROI_MARGIN, 0), max(ox1 - ROI_MARGIN, 0)
+            y1, x1 = min(oy2 + ROI_MARGIN, frame_h), min(ox2 + ROI_MARGIN, frame_w)
+            self.roi = (slice(y0, y1), slice(x0, x1))
+            self.background = np.ascontiguousarray(full_img[self.roi])
+            self.location = ((ox1 + ox2) // 2 - x0, (oy1 + oy2) // 2 - y0)
+        else:
+            # 超出原图的部分直接裁掉
+            y0, x0 = max(oy1, 0), max(ox1, 0)
+            y1, x1 = min(oy2, frame_h), min(ox2, frame_w)
+            self.roi = (slice(y0, y1), slice(x0, x1))
+            self.src = (slice(y0 - oy1, y1 - oy1), slice(x0 - ox1, x1 - ox1))
+            self.background = full_img[self.roi].astype(np.float32)
+            h, w = oy2 - oy1, ox2 - ox1
+            feather = max(int(min(h, w) / 10), 1) if feather is None else max(int(feather), 1)
+            ramp_y = np.clip((np.minimum(np.arange(h), np.arange(h)[::-1]) + 1) / feather, 0, 1)
+            ramp_x = np.clip((np.minimum(np.arange(w), np.arange(w)[::-1]) + 1) / feather, 0, 1)
+            self.alpha = (ramp_y[:, None] * ramp_x[None, :])[self.src][..., None].astype(np.float32)
+
+    def patch(self, crop_frame):
+        """融合一帧，只返回 ROI 部分（只读共享的背景与掩码，可在多个线程中同时调用）"""
+        p = cv2.resize(crop_frame.astype(np.uint8), self.size)
+        if self.mode == 'seamless':
+            return cv2.seamlessClone(p, self.background, self.mask, self.location, cv2.NORMAL_CLONE)
+        blended = p[self.src] * self.alpha + self.background * (1 - self.alpha)
+        return blended.round().astype(np.uint8)
+
+    def paste(self, patch, out=None):
+        out = self.full_img.copy() if out is None else out
+        out[self.roi] = patch
+        return out
 
-    tmp_path = str(uuid.uuid4())+'.mp4'
-    out_tmp = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MP4V'), fps, (frame_w, frame_h))
-    for crop_frame in tqdm(crop_frames, 'seamlessClone:'):
-        p = cv2.resize(crop_frame.astype(np.uint8), (ox2-ox1, oy2 - oy1)) 
+    def __call__(self, crop_frame):
+        return self.paste(self.patch(crop_frame))
 
-        mask = 255*np.ones(p.shape, p.dtype)
-        location = ((ox1+ox2) // 2, (oy1+oy2) // 2)
-        gen_img = cv2.seamlessClone(p, full_img, mask, location, cv2.NORMAL_CLONE)
-        out_tmp.write(gen_img)
 
-    out_tmp.release()
+def composite_frames(compositor, crop_frames, workers=None, max_pending=None):
+    """
+    逐帧贴回，workers > 1 时在线程池中并行融合，按输入顺序产出完整帧。
+    在途的帧数有上限，crop_frames 可以是渲染器的生成器。
+    """
+    if workers is None:
+        workers = PASTE_WORKERS
+    if workers <= 1:
+        for crop_frame in crop_frames:
+            yield compositor(crop_frame)
+        return
+    max_pending = max_pending or 4 * workers
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='paste') as executor:
+        for crop_frame in crop_frames:
+            pending.append(executor.submit(compositor.patch, crop_frame))
+            if len(pending) >= max_pending:
+                yield compositor.paste(pending.popleft().result())
+        while pending:
+            yield compositor.paste(pending.popleft().result())
+
+
+def read_full_image(pic_path):
+    if not os.path.isfile(pic_path):
+        raise ValueError('pic_path must be a valid path to video/image file')
+    # 图片直接读取，视频取第一帧
+    return next(iter(VideoReader(pic_path, end=1)))
+
+
+@instrument
+def paste_pic(video_path, pic_path, crop_info, new_audio_path, full_video_path, extended_crop=False,
+              mode='seamless', workers=None, fps=25, rgb=False):
+    """
+    video_path: 生成的裁剪视频路径，或渲染器直接给出的帧序列（rgb 指定颜色顺序）
+    结果连同音频直接编码到 full_video_path。
+    """
+    full_img = read_full_image(pic_path)
+
+    if len(crop_info) != 3:
+        print("you didn't crop the image")
+        return
+
+    if isinstance(video_path, str):
+        crop_frames = VideoReader(video_path, prefetch=8)
+        fps = crop_frames.fps or fps
+    elif rgb:
+        crop_frames = (cv2.cvtColor(np.asarray(frame), cv2.COLOR_RGB2BGR) for frame in video_path)
+    else:
+        crop_frames = video_path
 
-    save_video_with_watermark(tmp_path, new_audio_path, full_video_path, watermark=False)
-    os.remove(tmp_path)
+    compositor = PasteCompositor(full_img, crop_info, extended_crop=extended_crop, mode=mode)
+    frame_h, frame_w = full_img.shape[:2]
+    with FFmpegWriter(full_video_path, fps, (frame_w, frame_h), audio=new_audio_path) as writer:
+        for frame in tqdm(composite_frames(compositor, crop_frames, workers), 'seamlessClone:'):
+            writer.write(frame)
+    return full_video_path
@@ -4,8 +4,6 @@ from tqdm import tqdm
 from PIL import Image 
 
 # 3dmm extraction
-import safetensors
-import safetensors.torch 
 from src.face3d.util.preprocess import align_img
 from src.face3d.util.load_mats import load_lm3d
 from src.face3d.models import networks
@@ -16,7 +14,9 @@ from src.utils.croper import Preprocesser
 
 import warnings
 
-from src.utils.safetensor_helper import load_x_from_safetensor 
+from src.utils.safetensor_helper import open_safetensor
+from src.utils.videoio import VideoReader
+from src.cost_time import instrument
 warnings.filterwarnings("ignore")
 
 def split_coeff(coeffs):
@@ -50,8 +50,7 @@ class CropAndExtract():
         self.net_recon = networks.define_net_recon(net_recon='resnet50', use_last_fc=False, init_path='').to(device)
         
         if sadtalker_path['use_safetensor']:
-            checkpoint = safetensors.torch.load_file(sadtalker_path['checkpoint'])    
-            self.net_recon.load_state_dict(load_x_from_safetensor(checkpoint, 'face_3drecon'))
+            open_safetensor(sadtalker_path['checkpoint']).load_into(self.net_recon, 'face_3drecon')
         else:
             checkpoint = torch.load(sadtalker_path['path_of_net_recon_model'], map_location=torch.device(device))    
             self.net_recon.load_state_dict(checkpoint['net_recon'])
@@ -60,6 +59,7 @@ class CropAndExtract():
         self.lm3d_std = load_lm3d(sadtalker_path['dir_of_BFM_fitting'])
         self.device = device
     
+    @instrument
     def generate(self, input_path, save_dir, crop_or_resize='crop', source_image_flag=False, pic_size=256):
 
         pic_name = os.path.splitext(os.path.split(input_path)[-1])[0]  
@@ -71,25 +71,12 @@ class CropAndExtract():
         #load input
         if not os.path.isfile(input_path):
             raise ValueError('input_path must be a valid path to video/image file')
-        elif input_path.split('.')[-1] in ['jpg', 'png', 'jpeg']:
-            # loader for first frame
-            full_frames = [cv2.imread(input_path)]
-            fps = 25
         else:
-            # loader for videos
-            video_stream = cv2.VideoCapture(input_path)
-            fps = video_stream.get(cv2.CAP_PROP_FPS)
-            full_frames = [] 
-            while 1:
-                still_reading, frame = video_stream.read()
-                if not still_reading:
-                    video_stream.release()
-                    break 
-                full_frames.append(frame) 
-                if source_image_flag:
-                    break
-
-        x_full_frames= [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  for frame in full_frames] 
+            # 图片按单帧读取；视频作为源图时只需要第一帧
+            reader = VideoReader(input_path, end=1 if source_image_flag else None, rgb=True)
+            x_full_frames = reader.read()
+            fps = reader.fps or 25
+
 
         #### crop images as the 
         if 'crop' in crop_or_resize.lower(): # default crop
@@ -1,8 +1,78 @@
+import os
+import threading
+
+from safetensors import safe_open
+
+
+class SafetensorCheckpoint:
+    """
+    SadTalker 合并权重 (SadTalker_V0.0.2_<size>.safetensors) 的共享句柄。
+    文件用 safe_open 以 mmap 方式打开，按顶层前缀（audio2pose / audio2exp /
+    generator / kp_extractor / face_3drecon ...）建立索引，
+    各子网络只按需读取自己的那一部分张量，不再整文件加载后线性扫描。
+    读过的页会一直计入 RSS，所以 load_into 拷贝进网络后释放映射，
+    下次读取时再重新打开（只解析文件头），索引保留。
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self._index = {}
+        for k in self._open().keys():
+            self._index.setdefault(k.split('.', 1)[0], []).append(k)
+
+    def _open(self):
+        if self._file is None:
+            self._file = safe_open(self.path, framework='pt', device='cpu')
+        return self._file
+
+    def prefixes(self):
+        return list(self._index)
+
+    def keys(self, prefix):
+        return list(self._index.get(prefix, []))
+
+    def state_dict(self, prefix):
+        """读取 prefix 下的张量（与文件共享 mmap 内存），返回去掉前缀的 state_dict"""
+        if prefix not in self._index:
+            raise KeyError('{} not found in {} (available: {})'.format(prefix, self.path, ', '.join(self._index)))
+        with self._lock:
+            f = self._open()
+            return {k[len(prefix) + 1:]: f.get_tensor(k) for k in self._index[prefix]}
+
+    def load_into(self, module, prefix, strict=True):
+        result = module.load_state_dict(self.state_dict(prefix), strict=strict)
+        self.release()
+        return result
+
+    def release(self):
+        """关闭 mmap（已返回的张量仍然有效），索引保留"""
+        with self._lock:
+            self._file = None
+
+
+_checkpoints = {}
+_checkpoints_lock = threading.Lock()
+
+
+def open_safetensor(path):
+    """进程内共享的 SafetensorCheckpoint，文件被替换（mtime/大小变化）后重新打开"""
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _checkpoints_lock:
+        checkpoint = _checkpoints.get(path)
+        if checkpoint is None or checkpoint[0] != key:
+            checkpoint = (key, SafetensorCheckpoint(path))
+            _checkpoints[path] = checkpoint
+        return checkpoint[1]
 
 
 def load_x_from_safetensor(checkpoint, key):
+    if isinstance(checkpoint, SafetensorCheckpoint):
+        return checkpoint.state_dict(key)
     x_generator = {}
     for k,v in checkpoint.items():
         if key in k:
             x_generator[k.replace(key+'.', '')] = v
-    return x_generator
\ No newline at end of file
+    return x_generator
@@ -91,6 +91,31 @@ def img_warp_back_inv_m(img, img_to, inv_m):
     return img_to
 
 
+def img_warp_back_inv_m_roi(img, img_to, inv_m):
+    """
+    与 img_warp_back_inv_m 结果一致，但只在 img 反变换后覆盖的矩形区域内 warp 与合成，
+    避免对整张高分辨率原图做 warpAffine。
+    """
+    h_up, w_up, c = img_to.shape
+    h, w = img.shape[:2]
+    corners = np.array([[0, 0, 1], [w, 0, 1], [0, h, 1], [w, h, 1]], dtype=np.float64) @ np.asarray(inv_m, dtype=np.float64).T
+    x0, y0 = np.floor(corners.min(axis=0)).astype(int) - 1
+    x1, y1 = np.ceil(corners.max(axis=0)).astype(int) + 1
+    x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, w_up), min(y1, h_up)
+    if x1 <= x0 or y1 <= y0:
+        return img_to
+
+    roi_m = np.array(inv_m, dtype=np.float64)
+    roi_m[:, 2] -= (x0, y0)
+    mask = np.ones((h, w), dtype=np.float32)
+    inv_mask = cv2.warpAffine(mask, roi_m, (x1 - x0, y1 - y0)) == 1
+    inv_img = cv2.warpAffine(img, roi_m, (x1 - x0, y1 - y0))
+
+    roi = img_to[y0:y1, x0:x1]
+    roi[inv_mask] = inv_img[inv_mask]
+    return img_to
+
+
 def get_video_fps(vfile):
     cap = cv2.VideoCapture(vfile)
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -1,31 +1,325 @@
+"""
+视频读写 (video I/O)
+
+各 TFG 后端统一使用的读写接口：
+- VideoReader: 帧迭代器，支持帧区间 / seek、可选的解码线程预读；
+- FFmpegWriter: 原始帧经管道送入常驻 ffmpeg 进程编码，可同时混入音频，编码器可配置；
+- write_video / mux_audio / extract_audio: 常用的一次性操作，ffmpeg 参数以列表传入，路径无需转义。
+每次视频编码都会计数（encode_passes），便于检查一次请求经过了几次有损编码。
+"""
 import shutil
 import uuid
 import subprocess
 import os
+import queue
+import threading
+import time
 
 import cv2
+import numpy as np
+
+from src.cost_time import instrument, record
+
+FFMPEG = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+_encode_passes = 0
+_encode_lock = threading.Lock()
+
+
+def _count_encode_pass():
+    global _encode_passes
+    with _encode_lock:
+        _encode_passes += 1
+
+
+def encode_passes():
+    """进程启动以来的视频编码次数（FFmpegWriter 与重新编码的 mux 各算一次）"""
+    return _encode_passes
+
+
+def is_image(path):
+    return os.path.splitext(str(path))[1].lower() in ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class VideoReader:
+    """
+    逐帧读取视频（默认 BGR，与 cv2 一致）。
+    start / end: 帧区间 [start, end)，start > 0 时直接 seek；
+    prefetch: > 0 时在独立线程中解码，最多预读 prefetch 帧，与调用方的处理重叠。
+    图片路径按单帧视频处理。
+    """
+    def __init__(self, path, start=0, end=None, rgb=False, prefetch=0):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.rgb = rgb
+        self.prefetch = prefetch
+        if is_image(path):
+            self.fps, self.frame_count = 0.0, 1
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError('无法读取图片 {}'.format(path))
+            self.size = image.shape[1::-1]
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise ValueError('无法打开视频 {}'.format(path))
+            self.fps = cap.get(cv2.CAP_PROP_FPS)
+            self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            cap.release()
+
+    def __len__(self):
+        end = self.frame_count if self.end is None else min(self.end, self.frame_count)
+        return max(end - self.start, 0)
+
+    def _decode(self):
+        if is_image(self.path):
+            if self.start == 0 and (self.end is None or self.end > 0):
+                frame = cv2.imread(self.path)
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if self.rgb else frame
+            return
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if self.start > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+            index = self.start
+            while self.end is None or index < self.end:
+                still_reading, frame = cap.read()
+                if not still_reading:
+                    break
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if self.rgb else frame
+                index += 1
+        finally:
+            cap.release()
+
+    def _prefetched(self):
+        frames = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def decode():
+            decoder = self._decode()
+            try:
+                for frame in decoder:
+                    if not put(frame):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+            finally:
+                decoder.close()
+
+        thread = threading.Thread(target=decode, name='video_reader', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 调用方提前结束迭代时通知解码线程退出
+            stop.set()
+            thread.join()
+
+    def __iter__(self):
+        return self._prefetched() if self.prefetch > 0 else self._decode()
+
+    def read(self):
+        return list(self)
+
+
+def read_video(path, start=0, end=None, rgb=False):
+    return VideoReader(path, start=start, end=end, rgb=rgb).read()
+
+
+def video_fps(path):
+    return VideoReader(path).fps
+
 
 def load_video_to_cv2(input_path):
-    video_stream = cv2.VideoCapture(input_path)
-    fps = video_stream.get(cv2.CAP_PROP_FPS)
-    full_frames = [] 
-    while 1:
-        still_reading, frame = video_stream.read()
-        if not still_reading:
-            video_stream.release()
-            break 
-        full_frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    return full_frames
+    return read_video(input_path, rgb=True)
+
+def iter_video_frames(input_path, prefetch=8):
+    """逐帧解码视频（RGB），不把整段视频读入内存"""
+    return iter(VideoReader(input_path, rgb=True, prefetch=prefetch))
+
+def count_video_frames(input_path):
+    return len(VideoReader(input_path))
+
+
+def run_ffmpeg(args, encode=True):
+    """以参数列表调用 ffmpeg（不经过 shell），失败时抛出带 stderr 的 RuntimeError"""
+    cmd = [FFMPEG, '-y', '-hide_banner', '-loglevel', 'error'] + [str(a) for a in args]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError('ffmpeg 执行失败 (%s): %s' % (' '.join(cmd), proc.stderr.decode('utf-8', errors='replace').strip()))
+    if encode:
+        _count_encode_pass()
+
+
+@instrument
+def extract_audio(src, save_path, sample_rate=None):
+    """从音视频文件中提取音频（例如转为 wav）"""
+    args = ['-i', src, '-vn']
+    if sample_rate:
+        args += ['-ar', sample_rate]
+    run_ffmpeg(args + [save_path], encode=False)
+    return save_path
+
+
+@instrument
+def mux_audio(video, audio, save_path, reencode=False, codec='libx264', crf=18):
+    """
+    给视频混入音频。默认直接复制视频流，不再有损编码一次；
+    reencode=True 时用 codec 重新编码（源视频编码格式不适合 mp4 播放时使用）。
+    """
+    args = ['-i', video, '-i', audio, '-map', '0:v:0', '-map', '1:a:0?']
+    args += ['-c:v', codec, '-crf', crf, '-pix_fmt', 'yuv420p'] if reencode else ['-c:v', 'copy']
+    temp_file = os.path.join(os.path.dirname(os.path.abspath(save_path)), 'mux_%s.mp4' % uuid.uuid4().hex[:12])
+    try:
+        run_ffmpeg(args + ['-c:a', 'aac', temp_file], encode=reencode)
+        shutil.move(temp_file, save_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return save_path
 
 def save_video_with_watermark(video, audio, save_path, watermark=False):
-    temp_file = str(uuid.uuid4())+'.mp4'
-    # os.system(cmd)
+    """混入音频：默认复制视频流，源视频编码无法直接封装进 mp4 时才重新编码"""
     try:
-        cmd = r'ffmpeg -y -hide_banner -loglevel error -i "%s" -i "%s" -vcodec h264 "%s"' % (video, audio, temp_file)
-        subprocess.run(cmd, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except:
-        cmd = r'ffmpeg -y -hide_banner -loglevel error -i "%s" -i "%s" -vcodec copy "%s"' % (video, audio, temp_file)
-        subprocess.run(cmd, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if not os.path.exists(temp_file):
-        print("FFmpeg error")
-    shutil.move(temp_file, save_path)
\ No newline at end of file
+        mux_audio(video, audio, save_path)
+    except RuntimeError:
+        mux_audio(video, audio, save_path, reencode=True, codec='h264')
+
+def unique_video_path(save_dir='results', prefix='video', ext='.mp4'):
+    """为每次请求生成独立的输出路径，避免并发请求互相覆盖"""
+    os.makedirs(save_dir, exist_ok=True)
+    return os.path.join(save_dir, '%s_%s%s' % (prefix, uuid.uuid4().hex[:12], ext))
+
+
+class FFmpegWriter:
+    """
+    通过管道把原始 BGR 帧直接送入一个常驻的 ffmpeg 进程编码，并同时混入音频。
+    接口与 cv2.VideoWriter 一致（write / release），可直接作为 FramePipeline 的 writer，
+    省去先写中间 AVI 再调用 ffmpeg 转码合成的过程。
+    """
+    def __init__(self, save_path, fps, frame_size, audio=None, codec='libx264', preset='veryfast',
+                 crf=18, pix_fmt='yuv420p', audio_codec='aac', ffmpeg=None, input_pix_fmt='bgr24'):
+        """
+        frame_size: (width, height)
+        audio: 需要混入的音频文件路径，None 时只输出视频
+        input_pix_fmt: 写入帧的像素格式，bgr24（OpenCV）、rgb24 或 gray（单通道）
+        """
+        self.save_path = save_path
+        self.frame_size = tuple(int(s) for s in frame_size)
+        width, height = self.frame_size
+        cmd = [ffmpeg or FFMPEG, '-y', '-hide_banner', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', input_pix_fmt, '-s', '%dx%d' % (width, height), '-r', str(fps), '-i', '-']
+        if audio is not None:
+            cmd += ['-i', str(audio), '-map', '0:v:0', '-map', '1:a:0', '-c:a', audio_codec]
+        cmd += ['-c:v', codec]
+        if preset:
+            cmd += ['-preset', preset]
+        if crf is not None:
+            cmd += ['-crf', str(crf)]
+        if pix_fmt == 'yuv420p' and (width % 2 or height % 2):
+            # yuv420p 要求宽高为偶数
+            cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        cmd += ['-pix_fmt', pix_fmt, save_path]
+        self.command = cmd
+        self.frames = 0
+        # 写入管道被编码阻塞的时间与结束时等待编码完成的时间之和
+        self.encode_time = 0.0
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _count_encode_pass()
+        # 持续读取 stderr，防止输出过多时管道写满导致 ffmpeg 阻塞
+        self._stderr = []
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self.proc.stderr:
+            self._stderr.append(line.decode('utf-8', errors='replace'))
+            del self._stderr[:-50]
+
+    def _error(self):
+        return RuntimeError('ffmpeg 编码失败 (%s): %s' % (' '.join(self.command), ''.join(self._stderr).strip()))
+
+    def write(self, frame):
+        if frame.shape[1::-1] != self.frame_size:
+            raise ValueError('帧尺寸 %s 与编码器尺寸 %s 不一致' % (frame.shape[1::-1], self.frame_size))
+        start = time.perf_counter()
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except (BrokenPipeError, OSError):
+            self.proc.wait()
+            self._stderr_thread.join()
+            raise self._error()
+        self.encode_time += time.perf_counter() - start
+        self.frames += 1
+
+    def release(self):
+        if self.proc.stdin.closed:
+            return self.save_path
+        start = time.perf_counter()
+        try:
+            self.proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self.proc.wait()
+        self._stderr_thread.join()
+        self.encode_time += time.perf_counter() - start
+        record('FFmpegWriter.encode', self.encode_time, frames=self.frames)
+        if self.proc.returncode != 0:
+            raise self._error()
+        return self.save_path
+
+    close = release
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.release()
+        else:
+            # 出错时终止 ffmpeg，丢弃不完整的输出
+            self.proc.kill()
+            self.proc.wait()
+            self._stderr_thread.join()
+            if os.path.exists(self.save_path):
+                os.remove(self.save_path)
+
+
+@instrument
+def write_video(frames, save_path, fps, audio=None, rgb=False, **kwargs):
+    """
+    把一组帧一次编码为视频（可同时混入音频），替代 imageio.mimsave + 再合成音频的两次编码。
+    frames: 帧的可迭代对象，rgb 指定其颜色顺序；其余参数同 FFmpegWriter
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError('没有可写入的帧')
+    first = np.asarray(first)
+    if first.dtype != np.uint8:
+        raise ValueError('帧必须为 uint8')
+    pix_fmt = 'gray' if first.ndim == 2 else ('rgb24' if rgb else 'bgr24')
+    with FFmpegWriter(save_path, fps, first.shape[1::-1], audio=audio, input_pix_fmt=pix_fmt, **kwargs) as writer:
+        writer.write(first)
+        for frame in frames:
+            writer.write(frame)
+    return save_path
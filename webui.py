@@ -10,7 +10,9 @@ warnings.filterwarnings('ignore')
 from zhconv import convert
 from LLM import LLM
 from TTS import EdgeTTS
-from src.cost_time import calculate_time
+from src.cost_time import instrument, start_metrics_server
+from src.utils.audio_clip import AudioClip, audio_path
+from src.utils.jobs import get_job_queue
 
 from configs import *
 os.environ["GRADIO_TEMP_DIR"]= './temp'
@@ -50,7 +52,7 @@ AUDIO_LENGTH = 5
 
 edgetts = EdgeTTS()
 
-@calculate_time
+@instrument
 def Asr(audio):
     try:
         question = asr.transcribe(audio)
@@ -91,12 +93,13 @@ def change_instruction(mode):
 PROMPT_SR, TARGET_SR = 16000, 22050
 DEFAULT_DATA = np.zeros(TARGET_SR)
 
-@calculate_time
+@instrument
 def TTS_response(text, voice, rate, volume, pitch, am, voc, lang, male,
                 ref_audio, prompt_text, prompt_language, text_language,
                 cut_method, question_audio, question, use_mic_voice,
                 mode_checkbox_group, sft_dropdown, prompt_text_cv, prompt_wav_upload, prompt_wav_record, seed, speed_factor,
-                tts_method='Edge-TTS', save_path='answer.wav'):
+                tts_method='Edge-TTS', save_path='answer.wav', return_clip=False):
+    # return_clip=True 时返回内存中的 AudioClip，供数字人模块直接使用，避免重复读盘与重采样
     if text == '':
         text = '请输入文字/问题'
     if tts_method == 'Edge-TTS':
@@ -104,25 +107,26 @@ def TTS_response(text, voice, rate, volume, pitch, am, voc, lang, male,
             gr.Warning("请检查网络或使用其他模型，例如PaddleTTS")
             return None
         try:
-            edgetts.predict(text, voice, rate, volume, pitch, save_path, 'answer.vtt')
+            audio, _ = edgetts.predict(text, voice, rate, volume, pitch, save_path, 'answer.vtt', return_clip=return_clip)
         except Exception as e:
-            os.system(f'edge-tts --text "{text}" --voice {voice} --write-media {save_path} --write-subtitles answer.vtt')
-        return save_path
+            gr.Warning(f"EdgeTTS合成失败，请检查网络或使用其他模型: {e}")
+            return None
+        return audio
     
     if tts_method == 'PaddleTTS':
         tts.predict(text, am, voc, lang=lang, male=male, save_path=save_path)
-        return save_path
+        return AudioClip.from_file(save_path) if return_clip else save_path
     
     if tts_method == 'GPT-SoVITS克隆声音':
         try:
-            vits.predict(ref_wav_path=question_audio if use_mic_voice else ref_audio,
-                         prompt_text=question if use_mic_voice else prompt_text,
-                         prompt_language=prompt_language,
-                         text=text,
-                         text_language=text_language,
-                         how_to_cut=cut_method,
-                         save_path=save_path)
-            return save_path
+            return vits.predict(ref_wav_path=question_audio if use_mic_voice else ref_audio,
+                                prompt_text=question if use_mic_voice else prompt_text,
+                                prompt_language=prompt_language,
+                                text=text,
+                                text_language=text_language,
+                                how_to_cut=cut_method,
+                                save_path=save_path,
+                                return_clip=return_clip)
         except Exception as e:
             gr.Warning("无克隆环境或模型权重，无法克隆声音", e)
             return None
@@ -160,13 +164,13 @@ def TTS_response(text, voice, rate, volume, pitch, am, voc, lang, male,
 
         if mode_checkbox_group == '预训练音色':
             set_all_random_seed(seed)
-            output = cosyvoice.predict_sft(text, sft_dropdown, speed_factor=speed_factor, save_path=save_path)
+            output = cosyvoice.predict_sft(text, sft_dropdown, speed_factor=speed_factor, save_path=save_path, return_clip=return_clip)
         elif mode_checkbox_group == '3s极速复刻':
             set_all_random_seed(seed)
-            output = cosyvoice.predict_zero_shot(text, prompt_text_cv, prompt_wav, speed_factor=speed_factor, save_path=save_path)
+            output = cosyvoice.predict_zero_shot(text, prompt_text_cv, prompt_wav, speed_factor=speed_factor, save_path=save_path, return_clip=return_clip)
         elif mode_checkbox_group == '跨语种复刻':
             set_all_random_seed(seed)
-            output = cosyvoice.predict_cross_lingual(text, prompt_wav, speed_factor=speed_factor, save_path=save_path)
+            output = cosyvoice.predict_cross_lingual(text, prompt_wav, speed_factor=speed_factor, save_path=save_path, return_clip=return_clip)
         return output
     else:
         gr.Warning('未知模型')
@@ -179,7 +183,7 @@ instruct_dict = {'预训练音色': '1. 选择预训练音色\n2. 点击生成
                 '自然语言控制': '1. 选择预训练音色\n2. 输入instruct文本\n3. 点击生成音频按钮'}
 
 
-@calculate_time
+@instrument
 def LLM_response(
     question_audio, question,  # 输入的音频和文本问题
     voice, rate, volume, pitch,  # 语音合成参数
@@ -204,7 +208,7 @@ def LLM_response(
         ref_audio, prompt_text, prompt_language, text_language, 
         cut_method, question_audio, question, use_mic_voice, 
         mode_checkbox_group, sft_dropdown, prompt_text_cv, prompt_wav_upload, 
-        prompt_wav_record, seed, speed_factor, tts_method
+        prompt_wav_record, seed, speed_factor, tts_method, return_clip=True
     )
 
     # 生成VTT文件（如果TTS方法为'Edge-TTS'）
@@ -212,7 +216,21 @@ def LLM_response(
     tts_vtt = None
     return tts_audio, tts_vtt, answer
 
-@calculate_time
+def render_job(model, fn, *args, progress=None, **kwargs):
+    """在后台任务队列中渲染视频（fn 绑定的模型实例在提交时确定，同一实例的任务依次执行），把阶段与帧进度同步到 Gradio 进度条"""
+    jobs = get_job_queue()
+    job_id = jobs.submit(model, fn, *args, **kwargs)
+    for event in jobs.events(job_id):
+        if event is None:
+            continue
+        if event['type'] == 'progress' and progress is not None:
+            progress((event['n'], event['total']) if event['total'] else None, desc=event['stage'])
+        elif event['status'] == 'failed':
+            gr.Warning("视频生成失败：" + event['error'])
+            return None
+    return jobs.artifact(job_id)
+
+@instrument
 def Talker_response_img(question_audio, method, text, voice, rate, volume, pitch,
                         am, voc, lang, male, inp_ref, prompt_text, prompt_language,
                         text_language, how_to_cut, use_mic_voice, 
@@ -240,22 +258,23 @@ def Talker_response_img(question_audio, method, text, voice, rate, volume, pitch
     # 视频生成
     video = None
     if method == 'SadTalker':
-        video = talker.test2(source_image, driven_audio, preprocess_type, is_still_mode, enhancer,
-                             batch_size, size_of_image, pose_style, facerender, exp_weight,
-                             REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH, blink_every, 
-                             fps=fps)
+        video = render_job(method, talker.test2, source_image, driven_audio, preprocess_type, is_still_mode, enhancer,
+                           batch_size, size_of_image, pose_style, facerender, exp_weight,
+                           REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH, blink_every, 
+                           fps=fps, progress=progress)
     elif method == 'Wav2Lip':
-        video = talker.predict(source_image, driven_audio, batch_size)
+        video = render_job(method, talker.predict, source_image, driven_audio, batch_size, progress=progress)
     elif method == 'Wav2Lipv2':
-        video = talker.predict(source_image, driven_audio, batch_size)
+        video = render_job(method, talker.predict, source_image, driven_audio, batch_size, progress=progress)
     elif method == 'NeRFTalk':
-        video = talker.predict(driven_audio)
+        video = render_job(method, talker.predict, audio_path(driven_audio), progress=progress)
     else:
         gr.Warning("不支持的方法：" + method)
         return None
 
     return (video, driven_vtt) if driven_vtt else video
 
+@instrument
 def chat_response(system, message, history):
     # response = llm.generate(message)
     response, history = llm.chat(system, message, history)
@@ -278,6 +297,7 @@ def clear_session():
     return '', []
 
 
+@instrument
 def human_response(source_image, history, question_audio, talker_method, voice, rate, volume, pitch,
                    am, voc, lang, male, inp_ref, prompt_text, prompt_language, text_language, cut_method, use_mic_voice, 
                    mode_checkbox_group, sft_dropdown, prompt_text_cv, prompt_wav_upload, prompt_wav_record, seed, speed_factor, 
@@ -311,7 +331,8 @@ def human_response(source_image, history, question_audio, talker_method, voice,
     driven_audio = TTS_response(response, voice, rate, volume, pitch, am, voc, lang, male,
                                             inp_ref, prompt_text, prompt_language, text_language,
                                             cut_method, question_audio, question, use_mic_voice, 
-                                            mode_checkbox_group, sft_dropdown, prompt_text_cv, prompt_wav_upload, prompt_wav_record, seed, speed_factor,tts_method)
+                                            mode_checkbox_group, sft_dropdown, prompt_text_cv, prompt_wav_upload, prompt_wav_record, seed, speed_factor,tts_method,
+                                            return_clip=True)
     driven_vtt = 'answer.vtt' if tts_method == 'Edge-TTS' else None
     driven_vtt = None
     if driven_audio is None:
@@ -322,16 +343,16 @@ def human_response(source_image, history, question_audio, talker_method, voice,
     video = None
     if talker_method == 'SadTalker':
         pose_style = random.randint(0, 45)
-        video = talker.test2(source_image, driven_audio, preprocess_type, is_still_mode, enhancer,
-                        batch_size, size_of_image, pose_style, facerender, exp_weight,
-                        REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH, blink_every, 
-                        fps=fps)
+        video = render_job(talker_method, talker.test2, source_image, driven_audio, preprocess_type, is_still_mode, enhancer,
+                           batch_size, size_of_image, pose_style, facerender, exp_weight,
+                           REF_VIDEO, REF_INFO, USE_IDLE_MODE, AUDIO_LENGTH, blink_every, 
+                           fps=fps, progress=progress)
     elif talker_method == 'Wav2Lip':
-        video = talker.predict(crop_pic_path, driven_audio, batch_size, enhancer)
+        video = render_job(talker_method, talker.predict, crop_pic_path, driven_audio, batch_size, enhancer, progress=progress)
     elif talker_method == 'Wav2Lipv2':
-        video = talker.run(crop_pic_path, driven_audio, batch_size, enhancer)
+        video = render_job(talker_method, talker.run, crop_pic_path, driven_audio, batch_size, enhancer, progress=progress)
     elif talker_method == 'NeRFTalk':
-        video = talker.predict(driven_audio)
+        video = render_job(talker_method, talker.predict, audio_path(driven_audio), progress=progress)
     else:
         gr.Warning("不支持的方法：" + talker_method)
         return None
@@ -339,7 +360,7 @@ def human_response(source_image, history, question_audio, talker_method, voice,
     return video, driven_vtt if driven_vtt else video
 
 
-@calculate_time
+@instrument
 def MuseTalker_response(source_video, bbox_shift, question_audio, text, voice,
                         rate, volume, pitch, am, voc, lang, male, 
                         ref_audio, prompt_text, prompt_language, text_language, cut_method, use_mic_voice,
@@ -867,6 +888,11 @@ def talker_model_change(model_name, progress=gr.Progress(track_tqdm=True)):
     """更换数字人对话模型，并根据选择的模型加载相应资源。"""
     global talker
 
+    # 排队中的任务仍在使用当前模型，渲染结束前不更换，选项恢复为当前模型
+    if get_job_queue().pending():
+        gr.Warning("还有视频正在生成，请等待任务结束后再更换模型")
+        return type(talker).__name__
+
     # 清理显存，释放不必要的显存以便加载新模型
     clear_memory()
 
@@ -1013,6 +1039,9 @@ if __name__ == "__main__":
     except Exception as e:
         error_print(f"EdgeTTS 加载失败: {e}")
 
+    # 设置 LINLY_METRICS_PORT 时提供各阶段耗时指标（/metrics、/metrics.json）
+    start_metrics_server()
+
     # Gradio UI的初始化和启动
     gr.close_all()
     demo_img = app_img()